@@ -6,8 +6,8 @@ import fs from "fs/promises";
 import path from "path";
 import PDFDocument from "pdfkit";
 import { forwardToSeleniumInsuranceClaimStatusAgent } from "../services/seleniumInsuranceClaimStatusClient";
-import fsSync from "fs";
 import { emptyFolderContainingFile } from "../utils/emptyTempFolder";
+import { hasSeleniumFile, readSeleniumFile } from "../services/seleniumAgentJobs";
 import forwardToPatientDataExtractorService from "../services/patientDataExtractorService";
 import {
   InsertPatient,
@@ -163,7 +163,7 @@ router.post(
       ) {
         try {
           const pdfPath = seleniumResult.pdf_path;
-          const pdfBuffer = await fs.readFile(pdfPath);
+          const pdfBuffer = await readSeleniumFile(seleniumResult, "pdf_path");
 
           const extraction = await forwardToPatientDataExtractorService({
             buffer: pdfBuffer,
@@ -227,7 +227,7 @@ router.post(
           seleniumResult.pdf_path &&
           seleniumResult.pdf_path.endsWith(".pdf")
         ) {
-          const pdfBuffer = await fs.readFile(seleniumResult.pdf_path);
+          const pdfBuffer = await readSeleniumFile(seleniumResult, "pdf_path");
 
           const groupTitle = "Eligibility Status";
           const groupTitleKey = "ELIGIBILITY_STATUS";
@@ -313,7 +313,7 @@ router.post(
 
     let result: any = undefined;
 
-    async function imageToPdfBuffer(imagePath: string): Promise<Buffer> {
+    async function imageToPdfBuffer(image: string | Buffer): Promise<Buffer> {
       return new Promise<Buffer>((resolve, reject) => {
         try {
           const doc = new PDFDocument({ autoFirstPage: false });
@@ -329,7 +329,7 @@ router.post(
 
           doc.addPage({ size: [A4_WIDTH, A4_HEIGHT] });
 
-          doc.image(imagePath, 0, 0, {
+          doc.image(image, 0, 0, {
             fit: [A4_WIDTH, A4_HEIGHT],
             align: "center",
             valign: "center",
@@ -382,12 +382,12 @@ router.post(
         ) {
           try {
             // Ensure file exists
-            if (!fsSync.existsSync(result.ss_path)) {
+            if (!hasSeleniumFile(result, "ss_path")) {
               throw new Error(`Screenshot file not found: ${result.ss_path}`);
             }
 
             // Convert image to PDF buffer
-            pdfBuffer = await imageToPdfBuffer(result.ss_path);
+            pdfBuffer = await imageToPdfBuffer(await readSeleniumFile(result, "ss_path"));
 
             // Optionally write generated PDF to temp path (so name is available for createPdfFile)
             const pdfFileName = `claimStatus_${insuranceClaimStatusData.memberId}_${Date.now()}.pdf`;
@@ -395,6 +395,7 @@ router.post(
               path.dirname(result.ss_path),
               pdfFileName
             );
+            await fs.mkdir(path.dirname(generatedPdfPath), { recursive: true });
             await fs.writeFile(generatedPdfPath, pdfBuffer);
           } catch (err) {
             console.error("Failed to convert screenshot to PDF:", err);
@@ -600,7 +601,7 @@ router.post(
           ) {
             try {
               const pdfPath = seleniumResult.pdf_path;
-              const pdfBuffer = await fs.readFile(pdfPath);
+              const pdfBuffer = await readSeleniumFile(seleniumResult, "pdf_path");
 
               const extraction = await forwardToPatientDataExtractorService({
                 buffer: pdfBuffer,
@@ -670,7 +671,7 @@ router.post(
             seleniumResult.pdf_path.endsWith(".pdf")
           ) {
             try {
-              const pdfBuf = await fs.readFile(seleniumResult.pdf_path);
+              const pdfBuf = await readSeleniumFile(seleniumResult, "pdf_path");
               const groupTitle = "Eligibility Status";
               const groupTitleKey = "ELIGIBILITY_STATUS";
 
@@ -6,10 +6,10 @@ import {
   getSeleniumDdmaSessionStatus,
 } from "../services/seleniumDdmaInsuranceEligibilityClient";
 import fs from "fs/promises";
-import fsSync from "fs";
 import path from "path";
 import PDFDocument from "pdfkit";
 import { emptyFolderContainingFile } from "../utils/emptyTempFolder";
+import { hasSeleniumFile, readSeleniumFile } from "../services/seleniumAgentJobs";
 import {
   InsertPatient,
   insertPatientSchema,
@@ -36,7 +36,7 @@ function splitName(fullName?: string | null) {
   return { firstName, lastName };
 }
 
-async function imageToPdfBuffer(imagePath: string): Promise<Buffer> {
+async function imageToPdfBuffer(image: string | Buffer): Promise<Buffer> {
   return new Promise<Buffer>((resolve, reject) => {
     try {
       const doc = new PDFDocument({ autoFirstPage: false });
@@ -51,7 +51,7 @@ async function imageToPdfBuffer(imagePath: string): Promise<Buffer> {
 
       doc.addPage({ size: [A4_WIDTH, A4_HEIGHT] });
 
-      doc.image(imagePath, 0, 0, {
+      doc.image(image, 0, 0, {
         fit: [A4_WIDTH, A4_HEIGHT],
         align: "center",
         valign: "center",
@@ -287,7 +287,7 @@ async function handleDdmaCompletedJob(
       typeof seleniumResult.ss_path === "string"
     ) {
       try {
-        if (!fsSync.existsSync(seleniumResult.ss_path)) {
+        if (!hasSeleniumFile(seleniumResult, "ss_path")) {
           throw new Error(
             `File not found: ${seleniumResult.ss_path}`
           );
@@ -296,7 +296,7 @@ async function handleDdmaCompletedJob(
         // Check if the file is already a PDF (from Page.printToPDF)
         if (seleniumResult.ss_path.endsWith(".pdf")) {
           // Read PDF directly
-          pdfBuffer = await fs.readFile(seleniumResult.ss_path);
+          pdfBuffer = await readSeleniumFile(seleniumResult, "ss_path");
           generatedPdfPath = seleniumResult.ss_path;
           seleniumResult.pdf_path = generatedPdfPath;
           console.log(`[ddma-eligibility] Using PDF directly from Selenium: ${generatedPdfPath}`);
@@ -306,13 +306,14 @@ async function handleDdmaCompletedJob(
           seleniumResult.ss_path.endsWith(".jpeg")
         ) {
           // Convert image to PDF
-          pdfBuffer = await imageToPdfBuffer(seleniumResult.ss_path);
+          pdfBuffer = await imageToPdfBuffer(await readSeleniumFile(seleniumResult, "ss_path"));
 
           const pdfFileName = `ddma_eligibility_${insuranceEligibilityData.memberId}_${Date.now()}.pdf`;
           generatedPdfPath = path.join(
             path.dirname(seleniumResult.ss_path),
             pdfFileName
           );
+          await fs.mkdir(path.dirname(generatedPdfPath), { recursive: true });
           await fs.writeFile(generatedPdfPath, pdfBuffer);
           seleniumResult.pdf_path = generatedPdfPath;
           console.log(`[ddma-eligibility] Converted screenshot to PDF: ${generatedPdfPath}`);
@@ -10,6 +10,7 @@ import fsSync from "fs";
 import path from "path";
 import PDFDocument from "pdfkit";
 import { emptyFolderContainingFile } from "../utils/emptyTempFolder";
+import { hasSeleniumFile, readSeleniumFile } from "../services/seleniumAgentJobs";
 import {
   InsertPatient,
   insertPatientSchema,
@@ -36,7 +37,7 @@ function splitName(fullName?: string | null) {
   return { firstName, lastName };
 }
 
-async function imageToPdfBuffer(imagePath: string): Promise<Buffer> {
+async function imageToPdfBuffer(image: string | Buffer): Promise<Buffer> {
   return new Promise<Buffer>((resolve, reject) => {
     try {
       const doc = new PDFDocument({ autoFirstPage: false });
@@ -51,7 +52,7 @@ async function imageToPdfBuffer(imagePath: string): Promise<Buffer> {
 
       doc.addPage({ size: [A4_WIDTH, A4_HEIGHT] });
 
-      doc.image(imagePath, 0, 0, {
+      doc.image(image, 0, 0, {
         fit: [A4_WIDTH, A4_HEIGHT],
         align: "center",
         valign: "center",
@@ -282,12 +283,12 @@ async function handleDeltaInsCompletedJob(
     // Fallback: check for file path from selenium
     if (!pdfBuffer && seleniumResult?.ss_path && typeof seleniumResult.ss_path === "string") {
       try {
-        if (!fsSync.existsSync(seleniumResult.ss_path)) {
+        if (!hasSeleniumFile(seleniumResult, "ss_path")) {
           throw new Error(`File not found: ${seleniumResult.ss_path}`);
         }
 
         if (seleniumResult.ss_path.endsWith(".pdf")) {
-          pdfBuffer = await fs.readFile(seleniumResult.ss_path);
+          pdfBuffer = await readSeleniumFile(seleniumResult, "ss_path");
           generatedPdfPath = seleniumResult.ss_path;
           seleniumResult.pdf_path = generatedPdfPath;
         } else if (
@@ -295,12 +296,13 @@ async function handleDeltaInsCompletedJob(
           seleniumResult.ss_path.endsWith(".jpg") ||
           seleniumResult.ss_path.endsWith(".jpeg")
         ) {
-          pdfBuffer = await imageToPdfBuffer(seleniumResult.ss_path);
+          pdfBuffer = await imageToPdfBuffer(await readSeleniumFile(seleniumResult, "ss_path"));
           const pdfFileName = `deltains_eligibility_${insuranceId || "unknown"}_${Date.now()}.pdf`;
           generatedPdfPath = path.join(
             path.dirname(seleniumResult.ss_path),
             pdfFileName
           );
+          await fs.mkdir(path.dirname(generatedPdfPath), { recursive: true });
           await fs.writeFile(generatedPdfPath, pdfBuffer);
           seleniumResult.pdf_path = generatedPdfPath;
         }
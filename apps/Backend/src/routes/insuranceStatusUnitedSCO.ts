@@ -6,10 +6,10 @@ import {
   getSeleniumUnitedSCOSessionStatus,
 } from "../services/seleniumUnitedSCOInsuranceEligibilityClient";
 import fs from "fs/promises";
-import fsSync from "fs";
 import path from "path";
 import PDFDocument from "pdfkit";
 import { emptyFolderContainingFile } from "../utils/emptyTempFolder";
+import { hasSeleniumFile, readSeleniumFile } from "../services/seleniumAgentJobs";
 import {
   InsertPatient,
   insertPatientSchema,
@@ -36,7 +36,7 @@ function splitName(fullName?: string | null) {
   return { firstName, lastName };
 }
 
-async function imageToPdfBuffer(imagePath: string): Promise<Buffer> {
+async function imageToPdfBuffer(image: string | Buffer): Promise<Buffer> {
   return new Promise<Buffer>((resolve, reject) => {
     try {
       const doc = new PDFDocument({ autoFirstPage: false });
@@ -51,7 +51,7 @@ async function imageToPdfBuffer(imagePath: string): Promise<Buffer> {
 
       doc.addPage({ size: [A4_WIDTH, A4_HEIGHT] });
 
-      doc.image(imagePath, 0, 0, {
+      doc.image(image, 0, 0, {
         fit: [A4_WIDTH, A4_HEIGHT],
         align: "center",
         valign: "center",
@@ -283,7 +283,7 @@ async function handleUnitedSCOCompletedJob(
       typeof seleniumResult.ss_path === "string"
     ) {
       try {
-        if (!fsSync.existsSync(seleniumResult.ss_path)) {
+        if (!hasSeleniumFile(seleniumResult, "ss_path")) {
           throw new Error(
             `File not found: ${seleniumResult.ss_path}`
           );
@@ -292,7 +292,7 @@ async function handleUnitedSCOCompletedJob(
         // Check if the file is already a PDF (from Page.printToPDF)
         if (seleniumResult.ss_path.endsWith(".pdf")) {
           // Read PDF directly
-          pdfBuffer = await fs.readFile(seleniumResult.ss_path);
+          pdfBuffer = await readSeleniumFile(seleniumResult, "ss_path");
           generatedPdfPath = seleniumResult.ss_path;
           seleniumResult.pdf_path = generatedPdfPath;
           console.log(`[unitedsco-eligibility] Using PDF directly from Selenium: ${generatedPdfPath}`);
@@ -302,7 +302,7 @@ async function handleUnitedSCOCompletedJob(
           seleniumResult.ss_path.endsWith(".jpeg")
         ) {
           // Convert image to PDF
-          pdfBuffer = await imageToPdfBuffer(seleniumResult.ss_path);
+          pdfBuffer = await imageToPdfBuffer(await readSeleniumFile(seleniumResult, "ss_path"));
 
           // Use insuranceId (which may come from Selenium result) for filename
           const pdfFileName = `unitedsco_eligibility_${insuranceId || "unknown"}_${Date.now()}.pdf`;
@@ -310,6 +310,7 @@ async function handleUnitedSCOCompletedJob(
             path.dirname(seleniumResult.ss_path),
             pdfFileName
           );
+          await fs.mkdir(path.dirname(generatedPdfPath), { recursive: true });
           await fs.writeFile(generatedPdfPath, pdfBuffer);
           seleniumResult.pdf_path = generatedPdfPath;
           console.log(`[unitedsco-eligibility] Converted screenshot to PDF: ${generatedPdfPath}`);
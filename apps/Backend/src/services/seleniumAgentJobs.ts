@@ -0,0 +1,142 @@
+import axios from "axios";
+import { randomUUID } from "crypto";
+import fs from "fs/promises";
+import { existsSync } from "fs";
+
+const SELENIUM_AGENT_URL = "http://localhost:5002";
+
+const POLL_INTERVAL_MS = 2000;
+const JOB_TIMEOUT_MS = 15 * 60 * 1000;
+
+type JobOutcome = { done: true; value: any } | { done: false };
+
+function outcomeOf(job: any): JobOutcome {
+  if (job?.status === "completed") return { done: true, value: job.result };
+  if (job?.status === "error") {
+    return { done: true, value: { status: "error", message: job.message } };
+  }
+  return { done: false };
+}
+
+/**
+ * Follows GET /jobs/{job_id}/events (Server-Sent Events) until the job is
+ * done. Resolves { done: false } if the stream ends or breaks early, so the
+ * caller can fall back to polling.
+ */
+async function waitForJobEvents(jobId: string, timeoutMs: number): Promise<JobOutcome> {
+  const controller = new AbortController();
+  const timer = setTimeout(() => controller.abort(), timeoutMs);
+  try {
+    const r = await axios.get(`${SELENIUM_AGENT_URL}/jobs/${jobId}/events`, {
+      responseType: "stream",
+      signal: controller.signal,
+    });
+
+    let buffer = "";
+    for await (const chunk of r.data) {
+      buffer += chunk.toString("utf8");
+      let sep: number;
+      while ((sep = buffer.indexOf("\n\n")) >= 0) {
+        const frame = buffer.slice(0, sep);
+        buffer = buffer.slice(sep + 2);
+        const data = frame
+          .split("\n")
+          .filter((line) => line.startsWith("data:"))
+          .map((line) => line.slice(5).trim())
+          .join("\n");
+        if (!data) continue; // keepalive comment
+
+        const outcome = outcomeOf(JSON.parse(data));
+        if (outcome.done) return outcome;
+      }
+    }
+  } catch {
+    // stream unavailable / dropped - poll instead
+  } finally {
+    clearTimeout(timer);
+    controller.abort();
+  }
+  return { done: false };
+}
+
+/**
+ * Submits a job to the Selenium agent and waits for it to finish.
+ *
+ * The agent answers the submit immediately with a job_id; the result is then
+ * pushed on GET /jobs/{job_id}/events (falling back to polling GET
+ * /jobs/{job_id} if the stream is unavailable). The submit carries an
+ * Idempotency-Key so a retried POST is attached to the same job instead of
+ * running it twice.
+ *
+ * Resolves with the job result (same shape the endpoints used to return
+ * directly), or with { status: "error", message } if the job failed.
+ */
+export async function runSeleniumAgentJob(
+  path: string,
+  payload: any
+): Promise<any> {
+  const submit = await axios.post(`${SELENIUM_AGENT_URL}${path}`, payload, {
+    headers: { "Idempotency-Key": randomUUID() },
+  });
+  const jobId = submit.data?.job_id;
+  if (!jobId) return submit.data;
+
+  const deadline = Date.now() + JOB_TIMEOUT_MS;
+
+  const streamed = await waitForJobEvents(jobId, JOB_TIMEOUT_MS);
+  if (streamed.done) return streamed.value;
+
+  while (Date.now() < deadline) {
+    const r = await axios.get(`${SELENIUM_AGENT_URL}/jobs/${jobId}`);
+    const polled = outcomeOf(r.data);
+    if (polled.done) return polled.value;
+
+    await new Promise((res) => setTimeout(res, POLL_INTERVAL_MS));
+  }
+
+  return {
+    status: "error",
+    message: `Selenium job ${jobId} did not finish within ${JOB_TIMEOUT_MS / 60000} minutes`,
+  };
+}
+
+/**
+ * Downloads a stored artifact (PDF / screenshot) from the agent's
+ * GET /artifacts/{id}.
+ */
+export async function fetchSeleniumArtifact(artifactId: string): Promise<Buffer> {
+  const r = await axios.get(`${SELENIUM_AGENT_URL}/artifacts/${encodeURIComponent(artifactId)}`, {
+    responseType: "arraybuffer",
+  });
+  return Buffer.from(r.data);
+}
+
+/**
+ * Whether a Selenium result's file can be read: it has an artifact ID
+ * (fetched from the agent) or the local path exists.
+ */
+export function hasSeleniumFile(result: any, key: "pdf_path" | "ss_path"): boolean {
+  const artifactId = result?.[key.replace("_path", "_artifact_id")];
+  if (typeof artifactId === "string" && artifactId) return true;
+  return typeof result?.[key] === "string" && existsSync(result[key]);
+}
+
+/**
+ * Reads the file a Selenium result points at: by artifact ID when the agent
+ * stored it (pdf_path -> pdf_artifact_id), so the agent's disk need not be
+ * shared, otherwise from the local path.
+ */
+export async function readSeleniumFile(
+  result: any,
+  key: "pdf_path" | "ss_path"
+): Promise<Buffer> {
+  const artifactId = result?.[key.replace("_path", "_artifact_id")];
+  if (typeof artifactId === "string" && artifactId) {
+    try {
+      return await fetchSeleniumArtifact(artifactId);
+    } catch (err: any) {
+      console.warn(`[selenium] artifact ${artifactId} unavailable (${err?.message}), reading ${result?.[key]}`);
+    }
+  }
+  return fs.readFile(result[key]);
+}
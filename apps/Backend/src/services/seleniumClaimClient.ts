@@ -1,4 +1,4 @@
-import axios from "axios";
+import { runSeleniumAgentJob } from "./seleniumAgentJobs";
 
 export interface SeleniumPayload {
   claim: any;
@@ -36,17 +36,15 @@ export async function forwardToSeleniumClaimAgent(
     images,
   };
 
-  const result = await axios.post(
-    "http://localhost:5002/claimsubmit",
-    payload
-  );
-  if (result.data.status === "error") {
+  // Agent queues the job and returns a job_id; wait for its result
+  const result = await runSeleniumAgentJob("/claimsubmit", payload);
+  if (result?.status === "error") {
     const errorMsg =
-      typeof result.data.message === "string"
-        ? result.data.message
-        : result.data.message?.msg || "Selenium agent error";
+      typeof result.message === "string"
+        ? result.message
+        : result.message?.msg || "Selenium agent error";
     throw new Error(errorMsg);
   }
 
-  return result.data;
+  return result;
 }
\ No newline at end of file
@@ -1,6 +1,7 @@
 import axios from "axios";
 import http from "http";
 import https from "https";
+import { randomUUID } from "crypto";
 import dotenv from "dotenv";
 dotenv.config();
 
@@ -68,7 +69,16 @@ export async function forwardToSeleniumDentaQuestEligibilityAgent(
     url: SELENIUM_AGENT_BASE + url,
     keys: Object.keys(payload),
   });
-  const r = await requestWithRetries({ url, method: "POST", data: payload }, 4);
+  // Same key on every retry, so the agent never queues this request twice
+  const r = await requestWithRetries(
+    {
+      url,
+      method: "POST",
+      data: payload,
+      headers: { "Idempotency-Key": randomUUID() },
+    },
+    4
+  );
   log("selenium-dentaquest-client", "agent response", {
     status: r.status,
     dataKeys: r.data ? Object.keys(r.data) : null,
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import asyncio
@@ -7,17 +8,31 @@ from selenium_eligibilityCheckWorker import AutomationMassHealthEligibilityCheck
 from selenium_claimStatusCheckWorker import AutomationMassHealthClaimStatusCheck
 from selenium_preAuthWorker import AutomationMassHealthPreAuth
 import os
+import json
 import time
 import helpers_ddma_eligibility as hddma
 import helpers_dentaquest_eligibility as hdentaquest
 import helpers_unitedsco_eligibility as hunitedsco
 import helpers_deltains_eligibility as hdeltains
+from job_scheduler import get_lane, lanes_status, monitor_event_loop_lag, PRIORITY_CLASSES
+import job_store
+import job_events
+import agent_metrics
+import eligibility_cache
+import resource_policy
+import tracing
+import batch_eligibility
+import artifact_store
+import pdf_render
+import job_downloads
 
 # Import session clear functions for startup
 from ddma_browser_manager import clear_ddma_session_on_startup
 from dentaquest_browser_manager import clear_dentaquest_session_on_startup
 from unitedsco_browser_manager import clear_unitedsco_session_on_startup
 from deltains_browser_manager import clear_deltains_session_on_startup
+from massdhp_browser_manager import get_browser_manager as get_massdhp_browser_manager
+import chromedriver_service
 
 from dotenv import load_dotenv
 load_dotenv() 
@@ -36,13 +51,7 @@ print("SESSION CLEAR COMPLETE - FRESH LOGINS REQUIRED")
 print("=" * 50)
 
 app = FastAPI()
-# Allow 1 selenium session at a time
-semaphore = asyncio.Semaphore(1)
-
-# Manual counters to track active & queued jobs
-active_jobs = 0
-waiting_jobs = 0
-lock = asyncio.Lock()  # To safely update counters
+# Jobs are queued per payer lane (see job_scheduler.py) so different portals run in parallel
 
 
 app.add_middleware(
@@ -52,207 +61,398 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("shutdown")
+async def close_massdhp_pool():
+    # Pooled MassHealth browsers and the PDF render browsers are not tied to a profile - don't leave them running
+    await asyncio.to_thread(get_massdhp_browser_manager().quit_all)
+    await asyncio.to_thread(pdf_render.shutdown)
+    await asyncio.to_thread(chromedriver_service.shutdown)
+
+
+@app.on_event("startup")
+async def warm_up_chromedriver():
+    # Resolve chromedriver and start the shared service now, not on the first job
+    asyncio.create_task(asyncio.to_thread(chromedriver_service.warm_up))
+
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    # Reported in /status as event_loop_lag_ms - stays near 0 while Selenium runs in lane threads
+    asyncio.create_task(monitor_event_loop_lag())
+
+
+@app.on_event("startup")
+async def start_artifact_gc():
+    # Age / size retention of stored PDFs and screenshots (artifact_store.py)
+    asyncio.create_task(artifact_store.run_gc_forever())
+
+MASSDHP_LOGIN_URL = "https://providers.massdhp.com/providers_login.asp"
+DDMA_LOGIN_URL = "https://providers.deltadentalma.com/onboarding/start/"
+DENTAQUEST_LOGIN_URL = "https://providers.dentaquest.com/onboarding/start/"
+UNITEDSCO_LOGIN_URL = "https://app.dentalhub.com/app/login"
+DELTAINS_LOGIN_URL = "https://www.deltadentalins.com/ciam/login?TARGET=%2Fprovider-tools%2Fv2"
+
+# Job kinds the agent accepts. `rerun` = safe to run again if the agent died
+# mid-job (read-only lookups); claim / pre-auth submissions are never re-run.
+# `priority` = default queue class (job_scheduler.PRIORITY_CLASSES); callers can
+# override it per request with "priority" in the body or an X-Priority header.
+JOB_KINDS = {
+    "claimsubmit":           {"lane": "massdhp",    "rerun": False, "priority": "normal"},
+    "eligibility_check":     {"lane": "massdhp",    "rerun": True,  "priority": "interactive"},
+    "claim_status_check":    {"lane": "massdhp",    "rerun": True,  "priority": "bulk"},
+    "claim_pre_auth":        {"lane": "massdhp",    "rerun": False, "priority": "normal"},
+    "ddma_eligibility":      {"lane": "ddma",       "rerun": True,  "priority": "interactive"},
+    "dentaquest_eligibility": {"lane": "dentaquest", "rerun": True, "priority": "interactive"},
+    "unitedsco_eligibility": {"lane": "unitedsco",  "rerun": True,  "priority": "interactive"},
+    "deltains_eligibility":  {"lane": "deltains",   "rerun": True,  "priority": "interactive"},
+    "ddma_eligibility_batch":       {"lane": "ddma",       "rerun": True, "priority": "bulk"},
+    "dentaquest_eligibility_batch": {"lane": "dentaquest", "rerun": True, "priority": "bulk"},
+    "unitedsco_eligibility_batch":  {"lane": "unitedsco",  "rerun": True, "priority": "bulk"},
+    "deltains_eligibility_batch":   {"lane": "deltains",   "rerun": True, "priority": "bulk"},
+}
+
+
+# Eligibility depth: "full" (status + benefits PDF) or "quick" (status, member ID
+# and name straight from the search results - no detail page, no PDF)
+ELIGIBILITY_MODES = ("full", "quick")
+
+
+def _apply_eligibility_mode(request: Request, body: dict) -> dict:
+    """
+    Fold the requested mode ("mode" in the body or in data, or ?mode=) into
+    body["data"], where the workers, the eligibility cache and the persisted
+    job payload all see it. Returns body.
+    """
+    data = body.get("data")
+    if not isinstance(data, dict):
+        data = body["data"] = {}
+    mode = body.get("mode") or data.get("mode") or request.query_params.get("mode") or "full"
+    if mode not in ELIGIBILITY_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(ELIGIBILITY_MODES)}")
+    if mode == "quick":
+        data["mode"] = "quick"
+    else:
+        data.pop("mode", None)
+    return body
+
+
+def _create_job(request: Request, kind: str, payload: dict, priority: str | None = None):
+    """
+    Persist a job for this request. Returns (job, created) - see Idempotency-Key.
+    An `X-Callback-Url` header makes the agent POST the job's status changes
+    and final result to that URL (see job_events.py). The queue class is
+    `priority` (from the body), else an X-Priority header, else the kind's default.
+    """
+    priority = priority or request.headers.get("X-Priority") or JOB_KINDS[kind]["priority"]
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(
+            status_code=400, detail=f"priority must be one of: {', '.join(PRIORITY_CLASSES)}"
+        )
+    callback_url = request.headers.get("X-Callback-Url")
+    job, created = job_store.create_job(
+        kind,
+        JOB_KINDS[kind]["lane"],
+        payload,
+        idempotency_key=request.headers.get("Idempotency-Key"),
+        callback_url=callback_url,
+        priority=priority,
+    )
+    if created:
+        job_events.register_callback(job["id"], callback_url)
+        agent_metrics.JOBS_SUBMITTED.inc(kind=kind, lane=JOB_KINDS[kind]["lane"])
+    return job, created
+
+
+def _reuse_eligibility(request: Request, body: dict, kind: str, url: str):
+    """
+    Answer an OTP-payer eligibility request without a new run, if possible:
+    - an identical request is already queued / running: join that job
+      (single flight - same session_id, same OTP prompt and result);
+    - eligibility_cache has a fresh result: the job is created already
+      completed, so session status, GET /jobs/{id} and the event streams all
+      see the cached result.
+    Returns the usual "started" response, or None if a new run is needed.
+    """
+    data = body.get("data", {})
+    lane = JOB_KINDS[kind]["lane"]
+
+    # A job posts to one callback URL, so callers asking for their own get their own run
+    inflight = None if request.headers.get("X-Callback-Url") else eligibility_cache.inflight_job(lane, data)
+    if inflight is not None and (job_store.get_job(inflight) or {}).get("status") in (None, *job_store.FINAL_STATUSES):
+        eligibility_cache.release(inflight)
+        inflight = None
+    if inflight is not None:
+        agent_metrics.COALESCED_REQUESTS.inc(lane=lane)
+        print(f"[{lane}] identical request joined in-flight job {inflight}")
+        return {"status": "started", "session_id": inflight, "job_id": inflight, "coalesced": True}
+
+    result = eligibility_cache.get(lane, data, bypass=eligibility_cache.wants_bypass(body, request.headers))
+    if result is None:
+        return None
+
+    job, created = _create_job(request, kind, {"data": data, "url": url}, body.get("priority"))
+    if created:
+        job_store.update_job(job["id"], status="completed", message="completed (cached)", result=result)
+        _job_done(job["id"])
+    return {"status": "started", "session_id": job["id"], "job_id": job["id"], "cached": created}
+
+
+def _cache_result(lane: str, data: dict, patients: list | None, result, job_id: str):
+    """Remember a finished run's successful result(s) for later identical requests."""
+    try:
+        if patients is None:
+            eligibility_cache.put(lane, data, result, job_id)
+        else:
+            eligibility_cache.put_batch(lane, data, patients, result, job_id)
+    except Exception as e:
+        print(f"[eligibility_cache] Could not store result of {job_id}: {e}")
+
+
+def _job_done(job_id: str):
+    """A job's worker returned: end its event streams and count the outcome."""
+    job_downloads.finish_job()
+    eligibility_cache.release(job_id)
+    job_events.close(job_id)
+    agent_metrics.record_job_finished(job_id)
+
+
+async def _massdhp_worker_wrapper(job_id: str, kind: str, data: dict, priority: str = "normal"):
+    """
+    Background worker for the MassHealth endpoints:
+      - waits for a slot in the MassHealth lane,
+      - runs the worker's main_workflow and stores the result on the job.
+    """
+    worker_cls = {
+        "claimsubmit": AutomationMassHealth,
+        "eligibility_check": AutomationMassHealthEligibilityCheck,
+        "claim_status_check": AutomationMassHealthClaimStatusCheck,
+        "claim_pre_auth": AutomationMassHealthPreAuth,
+    }[kind]
+
+    with tracing.job_span(job_id, kind=kind, lane="massdhp", priority=priority):
+        async with get_lane("massdhp").slot(priority) as lane:
+            job_store.mark_started(job_id)
+            try:
+                bot = worker_cls(data)
+                result = await lane.run_blocking(bot.main_workflow, MASSDHP_LOGIN_URL)
+
+                if result.get("status") != "success":
+                    job_store.update_job(job_id, status="error", message=str(result.get("message")))
+                    return
+
+                # MassHealth results carry no memberId; artifacts are indexed by it
+                member_id = (data.get("data") or data.get("claim") or {}).get("memberId")
+                if member_id:
+                    result.setdefault("memberId", member_id)
+                result = await artifact_store.ingest(job_id, result)
+                job_store.update_job(job_id, status="completed", message="completed", result=result)
+            except Exception as e:
+                job_store.update_job(job_id, status="error", message=str(e))
+            finally:
+                _job_done(job_id)
+
+
+async def _start_massdhp_job(request: Request, kind: str):
+    data = await request.json()
+    if kind == "eligibility_check":
+        _apply_eligibility_mode(request, data)
+
+    job, created = _create_job(request, kind, data, data.get("priority"))
+    if created:
+        asyncio.create_task(_massdhp_worker_wrapper(job["id"], kind, data, job["priority"]))
+
+    # Result is fetched later via GET /jobs/{job_id}
+    return {"status": job["status"], "job_id": job["id"]}
+
+
 # Endpoint: 1 — Start the automation of submitting Claim.
 @app.post("/claimsubmit")
 async def start_workflow(request: Request):
-    global active_jobs, waiting_jobs
-    data = await request.json()
-
-    async with lock:
-        waiting_jobs += 1
-
-    async with semaphore: 
-        async with lock:
-            waiting_jobs -= 1
-            active_jobs += 1
-
-        try:
-            bot = AutomationMassHealth(data)
-            result = bot.main_workflow("https://providers.massdhp.com/providers_login.asp")
-
-            if result.get("status") != "success":
-                return {"status": "error", "message": result.get("message")}
-            
-            return result
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-        finally:
-            async with lock:
-                active_jobs -= 1
+    return await _start_massdhp_job(request, "claimsubmit")
     
 # Endpoint: 2 — Start the automation of cheking eligibility
 @app.post("/eligibility-check")
 async def start_workflow(request: Request):
-    global active_jobs, waiting_jobs
-    data = await request.json()
-
-    async with lock:
-        waiting_jobs += 1
-
-    async with semaphore:
-        async with lock:
-            waiting_jobs -= 1
-            active_jobs += 1
-        try:
-            bot = AutomationMassHealthEligibilityCheck(data)
-            result = bot.main_workflow("https://providers.massdhp.com/providers_login.asp")
-
-            if result.get("status") != "success":
-                return {"status": "error", "message": result.get("message")}
-            
-            return result
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-        finally:
-            async with lock:
-                active_jobs -= 1
+    return await _start_massdhp_job(request, "eligibility_check")
     
 # Endpoint: 3 — Start the automation of cheking claim status
 @app.post("/claim-status-check")
 async def start_workflow(request: Request):
-    global active_jobs, waiting_jobs
-    data = await request.json()
-
-    async with lock:
-        waiting_jobs += 1
-
-    async with semaphore:
-        async with lock:
-            waiting_jobs -= 1
-            active_jobs += 1
-        try:
-            bot = AutomationMassHealthClaimStatusCheck(data)
-            result = bot.main_workflow("https://providers.massdhp.com/providers_login.asp")
-
-            if result.get("status") != "success":
-                return {"status": "error", "message": result.get("message")}
-            
-            return result
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-        finally:
-            async with lock:
-                active_jobs -= 1
+    return await _start_massdhp_job(request, "claim_status_check")
 
 # Endpoint: 4 — Start the automation of cheking claim pre auth
 @app.post("/claim-pre-auth")
 async def start_workflow(request: Request):
-    global active_jobs, waiting_jobs
-    data = await request.json()
+    return await _start_massdhp_job(request, "claim_pre_auth")
 
-    async with lock:
-        waiting_jobs += 1
-
-    async with semaphore:
-        async with lock:
-            waiting_jobs -= 1
-            active_jobs += 1
-        try:
-            bot = AutomationMassHealthPreAuth(data)
-            result = bot.main_workflow("https://providers.massdhp.com/providers_login.asp")
-
-            if result.get("status") != "success":
-                return {"status": "error", "message": result.get("message")}
-            
-            return result
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-        finally:
-            async with lock:
-                active_jobs -= 1
+
+# Job status / result (all endpoints)
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job_store.job_public_view(job)
+
+
+@app.get("/jobs/{job_id}/trace")
+async def job_trace(job_id: str, format: str = "tree"):
+    """
+    Timed spans of a recent job (queue, browser start, login, search, PDF ...).
+    ?format=otlp returns OTLP/JSON TracesData instead of the flat span list.
+    """
+    trace = tracing.get_trace(job_id, otlp=format == "otlp")
+    if trace is None:
+        raise HTTPException(status_code=404, detail="no trace for this job (unknown, or evicted)")
+    return trace
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events_stream(job_id: str):
+    """
+    Status changes of a job / OTP session as Server-Sent Events, instead of
+    polling the status endpoints. Ends with a "done" event (final result).
+    """
+    if job_store.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return StreamingResponse(
+        job_events.sse_stream(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/jobs/{job_id}/ws")
+async def job_events_ws(websocket: WebSocket, job_id: str):
+    """Same events as /jobs/{job_id}/events, one JSON message each: {"event", ...snapshot}."""
+    await websocket.accept()
+    if job_store.get_job(job_id) is None:
+        await websocket.close(code=4404, reason="job not found")
+        return
+    try:
+        async for event, snapshot in job_events.subscribe(job_id):
+            if event == "keepalive":
+                continue
+            await websocket.send_json({"event": event, **snapshot})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
 
 # Endpoint:5 -  DDMA eligibility (background, OTP)
 
-async def _ddma_worker_wrapper(sid: str, data: dict, url: str):
+async def _ddma_worker_wrapper(
+    sid: str, data: dict, url: str, patients: list | None = None, priority: str = "normal"
+):
     """
     Background worker that:
-      - acquires semaphore (to keep 1 selenium at a time),
-      - updates active/queued counters,
+      - waits for a slot in the DDMA lane (one browser per payer),
+      - parks its execution slot while waiting for OTP,
       - runs the DDMA flow via helpers.start_ddma_run.
     """
-    global active_jobs, waiting_jobs
-    async with semaphore:
-        async with lock:
-            waiting_jobs -= 1
-            active_jobs += 1
-        try:
-            await hddma.start_ddma_run(sid, data, url)
-        finally:
-            async with lock:
-                active_jobs -= 1
+    kind = "ddma_eligibility_batch" if patients is not None else "ddma_eligibility"
+    with tracing.job_span(sid, kind=kind, lane="ddma", priority=priority):
+        async with get_lane("ddma").slot(priority) as slot:
+            job_store.mark_started(sid)
+            # Lets the helper park the execution slot while waiting for OTP
+            if sid in hddma.sessions:
+                hddma.sessions[sid]["slot"] = slot
+            try:
+                result = await hddma.start_ddma_run(sid, data, url, patients)
+                _cache_result("ddma", data, patients, result, sid)
+            finally:
+                _job_done(sid)
 
 
 @app.post("/ddma-eligibility")
 async def ddma_eligibility(request: Request):
     """
     Starts a DDMA eligibility session in the background.
-    Body: { "data": { ... }, "url"?: string }
-    Returns: { status: "started", session_id: "<uuid>" }
+    Body: { "data": { ... }, "url"?: string, "bypassCache"?: bool, "priority"?: "interactive" | "normal" | "bulk",
+            "mode"?: "full" | "quick" }
+    Returns: { status: "started", session_id: "<uuid>", job_id: "<uuid>", cached?: true, coalesced?: true }
     """
-    global waiting_jobs
-
-    body = await request.json()
+    body = _apply_eligibility_mode(request, await request.json())
     data = body.get("data", {})
 
+    url = DDMA_LOGIN_URL
+    reused = _reuse_eligibility(request, body, "ddma_eligibility", url)
+    if reused is not None:
+        return reused
+
+    job, created = _create_job(request, "ddma_eligibility", {"data": data, "url": url}, body.get("priority"))
+    if not created:
+        # Retried request (same Idempotency-Key) - already queued / running
+        return {"status": "started", "session_id": job["id"], "job_id": job["id"]}
+
     # create session
-    sid = hddma.make_session_entry()
+    sid = hddma.make_session_entry(job["id"])
     hddma.sessions[sid]["type"] = "ddma_eligibility"
     hddma.sessions[sid]["last_activity"] = time.time()
+    eligibility_cache.track_inflight("ddma", data, sid)
 
-    async with lock:
-        waiting_jobs += 1
+    # run in background (queued in the payer's lane)
+    asyncio.create_task(_ddma_worker_wrapper(sid, data, url=url, priority=job["priority"]))
 
-    # run in background (queued under semaphore)
-    asyncio.create_task(_ddma_worker_wrapper(sid, data, url="https://providers.deltadentalma.com/onboarding/start/"))
-
-    return {"status": "started", "session_id": sid}
+    return {"status": "started", "session_id": sid, "job_id": sid}
 
 
 # Endpoint:6 - DentaQuest eligibility (background, OTP)
 
-async def _dentaquest_worker_wrapper(sid: str, data: dict, url: str):
+async def _dentaquest_worker_wrapper(
+    sid: str, data: dict, url: str, patients: list | None = None, priority: str = "normal"
+):
     """
     Background worker that:
-      - acquires semaphore (to keep 1 selenium at a time),
-      - updates active/queued counters,
+      - waits for a slot in the DentaQuest lane (one browser per payer),
+      - parks its execution slot while waiting for OTP,
       - runs the DentaQuest flow via helpers.start_dentaquest_run.
     """
-    global active_jobs, waiting_jobs
-    async with semaphore:
-        async with lock:
-            waiting_jobs -= 1
-            active_jobs += 1
-        try:
-            await hdentaquest.start_dentaquest_run(sid, data, url)
-        finally:
-            async with lock:
-                active_jobs -= 1
+    kind = "dentaquest_eligibility_batch" if patients is not None else "dentaquest_eligibility"
+    with tracing.job_span(sid, kind=kind, lane="dentaquest", priority=priority):
+        async with get_lane("dentaquest").slot(priority) as slot:
+            job_store.mark_started(sid)
+            # Lets the helper park the execution slot while waiting for OTP
+            if sid in hdentaquest.sessions:
+                hdentaquest.sessions[sid]["slot"] = slot
+            try:
+                result = await hdentaquest.start_dentaquest_run(sid, data, url, patients)
+                _cache_result("dentaquest", data, patients, result, sid)
+            finally:
+                _job_done(sid)
 
 
 @app.post("/dentaquest-eligibility")
 async def dentaquest_eligibility(request: Request):
     """
     Starts a DentaQuest eligibility session in the background.
-    Body: { "data": { ... }, "url"?: string }
-    Returns: { status: "started", session_id: "<uuid>" }
+    Body: { "data": { ... }, "url"?: string, "bypassCache"?: bool, "priority"?: "interactive" | "normal" | "bulk",
+            "mode"?: "full" | "quick" }
+    Returns: { status: "started", session_id: "<uuid>", job_id: "<uuid>", cached?: true, coalesced?: true }
     """
-    global waiting_jobs
-
-    body = await request.json()
+    body = _apply_eligibility_mode(request, await request.json())
     data = body.get("data", {})
 
+    url = DENTAQUEST_LOGIN_URL
+    reused = _reuse_eligibility(request, body, "dentaquest_eligibility", url)
+    if reused is not None:
+        return reused
+
+    job, created = _create_job(request, "dentaquest_eligibility", {"data": data, "url": url}, body.get("priority"))
+    if not created:
+        # Retried request (same Idempotency-Key) - already queued / running
+        return {"status": "started", "session_id": job["id"], "job_id": job["id"]}
+
     # create session
-    sid = hdentaquest.make_session_entry()
+    sid = hdentaquest.make_session_entry(job["id"])
     hdentaquest.sessions[sid]["type"] = "dentaquest_eligibility"
     hdentaquest.sessions[sid]["last_activity"] = time.time()
+    eligibility_cache.track_inflight("dentaquest", data, sid)
 
-    async with lock:
-        waiting_jobs += 1
+    # run in background (queued in the payer's lane)
+    asyncio.create_task(_dentaquest_worker_wrapper(sid, data, url=url, priority=job["priority"]))
 
-    # run in background (queued under semaphore)
-    asyncio.create_task(_dentaquest_worker_wrapper(sid, data, url="https://providers.dentaquest.com/onboarding/start/"))
-
-    return {"status": "started", "session_id": sid}
+    return {"status": "started", "session_id": sid, "job_id": sid}
 
 
 @app.post("/dentaquest-submit-otp")
@@ -283,49 +483,60 @@ async def dentaquest_session_status(sid: str):
 
 # Endpoint:7 - United SCO eligibility (background, OTP)
 
-async def _unitedsco_worker_wrapper(sid: str, data: dict, url: str):
+async def _unitedsco_worker_wrapper(
+    sid: str, data: dict, url: str, patients: list | None = None, priority: str = "normal"
+):
     """
     Background worker that:
-      - acquires semaphore (to keep 1 selenium at a time),
-      - updates active/queued counters,
+      - waits for a slot in the United SCO lane (one browser per payer),
+      - parks its execution slot while waiting for OTP,
       - runs the United SCO flow via helpers.start_unitedsco_run.
     """
-    global active_jobs, waiting_jobs
-    async with semaphore:
-        async with lock:
-            waiting_jobs -= 1
-            active_jobs += 1
-        try:
-            await hunitedsco.start_unitedsco_run(sid, data, url)
-        finally:
-            async with lock:
-                active_jobs -= 1
+    kind = "unitedsco_eligibility_batch" if patients is not None else "unitedsco_eligibility"
+    with tracing.job_span(sid, kind=kind, lane="unitedsco", priority=priority):
+        async with get_lane("unitedsco").slot(priority) as slot:
+            job_store.mark_started(sid)
+            # Lets the helper park the execution slot while waiting for OTP
+            if sid in hunitedsco.sessions:
+                hunitedsco.sessions[sid]["slot"] = slot
+            try:
+                result = await hunitedsco.start_unitedsco_run(sid, data, url, patients)
+                _cache_result("unitedsco", data, patients, result, sid)
+            finally:
+                _job_done(sid)
 
 
 @app.post("/unitedsco-eligibility")
 async def unitedsco_eligibility(request: Request):
     """
     Starts a United SCO eligibility session in the background.
-    Body: { "data": { ... }, "url"?: string }
-    Returns: { status: "started", session_id: "<uuid>" }
+    Body: { "data": { ... }, "url"?: string, "bypassCache"?: bool, "priority"?: "interactive" | "normal" | "bulk",
+            "mode"?: "full" | "quick" }
+    Returns: { status: "started", session_id: "<uuid>", job_id: "<uuid>", cached?: true, coalesced?: true }
     """
-    global waiting_jobs
-
-    body = await request.json()
+    body = _apply_eligibility_mode(request, await request.json())
     data = body.get("data", {})
 
+    url = UNITEDSCO_LOGIN_URL
+    reused = _reuse_eligibility(request, body, "unitedsco_eligibility", url)
+    if reused is not None:
+        return reused
+
+    job, created = _create_job(request, "unitedsco_eligibility", {"data": data, "url": url}, body.get("priority"))
+    if not created:
+        # Retried request (same Idempotency-Key) - already queued / running
+        return {"status": "started", "session_id": job["id"], "job_id": job["id"]}
+
     # create session
-    sid = hunitedsco.make_session_entry()
+    sid = hunitedsco.make_session_entry(job["id"])
     hunitedsco.sessions[sid]["type"] = "unitedsco_eligibility"
     hunitedsco.sessions[sid]["last_activity"] = time.time()
+    eligibility_cache.track_inflight("unitedsco", data, sid)
 
-    async with lock:
-        waiting_jobs += 1
-
-    # run in background (queued under semaphore)
-    asyncio.create_task(_unitedsco_worker_wrapper(sid, data, url="https://app.dentalhub.com/app/login"))
+    # run in background (queued in the payer's lane)
+    asyncio.create_task(_unitedsco_worker_wrapper(sid, data, url=url, priority=job["priority"]))
 
-    return {"status": "started", "session_id": sid}
+    return {"status": "started", "session_id": sid, "job_id": sid}
 
 
 @app.post("/unitedsco-submit-otp")
@@ -356,47 +567,58 @@ async def unitedsco_session_status(sid: str):
 
 # Endpoint:8 - DeltaIns eligibility (background, OTP)
 
-async def _deltains_worker_wrapper(sid: str, data: dict, url: str):
+async def _deltains_worker_wrapper(
+    sid: str, data: dict, url: str, patients: list | None = None, priority: str = "normal"
+):
     """
     Background worker that:
-      - acquires semaphore (to keep 1 selenium at a time),
-      - updates active/queued counters,
+      - waits for a slot in the DeltaIns lane (one browser per payer),
+      - parks its execution slot while waiting for OTP,
       - runs the DeltaIns flow via helpers.start_deltains_run.
     """
-    global active_jobs, waiting_jobs
-    async with semaphore:
-        async with lock:
-            waiting_jobs -= 1
-            active_jobs += 1
-        try:
-            await hdeltains.start_deltains_run(sid, data, url)
-        finally:
-            async with lock:
-                active_jobs -= 1
+    kind = "deltains_eligibility_batch" if patients is not None else "deltains_eligibility"
+    with tracing.job_span(sid, kind=kind, lane="deltains", priority=priority):
+        async with get_lane("deltains").slot(priority) as slot:
+            job_store.mark_started(sid)
+            # Lets the helper park the execution slot while waiting for OTP
+            if sid in hdeltains.sessions:
+                hdeltains.sessions[sid]["slot"] = slot
+            try:
+                result = await hdeltains.start_deltains_run(sid, data, url, patients)
+                _cache_result("deltains", data, patients, result, sid)
+            finally:
+                _job_done(sid)
 
 
 @app.post("/deltains-eligibility")
 async def deltains_eligibility(request: Request):
     """
     Starts a DeltaIns eligibility session in the background.
-    Body: { "data": { ... }, "url"?: string }
-    Returns: { status: "started", session_id: "<uuid>" }
+    Body: { "data": { ... }, "url"?: string, "bypassCache"?: bool, "priority"?: "interactive" | "normal" | "bulk",
+            "mode"?: "full" | "quick" }
+    Returns: { status: "started", session_id: "<uuid>", job_id: "<uuid>", cached?: true, coalesced?: true }
     """
-    global waiting_jobs
-
-    body = await request.json()
+    body = _apply_eligibility_mode(request, await request.json())
     data = body.get("data", {})
 
-    sid = hdeltains.make_session_entry()
+    url = DELTAINS_LOGIN_URL
+    reused = _reuse_eligibility(request, body, "deltains_eligibility", url)
+    if reused is not None:
+        return reused
+
+    job, created = _create_job(request, "deltains_eligibility", {"data": data, "url": url}, body.get("priority"))
+    if not created:
+        # Retried request (same Idempotency-Key) - already queued / running
+        return {"status": "started", "session_id": job["id"], "job_id": job["id"]}
+
+    sid = hdeltains.make_session_entry(job["id"])
     hdeltains.sessions[sid]["type"] = "deltains_eligibility"
     hdeltains.sessions[sid]["last_activity"] = time.time()
+    eligibility_cache.track_inflight("deltains", data, sid)
 
-    async with lock:
-        waiting_jobs += 1
-
-    asyncio.create_task(_deltains_worker_wrapper(sid, data, url="https://www.deltadentalins.com/ciam/login?TARGET=%2Fprovider-tools%2Fv2"))
+    asyncio.create_task(_deltains_worker_wrapper(sid, data, url=url, priority=job["priority"]))
 
-    return {"status": "started", "session_id": sid}
+    return {"status": "started", "session_id": sid, "job_id": sid}
 
 
 @app.post("/deltains-submit-otp")
@@ -425,6 +647,77 @@ async def deltains_session_status(sid: str):
     return s
 
 
+# Batch eligibility: one login / OTP, many patients
+
+async def _start_batch(request: Request, kind: str, helpers, wrapper, url: str):
+    """
+    Body: { "data": { credentials ... }, "patients": [ { memberId, dateOfBirth, firstName, lastName }, ... ],
+            "priority"?: "interactive" | "normal" | "bulk" (default bulk), "mode"?: "full" | "quick" }
+    Returns: { status: "started", session_id, job_id, total }
+    OTP and status go through the payer's usual session endpoints; per-patient
+    results stream from GET /batch/{session_id}/results.
+    """
+    body = _apply_eligibility_mode(request, await request.json())
+    data = body.get("data", {})
+    patients = body.get("patients") or []
+    if not patients:
+        raise HTTPException(status_code=400, detail="patients required")
+    if len(patients) > batch_eligibility.BATCH_MAX_PATIENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"at most {batch_eligibility.BATCH_MAX_PATIENTS} patients per batch",
+        )
+
+    job, created = _create_job(request, kind, {"data": data, "url": url, "patients": patients}, body.get("priority"))
+    if not created:
+        return {"status": "started", "session_id": job["id"], "job_id": job["id"], "total": len(patients)}
+
+    sid = helpers.make_session_entry(job["id"])
+    helpers.sessions[sid]["type"] = kind
+    helpers.sessions[sid]["last_activity"] = time.time()
+
+    asyncio.create_task(wrapper(sid, data, url=url, patients=patients, priority=job["priority"]))
+
+    return {"status": "started", "session_id": sid, "job_id": sid, "total": len(patients)}
+
+
+@app.post("/ddma-eligibility-batch")
+async def ddma_eligibility_batch(request: Request):
+    return await _start_batch(request, "ddma_eligibility_batch", hddma, _ddma_worker_wrapper, DDMA_LOGIN_URL)
+
+
+@app.post("/dentaquest-eligibility-batch")
+async def dentaquest_eligibility_batch(request: Request):
+    return await _start_batch(request, "dentaquest_eligibility_batch", hdentaquest, _dentaquest_worker_wrapper, DENTAQUEST_LOGIN_URL)
+
+
+@app.post("/unitedsco-eligibility-batch")
+async def unitedsco_eligibility_batch(request: Request):
+    return await _start_batch(request, "unitedsco_eligibility_batch", hunitedsco, _unitedsco_worker_wrapper, UNITEDSCO_LOGIN_URL)
+
+
+@app.post("/deltains-eligibility-batch")
+async def deltains_eligibility_batch(request: Request):
+    return await _start_batch(request, "deltains_eligibility_batch", hdeltains, _deltains_worker_wrapper, DELTAINS_LOGIN_URL)
+
+
+@app.get("/batch/{sid}/results")
+async def batch_results(sid: str):
+    """Per-patient results as NDJSON, one line per patient as soon as it completes."""
+    for helpers in (hddma, hdentaquest, hunitedsco, hdeltains):
+        s = helpers.sessions.get(sid)
+        if s is not None and "batch_results" in s:
+            return StreamingResponse(batch_eligibility.stream_results(s), media_type="application/x-ndjson")
+
+    # Finished (or pre-restart) batch - replay what the job store has
+    job = job_store.get_job(sid)
+    if job is None or not job["kind"].endswith("_batch"):
+        raise HTTPException(status_code=404, detail="batch not found")
+    results = (job.get("result") or {}).get("results", [])
+    lines = [json.dumps(r, default=str) + "\n" for r in results]
+    return StreamingResponse(iter(lines), media_type="application/x-ndjson")
+
+
 @app.post("/submit-otp")
 async def submit_otp(request: Request):
     """
@@ -454,12 +747,98 @@ async def session_status(sid: str):
 # ✅ Status Endpoint
 @app.get("/status")
 async def get_status():
-    async with lock:
-        return {
-            "active_jobs": active_jobs,
-            "queued_jobs": waiting_jobs,
-            "status": "busy" if active_jobs > 0 or waiting_jobs > 0 else "idle"
-        }
+    return {
+        **lanes_status(),
+        "massdhp_pool": get_massdhp_browser_manager().snapshot(),
+        "chromedriver": chromedriver_service.chromedriver_status(),
+        "eligibility_cache": eligibility_cache.stats(),
+        "resource_policy": resource_policy.stats(),
+        "artifacts": artifact_store.stats(),
+        "pdf_render": pdf_render.stats(),
+    }
+
+
+# Stored PDFs / screenshots (artifact_store.py)
+@app.get("/artifacts")
+async def list_artifacts(lane: str = None, memberId: str = None, jobId: str = None, limit: int = 50):
+    rows = await asyncio.to_thread(artifact_store.find, lane, memberId, jobId, min(max(limit, 1), 500))
+    return [artifact_store.public_view(r) for r in rows]
+
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    """
+    Stream a stored PDF / screenshot. Content is immutable per ID, so the ETag
+    is its SHA-256: If-None-Match gets a 304, and Range / If-Range requests
+    get partial content (206) - a dropped download resumes where it stopped.
+    """
+    artifact = artifact_store.get(artifact_id)
+    if artifact is None or not os.path.isfile(artifact["path"]):
+        raise HTTPException(status_code=404, detail="artifact not found")
+    etag = f'"{artifact["sha256"]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        artifact["path"], media_type=artifact["content_type"], filename=artifact["filename"], headers=headers
+    )
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(agent_metrics.render(lanes_status()), media_type="text/plain; version=0.0.4")
+
+
+# ✅ Job recovery - pick up work left behind by a previous agent process
+def _dispatch_otp_job(job: dict):
+    helpers, wrapper = {
+        "ddma": (hddma, _ddma_worker_wrapper),
+        "dentaquest": (hdentaquest, _dentaquest_worker_wrapper),
+        "unitedsco": (hunitedsco, _unitedsco_worker_wrapper),
+        "deltains": (hdeltains, _deltains_worker_wrapper),
+    }[job["lane"]]
+    payload = job["payload"]
+    job_events.register_callback(job["id"], job.get("callback_url"))
+    sid = helpers.make_session_entry(job["id"])
+    helpers.sessions[sid]["type"] = job["kind"]
+    if not payload.get("patients"):
+        eligibility_cache.track_inflight(job["lane"], payload.get("data", {}), sid)
+    asyncio.create_task(wrapper(
+        sid, payload.get("data", {}), url=payload["url"], patients=payload.get("patients"), priority=job["priority"]
+    ))
+
+
+@app.on_event("startup")
+async def recover_jobs():
+    """
+    Re-queue jobs that were queued (or interrupted mid-run, if safe to re-run)
+    when the agent last stopped. Browser sessions were cleared above, so
+    OTP payers will log in again from scratch.
+    """
+    purged = job_store.purge_finished()
+    if purged:
+        print(f"[jobs] purged {purged} finished jobs past retention")
+
+    for job in job_store.unfinished_jobs():
+        kind = JOB_KINDS.get(job["kind"])
+        interrupted = job["status"] != "queued"
+        if (
+            kind is None
+            or not job.get("payload")
+            or (interrupted and (not kind["rerun"] or job["attempts"] >= job_store.JOB_MAX_ATTEMPTS))
+        ):
+            job_store.update_job(job["id"], status="error", message="Interrupted by agent restart")
+            print(f"[jobs] {job['kind']} {job['id']} interrupted by restart - marked as error")
+            continue
+
+        job_store.update_job(job["id"], status="queued", message="Re-queued after agent restart")
+        print(f"[jobs] re-queued {job['kind']} {job['id']}")
+        if kind["lane"] == "massdhp":
+            job_events.register_callback(job["id"], job.get("callback_url"))
+            asyncio.create_task(_massdhp_worker_wrapper(job["id"], job["kind"], job["payload"], job["priority"]))
+        else:
+            _dispatch_otp_job(job)
 
 
 # ✅ Clear session endpoints - called when credentials are deleted
@@ -0,0 +1,251 @@
+"""
+Prometheus-style metrics for the Selenium agent, served as text on GET /metrics.
+
+/status shows what is happening right now; these counters and histograms
+accumulate since the agent started, so a scrape over time shows which portal
+and which step eats the throughput:
+
+- jobs submitted / finished per job kind (endpoint) and lane (payer)
+- job errors by their "ERROR:..." prefix
+- blocking Selenium calls per lane and step (login, step1, step2, ...)
+- PDF capture (Page.printToPDF time, bytes written), browser launch, lane queue
+  wait, OTP wait
+- deferred PDF renders from DOM snapshots (outcome, snapshot-to-file time)
+- WebDriver commands sent, per browser and command
+- portal requests blocked by the resource policy (and their estimated bytes)
+- member data harvested from portal API responses vs DOM fallback
+- direct portal requests (cookie-bridged artifact / endpoint fetches)
+- eligibility result cache hits / misses / bypasses per payer, and requests
+  coalesced onto an identical in-flight run
+
+Kept dependency-free (plain text exposition format 0.0.4); instruments are
+module-level and thread-safe so lane threads can record directly.
+"""
+import re
+import math
+import threading
+from typing import Dict, Any, List, Tuple, Sequence
+
+import job_store
+
+STEP_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+WAIT_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets=STEP_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # key -> [per-bucket counts, sum, count]
+        self._values: Dict[Tuple, List[Any]] = {}
+
+    def observe(self, seconds: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += seconds
+            entry[2] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+JOBS_SUBMITTED = Counter(
+    "selenium_agent_jobs_submitted_total", "Jobs accepted, per job kind (endpoint) and lane (payer).", ("kind", "lane")
+)
+JOBS_FINISHED = Counter(
+    "selenium_agent_jobs_finished_total", "Jobs whose worker returned, by final status.", ("kind", "lane", "status")
+)
+JOB_ERRORS = Counter(
+    "selenium_agent_job_errors_total", "Failed jobs by the prefix of their ERROR: message.", ("lane", "prefix")
+)
+STEP_SECONDS = Histogram(
+    "selenium_agent_step_seconds",
+    "Blocking Selenium calls (login, step1, step2, main_workflow, ...) per lane.",
+    ("lane", "step"),
+)
+PDF_CAPTURE_SECONDS = Histogram(
+    "selenium_agent_pdf_capture_seconds", "Page.printToPDF round trips.", ("browser",), buckets=WAIT_BUCKETS
+)
+BROWSER_LAUNCH_SECONDS = Histogram(
+    "selenium_agent_browser_launch_seconds", "Chrome launches on the shared chromedriver.", ("browser",), buckets=WAIT_BUCKETS
+)
+BROWSER_LAUNCH_FAILURES = Counter(
+    "selenium_agent_browser_launch_failures_total", "Chrome launches that failed.", ("browser",)
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "selenium_agent_queue_wait_seconds",
+    "Time from submit to getting a lane + execution slot, per priority class.",
+    ("lane", "priority"),
+    buckets=WAIT_BUCKETS,
+)
+OTP_WAIT_SECONDS = Histogram(
+    "selenium_agent_otp_wait_seconds", "Time spent waiting for an OTP login to complete.", ("lane", "outcome"), buckets=WAIT_BUCKETS
+)
+PDF_CAPTURE_BYTES = Counter(
+    "selenium_agent_pdf_capture_bytes_total", "Bytes of printed PDFs streamed to disk.", ("browser",)
+)
+PDF_RENDERS = Counter(
+    "selenium_agent_pdf_renders_total", "Deferred PDF renders from DOM snapshots, by outcome.", ("outcome",)
+)
+PDF_RENDER_SECONDS = Histogram(
+    "selenium_agent_pdf_render_seconds", "Snapshot queued to PDF on disk (render pool).", (), buckets=WAIT_BUCKETS
+)
+WEBDRIVER_COMMANDS = Counter(
+    "selenium_agent_webdriver_commands_total", "WebDriver commands sent, per browser and command.", ("browser", "command")
+)
+RESOURCES_BLOCKED = Counter(
+    "selenium_agent_resources_blocked_total", "Portal requests blocked by the resource policy.", ("browser", "category")
+)
+BLOCKED_BYTES_ESTIMATED = Counter(
+    "selenium_agent_blocked_bytes_estimated_total",
+    "Bytes not downloaded thanks to blocking (per-category averages of unblocked loads).",
+    ("browser",),
+)
+RESOURCE_POLICY_VIOLATIONS = Counter(
+    "selenium_agent_resource_policy_violations_total", "Blocked requests that matched the payer's allowlist.", ("browser",)
+)
+API_HARVEST = Counter(
+    "selenium_agent_api_harvest_total", "step2 member data read from captured API JSON (api) or the page (dom_fallback).", ("browser", "outcome")
+)
+PORTAL_HTTP_REQUESTS = Counter(
+    "selenium_agent_portal_http_requests_total",
+    "Direct portal requests with the browser's cookies, by kind (artifact, endpoint) and outcome.",
+    ("browser", "kind", "outcome"),
+)
+ELIGIBILITY_CACHE = Counter(
+    "selenium_agent_eligibility_cache_total", "Eligibility cache lookups by outcome (hit, miss, bypass).", ("lane", "outcome")
+)
+COALESCED_REQUESTS = Counter(
+    "selenium_agent_coalesced_requests_total", "Eligibility requests joined to an identical in-flight job.", ("lane",)
+)
+LANE_JOBS = Gauge("selenium_agent_lane_jobs", "Jobs per lane and state (sampled at scrape).", ("lane", "state"))
+LANE_QUEUE_DEPTH = Gauge(
+    "selenium_agent_lane_queue_depth", "Queued jobs per lane and priority class (sampled at scrape).", ("lane", "priority")
+)
+LOOP_LAG_MS = Gauge("selenium_agent_event_loop_lag_ms", "Event loop lag, last sample and moving average.", ("stat",))
+
+_ERROR_PREFIX = re.compile(r"^ERROR:\s*(.+?)(?::| - |$)")
+
+
+def error_prefix(message: Any) -> str:
+    """'ERROR:LOGIN FAILED: Still on login page' -> 'LOGIN FAILED'; other messages -> 'OTHER'."""
+    match = _ERROR_PREFIX.match(str(message or "").strip())
+    if not match:
+        return "OTHER"
+    return match.group(1).strip().upper()[:60]
+
+
+def record_job_finished(job_id: str):
+    """Count a job whose worker has returned (status and message are final by then)."""
+    job = job_store.get_job(job_id)
+    if job is None or job["status"] not in job_store.FINAL_STATUSES:
+        return
+    JOBS_FINISHED.inc(kind=job["kind"], lane=job["lane"], status=job["status"])
+    if job["status"] == "error":
+        JOB_ERRORS.inc(lane=job["lane"], prefix=error_prefix(job.get("message")))
+
+
+def render(lanes: Dict[str, Any]) -> str:
+    """Text exposition of every metric; `lanes` is job_scheduler.lanes_status()."""
+    for name, lane in lanes["lanes"].items():
+        LANE_JOBS.set(lane["active_jobs"], lane=name, state="active")
+        LANE_JOBS.set(lane["queued_jobs"], lane=name, state="queued")
+        LANE_JOBS.set(lane["waiting_for_otp"], lane=name, state="waiting_for_otp")
+        for priority, depth in lane["queued_by_priority"].items():
+            LANE_QUEUE_DEPTH.set(depth, lane=name, priority=priority)
+    LOOP_LAG_MS.set(lanes["event_loop_lag_ms"]["last_ms"], stat="last")
+    LOOP_LAG_MS.set(lanes["event_loop_lag_ms"]["avg_ms"], stat="avg")
+
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,210 @@
+"""
+Harvest portal JSON API responses (CDP network capture) instead of scraping the DOM.
+
+The DDMA / DentaQuest portals are SPAs: the member search results that step2
+reads back out of the table (row text + regexes, one find_element /
+get_attribute per link) arrive first as JSON from the portal's own API.
+With API_CAPTURE=1 the worker records those responses during step1 / step2:
+
+- Network.responseReceived (XHR / Fetch, JSON mime type) and
+  Network.loadingFinished come from the performance log NetworkTracker
+  already reads for the page waits (page_waits.add_listener);
+- bodies are fetched with Network.getResponseBody only when step2 asks.
+
+find_member() walks the payloads for the record of the requested member
+(member ID, else last name) and returns its eligibility status, member ID
+and name. When nothing matches, the worker falls back to DOM scraping, so
+an API change on the portal costs speed, not correctness. Outcomes are
+counted in /metrics (selenium_agent_api_harvest_total).
+
+API_CAPTURE_LOG=1 prints the URL and top-level keys of every captured
+payload, for mapping a portal's API.
+"""
+import os
+import re
+import json
+import base64
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from selenium.common.exceptions import WebDriverException
+
+from page_waits import get_network_tracker
+import agent_metrics
+
+API_CAPTURE = os.getenv("API_CAPTURE", "0") == "1"
+API_CAPTURE_LOG = os.getenv("API_CAPTURE_LOG", "0") == "1"
+# Bodies larger than this are skipped (reports, documents - not search results)
+MAX_BODY_BYTES = int(os.getenv("API_CAPTURE_MAX_BODY_BYTES", str(2 * 1024 * 1024)))
+
+# Normalized key names (lowercase, no separators) seen in member / eligibility payloads
+_MEMBER_ID_KEYS = ("memberid", "membernumber", "memberidentifier", "subscriberid", "enrolleeid", "cardid")
+_FIRST_NAME_KEYS = ("firstname", "memberfirstname", "givenname")
+_LAST_NAME_KEYS = ("lastname", "memberlastname", "familyname", "surname")
+_FULL_NAME_KEYS = ("membername", "patientname", "fullname", "name")
+_STATUS_KEYS = ("eligibilitystatus", "coveragestatus", "memberstatus", "eligibility", "status")
+_FLAG_KEYS = ("iseligible", "eligible", "isactive", "active")
+
+
+def _key(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def _norm_id(value: Any) -> str:
+    return re.sub(r"[^0-9A-Z]", "", str(value or "").upper())
+
+
+class ResponseCapture:
+    """JSON XHR / fetch responses of one browser, from start() until stop()."""
+
+    def __init__(self, driver, tag: str):
+        self.driver = driver
+        self.tag = tag
+        self._tracker = get_network_tracker(driver)
+        self._pending: Dict[str, str] = {}              # requestId -> url (headers seen)
+        self._finished: List[Tuple[str, str]] = []      # (requestId, url) ready to read
+        self._payloads: List[Tuple[str, Any]] = []      # (url, parsed JSON)
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._tracker.poll()  # drop events from before the capture
+        self._tracker.add_listener(self._on_event)
+
+    def stop(self):
+        self._tracker.remove_listener(self._on_event)
+
+    def _on_event(self, method: str, params: dict):
+        if method == "Network.responseReceived":
+            response = params.get("response", {})
+            if params.get("type") in ("XHR", "Fetch") and "json" in (response.get("mimeType") or ""):
+                with self._lock:
+                    self._pending[params.get("requestId")] = response.get("url", "")
+        elif method == "Network.loadingFinished":
+            with self._lock:
+                url = self._pending.pop(params.get("requestId"), None)
+                if url is not None and (params.get("encodedDataLength") or 0) <= MAX_BODY_BYTES:
+                    self._finished.append((params.get("requestId"), url))
+
+    def payloads(self) -> List[Tuple[str, Any]]:
+        """Every captured (url, JSON) so far; bodies are fetched on first call."""
+        self._tracker.poll()
+        with self._lock:
+            ready, self._finished = self._finished, []
+        for request_id, url in ready:
+            try:
+                body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            except WebDriverException:
+                continue  # evicted from the browser's buffer, or the page navigated away
+            text = body.get("body", "")
+            if body.get("base64Encoded"):
+                text = base64.b64decode(text).decode("utf-8", "replace")
+            try:
+                payload = json.loads(text)
+            except ValueError:
+                continue
+            if API_CAPTURE_LOG:
+                keys = list(payload)[:15] if isinstance(payload, dict) else f"list[{len(payload)}]"
+                print(f"[{self.tag} api] {url[:120]} -> {keys}")
+            self._payloads.append((url, payload))
+        return list(self._payloads)
+
+
+def start_capture(driver, tag: str) -> Optional[ResponseCapture]:
+    """Begin capturing JSON responses (None when API_CAPTURE is off)."""
+    if not API_CAPTURE or driver is None:
+        return None
+    capture = ResponseCapture(driver, tag)
+    capture.start()
+    return capture
+
+
+def _records(node: Any):
+    """Every dict in a payload, each with the scalar fields of its direct child dicts merged in."""
+    if isinstance(node, dict):
+        flat = {}
+        for k, v in node.items():
+            if isinstance(v, dict):
+                for ck, cv in v.items():
+                    if not isinstance(cv, (dict, list)):
+                        flat.setdefault(_key(ck), cv)
+        for k, v in node.items():
+            if not isinstance(v, (dict, list)):
+                flat[_key(k)] = v
+        yield flat
+        for v in node.values():
+            yield from _records(v)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _records(item)
+
+
+def _first(record: Dict[str, Any], keys) -> Any:
+    for k in keys:
+        value = record.get(k)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _eligibility(record: Dict[str, Any]) -> Optional[str]:
+    status = _first(record, _STATUS_KEYS)
+    if isinstance(status, str) and status.strip():
+        return status.strip()
+    flag = _first(record, _FLAG_KEYS)
+    if isinstance(flag, bool):
+        return "active" if flag else "inactive"
+    return None
+
+
+def find_member(
+    payloads: List[Tuple[str, Any]], member_id: str = "", last_name: str = ""
+) -> Optional[Dict[str, Any]]:
+    """
+    The requested member's {eligibility, memberId, patientName, source} from
+    captured payloads: a record with a status and a matching member ID (or,
+    without one, a matching last name). None if no record qualifies.
+    """
+    wanted_id = _norm_id(member_id)
+    wanted_last = last_name.strip().lower()
+    # Latest responses first - a re-run search supersedes the earlier one
+    for url, payload in reversed(payloads):
+        for record in _records(payload):
+            eligibility = _eligibility(record)
+            if eligibility is None:
+                continue
+            found_id = _first(record, _MEMBER_ID_KEYS)
+            first = _first(record, _FIRST_NAME_KEYS)
+            last = _first(record, _LAST_NAME_KEYS)
+            if wanted_id:
+                if _norm_id(found_id) != wanted_id:
+                    continue
+            elif not (wanted_last and str(last or "").strip().lower() == wanted_last):
+                continue
+
+            name = " ".join(str(p).strip() for p in (first, last) if p) or _first(record, _FULL_NAME_KEYS) or ""
+            return {
+                "eligibility": eligibility,
+                "memberId": str(found_id or member_id),
+                "patientName": str(name).strip(),
+                "source": url,
+            }
+    return None
+
+
+def harvest(capture: Optional[ResponseCapture], member_id: str, last_name: str, tag: str) -> Optional[Dict[str, Any]]:
+    """find_member() over a capture, counted as api / dom_fallback; stops the capture."""
+    if capture is None:
+        return None
+    try:
+        found = find_member(capture.payloads(), member_id, last_name)
+    except Exception as e:
+        print(f"[{tag} api] Harvest failed: {e}")
+        found = None
+    finally:
+        capture.stop()
+    agent_metrics.API_HARVEST.inc(browser=tag.lower(), outcome="api" if found else "dom_fallback")
+    if found:
+        print(f"[{tag} api] Member data from {found['source'][:120]}")
+    else:
+        print(f"[{tag} api] No matching member in captured responses - scraping the page")
+    return found
@@ -0,0 +1,341 @@
+"""
+Content-addressed store for the PDFs and screenshots jobs produce.
+
+seleniumDownloads/ used to grow forever - eligibility_<id>.pdf, ss_<id>.png,
+DeltaIns downloads - and the only cleanup was an error path emptying the
+whole folder. Now every file a job result points at (pdf_path / ss_path,
+also per patient of a batch) is filed here before the result is stored:
+
+- blobs/<sha256[:2]>/<sha256>.<ext>: one file per distinct content, so the
+  same benefits PDF fetched ten times a day is stored once;
+- artifacts table (SQLite, ARTIFACT_STORE_DIR/artifacts.sqlite3): one row
+  per (job, file) with payer lane, hashed member ID (like the eligibility
+  cache - no member IDs in clear), job ID, kind and timestamp, so
+  lookups by payer / member / job are index reads, not directory scans.
+
+The job's original file stays where it is: the backend reads - and then
+removes - pdf_path exactly as before, and the stored copy is unaffected.
+Blobs are never written in place (copy to a temp file, then rename), so a
+worker re-writing its output path cannot alter a stored artifact.
+
+Retention: a background task (every ARTIFACT_GC_INTERVAL_SECONDS) drops
+artifacts older than ARTIFACT_MAX_AGE_DAYS, then the oldest ones while the
+store is over ARTIFACT_MAX_BYTES, deletes blobs no artifact references,
+and removes per-job download folders (job_downloads.py) past the age limit.
+
+Results reference what was stored by ID (pdf_artifact_id / ss_artifact_id
+next to pdf_path / ss_path), written into the result by ingest() - off the
+event loop - before the helpers / agent store it on the job, so
+GET /jobs/{id}, events and webhooks all carry them. GET /artifacts/{id}
+streams the file (Content-Length, ETag = content hash, Range requests), so
+the backend can fetch documents lazily and from another host; GET
+/artifacts?lane=&memberId=&jobId= lists them.
+"""
+import os
+import re
+import time
+import uuid
+import shutil
+import hashlib
+import sqlite3
+import asyncio
+import threading
+import mimetypes
+from typing import Dict, Any, Optional, List
+
+import job_store
+
+ARTIFACT_STORE_DIR = os.getenv(
+    "ARTIFACT_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts"),
+)
+ARTIFACT_MAX_AGE_DAYS = float(os.getenv("ARTIFACT_MAX_AGE_DAYS", "30"))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(5 * 1024 ** 3)))
+ARTIFACT_GC_INTERVAL_SECONDS = float(os.getenv("ARTIFACT_GC_INTERVAL_SECONDS", "3600"))
+# Per-job download folders swept by the GC (see job_downloads.py)
+DOWNLOADS_JOBS_DIR = os.path.join(os.path.abspath("seleniumDownloads"), "jobs")
+
+# Result keys that point at files worth keeping
+_PATH_KEYS = ("pdf_path", "ss_path")
+CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(ARTIFACT_STORE_DIR, exist_ok=True)
+        _conn = sqlite3.connect(
+            os.path.join(ARTIFACT_STORE_DIR, "artifacts.sqlite3"), check_same_thread=False, isolation_level=None
+        )
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256       TEXT PRIMARY KEY,
+                path         TEXT NOT NULL,
+                size         INTEGER NOT NULL,
+                content_type TEXT NOT NULL,
+                created_at   REAL NOT NULL
+            )
+            """
+        )
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS artifacts (
+                id         TEXT PRIMARY KEY,
+                sha256     TEXT NOT NULL REFERENCES blobs(sha256),
+                lane       TEXT,
+                member_key TEXT,
+                job_id     TEXT,
+                kind       TEXT,
+                filename   TEXT,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS artifacts_member ON artifacts(lane, member_key, created_at)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS artifacts_job ON artifacts(job_id)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS artifacts_created ON artifacts(created_at)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS artifacts_sha ON artifacts(sha256)")
+    return _conn
+
+
+def member_key(member_id: Any) -> Optional[str]:
+    """Hashed, normalized member ID (None without one)."""
+    norm = re.sub(r"[^0-9a-z]", "", str(member_id or "").lower())
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest() if norm else None
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_atomic(src: str, dst: str):
+    tmp = f"{dst}.{uuid.uuid4().hex}.part"
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def put_file(
+    path: str, lane: str = None, member_id: Any = None, job_id: str = None, kind: str = None
+) -> Dict[str, Any]:
+    """
+    File `path` in the store and return its artifact row. The blob is a copy:
+    `path` stays where it is, for whoever still reads (or deletes) it.
+    """
+    sha = _sha256(path)
+    ext = os.path.splitext(path)[1].lower()
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    now = time.time()
+    with _lock:
+        db = _db()
+        blob = db.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha,)).fetchone()
+        if blob is None or not os.path.exists(blob["path"]):
+            blob_path = os.path.join(ARTIFACT_STORE_DIR, "blobs", sha[:2], sha + ext)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            if not os.path.exists(blob_path):
+                _copy_atomic(path, blob_path)
+            db.execute(
+                "INSERT OR REPLACE INTO blobs (sha256, path, size, content_type, created_at) VALUES (?, ?, ?, ?, ?)",
+                (sha, blob_path, os.path.getsize(blob_path), content_type, now),
+            )
+        artifact_id = uuid.uuid4().hex
+        db.execute(
+            "INSERT INTO artifacts (id, sha256, lane, member_key, job_id, kind, filename, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (artifact_id, sha, lane, member_key(member_id), job_id, kind, os.path.basename(path), now),
+        )
+    return get(artifact_id)
+
+
+def get(artifact_id: str) -> Optional[Dict[str, Any]]:
+    """Artifact row joined with its blob (path, size, content_type), or None."""
+    with _lock:
+        row = _db().execute(
+            "SELECT a.*, b.path, b.size, b.content_type FROM artifacts a JOIN blobs b USING (sha256) WHERE a.id = ?",
+            (artifact_id,),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def find(lane: str = None, member_id: Any = None, job_id: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """Newest artifacts matching the given payer / member / job."""
+    where, args = [], []
+    if lane:
+        where.append("a.lane = ?")
+        args.append(lane)
+    if member_id:
+        where.append("a.member_key = ?")
+        args.append(member_key(member_id))
+    if job_id:
+        where.append("a.job_id = ?")
+        args.append(job_id)
+    sql = "SELECT a.*, b.size, b.content_type FROM artifacts a JOIN blobs b USING (sha256)"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY a.created_at DESC LIMIT ?"
+    with _lock:
+        rows = _db().execute(sql, (*args, limit)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def public_view(artifact: Dict[str, Any]) -> Dict[str, Any]:
+    """Artifact fields safe to return over HTTP (no disk paths, no member hash)."""
+    return {
+        "id": artifact["id"],
+        "sha256": artifact["sha256"],
+        "lane": artifact["lane"],
+        "job_id": artifact["job_id"],
+        "kind": artifact["kind"],
+        "filename": artifact["filename"],
+        "size": artifact["size"],
+        "content_type": artifact["content_type"],
+        "created_at": artifact["created_at"],
+    }
+
+
+# ── Ingest from job results ──────────────────────────────────────────
+
+def _result_files(result: Any):
+    """(item, key, path) of every file a job result points at, batch items included."""
+    if not isinstance(result, dict):
+        return
+    for item in [result, *(result.get("results") or [])]:
+        if not isinstance(item, dict):
+            continue
+        for key in _PATH_KEYS:
+            path = item.get(key)
+            if isinstance(path, str) and os.path.isfile(path):
+                yield item, key, path
+
+
+def artifact_key(path_key: str) -> str:
+    """Result key holding the artifact ID of a path key: pdf_path -> pdf_artifact_id."""
+    return path_key.replace("_path", "_artifact_id")
+
+
+def ingest_result(job_id: str, result: Any):
+    """
+    File every artifact of a job's result and record its ID next to the path
+    (pdf_path -> pdf_artifact_id, ss_path -> ss_artifact_id), in place. Files
+    already stored for this job keep their artifact.
+    """
+    job = job_store.get_job(job_id) or {}
+    lane, kind = job.get("lane"), job.get("kind")
+    for item, key, path in _result_files(result):
+        with _lock:
+            known = _db().execute(
+                "SELECT id FROM artifacts WHERE job_id = ? AND filename = ?", (job_id, os.path.basename(path))
+            ).fetchone()
+        if known:
+            item[artifact_key(key)] = known["id"]
+            continue
+        try:
+            artifact = put_file(path, lane=lane, member_id=item.get("memberId"), job_id=job_id, kind=kind)
+        except OSError as e:
+            print(f"[artifacts] Could not store {path} for {job_id}: {e}")
+            continue
+        item[artifact_key(key)] = artifact["id"]
+
+
+async def ingest(job_id: str, result: Any) -> Any:
+    """
+    ingest_result() in a worker thread (hashing, copying and SQLite writes
+    stay off the event loop); call before the result is stored on the job.
+    """
+    if isinstance(result, dict):
+        await asyncio.to_thread(ingest_result, job_id, result)
+    return result
+
+
+# ── Retention ────────────────────────────────────────────────────────
+
+def gc(now: float = None) -> Dict[str, int]:
+    """Apply age / size retention; returns what was removed."""
+    now = now or time.time()
+    removed = {"artifacts": 0, "blobs": 0, "bytes": 0, "job_dirs": 0}
+    with _lock:
+        db = _db()
+        if ARTIFACT_MAX_AGE_DAYS > 0:
+            cur = db.execute("DELETE FROM artifacts WHERE created_at < ?", (now - ARTIFACT_MAX_AGE_DAYS * 86400,))
+            removed["artifacts"] += cur.rowcount
+
+        # Over the size cap: drop the oldest artifacts until the referenced blobs fit
+        total = db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM blobs WHERE sha256 IN (SELECT sha256 FROM artifacts)"
+        ).fetchone()[0]
+        if total > ARTIFACT_MAX_BYTES:
+            for row in db.execute("SELECT id, sha256 FROM artifacts ORDER BY created_at").fetchall():
+                if total <= ARTIFACT_MAX_BYTES:
+                    break
+                db.execute("DELETE FROM artifacts WHERE id = ?", (row["id"],))
+                removed["artifacts"] += 1
+                if db.execute("SELECT 1 FROM artifacts WHERE sha256 = ? LIMIT 1", (row["sha256"],)).fetchone() is None:
+                    total -= db.execute("SELECT size FROM blobs WHERE sha256 = ?", (row["sha256"],)).fetchone()[0]
+
+        orphans = db.execute(
+            "SELECT sha256, path, size FROM blobs WHERE sha256 NOT IN (SELECT sha256 FROM artifacts)"
+        ).fetchall()
+        for blob in orphans:
+            try:
+                os.remove(blob["path"])
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[artifacts] Could not remove {blob['path']}: {e}")
+                continue
+            db.execute("DELETE FROM blobs WHERE sha256 = ?", (blob["sha256"],))
+            removed["blobs"] += 1
+            removed["bytes"] += blob["size"]
+
+    # Per-job download folders the backend did not clean up
+    if ARTIFACT_MAX_AGE_DAYS > 0 and os.path.isdir(DOWNLOADS_JOBS_DIR):
+        cutoff = now - ARTIFACT_MAX_AGE_DAYS * 86400
+        for entry in os.scandir(DOWNLOADS_JOBS_DIR):
+            try:
+                if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path)
+                    removed["job_dirs"] += 1
+            except OSError as e:
+                print(f"[artifacts] Could not remove {entry.path}: {e}")
+
+    if any(removed.values()):
+        print(f"[artifacts] GC removed {removed}")
+    return removed
+
+
+async def run_gc_forever():
+    """Background retention loop (started with the agent)."""
+    while True:
+        try:
+            await asyncio.to_thread(gc)
+        except Exception as e:
+            print(f"[artifacts] GC failed: {e}")
+        await asyncio.sleep(ARTIFACT_GC_INTERVAL_SECONDS)
+
+
+def stats() -> Dict[str, Any]:
+    """Artifact / blob counts and stored bytes (for /status)."""
+    with _lock:
+        db = _db()
+        artifacts = db.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+        blobs, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+    return {
+        "artifacts": artifacts,
+        "blobs": blobs,
+        "stored_bytes": size,
+        "max_bytes": ARTIFACT_MAX_BYTES,
+        "max_age_days": ARTIFACT_MAX_AGE_DAYS,
+    }
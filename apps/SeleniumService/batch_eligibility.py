@@ -0,0 +1,126 @@
+"""
+Batch eligibility: check many patients over one logged-in portal session.
+
+The helpers' start_<payer>_run() does the login (and OTP, if the portal asks
+for one) exactly once, then hands the bot to run_patients(), which loops
+load_patient -> step1 -> step2 for every patient. The browser stays open for
+the whole batch (bot.keep_browser_open) and is closed by the helper at the end.
+
+Per-patient results are appended to the session as they complete;
+stream_results() yields them as NDJSON lines for GET /batch/{sid}/results.
+A patient whose PDF is rendered in the background (pdf_render.py) is
+published once the PDF exists, while the loop is already on the next
+patient - so results can arrive out of order (each carries its index).
+"""
+import os
+import json
+import time
+import asyncio
+from typing import Dict, Any, List, AsyncIterator
+
+from job_scheduler import run_blocking
+import pdf_render
+
+BATCH_MAX_PATIENTS = int(os.getenv("BATCH_MAX_PATIENTS", "100"))
+
+# Patient fields echoed back with each result so the caller can match them up
+_PATIENT_FIELDS = ("memberId", "dateOfBirth", "firstName", "lastName")
+
+
+def init_batch(s: Dict[str, Any], patients: List[Dict[str, Any]]):
+    """Attach batch progress state to a session entry."""
+    s["batch_total"] = len(patients)
+    s["batch_results"] = []
+    s["batch_done"] = False
+    s["batch_changed"] = asyncio.Event()
+
+
+def _publish(s: Dict[str, Any], item: Dict[str, Any] | None = None, done: bool = False):
+    if item is not None:
+        s["batch_results"].append(item)
+    if done:
+        s["batch_done"] = True
+    # Wake every streamer, then arm a fresh event for the next change
+    changed = s["batch_changed"]
+    s["batch_changed"] = asyncio.Event()
+    changed.set()
+
+
+async def _publish_rendered(s: Dict[str, Any], item: Dict[str, Any]):
+    """Publish a patient's result once its deferred PDF is on disk."""
+    _publish(s, await pdf_render.wait(item))
+
+
+async def run_patients(s: Dict[str, Any], lane: str, bot, patients: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Run step1/step2 for each patient on an already logged-in bot.
+    A failing patient is recorded and the batch moves on to the next one.
+    Returns the batch summary (also stored as the session result by the helper).
+    """
+    bot.keep_browser_open = True
+    total = len(patients)
+    renders = []  # patients waiting for their deferred PDF
+
+    for index, patient in enumerate(patients):
+        s["message"] = f"Checking patient {index + 1}/{total}"
+        s["last_activity"] = time.time()
+        started = time.time()
+
+        try:
+            if index > 0:
+                await run_blocking(lane, bot.load_patient, patient)
+
+            step1_result = await run_blocking(lane, bot.step1)
+            if isinstance(step1_result, str) and step1_result.startswith("ERROR"):
+                result = {"status": "error", "message": step1_result}
+            else:
+                step2_result = await run_blocking(lane, bot.step2)
+                if isinstance(step2_result, dict):
+                    result = step2_result
+                else:
+                    result = {"status": "error", "message": str(step2_result)}
+        except Exception as e:
+            result = {"status": "error", "message": f"worker exception: {e}"}
+
+        item = {
+            "index": index,
+            "patient": {k: patient.get(k, "") for k in _PATIENT_FIELDS},
+            "elapsed_s": round(time.time() - started, 2),
+            **result,
+        }
+        if pdf_render.pending(result):
+            renders.append(asyncio.create_task(_publish_rendered(s, item)))
+        else:
+            _publish(s, item)
+        print(f"[batch] patient {index + 1}/{total}: {result.get('status')}")
+
+    await asyncio.gather(*renders)
+    results = sorted(s["batch_results"], key=lambda r: r["index"])
+    succeeded = sum(1 for r in results if r.get("status") == "success")
+    summary = {
+        "status": "success",
+        "total": total,
+        "succeeded": succeeded,
+        "failed": total - succeeded,
+        "results": results,
+    }
+    _publish(s, done=True)
+    return summary
+
+
+async def stream_results(s: Dict[str, Any]) -> AsyncIterator[str]:
+    """Yield per-patient results as NDJSON lines until the batch finishes."""
+    sent = 0
+    while True:
+        changed = s["batch_changed"]
+        results = s["batch_results"]
+        while sent < len(results):
+            yield json.dumps(results[sent], default=str) + "\n"
+            sent += 1
+        if s["batch_done"] or s.get("status") == "error":
+            return
+        try:
+            await asyncio.wait_for(changed.wait(), timeout=15)
+        except asyncio.TimeoutError:
+            # keep-alive so proxies don't drop a long batch
+            yield "\n"
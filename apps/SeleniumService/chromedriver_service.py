@@ -0,0 +1,248 @@
+"""
+Chromedriver resolution and a shared chromedriver process for every browser.
+
+Before this, each browser launch ran Service(ChromeDriverManager().install()):
+version lookup, filesystem checks and possibly a network call, then a fresh
+chromedriver process per browser. Now:
+
+- The driver path is resolved once and cached:
+    1. CHROMEDRIVER_PATH (pinned local binary), else
+    2. the path cached in CHROMEDRIVER_CACHE_FILE by a previous run, else
+    3. ChromeDriverManager().install() (skipped when CHROMEDRIVER_OFFLINE=1,
+       which falls back to a chromedriver on PATH).
+  If Chrome was upgraded and the cached driver no longer matches, the cache is
+  dropped and resolved again once.
+- One chromedriver process serves all sessions (chromedriver handles many
+  sessions per process); driver.quit() ends the session but leaves the
+  process up for the next launch.
+- Launch times are recorded and reported in /status.
+- Every browser gets its payer's resource blocking policy (resource_policy).
+- Browsers are InstrumentedChrome: every WebDriver command is counted in
+  /metrics and traced as a span of the running job, and Page.printToPDF
+  round trips are timed.
+"""
+import os
+import json
+import time
+import shutil
+import threading
+from typing import Dict, Any
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.webdriver.chrome.service import Service
+
+from page_waits import enable_network_events
+import agent_metrics
+import tracing
+import resource_policy
+
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH", "")
+CHROMEDRIVER_OFFLINE = os.getenv("CHROMEDRIVER_OFFLINE", "0") == "1"
+CHROMEDRIVER_CACHE_FILE = os.getenv(
+    "CHROMEDRIVER_CACHE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chromedriver_path.json"),
+)
+
+_lock = threading.RLock()
+# Guards _resolved / launch_stats only - never held across a driver download or
+# chromedriver start, so /status can read them while _lock is busy
+_stats_lock = threading.Lock()
+_resolved: Dict[str, Any] = {"path": None, "source": None, "resolve_ms": None}
+_service = None
+
+launch_stats: Dict[str, Any] = {
+    "launches": 0,
+    "failures": 0,
+    "last_ms": 0.0,
+    "avg_ms": 0.0,
+    "max_ms": 0.0,
+    "by_browser": {},
+}
+
+
+class SharedChromeService(Service):
+    """
+    chromedriver Service that outlives the sessions it serves: start() is a
+    no-op while the process is up, and stop() (called by driver.quit()) keeps
+    it running. shutdown() really stops it.
+    """
+
+    def start(self):
+        with _lock:
+            process = getattr(self, "process", None)
+            if process is not None and process.poll() is None and self.is_connectable():
+                return
+            try:
+                super().start()
+            except BaseException:
+                # Service.start() cleans up through stop(), which is a no-op here
+                self.shutdown()
+                raise
+            print(f"[chromedriver] Service started on {self.service_url}")
+
+    def stop(self):
+        pass
+
+    def shutdown(self):
+        super().stop()
+
+
+class InstrumentedChrome(webdriver.Chrome):
+    """
+    webdriver.Chrome that reports its commands to agent_metrics under `label`
+    and counts them in `command_count` (per-step totals in PageWaits).
+    """
+
+    def __init__(self, label: str, **kwargs):
+        self.metrics_label = label
+        self.command_count = 0
+        super().__init__(**kwargs)
+
+    def execute(self, driver_command: str, params: dict = None):
+        self.command_count += 1
+        agent_metrics.WEBDRIVER_COMMANDS.inc(browser=self.metrics_label, command=driver_command)
+        cdp_method = (params or {}).get("cmd") if driver_command == "executeCdpCommand" else None
+        span_name = f"cdp {cdp_method}" if cdp_method else f"webdriver {driver_command}"
+        with tracing.span(span_name, browser=self.metrics_label):
+            if cdp_method == "Page.printToPDF":
+                started = time.perf_counter()
+                try:
+                    return super().execute(driver_command, params)
+                finally:
+                    agent_metrics.PDF_CAPTURE_SECONDS.observe(time.perf_counter() - started, browser=self.metrics_label)
+            return super().execute(driver_command, params)
+
+
+def _read_cache() -> str | None:
+    try:
+        with open(CHROMEDRIVER_CACHE_FILE, "r") as f:
+            path = json.load(f).get("path")
+        if path and os.path.isfile(path):
+            return path
+    except Exception:
+        pass
+    return None
+
+
+def _write_cache(path: str):
+    try:
+        with open(CHROMEDRIVER_CACHE_FILE, "w") as f:
+            json.dump({"path": path, "resolved_at": time.time()}, f)
+    except Exception as e:
+        print(f"[chromedriver] Could not write cache file: {e}")
+
+
+def resolve_chromedriver(refresh: bool = False) -> str:
+    """Return the chromedriver path, resolving (and caching) it on first use."""
+    with _lock:
+        if _resolved["path"] and not refresh:
+            return _resolved["path"]
+
+        start = time.perf_counter()
+        path, source = None, None
+
+        if CHROMEDRIVER_PATH:
+            if not os.path.isfile(CHROMEDRIVER_PATH):
+                raise FileNotFoundError(f"CHROMEDRIVER_PATH does not exist: {CHROMEDRIVER_PATH}")
+            path, source = CHROMEDRIVER_PATH, "pinned"
+        elif not refresh and _read_cache():
+            path, source = _read_cache(), "cache"
+        elif not CHROMEDRIVER_OFFLINE:
+            from webdriver_manager.chrome import ChromeDriverManager
+            path, source = ChromeDriverManager().install(), "webdriver_manager"
+            _write_cache(path)
+        else:
+            path, source = shutil.which("chromedriver"), "PATH"
+            if not path:
+                raise FileNotFoundError(
+                    "CHROMEDRIVER_OFFLINE=1 but no CHROMEDRIVER_PATH, cached driver or chromedriver on PATH"
+                )
+
+        with _stats_lock:
+            _resolved.update(path=path, source=source, resolve_ms=round((time.perf_counter() - start) * 1000, 1))
+        print(f"[chromedriver] Using {path} ({source}, {_resolved['resolve_ms']} ms)")
+        return path
+
+
+def get_service() -> SharedChromeService:
+    """The process-wide chromedriver service (created on first use)."""
+    global _service
+    with _lock:
+        path = resolve_chromedriver()
+        if _service is None or _service.path != path:
+            if _service is not None:
+                _service.shutdown()
+            _service = SharedChromeService(executable_path=path)
+        return _service
+
+
+def warm_up():
+    """Resolve the driver and start chromedriver ahead of the first browser launch."""
+    try:
+        get_service().start()
+    except Exception as e:
+        print(f"[chromedriver] Warm-up failed (will retry on first launch): {e}")
+
+
+def _record_launch(label: str, elapsed_ms: float):
+    with _stats_lock:
+        launch_stats["launches"] += 1
+        n = launch_stats["launches"]
+        launch_stats["last_ms"] = round(elapsed_ms, 1)
+        launch_stats["max_ms"] = round(max(launch_stats["max_ms"], elapsed_ms), 1)
+        launch_stats["avg_ms"] = round(launch_stats["avg_ms"] + (elapsed_ms - launch_stats["avg_ms"]) / n, 1)
+        per = launch_stats["by_browser"].setdefault(label, {"launches": 0, "last_ms": 0.0})
+        per["launches"] += 1
+        per["last_ms"] = round(elapsed_ms, 1)
+
+
+def create_chrome_driver(options, label: str = "chrome") -> InstrumentedChrome:
+    """
+    Launch Chrome with `options` on the shared chromedriver service and
+    record how long it took. `label` names the caller in the launch stats.
+    CDP Network events are always recorded so page_waits can detect network idle,
+    and the payer's resource policy (resource_policy.py, keyed by `label`) is applied.
+    """
+    enable_network_events(options)
+    start = time.perf_counter()
+    try:
+        try:
+            driver = InstrumentedChrome(label, service=get_service(), options=options)
+        except SessionNotCreatedException as e:
+            # Usually a Chrome upgrade the cached driver doesn't support - re-resolve once
+            if _resolved["source"] != "cache" or CHROMEDRIVER_OFFLINE:
+                raise
+            print(f"[chromedriver] Cached driver rejected ({e.msg}) - resolving again")
+            resolve_chromedriver(refresh=True)
+            driver = InstrumentedChrome(label, service=get_service(), options=options)
+    except Exception:
+        with _stats_lock:
+            launch_stats["failures"] += 1
+        agent_metrics.BROWSER_LAUNCH_FAILURES.inc(browser=label)
+        raise
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    _record_launch(label, elapsed_ms)
+    resource_policy.apply_policy(driver, label)
+    agent_metrics.BROWSER_LAUNCH_SECONDS.observe(elapsed_ms / 1000, browser=label)
+    print(f"[chromedriver] {label} browser launched in {elapsed_ms:.0f} ms")
+    return driver
+
+
+def shutdown():
+    """Stop the shared chromedriver process (agent shutdown)."""
+    with _lock:
+        if _service is not None:
+            _service.shutdown()
+
+
+def chromedriver_status() -> Dict[str, Any]:
+    """Resolution + launch timings, as served by /status (never waits on a driver download or launch)."""
+    with _stats_lock:
+        return {
+            "path": _resolved["path"],
+            "source": _resolved["source"],
+            "resolve_ms": _resolved["resolve_ms"],
+            **{k: v for k, v in launch_stats.items() if k != "by_browser"},
+            "by_browser": {label: dict(per) for label, per in launch_stats["by_browser"].items()},
+        }
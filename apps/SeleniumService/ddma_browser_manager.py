@@ -9,8 +9,7 @@ import shutil
 import hashlib
 import threading
 from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from chromedriver_service import create_chrome_driver
 
 # Ensure DISPLAY is set for Chrome to work (needed when running from SSH/background)
 if not os.environ.get("DISPLAY"):
@@ -269,8 +268,7 @@ class DDMABrowserManager:
         }
         options.add_experimental_option("prefs", prefs)
 
-        service = Service(ChromeDriverManager().install())
-        self._driver = webdriver.Chrome(service=service, options=options)
+        self._driver = create_chrome_driver(options, label="ddma")
         self._driver.maximize_window()
         
         # Remove webdriver property to avoid detection
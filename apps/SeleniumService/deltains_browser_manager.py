@@ -9,10 +9,9 @@ import shutil
 import hashlib
 import threading
 import subprocess
-import time
+import tracing
 from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from chromedriver_service import create_chrome_driver
 
 if not os.environ.get("DISPLAY"):
     os.environ["DISPLAY"] = ":0"
@@ -78,10 +77,10 @@ class DeltaInsBrowserManager:
             # Navigate to the DeltaIns domain first so we can set cookies for it
             try:
                 self._driver.get("https://www.deltadentalins.com/favicon.ico")
-                time.sleep(2)
+                tracing.sleep(2)
             except Exception:
                 self._driver.get("https://www.deltadentalins.com")
-                time.sleep(3)
+                tracing.sleep(3)
 
             restored = 0
             for cookie in cookies:
@@ -259,7 +258,7 @@ class DeltaInsBrowserManager:
                         subprocess.run(["kill", "-9", pid], check=False)
                     except:
                         pass
-                time.sleep(1)
+                tracing.sleep(1)
         except Exception:
             pass
 
@@ -313,7 +312,7 @@ class DeltaInsBrowserManager:
             except:
                 pass
             self._driver = None
-            time.sleep(1)
+            tracing.sleep(1)
 
         options = webdriver.ChromeOptions()
         if headless:
@@ -339,8 +338,7 @@ class DeltaInsBrowserManager:
         }
         options.add_experimental_option("prefs", prefs)
 
-        service = Service(ChromeDriverManager().install())
-        self._driver = webdriver.Chrome(service=service, options=options)
+        self._driver = create_chrome_driver(options, label="deltains")
         self._driver.maximize_window()
 
         try:
@@ -8,10 +8,9 @@ import shutil
 import hashlib
 import threading
 import subprocess
-import time
+import tracing
 from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from chromedriver_service import create_chrome_driver
 
 # Ensure DISPLAY is set for Chrome to work (needed when running from SSH/background)
 if not os.environ.get("DISPLAY"):
@@ -177,7 +176,7 @@ class DentaQuestBrowserManager:
                         subprocess.run(["kill", "-9", pid], check=False)
                     except:
                         pass
-                time.sleep(1)
+                tracing.sleep(1)
         except Exception as e:
             pass
         
@@ -222,7 +221,7 @@ class DentaQuestBrowserManager:
             except:
                 pass
             self._driver = None
-            time.sleep(1)
+            tracing.sleep(1)
 
         options = webdriver.ChromeOptions()
         if headless:
@@ -241,8 +240,7 @@ class DentaQuestBrowserManager:
         }
         options.add_experimental_option("prefs", prefs)
 
-        service = Service(ChromeDriverManager().install())
-        self._driver = webdriver.Chrome(service=service, options=options)
+        self._driver = create_chrome_driver(options, label="dentaquest")
         self._driver.maximize_window()
         
         # Reset the session clear flag (file-based clearing is done on startup)
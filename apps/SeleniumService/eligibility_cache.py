@@ -0,0 +1,249 @@
+"""
+Eligibility result cache for the OTP payers (DDMA, DentaQuest, United SCO, DeltaIns).
+
+Front-desk staff re-check the same patient several times a day; each re-check
+used to cost a full portal session (login, often an OTP, search, PDF). A
+successful result is now stored under
+
+    (payer, member ID, date of birth, first name, last name, service date)
+
+and an identical request within ELIGIBILITY_CACHE_TTL_SECONDS is answered from
+here without touching a browser: the job is created already completed, with
+the stored eligibility / patientName / memberId / PDF reference.
+
+- Service date: `serviceDate` from the request data, else today.
+- Bypass: `"bypassCache": true` in the body (or in data), or a
+  `Cache-Control: no-cache` header. A bypassed run still refreshes the entry.
+- A full result without its PDF - e.g. one whose render failed (pdf_error,
+  see pdf_render.py) - is not stored, so the next request runs again.
+- Full results are cached by their stored PDF / screenshot (pdf_artifact_id
+  / ss_artifact_id, see artifact_store.py), not the download path: the
+  backend empties the job's download folder once it has the file, and reads
+  a cached result's document by artifact ID. An entry whose artifact has
+  since been collected is a miss.
+- mode=quick results (status only, no PDF) are kept under their own key: a
+  quick request is answered by a cached full result or a cached quick one,
+  a full request only by a full one. Quick and full runs never join each
+  other in flight.
+- Keys are hashed, so the table holds no member IDs / names in clear - only
+  the cached result itself.
+- Hits / misses / bypasses are counted in /metrics.
+
+In-flight de-duplication (single flight): while a live run for a key is
+queued or running, an identical request joins it - it gets the same
+session / job ID (and so the same OTP prompt, status and result stream)
+instead of a second run in the payer's one-browser lane.
+
+DB location: ELIGIBILITY_CACHE_PATH (default eligibility_cache.sqlite3 next to
+this file). ELIGIBILITY_CACHE_TTL_SECONDS=0 turns the cache off.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from datetime import date
+from typing import Dict, Any, Optional
+
+import agent_metrics
+import artifact_store
+
+ELIGIBILITY_CACHE_PATH = os.getenv(
+    "ELIGIBILITY_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "eligibility_cache.sqlite3"),
+)
+ELIGIBILITY_CACHE_TTL_SECONDS = int(os.getenv("ELIGIBILITY_CACHE_TTL_SECONDS", str(4 * 3600)))
+
+# Result fields worth keeping; per-run diagnostics (waits, timings) are not
+_RESULT_FIELDS = (
+    "status", "eligibility", "patientName", "memberId", "pdf_path", "ss_path", "pdfBase64", "extractedDob",
+    "pdf_artifact_id", "ss_artifact_id", "mode",
+)
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+# Single flight: cache key -> job ID of the live run, and back
+_inflight: Dict[str, str] = {}
+_inflight_keys: Dict[str, str] = {}
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(ELIGIBILITY_CACHE_PATH, check_same_thread=False, isolation_level=None)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS eligibility_cache (
+                key        TEXT PRIMARY KEY,
+                lane       TEXT NOT NULL,
+                result     TEXT NOT NULL,
+                job_id     TEXT,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS eligibility_cache_expires ON eligibility_cache(expires_at)")
+    return _conn
+
+
+def _norm(value: Any) -> str:
+    """Case / punctuation-insensitive form of an ID, date or name."""
+    return re.sub(r"[^0-9a-z]", "", str(value or "").lower())
+
+
+def cache_key(lane: str, data: Dict[str, Any]) -> Optional[str]:
+    """Hashed key for a patient lookup, or None if the request names no member."""
+    member_id = _norm(data.get("memberId"))
+    if not member_id and not (_norm(data.get("lastName")) and _norm(data.get("dateOfBirth"))):
+        return None
+    parts = (
+        lane,
+        member_id,
+        _norm(data.get("dateOfBirth")),
+        _norm(data.get("firstName")),
+        _norm(data.get("lastName")),
+        _norm(data.get("serviceDate") or date.today().isoformat()),
+    )
+    if is_quick(data):
+        parts += ("quick",)
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def is_quick(data: Dict[str, Any]) -> bool:
+    """Status-only lookup (mode=quick)?"""
+    return (data or {}).get("mode") == "quick"
+
+
+def wants_bypass(body: Dict[str, Any], headers) -> bool:
+    data = body.get("data") or {}
+    if body.get("bypassCache") or data.get("bypassCache"):
+        return True
+    return "no-cache" in (headers.get("Cache-Control") or "").lower()
+
+
+_ARTIFACT_KEYS = ("pdf_artifact_id", "ss_artifact_id")
+
+
+def _has_document(result: Dict[str, Any]) -> bool:
+    """A full result is only worth caching with its PDF / screenshot stored (or inline)."""
+    if result.get("pdf_error"):
+        return False
+    return bool(result.get("pdfBase64") or any(result.get(k) for k in _ARTIFACT_KEYS))
+
+
+def _usable(result: Dict[str, Any]) -> bool:
+    if is_quick(result):
+        return True
+    if not _has_document(result):
+        return False
+    for artifact_id in filter(None, (result.get(k) for k in _ARTIFACT_KEYS)):
+        artifact = artifact_store.get(artifact_id)
+        if artifact is None or not os.path.exists(artifact["path"]):
+            return False
+    return True
+
+
+def get(lane: str, data: Dict[str, Any], bypass: bool = False) -> Optional[Dict[str, Any]]:
+    """Cached result for this lookup (counted as hit / miss / bypass), or None."""
+    if ELIGIBILITY_CACHE_TTL_SECONDS <= 0:
+        return None
+    if bypass:
+        agent_metrics.ELIGIBILITY_CACHE.inc(lane=lane, outcome="bypass")
+        return None
+    # A quick lookup is answered by a full result too (it has everything a quick one has)
+    keys = [cache_key(lane, {**data, "mode": None})]
+    if is_quick(data):
+        keys.append(cache_key(lane, data))
+    row = result = None
+    for key in filter(None, keys):
+        with _lock:
+            row = _db().execute(
+                "SELECT * FROM eligibility_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        result = json.loads(row["result"]) if row else None
+        if result is not None and not _usable(result):
+            invalidate(key)
+            result = None
+        if result is not None:
+            break
+    agent_metrics.ELIGIBILITY_CACHE.inc(lane=lane, outcome="hit" if result else "miss")
+    if result is None:
+        return None
+    return {**result, "cached": True, "cached_at": row["created_at"], "cached_job_id": row["job_id"]}
+
+
+def put(lane: str, data: Dict[str, Any], result: Any, job_id: Optional[str] = None):
+    """Store a successful single-patient result (full mode: with its PDF); anything else is ignored."""
+    if ELIGIBILITY_CACHE_TTL_SECONDS <= 0:
+        return
+    if not isinstance(result, dict) or result.get("status") != "success":
+        return
+    if not is_quick(data) and not _has_document(result):
+        return  # no stored PDF (e.g. its render failed) - the next request runs again
+    key = cache_key(lane, data)
+    if not key:
+        return
+    stored = {k: result[k] for k in _RESULT_FIELDS if k in result}
+    now = time.time()
+    with _lock:
+        db = _db()
+        db.execute(
+            "INSERT OR REPLACE INTO eligibility_cache (key, lane, result, job_id, created_at, expires_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, lane, json.dumps(stored, default=str), job_id, now, now + ELIGIBILITY_CACHE_TTL_SECONDS),
+        )
+        db.execute("DELETE FROM eligibility_cache WHERE expires_at <= ?", (now,))
+
+
+def put_batch(lane: str, data: Dict[str, Any], patients: list, summary: Any, job_id: Optional[str] = None):
+    """Store each successful patient of a batch summary (see batch_eligibility.run_patients)."""
+    if not isinstance(summary, dict):
+        return
+    for item in summary.get("results") or []:
+        index = item.get("index")
+        if isinstance(index, int) and 0 <= index < len(patients):
+            put(lane, {**data, **patients[index]}, item, job_id)
+
+
+def invalidate(key: str):
+    with _lock:
+        _db().execute("DELETE FROM eligibility_cache WHERE key = ?", (key,))
+
+
+def inflight_job(lane: str, data: Dict[str, Any]) -> Optional[str]:
+    """Job ID of a live run for the same lookup, if there is one."""
+    key = cache_key(lane, data)
+    return _inflight.get(key) if key else None
+
+
+def track_inflight(lane: str, data: Dict[str, Any], job_id: str):
+    """Let identical requests join job_id until release(job_id)."""
+    key = cache_key(lane, data)
+    if key and key not in _inflight:
+        _inflight[key] = job_id
+        _inflight_keys[job_id] = key
+
+
+def release(job_id: str):
+    key = _inflight_keys.pop(job_id, None)
+    if key is not None and _inflight.get(key) == job_id:
+        del _inflight[key]
+
+
+def stats() -> Dict[str, Any]:
+    """Live entry count per lane and joinable runs (for /status)."""
+    with _lock:
+        rows = _db().execute(
+            "SELECT lane, COUNT(*) AS n FROM eligibility_cache WHERE expires_at > ? GROUP BY lane", (time.time(),)
+        ).fetchall()
+    return {
+        "ttl_seconds": ELIGIBILITY_CACHE_TTL_SECONDS,
+        "entries": {r["lane"]: r["n"] for r in rows},
+        "inflight": len(_inflight),
+    }
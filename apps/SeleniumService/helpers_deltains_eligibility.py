@@ -4,23 +4,28 @@ import asyncio
 from typing import Dict, Any
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import WebDriverException, TimeoutException
+from selenium.common.exceptions import WebDriverException
 
 from selenium_DeltaIns_eligibilityCheckWorker import AutomationDeltaInsEligibilityCheck
 from deltains_browser_manager import get_browser_manager
+from job_scheduler import run_blocking
+from job_store import SessionStore
+import batch_eligibility
+import artifact_store
+import pdf_render
+from otp_watch import LoginSignals, wait_for_otp_login
 
-# In-memory session store
-sessions: Dict[str, Dict[str, Any]] = {}
+# Lane whose thread pool runs the blocking Selenium calls
+LANE = "deltains"
+
+# Live sessions, keyed by job ID and backed by the durable job store
+sessions = SessionStore(LANE)
 
 SESSION_OTP_TIMEOUT = int(os.getenv("SESSION_OTP_TIMEOUT", "240"))
 
 
-def make_session_entry() -> str:
-    import uuid
-    sid = str(uuid.uuid4())
-    sessions[sid] = {
+def make_session_entry(sid: str | None = None) -> str:
+    return sessions.create({
         "status": "created",
         "created_at": time.time(),
         "last_activity": time.time(),
@@ -31,8 +36,7 @@ def make_session_entry() -> str:
         "result": None,
         "message": None,
         "type": None,
-    }
-    return sid
+    }, job_id=sid)
 
 
 async def cleanup_session(sid: str, message: str | None = None):
@@ -41,10 +45,12 @@ async def cleanup_session(sid: str, message: str | None = None):
         return
     try:
         try:
+            final = {}
             if s.get("status") not in ("completed", "error", "not_found"):
-                s["status"] = "error"
+                final["status"] = "error"
             if message:
-                s["message"] = message
+                final["message"] = message
+            s.update(final)
         except Exception:
             pass
         try:
@@ -79,12 +85,44 @@ def _close_browser(bot):
         print(f"[DeltaIns] Could not close browser: {e}")
 
 
-async def start_deltains_run(sid: str, data: dict, url: str):
+def _on_provider_tools(driver) -> bool:
+    current_url = driver.current_url.lower()
+    return "provider-tools" in current_url and "login" not in current_url and "ciam" not in current_url
+
+
+# Provider-tools page = logged in (watched from inside the browser, see _on_provider_tools)
+OTP_SIGNALS = LoginSignals(
+    logged_in_url=("provider-tools",),
+    logged_out_url=("login", "ciam"),
+)
+
+
+def _type_otp(driver, otp_value: str):
+    """Type an app-submitted OTP into the passcode form (blocking - lane thread pool)."""
+    otp_input = driver.find_element(By.XPATH,
+        "//input[@name='credentials.passcode' and @type='text'] | "
+        "//input[contains(@name,'passcode')]")
+    otp_input.clear()
+    otp_input.send_keys(otp_value)
+
+    try:
+        verify_btn = driver.find_element(By.XPATH,
+            "//input[@type='submit'] | "
+            "//button[@type='submit']")
+        verify_btn.click()
+        print("[DeltaIns OTP] Clicked verify button")
+    except Exception:
+        otp_input.send_keys(Keys.RETURN)
+        print("[DeltaIns OTP] Pressed Enter as fallback")
+
+
+async def start_deltains_run(sid: str, data: dict, url: str, patients: list | None = None):
     """
     Run the DeltaIns eligibility check workflow:
     1. Login (with OTP if needed)
     2. Search patient by Member ID + DOB
     3. Extract eligibility info + PDF
+    With `patients`, logs in once and checks every patient in the list (batch).
     """
     s = sessions.get(sid)
     if not s:
@@ -93,10 +131,17 @@ async def start_deltains_run(sid: str, data: dict, url: str):
     s["status"] = "running"
     s["last_activity"] = time.time()
     bot = None
+    # Set once the slot is released for a deferred PDF: the browser is then the next job's
+    released = False
 
     try:
+        if patients is not None:
+            # Batch: the bot starts on the first patient, the rest are loaded in turn
+            batch_eligibility.init_batch(s, patients)
+            data = {**data, **(patients[0] if patients else {})}
+
         bot = AutomationDeltaInsEligibilityCheck({"data": data})
-        bot.config_driver()
+        await run_blocking(LANE, bot.config_driver)
 
         s["bot"] = bot
         s["driver"] = bot.driver
@@ -105,168 +150,153 @@ async def start_deltains_run(sid: str, data: dict, url: str):
         # Maximize window and login (bot.login handles navigation itself,
         # checking provider-tools URL first to preserve existing sessions)
         try:
-            bot.driver.maximize_window()
+            await run_blocking(LANE, bot.driver.maximize_window)
         except Exception:
             pass
 
         try:
-            login_result = bot.login(url)
+            login_result = await run_blocking(LANE, bot.login, url)
         except WebDriverException as wde:
-            s["status"] = "error"
-            s["message"] = f"Selenium driver error during login: {wde}"
-            s["result"] = {"status": "error", "message": s["message"]}
-            _close_browser(bot)
+            message = f"Selenium driver error during login: {wde}"
+            s.update(status="error", message=message, result={"status": "error", "message": message})
+            await run_blocking(LANE, _close_browser, bot)
             asyncio.create_task(_remove_session_later(sid, 30))
             return {"status": "error", "message": s["message"]}
         except Exception as e:
-            s["status"] = "error"
-            s["message"] = f"Unexpected error during login: {e}"
-            s["result"] = {"status": "error", "message": s["message"]}
-            _close_browser(bot)
+            message = f"Unexpected error during login: {e}"
+            s.update(status="error", message=message, result={"status": "error", "message": message})
+            await run_blocking(LANE, _close_browser, bot)
             asyncio.create_task(_remove_session_later(sid, 30))
             return {"status": "error", "message": s["message"]}
 
         # Handle login result
         if isinstance(login_result, str) and login_result == "ALREADY_LOGGED_IN":
-            s["status"] = "running"
-            s["message"] = "Session persisted"
+            s.update(status="running", message="Session persisted")
             print("[DeltaIns] Session persisted - skipping OTP")
             # Re-save cookies to keep them fresh on disk
-            get_browser_manager().save_cookies()
+            await run_blocking(LANE, get_browser_manager().save_cookies)
 
         elif isinstance(login_result, str) and login_result == "OTP_REQUIRED":
-            s["status"] = "waiting_for_otp"
-            s["message"] = "OTP required - please enter the code sent to your email"
+            s.update(
+                status="waiting_for_otp",
+                message="OTP required - please enter the code sent to your email",
+            )
             s["last_activity"] = time.time()
 
             driver = s["driver"]
-            max_polls = SESSION_OTP_TIMEOUT
-            login_success = False
-
-            print(f"[DeltaIns OTP] Waiting for OTP (polling for {SESSION_OTP_TIMEOUT}s)...")
 
-            for poll in range(max_polls):
-                await asyncio.sleep(1)
-                s["last_activity"] = time.time()
+            # Nothing to drive until the user types the code: hand the execution
+            # slot to other payers (our lane - and the browser - stay reserved)
+            slot = s.get("slot")
+            if slot:
+                slot.park()
 
-                try:
-                    otp_value = s.get("otp_value")
-                    if otp_value:
-                        print(f"[DeltaIns OTP] OTP received from app: {otp_value}")
-                        try:
-                            otp_input = driver.find_element(By.XPATH,
-                                "//input[@name='credentials.passcode' and @type='text'] | "
-                                "//input[contains(@name,'passcode')]")
-                            otp_input.clear()
-                            otp_input.send_keys(otp_value)
-
-                            try:
-                                verify_btn = driver.find_element(By.XPATH,
-                                    "//input[@type='submit'] | "
-                                    "//button[@type='submit']")
-                                verify_btn.click()
-                                print("[DeltaIns OTP] Clicked verify button")
-                            except Exception:
-                                otp_input.send_keys(Keys.RETURN)
-                                print("[DeltaIns OTP] Pressed Enter as fallback")
-
-                            s["otp_value"] = None
-                            await asyncio.sleep(8)
-                        except Exception as type_err:
-                            print(f"[DeltaIns OTP] Failed to type OTP: {type_err}")
-
-                    current_url = driver.current_url.lower()
-                    if poll % 10 == 0:
-                        print(f"[DeltaIns OTP Poll {poll+1}/{max_polls}] URL: {current_url[:80]}")
-
-                    if "provider-tools" in current_url and "login" not in current_url and "ciam" not in current_url:
-                        print("[DeltaIns OTP] Login successful!")
-                        login_success = True
-                        break
+            login_success = await wait_for_otp_login(
+                s, LANE, OTP_SIGNALS, _type_otp, SESSION_OTP_TIMEOUT, "DeltaIns"
+            )
 
-                except Exception as poll_err:
-                    if poll % 10 == 0:
-                        print(f"[DeltaIns OTP Poll {poll+1}] Error: {poll_err}")
+            if slot:
+                await slot.resume()
 
             if not login_success:
                 try:
-                    current_url = driver.current_url.lower()
-                    if "provider-tools" in current_url and "login" not in current_url and "ciam" not in current_url:
+                    if await run_blocking(LANE, _on_provider_tools, driver):
                         login_success = True
                     else:
-                        s["status"] = "error"
-                        s["message"] = "OTP timeout - login not completed"
-                        s["result"] = {"status": "error", "message": "OTP not completed in time"}
-                        _close_browser(bot)
+                        s.update(
+                            status="error",
+                            message="OTP timeout - login not completed",
+                            result={"status": "error", "message": "OTP not completed in time"},
+                        )
+                        await run_blocking(LANE, _close_browser, bot)
                         asyncio.create_task(_remove_session_later(sid, 30))
                         return {"status": "error", "message": "OTP not completed in time"}
                 except Exception as final_err:
-                    s["status"] = "error"
-                    s["message"] = f"OTP verification failed: {final_err}"
-                    s["result"] = {"status": "error", "message": s["message"]}
-                    _close_browser(bot)
+                    message = f"OTP verification failed: {final_err}"
+                    s.update(status="error", message=message, result={"status": "error", "message": message})
+                    await run_blocking(LANE, _close_browser, bot)
                     asyncio.create_task(_remove_session_later(sid, 30))
                     return {"status": "error", "message": s["message"]}
 
             if login_success:
-                s["status"] = "running"
-                s["message"] = "Login successful after OTP"
+                s.update(status="running", message="Login successful after OTP")
                 print("[DeltaIns OTP] Proceeding to step1...")
                 # Save cookies to disk so session survives browser restart
-                get_browser_manager().save_cookies()
+                await run_blocking(LANE, get_browser_manager().save_cookies)
 
         elif isinstance(login_result, str) and login_result.startswith("ERROR"):
-            s["status"] = "error"
-            s["message"] = login_result
-            s["result"] = {"status": "error", "message": login_result}
-            _close_browser(bot)
+            s.update(
+                status="error",
+                message=login_result,
+                result={"status": "error", "message": login_result},
+            )
+            await run_blocking(LANE, _close_browser, bot)
             asyncio.create_task(_remove_session_later(sid, 30))
             return {"status": "error", "message": login_result}
 
         elif isinstance(login_result, str) and login_result == "SUCCESS":
             print("[DeltaIns] Login succeeded without OTP")
-            s["status"] = "running"
-            s["message"] = "Login succeeded"
+            s.update(status="running", message="Login succeeded")
             # Save cookies to disk so session survives browser restart
-            get_browser_manager().save_cookies()
+            await run_blocking(LANE, get_browser_manager().save_cookies)
+
+        # Batch: the login / OTP above covers every patient in the list
+        if patients is not None:
+            summary = await batch_eligibility.run_patients(s, LANE, bot, patients)
+            summary = await artifact_store.ingest(sid, summary)
+            await run_blocking(LANE, _close_browser, bot)
+            s.update(
+                status="completed",
+                result=summary,
+                message=f"completed ({summary['succeeded']}/{summary['total']} patients succeeded)",
+            )
+            asyncio.create_task(_remove_session_later(sid, 60))
+            return summary
 
         # Step 1 - search patient
-        step1_result = bot.step1()
+        step1_result = await run_blocking(LANE, bot.step1)
         print(f"[DeltaIns] step1 result: {step1_result}")
 
         if isinstance(step1_result, str) and step1_result.startswith("ERROR"):
-            s["status"] = "error"
-            s["message"] = step1_result
-            s["result"] = {"status": "error", "message": step1_result}
-            _close_browser(bot)
+            s.update(
+                status="error",
+                message=step1_result,
+                result={"status": "error", "message": step1_result},
+            )
+            await run_blocking(LANE, _close_browser, bot)
             asyncio.create_task(_remove_session_later(sid, 30))
             return {"status": "error", "message": step1_result}
 
         # Step 2 - extract eligibility info + PDF
-        step2_result = bot.step2()
+        step2_result = await run_blocking(LANE, bot.step2)
+        # Deferred PDF (pdf_render.py): free the browser for the next job, publish once rendered
+        if pdf_render.pending(step2_result):
+            slot = s.get("slot")
+            if slot:
+                slot.release()
+                released = True
+            step2_result = await pdf_render.wait(step2_result)
+        step2_result = await artifact_store.ingest(sid, step2_result)
         print(f"[DeltaIns] step2 result: {step2_result.get('status') if isinstance(step2_result, dict) else step2_result}")
 
         if isinstance(step2_result, dict):
-            s["status"] = "completed"
-            s["result"] = step2_result
-            s["message"] = "completed"
+            s.update(status="completed", result=step2_result, message="completed")
             asyncio.create_task(_remove_session_later(sid, 60))
             return step2_result
         else:
-            s["status"] = "error"
-            s["message"] = f"step2 returned unexpected result: {step2_result}"
-            s["result"] = {"status": "error", "message": s["message"]}
-            _close_browser(bot)
+            message = f"step2 returned unexpected result: {step2_result}"
+            s.update(status="error", message=message, result={"status": "error", "message": message})
+            if not released:
+                await run_blocking(LANE, _close_browser, bot)
             asyncio.create_task(_remove_session_later(sid, 30))
             return {"status": "error", "message": s["message"]}
 
     except Exception as e:
         if s:
-            s["status"] = "error"
-            s["message"] = f"worker exception: {e}"
-            s["result"] = {"status": "error", "message": s["message"]}
-        if bot:
-            _close_browser(bot)
+            message = f"worker exception: {e}"
+            s.update(status="error", message=message, result={"status": "error", "message": message})
+        if bot and not released:
+            await run_blocking(LANE, _close_browser, bot)
         asyncio.create_task(_remove_session_later(sid, 30))
         return {"status": "error", "message": f"worker exception: {e}"}
 
@@ -287,7 +317,8 @@ def submit_otp(sid: str, otp: str) -> Dict[str, Any]:
 
 
 def get_session_status(sid: str) -> Dict[str, Any]:
-    s = sessions.get(sid)
+    # Finished (or pre-restart) sessions are answered from the job store
+    s = sessions.get(sid) or sessions.snapshot(sid)
     if not s:
         return {"status": "not_found"}
     return {
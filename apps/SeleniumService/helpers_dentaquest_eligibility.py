@@ -8,18 +8,26 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import WebDriverException, TimeoutException
 
 from selenium_DentaQuest_eligibilityCheckWorker import AutomationDentaQuestEligibilityCheck
+from dentaquest_browser_manager import get_browser_manager
+from job_scheduler import run_blocking
+from job_store import SessionStore
+import batch_eligibility
+import artifact_store
+import pdf_render
+from otp_watch import LoginSignals, wait_for_otp_login
 
-# In-memory session store
-sessions: Dict[str, Dict[str, Any]] = {}
+# Lane whose thread pool runs the blocking Selenium calls
+LANE = "dentaquest"
+
+# Live sessions, keyed by job ID and backed by the durable job store
+sessions = SessionStore(LANE)
 
 SESSION_OTP_TIMEOUT = int(os.getenv("SESSION_OTP_TIMEOUT", "120"))  # seconds
 
 
-def make_session_entry() -> str:
+def make_session_entry(sid: str | None = None) -> str:
     """Create a new session entry and return its ID."""
-    import uuid
-    sid = str(uuid.uuid4())
-    sessions[sid] = {
+    return sessions.create({
         "status": "created",     # created -> running -> waiting_for_otp -> otp_submitted -> completed / error
         "created_at": time.time(),
         "last_activity": time.time(),
@@ -30,8 +38,7 @@ def make_session_entry() -> str:
         "result": None,
         "message": None,
         "type": None,
-    }
-    return sid
+    }, job_id=sid)
 
 
 async def cleanup_session(sid: str, message: str | None = None):
@@ -45,10 +52,12 @@ async def cleanup_session(sid: str, message: str | None = None):
     try:
         # Ensure final state
         try:
+            final = {}
             if s.get("status") not in ("completed", "error", "not_found"):
-                s["status"] = "error"
+                final["status"] = "error"
             if message:
-                s["message"] = message
+                final["message"] = message
+            s.update(final)
         except Exception:
             pass
 
@@ -73,10 +82,65 @@ async def _remove_session_later(sid: str, delay: int = 20):
     await cleanup_session(sid)
 
 
-async def start_dentaquest_run(sid: str, data: dict, url: str):
+def _open_login_page(driver, url: str):
+    driver.maximize_window()
+    driver.get(url)
+
+
+# Pages seen while waiting for OTP (watched from inside the browser)
+OTP_SIGNALS = LoginSignals(
+    logged_in_url=("member", "dashboard", "eligibility"),
+    logged_in_xpath='//input[@placeholder="Search by member ID"]',
+    otp_xpath="//input[contains(@name,'otp') or contains(@name,'code') or @type='tel' or contains(@aria-label,'Verification') or contains(@placeholder,'code') or contains(@placeholder,'Code')]",
+    otp_gone_url=("onboarding", "start", "login"),
+)
+
+
+def _type_otp(driver, otp_value: str):
+    """Type an app-submitted OTP into the verification form (blocking - lane thread pool)."""
+    otp_input = driver.find_element(By.XPATH, OTP_SIGNALS.otp_xpath)
+    otp_input.clear()
+    otp_input.send_keys(otp_value)
+    # Click verify button - use same pattern as Delta MA
+    try:
+        verify_btn = driver.find_element(By.XPATH, "//button[@type='button' and @aria-label='Verify']")
+        verify_btn.click()
+        print("[DentaQuest OTP] Clicked verify button (aria-label)")
+    except:
+        try:
+            # Fallback: try other button patterns
+            verify_btn = driver.find_element(By.XPATH, "//button[contains(text(),'Verify') or contains(text(),'Submit') or @type='submit']")
+            verify_btn.click()
+            print("[DentaQuest OTP] Clicked verify button (text/type)")
+        except:
+            otp_input.send_keys("\n")  # Press Enter as fallback
+            print("[DentaQuest OTP] Pressed Enter as fallback")
+    print("[DentaQuest OTP] OTP typed and submitted via app")
+
+
+def _go_to_members(driver):
+    """OTP input gone but still on the login page - try the members page (like Delta MA)."""
+    print("[DentaQuest OTP] OTP input gone, trying to navigate to members page...")
+    driver.get("https://providers.dentaquest.com/members")
+
+
+def _otp_final_check(driver) -> bool:
+    """Final attempt after the OTP window: navigate to members page and look for the search input."""
+    print("[DentaQuest OTP] Final attempt - navigating to members page...")
+    driver.get("https://providers.dentaquest.com/members")
+
+    member_search = WebDriverWait(driver, 10).until(
+        EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
+    )
+    print("[DentaQuest OTP] Member search input found - login successful!")
+    return True
+
+
+async def start_dentaquest_run(sid: str, data: dict, url: str, patients: list | None = None):
     """
-    Run the DentaQuest workflow for a session (WITHOUT managing semaphore/counters).
-    Called by agent.py inside a wrapper that handles queue/counters.
+    Run the DentaQuest workflow for a session (WITHOUT managing lane slots/counters).
+    Called by agent.py inside a wrapper that holds the payer's lane slot.
+    With `patients`, logs in once and checks every patient in the list (batch).
     """
     s = sessions.get(sid)
     if not s:
@@ -86,8 +150,13 @@ async def start_dentaquest_run(sid: str, data: dict, url: str):
     s["last_activity"] = time.time()
 
     try:
+        if patients is not None:
+            # Batch: the bot starts on the first patient, the rest are loaded in turn
+            batch_eligibility.init_batch(s, patients)
+            data = {**data, **(patients[0] if patients else {})}
+
         bot = AutomationDentaQuestEligibilityCheck({"data": data})
-        bot.config_driver()
+        await run_blocking(LANE, bot.config_driver)
 
         s["bot"] = bot
         s["driver"] = bot.driver
@@ -97,192 +166,122 @@ async def start_dentaquest_run(sid: str, data: dict, url: str):
         try:
             if not url:
                 raise ValueError("URL not provided for DentaQuest run")
-            bot.driver.maximize_window()
-            bot.driver.get(url)
+            await run_blocking(LANE, _open_login_page, bot.driver, url)
             await asyncio.sleep(1)
         except Exception as e:
-            s["status"] = "error"
-            s["message"] = f"Navigation failed: {e}"
+            s.update(status="error", message=f"Navigation failed: {e}")
             await cleanup_session(sid)
             return {"status": "error", "message": s["message"]}
 
         # Login
         try:
-            login_result = bot.login(url)
+            login_result = await run_blocking(LANE, bot.login, url)
         except WebDriverException as wde:
-            s["status"] = "error"
-            s["message"] = f"Selenium driver error during login: {wde}"
+            s.update(status="error", message=f"Selenium driver error during login: {wde}")
             await cleanup_session(sid, s["message"])
             return {"status": "error", "message": s["message"]}
         except Exception as e:
-            s["status"] = "error"
-            s["message"] = f"Unexpected error during login: {e}"
+            s.update(status="error", message=f"Unexpected error during login: {e}")
             await cleanup_session(sid, s["message"])
             return {"status": "error", "message": s["message"]}
 
         # Already logged in - session persisted from profile, skip to step1
         if isinstance(login_result, str) and login_result == "ALREADY_LOGGED_IN":
-            s["status"] = "running"
-            s["message"] = "Session persisted"
+            s.update(status="running", message="Session persisted")
             # Continue to step1 below
 
-        # OTP required path - POLL THE BROWSER to detect when user enters OTP
+        # OTP required path - wait for the OTP (app submit or typed in the browser)
         elif isinstance(login_result, str) and login_result == "OTP_REQUIRED":
-            s["status"] = "waiting_for_otp"
-            s["message"] = "OTP required for login - please enter OTP in browser"
+            s.update(status="waiting_for_otp", message="OTP required for login - please enter OTP in browser")
             s["last_activity"] = time.time()
             
             driver = s["driver"]
-            
-            # Poll the browser to detect when OTP is completed (user enters it directly)
-            # We check every 1 second for up to SESSION_OTP_TIMEOUT seconds (faster response)
-            max_polls = SESSION_OTP_TIMEOUT
-            login_success = False
-            
-            print(f"[DentaQuest OTP] Waiting for user to enter OTP (polling browser for {SESSION_OTP_TIMEOUT}s)...")
-            
-            for poll in range(max_polls):
-                await asyncio.sleep(1)
-                s["last_activity"] = time.time()
-                
-                try:
-                    # Check if OTP was submitted via API (from app)
-                    otp_value = s.get("otp_value")
-                    if otp_value:
-                        print(f"[DentaQuest OTP] OTP received from app: {otp_value}")
-                        try:
-                            otp_input = driver.find_element(By.XPATH, 
-                                "//input[contains(@name,'otp') or contains(@name,'code') or @type='tel' or contains(@aria-label,'Verification') or contains(@placeholder,'code')]"
-                            )
-                            otp_input.clear()
-                            otp_input.send_keys(otp_value)
-                            # Click verify button - use same pattern as Delta MA
-                            try:
-                                verify_btn = driver.find_element(By.XPATH, "//button[@type='button' and @aria-label='Verify']")
-                                verify_btn.click()
-                                print("[DentaQuest OTP] Clicked verify button (aria-label)")
-                            except:
-                                try:
-                                    # Fallback: try other button patterns
-                                    verify_btn = driver.find_element(By.XPATH, "//button[contains(text(),'Verify') or contains(text(),'Submit') or @type='submit']")
-                                    verify_btn.click()
-                                    print("[DentaQuest OTP] Clicked verify button (text/type)")
-                                except:
-                                    otp_input.send_keys("\n")  # Press Enter as fallback
-                                    print("[DentaQuest OTP] Pressed Enter as fallback")
-                            print("[DentaQuest OTP] OTP typed and submitted via app")
-                            s["otp_value"] = None  # Clear so we don't submit again
-                            await asyncio.sleep(3)  # Wait for verification
-                        except Exception as type_err:
-                            print(f"[DentaQuest OTP] Failed to type OTP from app: {type_err}")
-                    
-                    # Check current URL - if we're on dashboard/member page, login succeeded
-                    current_url = driver.current_url.lower()
-                    print(f"[DentaQuest OTP Poll {poll+1}/{max_polls}] URL: {current_url[:60]}...")
-                    
-                    # Check if we've navigated away from login/OTP pages
-                    if "member" in current_url or "dashboard" in current_url or "eligibility" in current_url:
-                        # Verify by checking for member search input
-                        try:
-                            member_search = WebDriverWait(driver, 5).until(
-                                EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
-                            )
-                            print("[DentaQuest OTP] Member search input found - login successful!")
-                            login_success = True
-                            break
-                        except TimeoutException:
-                            print("[DentaQuest OTP] On member page but search input not found, continuing to poll...")
-                    
-                    # Also check if OTP input is still visible
-                    try:
-                        otp_input = driver.find_element(By.XPATH, 
-                            "//input[contains(@name,'otp') or contains(@name,'code') or @type='tel' or contains(@aria-label,'Verification') or contains(@placeholder,'code') or contains(@placeholder,'Code')]"
-                        )
-                        # OTP input still visible - user hasn't entered OTP yet
-                        print(f"[DentaQuest OTP Poll {poll+1}] OTP input still visible - waiting...")
-                    except:
-                        # OTP input not found - might mean login is in progress or succeeded
-                        # Try navigating to members page (like Delta MA)
-                        if "onboarding" in current_url or "start" in current_url or "login" in current_url:
-                            print("[DentaQuest OTP] OTP input gone, trying to navigate to members page...")
-                            try:
-                                driver.get("https://providers.dentaquest.com/members")
-                                await asyncio.sleep(2)
-                            except:
-                                pass
-                
-                except Exception as poll_err:
-                    print(f"[DentaQuest OTP Poll {poll+1}] Error: {poll_err}")
-            
+
+            # Nothing to drive until the user types the code: hand the execution
+            # slot to other payers (our lane - and the browser - stay reserved)
+            slot = s.get("slot")
+            if slot:
+                slot.park()
+
+            login_success = await wait_for_otp_login(
+                s, LANE, OTP_SIGNALS, _type_otp, SESSION_OTP_TIMEOUT, "DentaQuest", on_otp_gone=_go_to_members
+            )
+
+            if slot:
+                await slot.resume()
+
             if not login_success:
                 # Final attempt - navigate to members page and check (like Delta MA)
                 try:
-                    print("[DentaQuest OTP] Final attempt - navigating to members page...")
-                    driver.get("https://providers.dentaquest.com/members")
-                    await asyncio.sleep(3)
-                    
-                    member_search = WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
-                    )
-                    print("[DentaQuest OTP] Member search input found - login successful!")
-                    login_success = True
+                    login_success = await run_blocking(LANE, _otp_final_check, driver)
                 except TimeoutException:
-                    s["status"] = "error"
-                    s["message"] = "OTP timeout - login not completed"
+                    s.update(status="error", message="OTP timeout - login not completed")
                     await cleanup_session(sid)
                     return {"status": "error", "message": "OTP not completed in time"}
                 except Exception as final_err:
-                    s["status"] = "error"
-                    s["message"] = f"OTP verification failed: {final_err}"
+                    s.update(status="error", message=f"OTP verification failed: {final_err}")
                     await cleanup_session(sid)
                     return {"status": "error", "message": s["message"]}
             
             if login_success:
-                s["status"] = "running"
-                s["message"] = "Login successful after OTP"
+                s.update(status="running", message="Login successful after OTP")
                 print("[DentaQuest OTP] Proceeding to step1...")
 
         elif isinstance(login_result, str) and login_result.startswith("ERROR"):
-            s["status"] = "error"
-            s["message"] = login_result
+            s.update(status="error", message=login_result)
             await cleanup_session(sid)
             return {"status": "error", "message": login_result}
 
         # Login succeeded without OTP (SUCCESS)
         elif isinstance(login_result, str) and login_result == "SUCCESS":
             print("[start_dentaquest_run] Login succeeded without OTP")
-            s["status"] = "running"
-            s["message"] = "Login succeeded"
+            s.update(status="running", message="Login succeeded")
             # Continue to step1 below
 
+        # Batch: the login / OTP above covers every patient in the list
+        if patients is not None:
+            summary = await batch_eligibility.run_patients(s, LANE, bot, patients)
+            summary = await artifact_store.ingest(sid, summary)
+            await run_blocking(LANE, get_browser_manager().quit_driver)
+            s.update(
+                status="completed",
+                result=summary,
+                message=f"completed ({summary['succeeded']}/{summary['total']} patients succeeded)",
+            )
+            asyncio.create_task(_remove_session_later(sid, 60))
+            return summary
+
         # Step 1
-        step1_result = bot.step1()
+        step1_result = await run_blocking(LANE, bot.step1)
         if isinstance(step1_result, str) and step1_result.startswith("ERROR"):
-            s["status"] = "error"
-            s["message"] = step1_result
+            s.update(status="error", message=step1_result)
             await cleanup_session(sid)
             return {"status": "error", "message": step1_result}
 
         # Step 2 (PDF)
-        step2_result = bot.step2()
+        step2_result = await run_blocking(LANE, bot.step2)
+        # Deferred PDF (pdf_render.py): free the browser for the next job, publish once rendered
+        if pdf_render.pending(step2_result):
+            slot = s.get("slot")
+            if slot:
+                slot.release()
+            step2_result = await pdf_render.wait(step2_result)
+        step2_result = await artifact_store.ingest(sid, step2_result)
         if isinstance(step2_result, dict) and step2_result.get("status") == "success":
-            s["status"] = "completed"
-            s["result"] = step2_result
-            s["message"] = "completed"
+            s.update(status="completed", result=step2_result, message="completed")
             asyncio.create_task(_remove_session_later(sid, 30))
             return step2_result
         else:
-            s["status"] = "error"
             if isinstance(step2_result, dict):
-                s["message"] = step2_result.get("message", "unknown error")
+                message = step2_result.get("message", "unknown error")
             else:
-                s["message"] = str(step2_result)
+                message = str(step2_result)
+            s.update(status="error", message=message)
             await cleanup_session(sid)
             return {"status": "error", "message": s["message"]}
 
     except Exception as e:
-        s["status"] = "error"
-        s["message"] = f"worker exception: {e}"
+        s.update(status="error", message=f"worker exception: {e}")
         await cleanup_session(sid)
         return {"status": "error", "message": s["message"]}
 
@@ -304,7 +303,8 @@ def submit_otp(sid: str, otp: str) -> Dict[str, Any]:
 
 
 def get_session_status(sid: str) -> Dict[str, Any]:
-    s = sessions.get(sid)
+    # Finished (or pre-restart) sessions are answered from the job store
+    s = sessions.get(sid) or sessions.snapshot(sid)
     if not s:
         return {"status": "not_found"}
     return {
@@ -0,0 +1,258 @@
+"""
+Per-job download directories, with completion taken from Chrome's own events.
+
+All workers used to share seleniumDownloads/: MassHealth took the first .pdf
+it found there (possibly another run's), United SCO and DeltaIns globbed it
+every 0.5-2 s for "new" files, and every error path deleted everything in it
+- including files a concurrent job was still handing to the backend.
+
+Now every job writes to seleniumDownloads/jobs/<job id>/ (the job id comes
+from the running job's trace):
+
+- printed PDFs / screenshots are saved there by the worker;
+- for portal downloads, watch(driver) points the browser at that directory
+  with Browser.setDownloadBehavior (allowAndName, eventsEnabled) over a
+  DevTools connection to the browser target, and a reader thread blocks on
+  that socket for Browser.downloadWillBegin / Browser.downloadProgress.
+  wait() returns as soon as Chrome reports the download completed - no
+  folder polling. The file is renamed from its GUID to the portal's
+  suggested name.
+- discard() on an error removes what this job wrote there - nothing else;
+  finish_job() drops the directory at the end of the job if it is empty.
+
+When the DevTools socket is unreachable, the download behavior is set
+through chromedriver instead (keeping the portal's file names) and wait()
+watches the job directory - still only this job's files. Closing the watch
+restores the browser's default download behavior (the profile's download
+directory).
+"""
+import os
+import re
+import json
+import time
+import uuid
+import threading
+from typing import Dict, Any, Optional, Set
+
+import requests
+import websocket
+
+import tracing
+import pdf_render
+
+# Under the browser manager's download dir: <download_dir>/jobs/<job id>/
+JOB_DOWNLOADS_SUBDIR = "jobs"
+# Folder check interval when Chrome's download events are not available
+FALLBACK_POLL_SECONDS = 0.5
+
+
+# trace id -> job directories created under it (removed by finish_job() if empty)
+_job_dirs: Dict[str, Set[str]] = {}
+_job_dirs_lock = threading.Lock()
+
+
+def _job_key() -> str:
+    span = tracing.current()
+    return span.trace_id if span is not None else uuid.uuid4().hex
+
+
+def _safe_name(name: str) -> str:
+    name = os.path.basename(name or "")
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name).strip("._") or "download"
+
+
+class JobDownloads:
+    """One job's download directory, plus an optional browser download watch."""
+
+    def __init__(self, base_dir: str, tag: str):
+        self.tag = tag
+        key = _job_key()
+        self.dir = os.path.join(os.path.abspath(base_dir), JOB_DOWNLOADS_SUBDIR, key)
+        os.makedirs(self.dir, exist_ok=True)
+        if tracing.current() is not None:
+            with _job_dirs_lock:
+                _job_dirs.setdefault(key, set()).add(self.dir)
+        self.driver = None
+        self._ws = None
+        self._reader: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._begun = threading.Event()
+        self._done = threading.Event()
+        self._downloads: Dict[str, Dict[str, Any]] = {}  # guid -> {name, state, path}
+        self._result: Optional[str] = None
+        self._existing: set = set()  # files already in the directory at watch()
+        self._next_id = 0
+
+    def begin(self):
+        """Mark the files present now; discard() only removes files added after this."""
+        os.makedirs(self.dir, exist_ok=True)
+        self._existing = set(os.listdir(self.dir))
+
+    # ── Browser download watch ────────────────────────────────────────
+
+    def watch(self, driver):
+        """Send this browser's downloads to the job directory and start listening for them."""
+        self.close()
+        self.driver = driver
+        self._begun.clear()
+        self._done.clear()
+        self._result = None
+        self._downloads = {}
+        self.begin()
+        params = {"behavior": "allowAndName", "downloadPath": self.dir, "eventsEnabled": True}
+        try:
+            self._ws = websocket.create_connection(self._browser_ws_url(), timeout=10, suppress_origin=True)
+            self._send("Browser.setDownloadBehavior", params)
+            self._ws.settimeout(None)
+            self._reader = threading.Thread(target=self._read_events, name=f"downloads-{self.tag}", daemon=True)
+            self._reader.start()
+        except Exception as e:
+            print(f"[{self.tag} downloads] DevTools socket unavailable ({e}) - watching the job folder")
+            self._close_ws()
+            # "allow" keeps the portal's file name - there are no events to rename by
+            driver.execute_cdp_cmd("Browser.setDownloadBehavior", {"behavior": "allow", "downloadPath": self.dir})
+
+    def _browser_ws_url(self) -> str:
+        address = self.driver.capabilities.get("goog:chromeOptions", {}).get("debuggerAddress")
+        if not address:
+            raise RuntimeError("no debuggerAddress")
+        return requests.get(f"http://{address}/json/version", timeout=2).json()["webSocketDebuggerUrl"]
+
+    def _send(self, method: str, params: dict) -> dict:
+        """Send a command on the browser socket and wait for its reply (before the reader starts)."""
+        self._next_id += 1
+        self._ws.send(json.dumps({"id": self._next_id, "method": method, "params": params}))
+        while True:
+            message = json.loads(self._ws.recv())
+            if message.get("id") == self._next_id:
+                if "error" in message:
+                    raise RuntimeError(message["error"].get("message", message["error"]))
+                return message.get("result", {})
+
+    def _read_events(self):
+        ws = self._ws
+        while True:
+            try:
+                message = json.loads(ws.recv())
+            except Exception:
+                self._done.set()  # socket closed - release any waiter
+                return
+            method = message.get("method")
+            params = message.get("params", {})
+            if method == "Browser.downloadWillBegin":
+                with self._lock:
+                    self._downloads[params.get("guid")] = {"name": params.get("suggestedFilename"), "state": "inProgress"}
+                self._begun.set()
+                print(f"[{self.tag} downloads] Started: {params.get('suggestedFilename')}")
+            elif method == "Browser.downloadProgress" and params.get("state") in ("completed", "canceled"):
+                self._finished(params.get("guid"), params.get("state"))
+
+    def _finished(self, guid: str, state: str):
+        with self._lock:
+            entry = self._downloads.setdefault(guid, {"name": None})
+            entry["state"] = state
+            if state != "completed":
+                print(f"[{self.tag} downloads] Canceled: {entry['name']}")
+                return
+            src = os.path.join(self.dir, guid)
+            dst = os.path.join(self.dir, _safe_name(entry["name"] or guid))
+            try:
+                os.replace(src, dst)
+            except OSError:
+                dst = src
+            entry["path"] = dst
+            if self._result is None:
+                self._result = dst
+        print(f"[{self.tag} downloads] Completed: {os.path.basename(dst)}")
+        self._done.set()
+
+    def started(self) -> bool:
+        """Has a download begun since watch()? (Non-blocking.)"""
+        if self._ws is None:
+            return bool(set(os.listdir(self.dir)) - self._existing)
+        return self._begun.is_set()
+
+    def wait(self, timeout: float) -> Optional[str]:
+        """Path of the first completed download, or None after `timeout` seconds."""
+        with tracing.span("download_wait", browser=self.tag):
+            if self._ws is not None:
+                self._done.wait(timeout)
+                return self._result
+            # No event stream: check the job folder (only this job's new files)
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                names = set(os.listdir(self.dir)) - self._existing
+                files = [n for n in names if not n.endswith((".crdownload", ".tmp"))]
+                if files and len(files) == len(names):
+                    return os.path.join(self.dir, sorted(files)[0])
+                time.sleep(FALLBACK_POLL_SECONDS)
+            return None
+
+    def _close_ws(self):
+        ws, self._ws = self._ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def close(self):
+        """Stop watching; the browser falls back to its profile's download directory."""
+        if self.driver is None:
+            return
+        if self._ws is not None:
+            # The behavior set on this socket ends with its DevTools session
+            self._close_ws()
+        else:
+            try:
+                self.driver.execute_cdp_cmd("Browser.setDownloadBehavior", {"behavior": "default"})
+            except Exception:
+                pass
+        self.driver = None
+
+    # ── Cleanup ──────────────────────────────────────────────────────
+
+    def discard(self):
+        """
+        Error path: remove what this job wrote since begin() / watch(),
+        including PDFs still queued for rendering. Other
+        jobs' files are never touched, and earlier patients of a batch keep
+        their PDFs; the directory stays for the next patient (finish_job()).
+        """
+        self.close()
+        try:
+            added = set(os.listdir(self.dir)) - self._existing
+            # Snapshots queued for the render pool since begin() (<pdf>.mhtml)
+            for name in added:
+                if name.endswith(".mhtml"):
+                    pdf_render.forget(os.path.join(self.dir, name[:-len(".mhtml")]))
+            for name in added:
+                item = os.path.join(self.dir, name)
+                try:
+                    if os.path.isfile(item) or os.path.islink(item):
+                        os.remove(item)
+                        print(f"[cleanup] removed: {item}")
+                except Exception as rm_err:
+                    print(f"[cleanup] failed to remove {item}: {rm_err}")
+        except FileNotFoundError:
+            pass
+        except Exception as cleanup_exc:
+            print(f"[cleanup] unexpected error while cleaning {self.dir}: {cleanup_exc}")
+
+
+def finish_job():
+    """
+    End of the running job: remove its download directories that are empty.
+    Directories holding results are left for the backend, which deletes them
+    once it has stored the files.
+    """
+    span = tracing.current()
+    if span is None:
+        return
+    with _job_dirs_lock:
+        dirs = _job_dirs.pop(span.trace_id, set())
+    for path in dirs:
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass  # not empty, or already gone
@@ -0,0 +1,192 @@
+"""
+Push channel for job / session status, instead of polling the status endpoints.
+
+Every status / message / result write goes through job_store (the helpers'
+SessionView included), so job_store notifies this module and each change is
+pushed as a snapshot - the same shape as GET /jobs/{id}:
+
+- SSE:       GET /jobs/{job_id}/events        (text/event-stream)
+- WebSocket: /jobs/{job_id}/ws                 (one JSON message per event)
+- Webhook:   submit with an `X-Callback-Url` header; the agent POSTs
+             {"event": ..., **snapshot} to it on every status transition and
+             once more when the job is done (result included).
+
+Events:
+    status  - a status / message / result change while the job runs
+    done    - the job's worker finished; carries the final snapshot, then
+              the stream ends
+
+Status transitions: queued -> running -> (waiting_for_otp -> otp_submitted ->) completed / error
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
+
+import requests
+
+import job_store
+
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("JOB_WEBHOOK_TIMEOUT_SECONDS", "5"))
+WEBHOOK_RETRIES = int(os.getenv("JOB_WEBHOOK_RETRIES", "3"))
+# Comment line sent on idle SSE streams so proxies don't drop the connection
+KEEPALIVE_SECONDS = 15
+
+_lock = threading.Lock()
+# job_id -> [(loop, queue)] of connected SSE / WebSocket clients
+_subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+# job_id -> webhook URL
+_callbacks: Dict[str, str] = {}
+# job_id -> (status, message, result) last pushed, to skip no-op writes
+_last: Dict[str, Tuple] = {}
+# Jobs whose worker is still running (a final status may still be followed by its result)
+_active: set = set()
+
+# One sender thread: webhook calls for a job arrive in the order they happened
+_webhook_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-webhook")
+
+
+def register_callback(job_id: str, url: Optional[str]):
+    """Send this job's events to `url` (no-op for an empty URL)."""
+    if url:
+        with _lock:
+            _callbacks[job_id] = url
+
+
+def _snapshot(job_id: str) -> Optional[Dict[str, Any]]:
+    job = job_store.get_job(job_id)
+    if job is None:
+        return None
+    view = job_store.job_public_view(job)
+    view["session_id"] = view["job_id"]
+    return view
+
+
+def _push(job_id: str, event: str, snapshot: Dict[str, Any]):
+    with _lock:
+        targets = list(_subscribers.get(job_id, ()))
+    for loop, queue in targets:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (event, snapshot))
+        except RuntimeError:
+            # Subscriber's loop already closed
+            pass
+
+
+def _send_webhook(url: str, event: str, snapshot: Dict[str, Any]):
+    body = {"event": event, **snapshot}
+    for attempt in range(1, WEBHOOK_RETRIES + 1):
+        try:
+            r = requests.post(
+                url,
+                data=json.dumps(body, default=str),
+                headers={"Content-Type": "application/json", "X-Job-Id": snapshot["job_id"]},
+                timeout=WEBHOOK_TIMEOUT_SECONDS,
+            )
+            if r.status_code < 500:
+                return
+            print(f"[job_events] Webhook {url} answered {r.status_code} (attempt {attempt})")
+        except requests.RequestException as e:
+            print(f"[job_events] Webhook {url} failed (attempt {attempt}): {e}")
+        time.sleep(attempt)
+
+
+def _on_job_update(job_id: str, fields: Dict[str, Any]):
+    """job_store listener: push the new state to subscribers / the webhook."""
+    status = fields.get("status")
+    with _lock:
+        if status is not None and status not in job_store.FINAL_STATUSES:
+            _active.add(job_id)
+        url = _callbacks.get(job_id)
+        if not url and not _subscribers.get(job_id):
+            return
+
+    snapshot = _snapshot(job_id)
+    if snapshot is None:
+        return
+    key = (snapshot["status"], snapshot["message"], json.dumps(snapshot["result"], default=str))
+    with _lock:
+        previous = _last.get(job_id)
+        if previous == key:
+            return
+        _last[job_id] = key
+
+    _push(job_id, "status", snapshot)
+    if url and (previous is None or previous[0] != snapshot["status"]):
+        _webhook_pool.submit(_send_webhook, url, "status", snapshot)
+
+
+job_store.add_listener(_on_job_update)
+
+
+def close(job_id: str):
+    """The job's worker is done: send the final snapshot and end its streams."""
+    with _lock:
+        _active.discard(job_id)
+        _last.pop(job_id, None)
+        url = _callbacks.pop(job_id, None)
+        listening = bool(_subscribers.get(job_id))
+    if not url and not listening:
+        return
+
+    snapshot = _snapshot(job_id)
+    if snapshot is None:
+        return
+    _push(job_id, "done", snapshot)
+    if url:
+        _webhook_pool.submit(_send_webhook, url, "done", snapshot)
+
+
+def is_active(job_id: str) -> bool:
+    with _lock:
+        return job_id in _active
+
+
+async def subscribe(job_id: str):
+    """
+    Async iterator of (event, snapshot) for one job. Starts with the current
+    state and stops after "done". Returns nothing if the job doesn't exist.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    entry = (loop, queue)
+    # Subscribe before reading the snapshot so no transition falls in between
+    with _lock:
+        _subscribers.setdefault(job_id, []).append(entry)
+    try:
+        snapshot = _snapshot(job_id)
+        if snapshot is None:
+            return
+        if snapshot["status"] in job_store.FINAL_STATUSES and not is_active(job_id):
+            yield "done", snapshot
+            return
+        yield "status", snapshot
+
+        while True:
+            try:
+                event, snapshot = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield "keepalive", None
+                continue
+            yield event, snapshot
+            if event == "done":
+                return
+    finally:
+        with _lock:
+            subs = _subscribers.get(job_id, [])
+            if entry in subs:
+                subs.remove(entry)
+            if not subs:
+                _subscribers.pop(job_id, None)
+
+
+async def sse_stream(job_id: str):
+    """subscribe() rendered as Server-Sent Events."""
+    async for event, snapshot in subscribe(job_id):
+        if event == "keepalive":
+            yield ": keepalive\n\n"
+            continue
+        yield f"event: {event}\ndata: {json.dumps(snapshot, default=str)}\n\n"
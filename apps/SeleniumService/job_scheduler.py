@@ -0,0 +1,332 @@
+"""
+Per-payer execution lanes for the Selenium agent.
+
+Every portal gets its own lane with an independent concurrency limit, so a slow
+DeltaIns run no longer blocks an unrelated MassHealth or DDMA job.
+
+Lane sizes come from env vars (LANE_<NAME>_CONCURRENCY, default 1). The DDMA,
+DentaQuest, United SCO and DeltaIns lanes drive a single persistent browser
+through their browser manager, so they should stay at 1; MassHealth borrows
+from a pool of browsers (massdhp_browser_manager) and can be raised up to
+MASSDHP_POOL_SIZE.
+
+On top of the lanes, AGENT_MAX_ACTIVE_JOBS caps how many browsers are actively
+driven at once across all payers (CPU / memory bound). A session that is only
+waiting for a human to type an OTP parks: it keeps its lane (the payer's
+browser stays logged-in and untouched) but hands its execution slot to other
+payers' jobs, and gets it back ahead of fresh jobs once the OTP arrives.
+
+Both queues (lane and execution slot) are served by priority class, not
+FIFO: every job is "interactive" (a chairside check someone is waiting on),
+"normal" or "bulk" (batches, background screenshots). A waiting job gains
+one class per PRIORITY_AGING_SECONDS it has waited, so bulk work still gets
+through behind a steady stream of interactive checks. Resumed OTP sessions
+rank above every class.
+
+A job that is done with its browser but not yet finished (waiting for a
+deferred PDF render, see pdf_render.py) releases both slots early, so the
+payer's next job starts while it waits.
+
+Selenium calls are blocking (time.sleep, long WebDriverWaits), so each lane
+also owns a thread pool of the same size; workers run there via run_blocking()
+and the event loop stays free to serve /status, OTP submits and status polls.
+"""
+import os
+import time
+import asyncio
+import itertools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Any, List, Tuple
+
+import agent_metrics
+import tracing
+
+# Priority classes for the lane / execution slot queues (lower runs first)
+PRIORITY_CLASSES = {"interactive": 1, "normal": 2, "bulk": 3}
+DEFAULT_PRIORITY = "normal"
+PRIORITY_RESUME = 0   # session coming back from waiting_for_otp (above every class)
+
+# A waiting job moves up one class per this many seconds (0 = no aging)
+PRIORITY_AGING_SECONDS = float(os.getenv("PRIORITY_AGING_SECONDS", "120"))
+
+
+def _lane_size(name: str, default: int = 1) -> int:
+    try:
+        return max(1, int(os.getenv(f"LANE_{name.upper()}_CONCURRENCY", str(default))))
+    except ValueError:
+        return default
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "since", "label", "future")
+
+    def __init__(self, priority: int, seq: int, label: str, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.since = time.monotonic()
+        self.label = label
+        self.future = future
+
+    def rank(self, now: float) -> Tuple[float, int]:
+        priority = self.priority
+        if PRIORITY_AGING_SECONDS > 0 and priority > PRIORITY_CLASSES["interactive"]:
+            aged = (now - self.since) / PRIORITY_AGING_SECONDS
+            priority = max(PRIORITY_CLASSES["interactive"], priority - aged)
+        return priority, self.seq
+
+
+class SlotPool:
+    """
+    Counting semaphore whose waiters are served by priority (then FIFO), with
+    aging: the effective priority of a waiter improves the longer it waits,
+    so a bulk job is never starved by newer interactive ones.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.in_use = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for w in self._waiters if not w.future.done())
+
+    def waiting_by_class(self) -> Dict[str, int]:
+        counts = dict.fromkeys(PRIORITY_CLASSES, 0)
+        for w in self._waiters:
+            if not w.future.done() and w.label in counts:
+                counts[w.label] += 1
+        return counts
+
+    async def acquire(self, priority: str | int = DEFAULT_PRIORITY):
+        if self.in_use < self.size and not self.waiting:
+            self.in_use += 1
+            return
+
+        label = priority if isinstance(priority, str) else "resume"
+        rank = PRIORITY_CLASSES.get(priority, PRIORITY_CLASSES[DEFAULT_PRIORITY]) if isinstance(priority, str) else priority
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(_Waiter(rank, next(self._seq), label, fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # Slot was handed to us just as we got cancelled - give it back
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+
+    def _wake(self):
+        self._waiters = [w for w in self._waiters if not w.future.done()]
+        now = time.monotonic()
+        while self._waiters and self.in_use < self.size:
+            # Few waiters per pool - a scan keeps aging exact without re-heapifying
+            best = min(self._waiters, key=lambda w: w.rank(now))
+            self._waiters.remove(best)
+            self.in_use += 1
+            best.future.set_result(True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"size": self.size, "in_use": self.in_use, "waiting": self.waiting}
+
+
+# Shared across all lanes: how many browsers may be actively driven at once
+execution_slots = SlotPool(max(1, int(os.getenv("AGENT_MAX_ACTIVE_JOBS", "2"))))
+
+
+class JobSlot:
+    """
+    Handle for one scheduled job: owns a lane slot for its whole lifetime and an
+    execution slot except while parked (waiting_for_otp).
+    """
+
+    def __init__(self, lane: "Lane"):
+        self.lane = lane
+        self.parked = False
+        self.released = False
+
+    def park(self):
+        """Release the execution slot while waiting on a human (OTP). Lane stays held."""
+        if self.parked:
+            return
+        self.parked = True
+        self.lane.active -= 1
+        self.lane.parked += 1
+        execution_slots.release()
+        print(f"[scheduler] {self.lane.name} job parked - execution slot released")
+
+    async def resume(self):
+        """Re-acquire an execution slot, ahead of freshly queued jobs."""
+        if not self.parked:
+            return
+        await execution_slots.acquire(PRIORITY_RESUME)
+        self.parked = False
+        self.lane.parked -= 1
+        self.lane.active += 1
+        print(f"[scheduler] {self.lane.name} job resumed")
+
+    def release(self):
+        """
+        Done with the browser: hand the lane and execution slots to the next job
+        now. The rest of this job (e.g. waiting for a deferred PDF) needs neither.
+        """
+        if self.released:
+            return
+        self.released = True
+        if self.parked:
+            self.parked = False
+            self.lane.parked -= 1
+        else:
+            self.lane.active -= 1
+            execution_slots.release()
+        self.lane._slots.release()
+
+    async def run_blocking(self, fn: Callable, *args, **kwargs):
+        return await self.lane.run_blocking(fn, *args, **kwargs)
+
+
+class Lane:
+    """
+    One independently sized queue of Selenium jobs (one per payer / browser manager).
+    Tracks its own active, queued & parked counters for /status.
+    """
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self.active = 0
+        self.queued = 0
+        self.queued_by_class = dict.fromkeys(PRIORITY_CLASSES, 0)
+        self.parked = 0
+        self._slots = SlotPool(size)
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"lane-{name}")
+
+    @asynccontextmanager
+    async def slot(self, priority: str = DEFAULT_PRIORITY):
+        """
+        Wait for a free slot in this lane plus a shared execution slot, and hold
+        them for the duration of the block. Both queues are served by
+        `priority` class (see PRIORITY_CLASSES). Yields a JobSlot (see park/resume).
+        """
+        if priority not in PRIORITY_CLASSES:
+            priority = DEFAULT_PRIORITY
+        self.queued += 1
+        self.queued_by_class[priority] += 1
+        queued_at = time.perf_counter()
+        try:
+            with tracing.span("queue", lane=self.name, priority=priority):
+                await self._slots.acquire(priority)
+                try:
+                    await execution_slots.acquire(priority)
+                except BaseException:
+                    self._slots.release()
+                    raise
+        finally:
+            self.queued -= 1
+            self.queued_by_class[priority] -= 1
+
+        agent_metrics.QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued_at, lane=self.name, priority=priority)
+        job = JobSlot(self)
+        self.active += 1
+        try:
+            yield job
+        finally:
+            job.release()
+
+    async def run_blocking(self, fn: Callable, *args, **kwargs):
+        """
+        Run a blocking Selenium call on this lane's thread pool and await its result.
+        The call's duration is recorded per step (the function name, e.g. "step1"),
+        and traced as a span of the current job.
+        """
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        step = getattr(fn, "__name__", "call")
+
+        def timed_call():
+            started = time.perf_counter()
+            try:
+                with tracing.span(step, lane=self.name):
+                    return fn(*args, **kwargs)
+            finally:
+                agent_metrics.STEP_SECONDS.observe(time.perf_counter() - started, lane=self.name, step=step)
+
+        return await loop.run_in_executor(self._executor, lambda: ctx.run(timed_call))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "active_jobs": self.active,
+            "queued_jobs": self.queued,
+            "queued_by_priority": dict(self.queued_by_class),
+            "waiting_for_otp": self.parked,
+        }
+
+
+# One lane per payer / browser manager
+LANES: Dict[str, Lane] = {
+    name: Lane(name, _lane_size(name))
+    for name in ("massdhp", "ddma", "dentaquest", "unitedsco", "deltains")
+}
+
+
+def get_lane(name: str) -> Lane:
+    return LANES[name]
+
+
+async def run_blocking(lane: str, fn: Callable, *args, **kwargs):
+    """Shortcut for get_lane(lane).run_blocking(...), used by the helpers modules."""
+    return await LANES[lane].run_blocking(fn, *args, **kwargs)
+
+
+# ── Event loop lag ───────────────────────────────────────────────────
+
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))  # seconds
+
+loop_lag: Dict[str, float] = {
+    "last_ms": 0.0,
+    "max_ms": 0.0,
+    "avg_ms": 0.0,
+}
+
+
+async def monitor_event_loop_lag():
+    """
+    Sleep for a fixed interval and record how late the loop wakes us up.
+    Any blocking call on the loop shows up directly as lag.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag_ms = max(0.0, (time.perf_counter() - start - LOOP_LAG_INTERVAL) * 1000)
+        loop_lag["last_ms"] = round(lag_ms, 2)
+        loop_lag["max_ms"] = round(max(loop_lag["max_ms"], lag_ms), 2)
+        # Exponential moving average so a single spike doesn't dominate
+        loop_lag["avg_ms"] = round(loop_lag["avg_ms"] * 0.9 + lag_ms * 0.1, 2)
+
+
+def lanes_status() -> Dict[str, Any]:
+    """Aggregate counters plus the per-lane breakdown, as served by /status."""
+    lanes = {name: lane.snapshot() for name, lane in LANES.items()}
+    active = sum(l["active_jobs"] for l in lanes.values())
+    queued = sum(l["queued_jobs"] for l in lanes.values())
+    parked = sum(l["waiting_for_otp"] for l in lanes.values())
+    queued_by_priority = {
+        name: sum(l["queued_by_priority"][name] for l in lanes.values()) for name in PRIORITY_CLASSES
+    }
+    return {
+        "active_jobs": active,
+        "queued_jobs": queued,
+        "queued_by_priority": queued_by_priority,
+        "waiting_for_otp": parked,
+        "status": "busy" if active > 0 or queued > 0 or parked > 0 else "idle",
+        "lanes": lanes,
+        "execution_slots": {**execution_slots.snapshot(), "waiting_by_priority": execution_slots.waiting_by_class()},
+        "event_loop_lag_ms": dict(loop_lag),
+    }
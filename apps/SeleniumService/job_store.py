@@ -0,0 +1,286 @@
+"""
+Durable job store for the Selenium agent (local SQLite).
+
+Every request the agent accepts becomes a row in the `jobs` table and is
+addressed by its job ID from then on: the MassHealth endpoints return the ID
+immediately and the Backend polls GET /jobs/{id}; the OTP payers use the same
+ID as their session_id.
+
+- Idempotency-Key: a retried submit (Backend axios retries on 502/503/504)
+  returns the existing job instead of queueing the same work twice.
+- Restart safety: queued jobs, and interrupted jobs whose kind is safe to
+  re-run, are picked up again on startup (see agent.py recover_jobs).
+- The helpers' `sessions` dicts are SessionStore views: status / message /
+  result are written through to the job row, while live objects
+  (driver, bot, otp_event, lane slot ...) stay in memory only.
+- Listeners registered with add_listener() see every status / message /
+  result write; job_events.py uses this to push updates to clients.
+
+DB location: JOB_STORE_PATH (default jobs.sqlite3 next to this file).
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Callable, Dict, Any, Optional, Tuple, List
+
+JOB_STORE_PATH = os.getenv(
+    "JOB_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.sqlite3"),
+)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# Lifecycle: queued -> running -> (waiting_for_otp -> otp_submitted ->) completed / error
+FINAL_STATUSES = ("completed", "error")
+
+# Session fields that are mirrored into the job row
+_PERSISTED_FIELDS = ("status", "message", "result")
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+# Called as listener(job_id, fields) after every job row update (see job_events.py)
+_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(JOB_STORE_PATH, check_same_thread=False, isolation_level=None)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id              TEXT PRIMARY KEY,
+                kind            TEXT NOT NULL,
+                lane            TEXT NOT NULL,
+                status          TEXT NOT NULL,
+                payload         TEXT,
+                result          TEXT,
+                message         TEXT,
+                idempotency_key TEXT UNIQUE,
+                callback_url    TEXT,
+                priority        TEXT NOT NULL DEFAULT 'normal',
+                attempts        INTEGER NOT NULL DEFAULT 0,
+                created_at      REAL NOT NULL,
+                updated_at      REAL NOT NULL,
+                started_at      REAL,
+                finished_at     REAL
+            )
+            """
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)")
+        columns = {r["name"] for r in _conn.execute("PRAGMA table_info(jobs)")}
+        if "callback_url" not in columns:
+            _conn.execute("ALTER TABLE jobs ADD COLUMN callback_url TEXT")
+        if "priority" not in columns:
+            _conn.execute("ALTER TABLE jobs ADD COLUMN priority TEXT NOT NULL DEFAULT 'normal'")
+    return _conn
+
+
+def _row_to_job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+    if row is None:
+        return None
+    job = dict(row)
+    for key in ("payload", "result"):
+        if job.get(key):
+            job[key] = json.loads(job[key])
+    return job
+
+
+def create_job(
+    kind: str,
+    lane: str,
+    payload: Any = None,
+    idempotency_key: Optional[str] = None,
+    job_id: Optional[str] = None,
+    callback_url: Optional[str] = None,
+    priority: str = "normal",
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Insert a queued job. Returns (job, created); created is False when a job
+    with the same idempotency key already exists (that job is returned).
+    """
+    now = time.time()
+    job_id = job_id or str(uuid.uuid4())
+    with _lock:
+        db = _db()
+        if idempotency_key:
+            existing = db.execute(
+                "SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone()
+            if existing:
+                return _row_to_job(existing), False
+        db.execute(
+            "INSERT INTO jobs (id, kind, lane, status, payload, idempotency_key, callback_url, priority, created_at, updated_at)"
+            " VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, lane, json.dumps(payload, default=str), idempotency_key, callback_url, priority, now, now),
+        )
+        row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row), True
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        row = _db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row)
+
+
+def add_listener(listener: Callable[[str, Dict[str, Any]], None]):
+    _listeners.append(listener)
+
+
+def _notify(job_id: str, fields: Dict[str, Any]):
+    for listener in _listeners:
+        try:
+            listener(job_id, fields)
+        except Exception as e:
+            print(f"[job_store] Listener failed for {job_id}: {e}")
+
+
+def update_job(job_id: str, **fields):
+    """Update columns of a job row (result is JSON-encoded)."""
+    if not fields:
+        return
+    changed = dict(fields)
+    fields["updated_at"] = time.time()
+    if "result" in fields:
+        fields["result"] = json.dumps(fields["result"], default=str)
+    if fields.get("status") in FINAL_STATUSES:
+        fields.setdefault("finished_at", fields["updated_at"])
+        # Payloads carry portal credentials / claim attachments - drop them once done
+        fields["payload"] = None
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    with _lock:
+        _db().execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+    _notify(job_id, changed)
+
+
+def mark_started(job_id: str):
+    """Job got its lane slot and is about to drive a browser."""
+    now = time.time()
+    with _lock:
+        _db().execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, updated_at = ?"
+            " WHERE id = ?",
+            (now, now, job_id),
+        )
+    _notify(job_id, {"status": "running"})
+
+
+def unfinished_jobs() -> List[Dict[str, Any]]:
+    """Jobs left queued / in flight by a previous agent process, oldest first."""
+    with _lock:
+        rows = _db().execute(
+            "SELECT * FROM jobs WHERE status NOT IN ('completed', 'error') ORDER BY created_at"
+        ).fetchall()
+    return [_row_to_job(r) for r in rows]
+
+
+def purge_finished(older_than: int = JOB_RETENTION_SECONDS) -> int:
+    """Delete finished jobs older than `older_than` seconds. Returns rows removed."""
+    cutoff = time.time() - older_than
+    with _lock:
+        cur = _db().execute(
+            "DELETE FROM jobs WHERE status IN ('completed', 'error') AND updated_at < ?", (cutoff,)
+        )
+    return cur.rowcount
+
+
+def job_public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape returned by GET /jobs/{id} (never exposes the payload)."""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "priority": job.get("priority"),
+        "message": job.get("message"),
+        "result": job.get("result") if job["status"] == "completed" else None,
+        "attempts": job.get("attempts"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+    }
+
+
+# ── Session views ────────────────────────────────────────────────────
+
+class SessionView(dict):
+    """
+    A helper session entry. Behaves like the plain dict it replaces; writes to
+    persisted fields are mirrored into the job row. update() mirrors all its
+    fields in one write, so listeners see e.g. a final status together with
+    its result rather than a completed job with no result yet.
+    """
+
+    def __init__(self, job_id: str, initial: Dict[str, Any]):
+        super().__init__(initial)
+        self.job_id = job_id
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key in _PERSISTED_FIELDS:
+            update_job(self.job_id, **{key: value})
+
+    def update(self, *args, **kwargs):
+        fields = dict(*args, **kwargs)
+        super().update(fields)
+        persisted = {k: v for k, v in fields.items() if k in _PERSISTED_FIELDS}
+        if persisted:
+            update_job(self.job_id, **persisted)
+
+
+class SessionStore:
+    """
+    Replacement for the helpers' in-memory `sessions` dict: live session
+    entries keyed by job ID, backed by the job store.
+    """
+
+    def __init__(self, lane: str):
+        self.lane = lane
+        self._live: Dict[str, SessionView] = {}
+
+    def create(self, initial: Dict[str, Any], job_id: Optional[str] = None) -> str:
+        """Open a live session for job_id (creating the job row if needed)."""
+        if job_id is None or get_job(job_id) is None:
+            job, _ = create_job(f"{self.lane}_eligibility", self.lane, job_id=job_id)
+            job_id = job["id"]
+        self._live[job_id] = SessionView(job_id, initial)
+        return job_id
+
+    def snapshot(self, sid: str) -> Optional[Dict[str, Any]]:
+        """Read-only state for a session that is no longer live (finished / before restart)."""
+        job = get_job(sid)
+        if job is None or job["lane"] != self.lane:
+            return None
+        return {
+            "status": job["status"],
+            "message": job.get("message"),
+            "created_at": job.get("created_at"),
+            "last_activity": job.get("updated_at"),
+            "result": job.get("result"),
+        }
+
+    # dict-style access used throughout the helpers
+    def get(self, sid: str, default=None):
+        return self._live.get(sid, default)
+
+    def pop(self, sid: str, default=None):
+        return self._live.pop(sid, default)
+
+    def __getitem__(self, sid: str) -> SessionView:
+        return self._live[sid]
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._live
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def items(self):
+        return self._live.items()
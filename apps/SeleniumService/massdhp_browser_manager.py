@@ -0,0 +1,263 @@
+"""
+Browser pool for MassHealth (providers.massdhp.com).
+
+Unlike the OTP portals there is no device trust to preserve, so instead of a
+single persistent profile this keeps a small warm pool of logged-in Chrome
+sessions that all four MassHealth workflows (claim submit, eligibility,
+claim status, pre-auth) borrow and give back.
+
+- Sessions are keyed by the portal username, so different credentials never
+  share a login.
+- Before reuse the session goes back to the page it landed on after login; if
+  the portal shows the login form again (session expired) it logs in again.
+- Sessions idle longer than MASSDHP_SESSION_IDLE_TIMEOUT are closed by a
+  background reaper; at most MASSDHP_POOL_SIZE browsers are kept.
+"""
+import os
+import time
+import hashlib
+import threading
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from chromedriver_service import create_chrome_driver
+
+# Ensure DISPLAY is set for Chrome to work (needed when running from SSH/background)
+if not os.environ.get("DISPLAY"):
+    os.environ["DISPLAY"] = ":0"
+
+MASSDHP_POOL_SIZE = int(os.getenv("MASSDHP_POOL_SIZE", "2"))
+MASSDHP_SESSION_IDLE_TIMEOUT = int(os.getenv("MASSDHP_SESSION_IDLE_TIMEOUT", "900"))  # seconds
+
+_LOGIN_FORM_XPATH = "//input[@name='Pass' and @type='password']"
+
+
+class PooledSession:
+    """One Chrome instance in the pool, logged in as a single portal user."""
+
+    def __init__(self, driver, user_key: str):
+        self.driver = driver
+        self.user_key = user_key
+        self.home_url = None      # page reached right after login; None = not logged in
+        self.in_use = False
+        self.created_at = time.time()
+        self.last_used = time.time()
+        self.uses = 0
+
+
+class MassDHPBrowserManager:
+    """
+    Singleton that manages the pool of MassHealth browser sessions.
+    - acquire() / release() hand sessions to workers
+    - ensure_logged_in() reuses a live login or logs in again on expiry
+    - a daemon thread closes sessions that sit idle too long
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._sessions = []
+                cls._instance.download_dir = os.path.abspath("seleniumDownloads")
+                os.makedirs(cls._instance.download_dir, exist_ok=True)
+                threading.Thread(
+                    target=cls._instance._reap_idle_sessions, name="massdhp-pool-reaper", daemon=True
+                ).start()
+        return cls._instance
+
+    def _user_key(self, username: str) -> str:
+        return hashlib.sha256((username or "").encode()).hexdigest()[:16]
+
+    def acquire(self, username: str, headless=False) -> PooledSession:
+        """
+        Borrow an idle session for this user, or start a new browser. The pool
+        lock is only held to pick or reserve a session: the liveness check and
+        the Chrome launch happen outside it, so snapshot() (/status) and the
+        other workers never wait on a browser.
+        """
+        key = self._user_key(username)
+        while True:
+            with self._lock:
+                session = next(
+                    (s for s in self._sessions if not s.in_use and s.user_key == key), None
+                )
+                if session:
+                    session.in_use = True
+            if session is None:
+                break
+            if self._is_alive(session):
+                session.uses += 1
+                print(f"[MassDHP BrowserManager] Reusing warm session (use #{session.uses})")
+                return session
+            with self._lock:
+                self._discard(session)
+            self._quit(session)
+
+        # Reserve a pool slot (driver None until launched), making room by
+        # dropping the least recently used idle session
+        evicted = None
+        with self._lock:
+            idle = [s for s in self._sessions if not s.in_use]
+            if len(self._sessions) >= MASSDHP_POOL_SIZE and idle:
+                evicted = min(idle, key=lambda s: s.last_used)
+                self._discard(evicted)
+            session = PooledSession(None, key)
+            session.in_use = True
+            session.uses = 1
+            self._sessions.append(session)
+        if evicted:
+            self._quit(evicted)
+
+        try:
+            session.driver = self._create_driver(headless)
+        except Exception:
+            with self._lock:
+                self._discard(session)
+            raise
+        with self._lock:
+            closed = session not in self._sessions  # quit_all() ran during the launch
+            count = len(self._sessions)
+        if closed:
+            self._quit(session)
+            raise RuntimeError("MassDHP browser pool was closed while starting a session")
+        print(f"[MassDHP BrowserManager] Started new session ({count} in pool)")
+        return session
+
+    def release(self, session: PooledSession | None, healthy: bool = True):
+        """Give a session back to the pool (or close it if the run left it broken)."""
+        if session is None:
+            return
+        with self._lock:
+            session.in_use = False
+            session.last_used = time.time()
+            close = not healthy or len(self._sessions) > MASSDHP_POOL_SIZE
+            if close:
+                self._discard(session)
+        if close:
+            self._quit(session)
+
+    def ensure_logged_in(self, session: PooledSession, login_url: str, login_fn) -> str:
+        """
+        Make sure the session is logged in and on the portal landing page.
+        Returns "ALREADY_LOGGED_IN" when a warm login was reused, otherwise the
+        result of login_fn() ("Success" / "ERROR:...").
+        """
+        driver = session.driver
+
+        if session.home_url:
+            try:
+                driver.get(session.home_url)
+                # Landing page loaded (or the portal bounced us to its login form)
+                WebDriverWait(driver, 10).until(
+                    lambda d: self._on_login_page(d) or d.execute_script("return document.readyState") == "complete"
+                )
+                if not self._on_login_page(driver):
+                    return "ALREADY_LOGGED_IN"
+                print("[MassDHP BrowserManager] Portal session expired - logging in again")
+            except Exception as e:
+                print(f"[MassDHP BrowserManager] Could not reuse session: {e}")
+            session.home_url = None
+
+        driver.get(login_url)
+        try:
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located((By.XPATH, _LOGIN_FORM_XPATH))
+            )
+        except TimeoutException:
+            return "ERROR:LOGIN PAGE DID NOT LOAD"
+        result = login_fn()
+        if isinstance(result, str) and not result.startswith("ERROR"):
+            try:
+                WebDriverWait(driver, 15).until(lambda d: not self._on_login_page(d))
+                session.home_url = driver.current_url
+            except Exception:
+                print("[MassDHP BrowserManager] Still on login page after login - not caching session")
+        return result
+
+    def _on_login_page(self, driver) -> bool:
+        return bool(driver.find_elements(By.XPATH, _LOGIN_FORM_XPATH))
+
+    def _is_alive(self, session: PooledSession) -> bool:
+        try:
+            _ = session.driver.current_url
+            return True
+        except Exception as e:
+            print(f"[MassDHP BrowserManager] Session not alive: {e}")
+            return False
+
+    def _discard(self, session: PooledSession):
+        """Drop a session from the pool (caller holds the lock; _quit() it after releasing)."""
+        if session in self._sessions:
+            self._sessions.remove(session)
+
+    def _quit(self, session: PooledSession):
+        """Close a discarded session's browser."""
+        try:
+            if session.driver:
+                session.driver.quit()
+        except Exception:
+            pass
+
+    def _create_driver(self, headless=False):
+        options = webdriver.ChromeOptions()
+        if headless:
+            options.add_argument("--headless")
+
+        # PDF download preferences (eligibility Tx Report, claim status)
+        prefs = {
+            "download.default_directory": self.download_dir,
+            "plugins.always_open_pdf_externally": True,
+            "download.prompt_for_download": False,
+            "download.directory_upgrade": True
+        }
+        options.add_experimental_option("prefs", prefs)
+
+        driver = create_chrome_driver(options, label="massdhp")
+        driver.maximize_window()
+        return driver
+
+    def _reap_idle_sessions(self):
+        while True:
+            time.sleep(30)
+            now = time.time()
+            with self._lock:
+                expired = [
+                    s for s in self._sessions
+                    if not s.in_use and now - s.last_used > MASSDHP_SESSION_IDLE_TIMEOUT
+                ]
+                for session in expired:
+                    self._discard(session)
+            for session in expired:
+                print("[MassDHP BrowserManager] Closing idle session")
+                self._quit(session)
+
+    def snapshot(self):
+        """Pool state for /status (sessions still launching count as in use)."""
+        with self._lock:
+            return {
+                "size": MASSDHP_POOL_SIZE,
+                "sessions": len(self._sessions),
+                "in_use": sum(1 for s in self._sessions if s.in_use),
+                "logged_in": sum(1 for s in self._sessions if s.home_url),
+            }
+
+    def quit_all(self):
+        """Close every pooled browser (agent shutdown)."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            self._quit(session)
+
+
+# Singleton accessor
+_manager = None
+
+def get_browser_manager():
+    global _manager
+    if _manager is None:
+        _manager = MassDHPBrowserManager()
+    return _manager
@@ -0,0 +1,301 @@
+"""
+Event-driven OTP wait for the OTP payers (DDMA, DentaQuest, United SCO, DeltaIns).
+
+The runner used to wake every second, check s["otp_value"], read the URL and
+run a 5 s WebDriverWait. Now it waits on two things at once and reacts to
+whichever comes first:
+
+- the session's otp_event, set by submit_otp() when the app sends a code:
+  the code is typed right away;
+- a watcher running inside the browser page, which resolves as soon as the
+  page shows the logged-in state (URL + element), the OTP form disappears, or
+  the page navigates. It is one Runtime.evaluate over Chrome's DevTools
+  socket, so it sends no WebDriver commands while the user reads their phone
+  and can be abandoned instantly when an OTP arrives. If the DevTools socket
+  is not reachable, it falls back to execute_async_script in short slices.
+
+Each payer describes its pages with LoginSignals; typing the code and
+recovering from a vanished OTP form stay in the payer's helpers module.
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+from typing import Callable, Dict, Any, Optional, Sequence
+
+import requests
+import websocket
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from job_scheduler import run_blocking
+import agent_metrics
+import tracing
+
+# Longest single in-page watch; the runner re-arms it (and refreshes last_activity)
+WATCH_SLICE_SECONDS = float(os.getenv("OTP_WATCH_SLICE_SECONDS", "30"))
+# Slice length when the watcher has to go through WebDriver (blocks other commands)
+FALLBACK_SLICE_SECONDS = 1.0
+# The OTP form must stay gone this long before "otp_gone" fires (verification spinners)
+OTP_GONE_GRACE_MS = 3000
+
+# Resolves with "logged_in", "otp_gone", "navigated" or "timeout"
+_WATCH_JS = """
+(function (sig, timeoutMs) {
+    function x(path) {
+        if (!path) return null;
+        try { return document.evaluate(path, document, null, 9, null).singleNodeValue; }
+        catch (e) { return null; }
+    }
+    function any(url, parts) {
+        for (var i = 0; i < parts.length; i++) if (url.indexOf(parts[i]) >= 0) return true;
+        return false;
+    }
+    return new Promise(function (resolve) {
+        var goneSince = null, observer = null, interval = null, timer = null;
+        function finish(state) {
+            clearInterval(interval);
+            clearTimeout(timer);
+            if (observer) observer.disconnect();
+            resolve(state);
+        }
+        function check() {
+            var url = location.href.toLowerCase();
+            if (any(url, sig.logged_in_url) && !any(url, sig.logged_out_url)
+                    && (!sig.logged_in_xpath || x(sig.logged_in_xpath))) {
+                return finish("logged_in");
+            }
+            if (sig.otp_xpath && any(url, sig.otp_gone_url) && !x(sig.otp_xpath)) {
+                goneSince = goneSince || Date.now();
+                if (Date.now() - goneSince >= sig.otp_gone_grace_ms) return finish("otp_gone");
+            } else {
+                goneSince = null;
+            }
+        }
+        observer = new MutationObserver(check);
+        observer.observe(document, {subtree: true, childList: true, attributes: true});
+        interval = setInterval(check, 250);
+        timer = setTimeout(function () { finish("timeout"); }, timeoutMs);
+        window.addEventListener("pagehide", function () { finish("navigated"); });
+        check();
+    });
+})
+"""
+
+
+class LoginSignals:
+    """
+    What a payer's pages look like while waiting for OTP.
+      logged_in_url   - URL fragments of a logged-in page (any of)
+      logged_out_url  - fragments that rule a URL out (login / SSO pages)
+      logged_in_xpath - element that must be present to count as logged in
+      otp_xpath       - the OTP input; if it is gone while the URL still
+                        matches otp_gone_url, the runner's on_otp_gone runs
+    """
+
+    def __init__(
+        self,
+        logged_in_url: Sequence[str],
+        logged_out_url: Sequence[str] = (),
+        logged_in_xpath: Optional[str] = None,
+        otp_xpath: Optional[str] = None,
+        otp_gone_url: Sequence[str] = (),
+    ):
+        self.logged_in_url = list(logged_in_url)
+        self.logged_out_url = list(logged_out_url)
+        self.logged_in_xpath = logged_in_xpath
+        self.otp_xpath = otp_xpath
+        self.otp_gone_url = list(otp_gone_url)
+
+    def as_js(self) -> Dict[str, Any]:
+        return {
+            "logged_in_url": self.logged_in_url,
+            "logged_out_url": self.logged_out_url,
+            "logged_in_xpath": self.logged_in_xpath,
+            "otp_xpath": self.otp_xpath,
+            "otp_gone_url": self.otp_gone_url,
+            "otp_gone_grace_ms": OTP_GONE_GRACE_MS,
+        }
+
+
+class BrowserWatcher:
+    """Runs _WATCH_JS in the driver's current tab; interrupt() abandons a running watch."""
+
+    def __init__(self, driver, signals: LoginSignals, tag: str):
+        self.driver = driver
+        self.signals = signals
+        self.tag = tag
+        self._ws_url: Optional[str] = None
+        self._ws = None
+        self._cdp = True
+        self._interrupted = threading.Event()
+        self._lock = threading.Lock()
+
+    def arm(self):
+        """Clear a previous interrupt; called before each wait is scheduled."""
+        self._interrupted.clear()
+
+    def interrupt(self):
+        self._interrupted.set()
+        with self._lock:
+            ws = self._ws
+        if ws is not None:
+            try:
+                ws.abort()
+            except Exception:
+                pass
+
+    def wait(self, timeout: float) -> str:
+        """Block until the page reaches a watched state (or `timeout` seconds)."""
+        if self._cdp:
+            try:
+                return self._wait_cdp(timeout)
+            except Exception as e:
+                if self._interrupted.is_set():
+                    return "interrupted"
+                print(f"[{self.tag} OTP] DevTools watcher unavailable ({e}) - watching through WebDriver")
+                self._cdp = False
+        return self._wait_webdriver(timeout)
+
+    def _page_ws_url(self) -> str:
+        address = self.driver.capabilities.get("goog:chromeOptions", {}).get("debuggerAddress")
+        if not address:
+            raise RuntimeError("no debuggerAddress")
+        # chromedriver window handles are DevTools target ids
+        handle = self.driver.current_window_handle
+        for target in requests.get(f"http://{address}/json/list", timeout=2).json():
+            if target.get("id") == handle:
+                return target["webSocketDebuggerUrl"]
+        raise RuntimeError("current tab not found in DevTools targets")
+
+    def _wait_cdp(self, timeout: float) -> str:
+        if self._ws_url is None:
+            self._ws_url = self._page_ws_url()
+        expression = f"{_WATCH_JS}({json.dumps(self.signals.as_js())}, {int(timeout * 1000)})"
+        ws = websocket.create_connection(self._ws_url, timeout=timeout + 10, suppress_origin=True)
+        with self._lock:
+            self._ws = ws
+        try:
+            if self._interrupted.is_set():
+                return "interrupted"
+            ws.send(json.dumps({
+                "id": 1,
+                "method": "Runtime.evaluate",
+                "params": {"expression": expression, "awaitPromise": True, "returnByValue": True},
+            }))
+            while True:
+                try:
+                    message = json.loads(ws.recv())
+                except (websocket.WebSocketException, OSError):
+                    if self._interrupted.is_set():
+                        return "interrupted"
+                    raise
+                if message.get("id") != 1:
+                    continue
+                # Navigation destroys the execution context the promise lived in
+                if "error" in message or message["result"].get("exceptionDetails"):
+                    return "navigated"
+                return message["result"]["result"].get("value") or "navigated"
+        finally:
+            with self._lock:
+                self._ws = None
+            # No close handshake: an abandoned watch has nothing left to say
+            ws.shutdown()
+
+    def _wait_webdriver(self, timeout: float) -> str:
+        deadline = time.monotonic() + timeout
+        script = (
+            "var done = arguments[arguments.length - 1];"
+            f"{_WATCH_JS}(arguments[0], arguments[1]).then(done);"
+        )
+        while not self._interrupted.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return "timeout"
+            slice_s = min(remaining, FALLBACK_SLICE_SECONDS)
+            try:
+                self.driver.set_script_timeout(slice_s + 5)
+                state = self.driver.execute_async_script(script, self.signals.as_js(), int(slice_s * 1000))
+            except (TimeoutException, WebDriverException):
+                return "navigated"
+            if state != "timeout":
+                return state or "navigated"
+        return "interrupted"
+
+
+async def wait_for_otp_login(
+    s: Dict[str, Any],
+    lane: str,
+    signals: LoginSignals,
+    type_otp: Callable[[Any, str], None],
+    timeout: float,
+    tag: str,
+    on_otp_gone: Optional[Callable[[Any], None]] = None,
+) -> bool:
+    """
+    Wait up to `timeout` seconds for the OTP login of session `s` to complete.
+    OTPs submitted through the API are typed with type_otp(driver, otp) as
+    soon as they arrive. Returns True once the browser shows the logged-in page.
+    """
+    started = time.perf_counter()
+    logged_in = False
+    try:
+        with tracing.span("otp_wait", lane=lane) as span:
+            logged_in = await _wait_for_otp_login(s, lane, signals, type_otp, timeout, tag, on_otp_gone)
+            if span is not None:
+                span.set(logged_in=logged_in)
+        return logged_in
+    finally:
+        agent_metrics.OTP_WAIT_SECONDS.observe(
+            time.perf_counter() - started, lane=lane, outcome="logged_in" if logged_in else "timeout"
+        )
+
+
+async def _wait_for_otp_login(s, lane, signals, type_otp, timeout, tag, on_otp_gone) -> bool:
+    driver = s["driver"]
+    otp_event: asyncio.Event = s["otp_event"]
+    watcher = BrowserWatcher(driver, signals, tag)
+    deadline = time.monotonic() + timeout
+    print(f"[{tag} OTP] Waiting up to {timeout:.0f}s for the OTP (browser-side watcher)")
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        s["last_activity"] = time.time()
+
+        watcher.arm()
+        watch = asyncio.ensure_future(
+            run_blocking(lane, watcher.wait, min(remaining, WATCH_SLICE_SECONDS))
+        )
+        otp_arrived = asyncio.ensure_future(otp_event.wait())
+        done, _ = await asyncio.wait({watch, otp_arrived}, return_when=asyncio.FIRST_COMPLETED)
+
+        if otp_arrived in done:
+            otp_event.clear()
+            watcher.interrupt()
+            state = await watch
+            otp_value = s.get("otp_value")
+            if otp_value:
+                s["otp_value"] = None  # Clear so we don't submit again
+                print(f"[{tag} OTP] OTP received from app - typing it")
+                try:
+                    await run_blocking(lane, type_otp, driver, otp_value)
+                except Exception as type_err:
+                    print(f"[{tag} OTP] Failed to type OTP from app: {type_err}")
+            elif s.get("status") != "waiting_for_otp":
+                # Woken by cleanup_session
+                return False
+        else:
+            otp_arrived.cancel()
+            state = watch.result()
+
+        if state == "logged_in":
+            print(f"[{tag} OTP] Logged-in page detected")
+            return True
+        if state == "otp_gone" and on_otp_gone is not None:
+            print(f"[{tag} OTP] OTP input gone without reaching the logged-in page")
+            try:
+                await run_blocking(lane, on_otp_gone, driver)
+            except Exception as nav_err:
+                print(f"[{tag} OTP] Recovery navigation failed: {nav_err}")
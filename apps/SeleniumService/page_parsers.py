@@ -0,0 +1,328 @@
+"""
+Pure parsers for the eligibility workers' result pages.
+
+step2 used to read the member search results / patient card element by
+element: find_element, then .text, then get_attribute("href") for every
+link - one WebDriver round trip each, plus up to a 5s wait for every
+selector that didn't match. The workers now take one driver.page_source and
+hand it to these functions, which run the same XPaths with lxml: no
+browser, no waits. The WebDriver commands each step issued are in the
+step2 result's "waits" report ("commands", see page_waits).
+
+Each function takes the page HTML (plus the page URL, to resolve links the
+way get_attribute("href") does) and returns plain data, so it can be run
+against a saved page:
+
+    page_parsers.ddma_search_results(Path("results.html").read_text(), url)
+
+text_of() stands in for Selenium's element.text: block elements start a
+new line, table cells are joined by spaces, whitespace is collapsed and
+<script>/<style>/hidden elements are skipped. Content hidden by a
+stylesheet can't be seen from the HTML, so it is included.
+"""
+import re
+from urllib.parse import urljoin
+from typing import Dict, Any, List, Optional, Tuple
+
+import lxml.html
+
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "body", "dd", "details", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "html", "li", "main", "nav", "ol", "p", "pre", "section", "summary",
+    "table", "tbody", "tfoot", "thead", "tr", "ul",
+}
+_CELL_TAGS = {"td", "th"}
+_SKIP_TAGS = {"head", "script", "style", "noscript", "template"}
+
+_MEMBER_ID_LINE = re.compile(r"^[A-Z0-9]{5,}$")
+_ROW_DOB = re.compile(r"\s*DOB[:\s]*\d{1,2}/\d{1,2}/\d{2,4}\s*", re.IGNORECASE)
+
+# Patient detail link in the first search result, most specific first
+_DETAIL_LINK_XPATHS = (
+    "(//table//tbody//tr)[1]//td[1]//a",
+    "(//tbody//tr)[1]//a[contains(@href, 'member-details')]",
+    "(//tbody//tr)[1]//a[contains(@href, 'member')]",
+)
+_DETAIL_NAME_XPATHS = (
+    "//h1",
+    "//h2",
+    "//*[contains(@class,'patient-name') or contains(@class,'member-name')]",
+    "//div[contains(@class,'header')]//span",
+)
+_DETAIL_NAME_SKIP = ("active", "inactive", "eligible", "search", "date", "print", "member id")
+
+
+# ── Tree / text helpers ─────────────────────────────────────────────
+
+def parse(html: str):
+    """lxml tree of a page_source (an empty document for an empty page)."""
+    if not html or not html.strip():
+        return lxml.html.document_fromstring("<html><body></body></html>")
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # Unicode string with an encoding declaration
+        return lxml.html.document_fromstring(html.encode("utf-8"))
+
+
+def _hidden(el) -> bool:
+    style = (el.get("style") or "").replace(" ", "").lower()
+    return el.get("hidden") is not None or "display:none" in style or "visibility:hidden" in style
+
+
+def text_of(el) -> str:
+    """Rendered text of an element, like Selenium's element.text ("" for None)."""
+    if el is None:
+        return ""
+    parts: List[str] = []
+
+    def walk(node):
+        tag = node.tag.lower() if isinstance(node.tag, str) else None
+        if tag is not None and tag not in _SKIP_TAGS and not _hidden(node):
+            if tag in _BLOCK_TAGS or tag == "br":
+                parts.append("\n")
+            elif tag in _CELL_TAGS:
+                parts.append(" ")
+            if node.text:
+                parts.append(node.text)
+            for child in node:
+                walk(child)
+            if tag in _BLOCK_TAGS:
+                parts.append("\n")
+        if node is not el and node.tail:
+            parts.append(node.tail)
+
+    walk(el)
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def first(tree, xpath: str):
+    """First match of an XPath (document order, like find_element), else None."""
+    matches = tree.xpath(xpath)
+    return matches[0] if matches else None
+
+
+def first_text(tree, xpath: str) -> str:
+    return text_of(first(tree, xpath))
+
+
+def _href(link, base_url: str) -> str:
+    href = (link.get("href") or "").strip()
+    return urljoin(base_url, href) if href else ""
+
+
+def eligibility_status(text: str) -> str:
+    """"active" / "inactive" from a status label, "" when it is neither."""
+    text = text.lower()
+    if "inactive" in text or "ineligible" in text or "not eligible" in text:
+        return "inactive"
+    if "active" in text or "eligible" in text:
+        return "active"
+    return ""
+
+
+# ── DDMA / DentaQuest member search ─────────────────────────────────
+
+def _search_row(tree, base_url: str) -> Dict[str, Any]:
+    """Text, lines, member ID and links of the first search result row."""
+    row = first(tree, "(//tbody//tr)[1]")
+    row_text = text_of(row)
+    lines = [line.strip() for line in row_text.split("\n") if line.strip()]
+    member_id = next(
+        (line for line in lines if _MEMBER_ID_LINE.match(line) and not line.startswith("DOB")), ""
+    )
+    links = [(_href(a, base_url), text_of(a)) for a in row.xpath(".//a")] if row is not None else []
+    return {
+        "rowText": row_text,
+        "lines": lines,
+        "memberId": member_id,
+        "links": links,
+        "firstCell": first_text(tree, "(//tbody//tr)[1]//td[1]"),
+    }
+
+
+def _detail_link(tree, base_url: str, accept, fallback_xpath: str) -> Tuple[str, Optional[str]]:
+    """
+    (link text, detail URL) from the first row's patient link: the first
+    selector whose link `accept`s its URL, else any link on the page.
+    """
+    link_text = ""
+    for selector in _DETAIL_LINK_XPATHS:
+        link = first(tree, selector)
+        if link is None:
+            continue
+        text, href = text_of(link), _href(link, base_url)
+        link_text = link_text or text
+        if href and accept(href):
+            return link_text, href
+    link = first(tree, fallback_xpath)
+    return link_text, (_href(link, base_url) or None) if link is not None else None
+
+
+def ddma_search_results(html: str, base_url: str = "") -> Dict[str, Any]:
+    """
+    DDMA member search, first result: patientName (DOB stripped), memberId,
+    eligibility (status link text, lowercased), detailUrl (member-details
+    link) and linkName; links / rowText / firstCell for logging and fallbacks.
+    """
+    tree = parse(html)
+    result = _search_row(tree, base_url)
+
+    name = ""
+    if result["lines"]:
+        candidate = _ROW_DOB.sub("", result["lines"][0]).strip()
+        if candidate and not candidate.startswith("DOB") and not candidate.isdigit():
+            name = candidate
+
+    eligibility = first_text(
+        tree, "(//tbody//tr)[1]//a[contains(@href, 'member-eligibility-search')]"
+    ).lower()
+    if not eligibility:
+        alt = first_text(
+            tree, "//*[contains(text(),'Active') or contains(text(),'Inactive') or contains(text(),'Eligible')]"
+        ).lower()
+        eligibility = eligibility_status(alt) or alt
+
+    link_name, detail_url = _detail_link(
+        tree, base_url, lambda href: "member-details" in href, "//a[contains(@href, 'member-details')]"
+    )
+    result.update(patientName=name, eligibility=eligibility, linkName=link_name, detailUrl=detail_url)
+    return result
+
+
+def dentaquest_search_results(html: str, base_url: str = "") -> Dict[str, Any]:
+    """
+    DentaQuest member search, first result: patientName, memberId,
+    eligibility ("active" / "inactive" / ""), detailUrl (member link) and
+    linkName; links / rowText / firstCell for logging and fallbacks.
+    """
+    tree = parse(html)
+    result = _search_row(tree, base_url)
+
+    name = result["lines"][0] if result["lines"] else ""
+    if name.startswith("DOB") or name.isdigit():
+        name = ""
+
+    eligibility = ""
+    for selector in (
+        "(//tbody//tr)[1]//a[contains(@href, 'eligibility')]",
+        "//a[contains(@href,'eligibility')]",
+        "//*[contains(@class,'status')]",
+        "//*[contains(text(),'Active') or contains(text(),'Inactive') or contains(text(),'Eligible')]",
+    ):
+        eligibility = eligibility_status(first_text(tree, selector))
+        if eligibility:
+            break
+
+    link_name, detail_url = _detail_link(
+        tree, base_url, lambda href: "member" in href, "//a[contains(@href, 'member')]"
+    )
+    result.update(patientName=name, eligibility=eligibility, linkName=link_name, detailUrl=detail_url)
+    return result
+
+
+def detail_page_name(html: str) -> str:
+    """Patient name from a member details page heading ("" if none looks like one)."""
+    tree = parse(html)
+    for selector in _DETAIL_NAME_XPATHS:
+        text = first_text(tree, selector)
+        if len(text) > 1 and not any(word in text.lower() for word in _DETAIL_NAME_SKIP):
+            return text
+    return ""
+
+
+# ── United SCO selected patient ─────────────────────────────────────
+
+_UNITEDSCO_NAME_XPATHS = (
+    "//*[contains(@class,'patient-name') or contains(@class,'patientName')]",
+    "//*[contains(@class,'selected-patient')]//h3 | //*[contains(@class,'selected-patient')]//h4 | //*[contains(@class,'selected-patient')]//strong",
+    "//div[contains(@class,'patient')]//h3 | //div[contains(@class,'patient')]//h4",
+    "//*[contains(@class,'eligibility__banner')]//h3 | //*[contains(@class,'eligibility__banner')]//h4",
+    "//*[contains(@class,'banner__patient')]",
+)
+# [^\n] keeps a match on one line (e.g. not picking up "Member Eligible")
+_UNITEDSCO_NAME_PATTERNS = (
+    # Name on the line right after "Selected Patient"
+    r"Selected Patient\s*\n\s*([A-Z][A-Za-z\-\']+(?: [A-Z][A-Za-z\-\']+)+)",
+    r"Patient Name\s*[\n:]\s*([A-Z][A-Za-z\-\']+(?: [A-Z][A-Za-z\-\']+)+)",
+    # "LASTNAME, FIRSTNAME" format
+    r"Selected Patient\s*\n\s*([A-Z][A-Za-z\-\']+,\s*[A-Z][A-Za-z\-\']+)",
+    # Name on the line right before "Member Eligible" or "Member ID"
+    r"\n([A-Z][A-Za-z\-\']+(?: [A-Z]\.?)? [A-Z][A-Za-z\-\']+)\n(?:Member|Date Of Birth|DOB)",
+)
+_UNITEDSCO_NAME_SKIP = (
+    "Selected Patient", "Patient Name", "Patient Information", "Member Eligible", "Member ID", "Date Of Birth",
+)
+
+
+def _unitedsco_name(tree, page_text: str) -> str:
+    name = first_text(tree, "//*[@id='patient-name']")
+    if name:
+        return name
+    for selector in _UNITEDSCO_NAME_XPATHS:
+        for el in tree.xpath(selector):
+            text = text_of(el)
+            # Must look like a name: 2+ words, starts with uppercase
+            if text and len(text.split()) >= 2 and text[0].isupper() and len(text) < 60:
+                return text
+    for pattern in _UNITEDSCO_NAME_PATTERNS:
+        match = re.search(pattern, page_text)
+        if match:
+            candidate = match.group(1).strip()
+            if (len(candidate) < 50 and candidate not in _UNITEDSCO_NAME_SKIP
+                    and "Eligible" not in candidate and "Member" not in candidate):
+                return candidate
+    return ""
+
+
+def unitedsco_selected_patient(html: str) -> Dict[str, Any]:
+    """
+    United SCO "Selected Patient" page: statusText / eligibility (badge),
+    patientName, memberId and dob ("" when not on the page), pageText.
+    """
+    tree = parse(html)
+    page_text = first_text(tree, "//body")
+    status_text = first_text(
+        tree, "//*[contains(text(),'Member Eligible') or contains(text(),'member eligible')]"
+    ).lower()
+    member_id = re.search(r"Member ID\s*[\n:]\s*(\d+)", page_text)
+    dob = re.search(r"Date Of Birth\s*[\n:]\s*(\d{2}/\d{2}/\d{4})", page_text)
+    return {
+        "statusText": status_text,
+        "eligibility": eligibility_status(status_text),
+        "patientName": _unitedsco_name(tree, page_text),
+        "memberId": member_id.group(1) if member_id else "",
+        "dob": dob.group(1) if dob else "",
+        "pageText": page_text,
+    }
+
+
+# ── Delta Dental Ins patient card ───────────────────────────────────
+
+def deltains_patient_card(html: str) -> Dict[str, Any]:
+    """
+    Delta Dental Ins patient card (search result or benefits page):
+    patientName, dob, memberId and eligibility as shown ("" when missing),
+    and whether the page says notEligible / terminated.
+    """
+    tree = parse(html)
+
+    def field(testid: str) -> str:
+        return first_text(tree, f"//*[@data-testid='{testid}']//*[contains(@class,'pt-staticfield-text')]")
+
+    body = first_text(tree, "//body").lower()
+    return {
+        "patientName": first_text(
+            tree,
+            "//div[contains(@class,'patient-card-header')]//h3 | "
+            "//div[contains(@class,'patient-card-root')]//h3 | "
+            "//div[starts-with(@data-testid,'patientCard')]//h3",
+        ),
+        "dob": field("patientCardDateOfBirth"),
+        "memberId": field("patientCardMemberId"),
+        "eligibility": field("patientCardMemberEligibility"),
+        "notEligible": "not eligible" in body,
+        "terminated": "terminated" in body,
+    }
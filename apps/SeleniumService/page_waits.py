@@ -0,0 +1,346 @@
+"""
+Condition-driven waits for the eligibility workers.
+
+Instead of fixed time.sleep() calls, workers wait for the thing they actually
+need and move on as soon as it is there:
+
+- network idle: no requests in flight for `idle` seconds. Requests are
+  tracked from the CDP Network events chromedriver writes to the performance
+  log (enabled for every browser by chromedriver_service.create_chrome_driver).
+- DOM quiescence: no nodes added/removed/changed for `idle` seconds
+  (a MutationObserver installed on the page).
+- element / custom predicates through WebDriverWait.
+
+Each worker owns a PageWaits. Every wait made through it - including plain
+WebDriverWait calls via PageWaits.wait() - is added to the current step
+("login", "step1", ...), and the per-step totals are returned with the
+step2 result under "waits". Each step also counts the WebDriver commands
+its browser executed ("commands", from InstrumentedChrome.command_count).
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List, Tuple
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+import tracing
+import resource_policy
+
+WAIT_IDLE_SECONDS = float(os.getenv("WAIT_IDLE_SECONDS", "0.5"))
+# Requests open longer than this (long-polling, analytics beacons) don't block "idle"
+LONG_REQUEST_SECONDS = 10
+# In-flight entries older than this are assumed lost (navigated away mid-request)
+STALE_REQUEST_SECONDS = 60
+POLL_INTERVAL = 0.1
+
+_DOM_QUIET_JS = """
+var q = window.__pageWaitsDom;
+if (!q) {
+    q = window.__pageWaitsDom = {last: performance.now()};
+    new MutationObserver(function () { q.last = performance.now(); })
+        .observe(document, {subtree: true, childList: true, characterData: true});
+}
+return [document.readyState, performance.now() - q.last];
+"""
+
+
+def enable_network_events(options):
+    """Have chromedriver record CDP Network events in the performance log."""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+
+def _event_age(entry: dict, params: dict, wall_now: float) -> float:
+    """Seconds since a perf-log event, from its wall-clock stamps (0 if it has none)."""
+    stamp = params.get("wallTime") or (entry.get("timestamp") or 0) / 1000
+    return max(0.0, wall_now - stamp) if stamp else 0.0
+
+
+class NetworkTracker:
+    """
+    Requests in flight for one browser, fed from the performance log.
+    Other modules can subscribe to the raw events with add_listener().
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.inflight: Dict[str, float] = {}
+        self.available = True
+        self._listeners: List[Callable[[str, dict], None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[str, dict], None]):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, dict], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def poll(self):
+        """Drain new events from the performance log."""
+        if not self.available:
+            return
+        try:
+            entries = self.driver.get_log("performance")
+        except WebDriverException:
+            # Browser started without performance logging - waits fall back to DOM checks
+            self.available = False
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            wall_now = time.time()
+            for entry in entries:
+                try:
+                    message = json.loads(entry["message"])["message"]
+                except (KeyError, TypeError, ValueError):
+                    continue
+                method = message.get("method", "")
+                params = message.get("params", {})
+                if method == "Network.requestWillBeSent":
+                    # When it was sent, not when the log was drained (only while a wait polls)
+                    self.inflight[params.get("requestId")] = now - _event_age(entry, params, wall_now)
+                elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                    self.inflight.pop(params.get("requestId"), None)
+                for listener in self._listeners:
+                    try:
+                        listener(method, params)
+                    except Exception as e:
+                        print(f"[page_waits] Network listener failed: {e}")
+
+            for request_id, started in list(self.inflight.items()):
+                if now - started > STALE_REQUEST_SECONDS:
+                    del self.inflight[request_id]
+
+    def busy(self) -> int:
+        """Number of in-flight requests that should hold up 'idle'."""
+        cutoff = time.monotonic() - LONG_REQUEST_SECONDS
+        with self._lock:
+            return sum(1 for started in self.inflight.values() if started > cutoff)
+
+
+def get_network_tracker(driver) -> NetworkTracker:
+    """The tracker attached to this driver (created on first use)."""
+    tracker = getattr(driver, "_network_tracker", None)
+    if tracker is None:
+        tracker = NetworkTracker(driver)
+        driver._network_tracker = tracker
+    return tracker
+
+
+class _TimedWait(WebDriverWait):
+    """WebDriverWait whose until()/until_not() time is booked to a PageWaits step."""
+
+    def __init__(self, waits, driver, timeout, **kwargs):
+        super().__init__(driver, timeout, **kwargs)
+        self._waits = waits
+
+    def until(self, method, message=""):
+        with self._waits.timed():
+            return super().until(method, message)
+
+    def until_not(self, method, message=""):
+        with self._waits.timed():
+            return super().until_not(method, message)
+
+
+class PageWaits:
+    """
+    Wait toolkit + per-step wait accounting for one worker.
+    `get_driver` returns the worker's current driver (it is created after
+    the worker object), `tag` prefixes log lines, e.g. "DDMA".
+    """
+
+    def __init__(self, get_driver: Callable[[], Any], tag: str):
+        self._get_driver = get_driver
+        self.tag = tag
+        self.reset()
+
+    @property
+    def driver(self):
+        return self._get_driver()
+
+    # ---- accounting ----
+
+    def reset(self):
+        """Start a fresh report (e.g. next patient of a batch)."""
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.current = None
+        self._step_started = None
+        self._step_commands = None
+
+    def _command_count(self):
+        driver = self._get_driver()
+        count = getattr(driver, "command_count", None)
+        return (driver, count) if count is not None else None
+
+    def begin(self, step: str):
+        """Book subsequent waits to `step`; logs the previous step's totals."""
+        self._close_step()
+        self.current = step
+        self._step_started = time.monotonic()
+        self._step_commands = self._command_count()
+        self.steps.setdefault(step, {"elapsed_s": 0.0, "waited_s": 0.0, "waits": 0, "timeouts": 0, "commands": 0})
+
+    def _close_step(self):
+        if self.current is None:
+            return
+        stats = self.steps[self.current]
+        stats["elapsed_s"] = round(stats["elapsed_s"] + time.monotonic() - self._step_started, 2)
+        # Commands since begin() - only if the step kept the browser it started with
+        now = self._command_count()
+        if now and self._step_commands and now[0] is self._step_commands[0]:
+            stats["commands"] += now[1] - self._step_commands[1]
+        print(
+            f"[{self.tag} {self.current}] waited {stats['waited_s']:.1f}s of {stats['elapsed_s']:.1f}s "
+            f"({stats['waits']} waits, {stats['timeouts']} timed out, {stats['commands']} commands)"
+        )
+        self.current = None
+
+    def _record(self, started: float, timed_out: bool):
+        if self.current is None:
+            self.begin("setup")
+        stats = self.steps[self.current]
+        stats["waited_s"] = round(stats["waited_s"] + time.monotonic() - started, 2)
+        stats["waits"] += 1
+        if timed_out:
+            stats["timeouts"] += 1
+
+    @contextmanager
+    def timed(self, kind: str = "element"):
+        """Book the time spent in the block as one wait of the current step."""
+        started = time.monotonic()
+        timed_out = False
+        with tracing.span(f"wait {kind}", step=self.current) as span:
+            try:
+                yield
+            except TimeoutException:
+                timed_out = True
+                raise
+            finally:
+                self._record(started, timed_out)
+                if span is not None:
+                    span.set(timed_out=timed_out)
+
+    def report(self) -> Dict[str, Any]:
+        """Close the current step and return the per-step totals."""
+        self._close_step()
+        return {
+            "waited_s": round(sum(s["waited_s"] for s in self.steps.values()), 2),
+            "commands": sum(s["commands"] for s in self.steps.values()),
+            "steps": {name: dict(stats) for name, stats in self.steps.items()},
+        }
+
+    # ---- element / predicate waits ----
+
+    def wait(self, timeout: float, **kwargs) -> WebDriverWait:
+        """Drop-in for WebDriverWait(driver, timeout) that is counted in the report."""
+        return _TimedWait(self, self.driver, timeout, **kwargs)
+
+    def condition(self, predicate: Callable[[Any], Any], timeout: float = 10) -> Any:
+        """Wait until predicate(driver) is truthy; returns its value, or None on timeout."""
+        try:
+            return self.wait(timeout).until(predicate)
+        except TimeoutException:
+            return None
+
+    def any_of(self, locators: List[Tuple[str, str]], timeout: float = 10) -> Tuple[int | None, Any]:
+        """
+        Wait for the first of several locators to match.
+        Returns (index, element) of the one that appeared, or (None, None).
+        """
+        def first_match(driver):
+            for index, locator in enumerate(locators):
+                found = driver.find_elements(*locator)
+                if found:
+                    return index, found[0]
+            return False
+
+        return self.condition(first_match, timeout) or (None, None)
+
+    def staleness(self, element, timeout: float = 10) -> bool:
+        """Wait for an element to be detached (page re-rendered)."""
+        return self.condition(EC.staleness_of(element), timeout) is not None
+
+    def new_window(self, known_handles: int, timeout: float = 10) -> bool:
+        """Wait for a popup/tab beyond the `known_handles` already open."""
+        return self.condition(lambda d: len(d.window_handles) > known_handles, timeout) is not None
+
+    def url_change(self, old_url: str, timeout: float = 10) -> bool:
+        return self.condition(lambda d: d.current_url != old_url, timeout) is not None
+
+    # ---- page-level waits ----
+
+    def network_idle(self, timeout: float = 10, idle: float = WAIT_IDLE_SECONDS) -> bool:
+        """No requests in flight for `idle` seconds."""
+        return self._settle(timeout, idle, network=True, dom=False)
+
+    def dom_quiet(self, timeout: float = 10, idle: float = WAIT_IDLE_SECONDS) -> bool:
+        """Document loaded and no DOM mutations for `idle` seconds."""
+        return self._settle(timeout, idle, network=False, dom=True)
+
+    def page_ready(self, timeout: float = 15, idle: float = WAIT_IDLE_SECONDS) -> bool:
+        """After a navigation: document loaded and the network idle."""
+        return self._settle(timeout, idle, network=True, dom=False, loaded=True)
+
+    def settled(self, timeout: float = 15, idle: float = WAIT_IDLE_SECONDS) -> bool:
+        """Network idle and DOM quiet - dynamic content finished rendering."""
+        return self._settle(timeout, idle, network=True, dom=True)
+
+    def _settle(self, timeout: float, idle: float, network: bool, dom: bool, loaded: bool = False) -> bool:
+        kind = "settled" if network and dom else "dom_quiet" if dom else "page_ready" if loaded else "network_idle"
+        started = time.monotonic()
+        with tracing.span(f"wait {kind}", step=self.current) as span:
+            settled = self._settle_loop(timeout, idle, network, dom, loaded)
+            if span is not None:
+                span.set(timed_out=not settled)
+        if settled and kind in ("page_ready", "settled"):
+            resource_policy.record_page_load(self.driver, time.monotonic() - started)
+        return settled
+
+    def _settle_loop(self, timeout: float, idle: float, network: bool, dom: bool, loaded: bool) -> bool:
+        started = time.monotonic()
+        driver = self.driver
+        tracker = get_network_tracker(driver) if network else None
+        if tracker is not None and not tracker.available:
+            # No request tracking on this browser - DOM quiescence is the best signal left
+            tracker, dom = None, True
+        network_quiet_since = None
+
+        while True:
+            now = time.monotonic()
+            try:
+                network_ok = True
+                if tracker is not None:
+                    tracker.poll()
+                    if tracker.busy():
+                        network_quiet_since = None
+                        network_ok = False
+                    else:
+                        network_quiet_since = network_quiet_since or now
+                        network_ok = now - network_quiet_since >= idle
+
+                page_ok = True
+                if dom:
+                    state, since_mutation_ms = driver.execute_script(_DOM_QUIET_JS)
+                    page_ok = state == "complete" and since_mutation_ms >= idle * 1000
+                elif loaded:
+                    page_ok = driver.execute_script("return document.readyState") == "complete"
+            except WebDriverException:
+                # Page is mid-navigation
+                network_ok = page_ok = False
+
+            if network_ok and page_ok:
+                self._record(started, timed_out=False)
+                return True
+
+            if now - started >= timeout:
+                self._record(started, timed_out=True)
+                return False
+            time.sleep(POLL_INTERVAL)
@@ -0,0 +1,81 @@
+"""
+Page.printToPDF streamed straight to a file.
+
+A plain printToPDF returns the whole document base64-encoded in one CDP
+response: chromedriver holds it, the JSON reply carries it, and the worker
+decodes all of it in memory before writing. A long benefits page is several
+MB, held three or four times over.
+
+print_to_pdf() asks for transferMode "ReturnAsStream" instead and pulls the
+document with IO.read in PDF_CAPTURE_CHUNK_BYTES chunks, each decoded and
+appended to the file as it arrives, so memory stays at one chunk whatever
+the page length. Workers return the file path, never the bytes.
+
+Browsers / drivers that ignore the transfer mode (no stream handle in the
+reply) get the inline data written the old way.
+"""
+import os
+import base64
+import time
+from typing import Dict, Any, Optional
+
+import agent_metrics
+
+PDF_CAPTURE_CHUNK_BYTES = int(os.getenv("PDF_CAPTURE_CHUNK_BYTES", str(1024 * 1024)))
+
+# Letter page, small margins - what the eligibility workers print with
+DEFAULT_PDF_OPTIONS: Dict[str, Any] = {
+    "landscape": False,
+    "displayHeaderFooter": False,
+    "printBackground": True,
+    "preferCSSPageSize": True,
+    "paperWidth": 8.5,
+    "paperHeight": 11,
+    "marginTop": 0.4,
+    "marginBottom": 0.4,
+    "marginLeft": 0.4,
+    "marginRight": 0.4,
+    "scale": 0.9,
+}
+
+
+def print_to_pdf(driver, dest_path: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """Print the current page to dest_path (streamed) and return the path."""
+    params = {**(DEFAULT_PDF_OPTIONS if options is None else options), "transferMode": "ReturnAsStream"}
+    label = getattr(driver, "metrics_label", "chrome")
+    started = time.perf_counter()
+    result = driver.execute_cdp_cmd("Page.printToPDF", params)
+    stream = result.get("stream")
+
+    tmp_path = dest_path + ".part"
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            if not stream:
+                data = base64.b64decode(result.get("data", ""))
+                f.write(data)
+                size = len(data)
+            else:
+                try:
+                    while True:
+                        chunk = driver.execute_cdp_cmd("IO.read", {"handle": stream, "size": PDF_CAPTURE_CHUNK_BYTES})
+                        data = chunk.get("data", "")
+                        data = base64.b64decode(data) if chunk.get("base64Encoded") else data.encode("latin-1")
+                        f.write(data)
+                        size += len(data)
+                        if chunk.get("eof"):
+                            break
+                finally:
+                    try:
+                        driver.execute_cdp_cmd("IO.close", {"handle": stream})
+                    except Exception:
+                        pass
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    agent_metrics.PDF_CAPTURE_BYTES.inc(size, browser=label)
+    print(f"[pdf_capture] {os.path.basename(dest_path)}: {size} bytes in {time.perf_counter() - started:.2f}s"
+          f"{' (streamed)' if stream else ''}")
+    return dest_path
@@ -0,0 +1,222 @@
+"""
+Deferred PDF rendering from DOM snapshots.
+
+Printing a member's detail page used to happen in the payer's browser, so
+the lane - the payer's one logged-in browser - stayed reserved through
+Page.printToPDF and everything after it, and the next patient waited.
+
+snapshot_to_pdf() captures the page instead: one Page.captureSnapshot call
+(MHTML - the DOM as rendered, styles and images inlined) written next to
+the PDF's path. A render pool turns it into the PDF in the background:
+PDF_RENDER_WORKERS threads, each with its own headless Chrome, open the
+.mhtml file and print it with pdf_capture.print_to_pdf (same options as an
+inline print). The worker returns straight away with the PDF's path, and:
+
+- a single check hands its lane to the next job (JobSlot.release) and
+  waits for the render off-lane - the next job is already navigating the
+  portal while this PDF renders; the result is published once the file
+  exists (wait());
+- a batch moves on to the next patient at once; each patient's result is
+  published when its PDF is ready.
+
+If a render fails, the result keeps its eligibility data with pdf_path /
+ss_path set to None and the reason in pdf_error; the browser has moved on
+by then, so the PDF is not retried there (and eligibility_cache does not
+store the result). A worker that fails after queueing a snapshot drops it
+through JobDownloads.discard() (forget()).
+
+PDF_RENDER_DEFERRED=0 prints inline in the payer's browser as before; a
+snapshot that cannot be captured falls back to the inline print too.
+Renders are counted and timed in /metrics (selenium_agent_pdf_renders_total,
+selenium_agent_pdf_render_seconds).
+"""
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, Optional, List
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+import agent_metrics
+import pdf_capture
+import tracing
+from chromedriver_service import create_chrome_driver
+
+PDF_RENDER_DEFERRED = os.getenv("PDF_RENDER_DEFERRED", "1") == "1"
+PDF_RENDER_WORKERS = max(1, int(os.getenv("PDF_RENDER_WORKERS", "1")))
+# Longest a finished job waits for its PDF
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "120"))
+
+# Result keys that may point at a deferred PDF
+_PATH_KEYS = ("pdf_path", "ss_path")
+
+_executor = ThreadPoolExecutor(max_workers=PDF_RENDER_WORKERS, thread_name_prefix="pdf-render")
+_local = threading.local()  # each render thread's headless browser
+_lock = threading.Lock()
+_drivers: List[Any] = []
+_pending: Dict[str, Future] = {}  # PDF path -> render
+
+
+# ── Render pool ──────────────────────────────────────────────────────
+
+def _render_driver():
+    driver = getattr(_local, "driver", None)
+    if driver is None:
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        driver = create_chrome_driver(options, label="pdf_render")
+        _local.driver = driver
+        with _lock:
+            _drivers.append(driver)
+    return driver
+
+
+def _drop_driver():
+    driver = getattr(_local, "driver", None)
+    _local.driver = None
+    if driver is None:
+        return
+    with _lock:
+        if driver in _drivers:
+            _drivers.remove(driver)
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def _render(mhtml_path: str, dest_path: str, options: Optional[Dict[str, Any]], queued_at: float) -> str:
+    try:
+        with tracing.span("pdf_render"):
+            for attempt in (1, 2):
+                try:
+                    driver = _render_driver()
+                    driver.get(Path(mhtml_path).as_uri())
+                    pdf_capture.print_to_pdf(driver, dest_path, options)
+                    break
+                except WebDriverException as e:
+                    # Crashed / wedged render browser: start a fresh one once
+                    _drop_driver()
+                    if attempt == 2:
+                        raise
+                    print(f"[pdf_render] Render browser failed ({e.msg}) - relaunching")
+        agent_metrics.PDF_RENDERS.inc(outcome="ok")
+        return dest_path
+    except Exception:
+        agent_metrics.PDF_RENDERS.inc(outcome="error")
+        raise
+    finally:
+        agent_metrics.PDF_RENDER_SECONDS.observe(time.perf_counter() - queued_at)
+        _remove(mhtml_path)
+
+
+def snapshot_to_pdf(driver, dest_path: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Snapshot the current page and queue its PDF for the render pool; returns
+    dest_path right away (see wait()). Prints inline when rendering is not
+    deferred or the snapshot fails.
+    """
+    if not PDF_RENDER_DEFERRED:
+        return pdf_capture.print_to_pdf(driver, dest_path, options)
+
+    mhtml_path = dest_path + ".mhtml"
+    try:
+        with tracing.span("dom_snapshot"):
+            snapshot = driver.execute_cdp_cmd("Page.captureSnapshot", {"format": "mhtml"})
+        # MHTML is CRLF-delimited - write it untranslated
+        with open(mhtml_path, "w", encoding="utf-8", newline="") as f:
+            f.write(snapshot["data"])
+    except Exception as e:
+        print(f"[pdf_render] Snapshot failed ({e}) - printing in the portal browser")
+        if os.path.exists(mhtml_path):
+            os.remove(mhtml_path)
+        return pdf_capture.print_to_pdf(driver, dest_path, options)
+
+    ctx = contextvars.copy_context()
+    future = _executor.submit(ctx.run, _render, mhtml_path, dest_path, options, time.perf_counter())
+    with _lock:
+        _pending[dest_path] = future
+    print(f"[pdf_render] Snapshot of {os.path.basename(dest_path)} queued for rendering")
+    return dest_path
+
+
+# ── Results ──────────────────────────────────────────────────────────
+
+def pending(result: Any) -> bool:
+    """Does this step2 result point at a PDF that is still being rendered?"""
+    if not isinstance(result, dict):
+        return False
+    with _lock:
+        return any(result.get(k) in _pending for k in _PATH_KEYS if result.get(k))
+
+
+async def wait(result: Dict[str, Any], timeout: float = PDF_RENDER_TIMEOUT) -> Dict[str, Any]:
+    """
+    Wait for the result's deferred PDF. Returns the result as is once the file
+    exists, or - if rendering failed - without its paths and with pdf_error.
+    """
+    paths = {result.get(k) for k in _PATH_KEYS if result.get(k)}
+    for path in paths:
+        with _lock:
+            future = _pending.pop(path, None)
+        if future is None:
+            continue
+        try:
+            with tracing.span("pdf_render_wait"):
+                await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except Exception as e:
+            error = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            print(f"[pdf_render] {os.path.basename(path)} could not be rendered: {error}")
+            result = {**result, "pdf_error": f"PDF render failed: {error}"}
+            for key in _PATH_KEYS:
+                if result.get(key) == path:
+                    result[key] = None
+    return result
+
+
+def forget(dest_path: str):
+    """
+    Drop a queued render whose job failed before wait(): cancelled if it has
+    not started, otherwise its PDF is removed once written.
+    """
+    with _lock:
+        future = _pending.pop(dest_path, None)
+    if future is not None and not future.cancel():
+        future.add_done_callback(lambda _: _remove(dest_path))
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def stats() -> Dict[str, Any]:
+    """Render pool state (for /status)."""
+    with _lock:
+        return {
+            "deferred": PDF_RENDER_DEFERRED,
+            "workers": PDF_RENDER_WORKERS,
+            "browsers": len(_drivers),
+            "pending": sum(1 for f in _pending.values() if not f.done()),
+        }
+
+
+def shutdown():
+    """Quit the render browsers (agent shutdown)."""
+    _executor.shutdown(wait=False, cancel_futures=True)
+    with _lock:
+        drivers = list(_drivers)
+        _drivers.clear()
+    for driver in drivers:
+        try:
+            driver.quit()
+        except Exception:
+            pass
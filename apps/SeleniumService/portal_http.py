@@ -0,0 +1,222 @@
+"""
+Direct HTTP to a payer portal, using the cookies of a logged-in browser.
+
+Once a worker's browser is logged in, several follow-ups are plain
+authenticated GETs that don't need the page at all: the claim / pre-auth
+confirmation PDF behind MassHealth's reach_to_pdf link, DeltaIns' benefit
+summary document, JSON endpoints of the portals' own APIs. Doing them
+through the browser costs navigations, clicks and download-folder polling;
+doing them here costs one request.
+
+- Cookie bridge: each call copies the browser's cookies (driver.get_cookies())
+  and User-Agent into a requests.Session, so the portal sees the same
+  logged-in session. Cookies the portal sets on these responses are not
+  written back - the browser stays the source of truth.
+- Pooled: one Session (keep-alive connection pool) per browser, attached to
+  the driver like its NetworkTracker.
+- Whitelisted: a lane may only reach its own portal hosts (HOSTS), and JSON
+  endpoints must be registered in ENDPOINTS (GET only, path templates
+  filled from keyword arguments). PORTAL_HTTP_ENDPOINTS (a JSON file
+  {"lane": {"name": "/path/{param}"}}) adds endpoints without a release -
+  API_CAPTURE_LOG=1 (api_capture.py) prints the URLs worth registering.
+
+Every failure raises PortalHttpError; callers keep their browser flow as the
+fallback. PORTAL_HTTP=0 turns direct requests off. Requests are counted in
+/metrics (selenium_agent_portal_http_requests_total).
+"""
+import os
+import json
+import threading
+from typing import Dict, Any, Optional
+from urllib.parse import urljoin, urlparse, quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import agent_metrics
+import tracing
+
+PORTAL_HTTP = os.getenv("PORTAL_HTTP", "1") == "1"
+PORTAL_HTTP_TIMEOUT = float(os.getenv("PORTAL_HTTP_TIMEOUT", "30"))
+PORTAL_HTTP_POOL_SIZE = int(os.getenv("PORTAL_HTTP_POOL_SIZE", "4"))
+CHUNK_SIZE = 64 * 1024
+
+# Hosts each lane may reach directly (exact host, or any subdomain of it)
+HOSTS: Dict[str, tuple] = {
+    "massdhp": ("providers.massdhp.com",),
+    "ddma": ("providers.deltadentalma.com",),
+    "dentaquest": ("providers.dentaquest.com",),
+    "unitedsco": ("app.dentalhub.com",),
+    "deltains": ("www.deltadentalins.com", "deltadentalins.com"),
+}
+
+# Base URL that endpoint paths are resolved against
+BASE_URLS: Dict[str, str] = {
+    "massdhp": "https://providers.massdhp.com",
+    "ddma": "https://providers.deltadentalma.com",
+    "dentaquest": "https://providers.dentaquest.com",
+    "unitedsco": "https://app.dentalhub.com",
+    "deltains": "https://www.deltadentalins.com",
+}
+
+# lane -> endpoint name -> GET path template
+ENDPOINTS: Dict[str, Dict[str, str]] = {lane: {} for lane in HOSTS}
+
+_lock = threading.Lock()
+
+
+class PortalHttpError(Exception):
+    """A direct request could not be made or did not return what was asked for."""
+
+
+def _load_endpoints():
+    path = os.getenv("PORTAL_HTTP_ENDPOINTS")
+    if not path:
+        return
+    try:
+        with open(path, "r") as f:
+            extra = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[portal_http] Could not read PORTAL_HTTP_ENDPOINTS {path}: {e}")
+        return
+    for lane, endpoints in extra.items():
+        if lane in ENDPOINTS and isinstance(endpoints, dict):
+            ENDPOINTS[lane].update({str(k): str(v) for k, v in endpoints.items()})
+
+
+_load_endpoints()
+
+
+def is_allowed(lane: str, url: str) -> bool:
+    """Is `url` an https URL on one of `lane`'s portal hosts?"""
+    parsed = urlparse(url or "")
+    host = (parsed.hostname or "").lower()
+    if parsed.scheme != "https" or not host:
+        return False
+    return any(host == h or host.endswith("." + h) for h in HOSTS.get(lane, ()))
+
+
+class PortalClient:
+    """Pooled requests.Session carrying one browser's login cookies."""
+
+    def __init__(self, driver, lane: str):
+        self.driver = driver
+        self.lane = lane
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=PORTAL_HTTP_POOL_SIZE, pool_maxsize=PORTAL_HTTP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._user_agent: Optional[str] = None
+
+    def sync_cookies(self):
+        """Copy the browser's current cookies (and User-Agent) into the session."""
+        cookies = self.driver.get_cookies()
+        jar = requests.cookies.RequestsCookieJar()
+        for c in cookies:
+            jar.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+        self.session.cookies = jar
+        if self._user_agent is None:
+            try:
+                self._user_agent = self.driver.execute_script("return navigator.userAgent") or ""
+            except Exception:
+                self._user_agent = ""
+            if self._user_agent:
+                self.session.headers["User-Agent"] = self._user_agent
+
+    def _get(self, url: str, kind: str, **kwargs) -> requests.Response:
+        if not PORTAL_HTTP:
+            raise PortalHttpError("direct portal requests are disabled (PORTAL_HTTP=0)")
+        if not is_allowed(self.lane, url):
+            agent_metrics.PORTAL_HTTP_REQUESTS.inc(browser=self.lane, kind=kind, outcome="denied")
+            raise PortalHttpError(f"{url} is not on the {self.lane} portal allowlist")
+        with _lock:
+            self.sync_cookies()
+        try:
+            with tracing.span("portal_http", lane=self.lane, kind=kind):
+                response = self.session.get(url, timeout=PORTAL_HTTP_TIMEOUT, allow_redirects=True, **kwargs)
+        except requests.RequestException as e:
+            agent_metrics.PORTAL_HTTP_REQUESTS.inc(browser=self.lane, kind=kind, outcome="error")
+            raise PortalHttpError(f"GET {url} failed: {e}") from e
+        # A redirect off the portal (SSO login page) means the cookies were not enough
+        if response.status_code != 200 or not is_allowed(self.lane, response.url):
+            response.close()
+            agent_metrics.PORTAL_HTTP_REQUESTS.inc(browser=self.lane, kind=kind, outcome="error")
+            raise PortalHttpError(f"GET {url} -> {response.status_code} {response.url}")
+        return response
+
+    def fetch_artifact(self, url: str, dest_path: str, content_type: str = "application/pdf") -> str:
+        """
+        Stream the document at `url` to dest_path and return the path. The body
+        must be `content_type` (for PDFs, checked by its %PDF header as well) -
+        an HTML login page served with 200 is an error, not an artifact.
+        """
+        response = self._get(url, "artifact", stream=True)
+        tmp_path = dest_path + ".part"
+        try:
+            received = (response.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+            chunks = response.iter_content(CHUNK_SIZE)
+            first = next(chunks, b"")
+            is_pdf = content_type == "application/pdf"
+            if (is_pdf and not first.startswith(b"%PDF")) or (not is_pdf and received != content_type):
+                raise PortalHttpError(f"GET {url} returned {received or 'no content type'}, not {content_type}")
+            size = len(first)
+            with open(tmp_path, "wb") as f:
+                f.write(first)
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, dest_path)
+        except PortalHttpError:
+            agent_metrics.PORTAL_HTTP_REQUESTS.inc(browser=self.lane, kind="artifact", outcome="error")
+            raise
+        except (OSError, requests.RequestException) as e:
+            agent_metrics.PORTAL_HTTP_REQUESTS.inc(browser=self.lane, kind="artifact", outcome="error")
+            raise PortalHttpError(f"GET {url} failed while reading: {e}") from e
+        finally:
+            response.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        agent_metrics.PORTAL_HTTP_REQUESTS.inc(browser=self.lane, kind="artifact", outcome="ok")
+        print(f"[portal_http] {self.lane}: fetched {os.path.basename(dest_path)} ({size} bytes) without the browser")
+        return dest_path
+
+    def get_json(self, endpoint: str, **params) -> Any:
+        """GET a registered endpoint of this lane (ENDPOINTS) and return its JSON."""
+        template = ENDPOINTS.get(self.lane, {}).get(endpoint)
+        if template is None:
+            agent_metrics.PORTAL_HTTP_REQUESTS.inc(browser=self.lane, kind="endpoint", outcome="denied")
+            raise PortalHttpError(f"{endpoint!r} is not a registered {self.lane} endpoint")
+        try:
+            path = template.format(**{k: quote(str(v), safe="") for k, v in params.items()})
+        except KeyError as e:
+            raise PortalHttpError(f"{endpoint!r} needs parameter {e}") from e
+        url = urljoin(BASE_URLS[self.lane], path)
+        response = self._get(url, "endpoint", headers={"Accept": "application/json"})
+        try:
+            payload = response.json()
+        except ValueError as e:
+            agent_metrics.PORTAL_HTTP_REQUESTS.inc(browser=self.lane, kind="endpoint", outcome="error")
+            raise PortalHttpError(f"{endpoint!r} did not return JSON") from e
+        finally:
+            response.close()
+        agent_metrics.PORTAL_HTTP_REQUESTS.inc(browser=self.lane, kind="endpoint", outcome="ok")
+        return payload
+
+
+def get_client(driver, lane: str) -> PortalClient:
+    """The client attached to this driver (created on first use)."""
+    client = getattr(driver, "_portal_http", None)
+    if client is None or client.lane != lane:
+        client = PortalClient(driver, lane)
+        driver._portal_http = client
+    return client
+
+
+def fetch_artifact(driver, lane: str, url: str, dest_path: str, content_type: str = "application/pdf") -> str:
+    """Shortcut for get_client(driver, lane).fetch_artifact(...)."""
+    return get_client(driver, lane).fetch_artifact(url, dest_path, content_type)
+
+
+def get_json(driver, lane: str, endpoint: str, **params) -> Any:
+    """Shortcut for get_client(driver, lane).get_json(...)."""
+    return get_client(driver, lane).get_json(endpoint, **params)
@@ -0,0 +1,306 @@
+"""
+Per-payer resource blocking for portal pages (CDP Network.setBlockedURLs).
+
+The portals load analytics, marketing tags, chat widgets, fonts and images
+that the workers never read. Every browser launched through
+chromedriver_service gets its payer's policy right after launch:
+
+- categories: which of CATEGORIES to block (RESOURCE_BLOCK_<LANE> overrides
+  the defaults, e.g. RESOURCE_BLOCK_DDMA=analytics,marketing,media,fonts).
+  Fonts and images stay loaded for the payers whose eligibility PDF is a
+  print of the page (DDMA, DentaQuest, United SCO, MassHealth).
+- search_only: categories blocked only while the worker searches
+  (searching(driver, True) ... searching(driver, False)). DeltaIns blocks
+  fonts and images on its patient search only: its login pages need them
+  (the cookie restore opens favicon.ico), and so does the benefits page,
+  which is printed when the summary download fails. A browser starts with
+  them unblocked.
+- allowlist: URL patterns that login / search must always reach (the
+  payer's own pages, SSO, captcha). Blocked patterns that cover an
+  allowlisted URL are never sent; and if a blocked request still turns out
+  to match the allowlist (a wildcard category like *.png hitting a captcha
+  image), that pattern is dropped for the lane on the spot and the policy
+  re-applied. tests/test_resource_policy.py checks each lane's login and
+  search URLs against the patterns a browser is given.
+
+RESOURCE_POLICY=block (default) blocks, =observe only classifies requests
+(no blocking - measures what the categories would cost), =off does nothing.
+
+Reporting (/status "resource_policy", /metrics): requests blocked per
+category; bytes those requests would have cost, estimated from the sizes
+seen in observe mode (or earlier unblocked loads); and average page load
+(PageWaits.page_ready / settled) per mode, whose difference is the time
+saved per page.
+
+Request interception (Fetch.requestPaused) would need a live DevTools
+listener answering every request of the page; setBlockedURLs needs no
+listener, so a stuck agent thread can never stall a portal page.
+"""
+import os
+import fnmatch
+import threading
+from typing import Dict, Any, List, Optional
+
+import agent_metrics
+
+RESOURCE_POLICY = os.getenv("RESOURCE_POLICY", "block").lower()  # block | observe | off
+
+# Wildcard URL patterns (setBlockedURLs syntax: '*' matches anything)
+CATEGORIES: Dict[str, List[str]] = {
+    "analytics": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*analytics.google.com*",
+        "*hotjar.com*", "*hotjar.io*", "*nr-data.net*", "*js-agent.newrelic.com*",
+        "*fullstory.com*", "*quantummetric.com*", "*clarity.ms*", "*mixpanel.com*",
+        "*heapanalytics.com*", "*cdn.segment.com*", "*api.segment.io*",
+        "*omtrdc.net*", "*demdex.net*", "*assets.adobedtm.com*", "*dynatrace.com*",
+    ],
+    "marketing": [
+        "*doubleclick.net*", "*googleadservices.com*", "*googlesyndication.com*",
+        "*connect.facebook.net*", "*bat.bing.com*", "*snap.licdn.com*", "*ads.linkedin.com*",
+        "*siteintercept.qualtrics.com*", "*intercom.io*", "*js.driftt.com*",
+        "*static.zdassets.com*", "*livechatinc.com*",
+    ],
+    "media": ["*.mp4", "*.mp4?*", "*.webm", "*.webm?*", "*.mp3", "*.mp3?*"],
+    "fonts": [
+        "*fonts.googleapis.com*", "*fonts.gstatic.com*", "*use.typekit.net*",
+        "*.woff", "*.woff?*", "*.woff2", "*.woff2?*", "*.ttf", "*.ttf?*", "*.otf", "*.otf?*",
+    ],
+    "images": [
+        "*.png", "*.png?*", "*.jpg", "*.jpg?*", "*.jpeg", "*.jpeg?*", "*.gif", "*.gif?*",
+        "*.webp", "*.webp?*", "*.ico", "*.ico?*",
+    ],
+}
+
+# Reached during login / search on every payer
+_COMMON_ALLOW = ["*recaptcha*", "*hcaptcha.com*", "*challenges.cloudflare.com*"]
+
+POLICIES: Dict[str, Dict[str, Any]] = {
+    "ddma": {
+        "categories": ["analytics", "marketing", "media"],
+        "allow": ["*providers.deltadentalma.com/*"],
+    },
+    "dentaquest": {
+        "categories": ["analytics", "marketing", "media"],
+        "allow": ["*providers.dentaquest.com/*"],
+    },
+    "unitedsco": {
+        "categories": ["analytics", "marketing", "media"],
+        "allow": ["*app.dentalhub.com/*"],
+    },
+    "deltains": {
+        "categories": ["analytics", "marketing", "media", "fonts", "images"],
+        "search_only": ["fonts", "images"],
+        "allow": ["*deltadentalins.com/ciam/*", "*okta*"],
+    },
+    "massdhp": {
+        "categories": ["analytics", "marketing", "media"],
+        "allow": ["*providers.massdhp.com/*"],
+    },
+}
+
+_lock = threading.Lock()
+# lane -> running totals (see stats())
+_stats: Dict[str, Dict[str, Any]] = {}
+# category -> [requests measured, bytes, load ms] from unblocked loads
+_observed: Dict[str, List[float]] = {}
+# lane -> patterns dropped after they blocked an allowlisted request
+_dropped: Dict[str, set] = {}
+
+
+def _lane_stats(lane: str) -> Dict[str, Any]:
+    return _stats.setdefault(lane, {
+        "blocked_requests": 0,
+        "blocked_by_category": {},
+        "blocked_bytes_estimated": 0,
+        "allowlist_violations": 0,
+        "page_loads": {"block": [0, 0.0], "observe": [0, 0.0]},
+    })
+
+
+def _sample_url(pattern: str) -> str:
+    return pattern.replace("*", "x")
+
+
+def _covers_allowlisted(pattern: str, allow: List[str]) -> bool:
+    """Would `pattern` block a URL the allowlist must keep reachable?"""
+    return any(
+        fnmatch.fnmatchcase(_sample_url(a), pattern) or fnmatch.fnmatchcase(_sample_url(pattern), a)
+        for a in allow
+    )
+
+
+def categories_for(lane: str) -> List[str]:
+    override = os.getenv(f"RESOURCE_BLOCK_{lane.upper()}")
+    if override is not None:
+        return [c.strip() for c in override.split(",") if c.strip() in CATEGORIES]
+    return list(POLICIES.get(lane, {}).get("categories", ["analytics", "marketing"]))
+
+
+def allowlist_for(lane: str) -> List[str]:
+    return _COMMON_ALLOW + list(POLICIES.get(lane, {}).get("allow", []))
+
+
+def search_only_for(lane: str) -> List[str]:
+    return [c for c in POLICIES.get(lane, {}).get("search_only", []) if c in categories_for(lane)]
+
+
+def blocked_patterns(lane: str, searching: bool = True) -> List[str]:
+    """Patterns a browser of `lane` blocks (without search_only ones when not searching)."""
+    allow = allowlist_for(lane)
+    dropped = _dropped.get(lane, set())
+    skip = () if searching else search_only_for(lane)
+    return [
+        p for c in categories_for(lane) if c not in skip for p in CATEGORIES[c]
+        if p not in dropped and not _covers_allowlisted(p, allow)
+    ]
+
+
+def classify(url: str, categories: Optional[List[str]] = None) -> Optional[str]:
+    """Category whose patterns match `url` (None if it would load)."""
+    for category in categories or CATEGORIES:
+        for pattern in CATEGORIES[category]:
+            if fnmatch.fnmatchcase(url, pattern):
+                return category
+    return None
+
+
+class _DriverPolicy:
+    """Policy state of one browser; fed from its NetworkTracker events."""
+
+    def __init__(self, driver, lane: str):
+        self.driver = driver
+        self.lane = lane
+        self.mode = RESOURCE_POLICY
+        self.categories = categories_for(lane)
+        self.allow = allowlist_for(lane)
+        self.searching = False  # search_only categories load until searching(driver, True)
+        self._requests: Dict[str, tuple] = {}  # requestId -> (category, url, started)
+
+    def apply(self):
+        patterns = blocked_patterns(self.lane, self.searching) if self.mode == "block" else []
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        return patterns
+
+    def on_event(self, method: str, params: dict):
+        if method == "Network.requestWillBeSent":
+            url = params.get("request", {}).get("url", "")
+            category = classify(url, self.categories)
+            if category is not None:
+                if len(self._requests) > 1000:
+                    self._requests.clear()  # requests abandoned by navigations
+                self._requests[params.get("requestId")] = (category, url, params.get("timestamp", 0))
+        elif method == "Network.loadingFinished":
+            entry = self._requests.pop(params.get("requestId"), None)
+            if entry is not None:
+                category, _, started = entry
+                # CDP timestamps (seconds) - events are only read when the tracker polls
+                elapsed_ms = max(0.0, (params.get("timestamp", 0) - started) * 1000)
+                with _lock:
+                    seen = _observed.setdefault(category, [0, 0.0, 0.0])
+                    seen[0] += 1
+                    seen[1] += params.get("encodedDataLength", 0) or 0
+                    seen[2] += elapsed_ms
+        elif method == "Network.loadingFailed":
+            entry = self._requests.pop(params.get("requestId"), None)
+            if entry is not None and params.get("blockedReason") == "inspector":
+                self._blocked(*entry[:2])
+
+    def _blocked(self, category: str, url: str):
+        if any(fnmatch.fnmatchcase(url, a) for a in self.allow):
+            self._allowlist_violation(category, url)
+            return
+        with _lock:
+            stats = _lane_stats(self.lane)
+            stats["blocked_requests"] += 1
+            stats["blocked_by_category"][category] = stats["blocked_by_category"].get(category, 0) + 1
+            seen = _observed.get(category)
+            estimated = int(seen[1] / seen[0]) if seen and seen[0] else 0
+            stats["blocked_bytes_estimated"] += estimated
+        agent_metrics.RESOURCES_BLOCKED.inc(browser=self.lane, category=category)
+        if estimated:
+            agent_metrics.BLOCKED_BYTES_ESTIMATED.inc(estimated, browser=self.lane)
+
+    def _allowlist_violation(self, category: str, url: str):
+        patterns = [p for p in CATEGORIES[category] if fnmatch.fnmatchcase(url, p)]
+        with _lock:
+            _lane_stats(self.lane)["allowlist_violations"] += 1
+            _dropped.setdefault(self.lane, set()).update(patterns)
+        agent_metrics.RESOURCE_POLICY_VIOLATIONS.inc(browser=self.lane)
+        print(f"[resource_policy] {self.lane}: blocked allowlisted {url} - no longer blocking {patterns}")
+        try:
+            self.apply()
+        except Exception as e:
+            print(f"[resource_policy] {self.lane}: could not re-apply policy: {e}")
+
+    def record_page_load(self, seconds: float):
+        with _lock:
+            loads = _lane_stats(self.lane)["page_loads"].setdefault(self.mode, [0, 0.0])
+            loads[0] += 1
+            loads[1] += seconds * 1000
+
+
+def apply_policy(driver, lane: str):
+    """Block `lane`'s policy categories in this browser (see RESOURCE_POLICY)."""
+    if RESOURCE_POLICY == "off" or not driver:
+        return
+    from page_waits import get_network_tracker
+
+    policy = _DriverPolicy(driver, lane)
+    try:
+        patterns = policy.apply()
+    except Exception as e:
+        print(f"[resource_policy] {lane}: could not apply policy: {e}")
+        return
+    driver._resource_policy = policy
+    get_network_tracker(driver).add_listener(policy.on_event)
+    if patterns:
+        print(f"[resource_policy] {lane}: blocking {', '.join(policy.categories)} ({len(patterns)} patterns)")
+
+
+def searching(driver, active: bool):
+    """
+    Block the lane's search_only categories while the worker searches
+    (active=True), load them again for login / a page to be printed (False).
+    """
+    policy = getattr(driver, "_resource_policy", None)
+    if policy is None or policy.searching == active or not search_only_for(policy.lane):
+        return
+    policy.searching = active
+    try:
+        policy.apply()
+    except Exception as e:
+        print(f"[resource_policy] {policy.lane}: could not re-apply policy: {e}")
+
+
+def record_page_load(driver, seconds: float):
+    """Called by PageWaits when a page finished loading (feeds the time-saved estimate)."""
+    policy = getattr(driver, "_resource_policy", None)
+    if policy is not None:
+        policy.record_page_load(seconds)
+
+
+def stats() -> Dict[str, Any]:
+    """Per-lane blocking totals and page-load averages, as served by /status."""
+    with _lock:
+        out: Dict[str, Any] = {"mode": RESOURCE_POLICY, "lanes": {}}
+        for lane, s in _stats.items():
+            avg = {
+                mode: round(total / n, 1) for mode, (n, total) in s["page_loads"].items() if n
+            }
+            saved = round(avg["observe"] - avg["block"], 1) if "observe" in avg and "block" in avg else None
+            out["lanes"][lane] = {
+                "categories": categories_for(lane),
+                "blocked_requests": s["blocked_requests"],
+                "blocked_by_category": dict(s["blocked_by_category"]),
+                "blocked_bytes_estimated": s["blocked_bytes_estimated"],
+                "allowlist_violations": s["allowlist_violations"],
+                "dropped_patterns": sorted(_dropped.get(lane, ())),
+                "avg_page_load_ms": avg,
+                "page_load_saved_ms": saved,
+            }
+        out["observed"] = {
+            category: {"requests": int(n), "avg_bytes": int(b / n), "avg_ms": round(ms / n, 1)}
+            for category, (n, b, ms) in _observed.items() if n
+        }
+        return out
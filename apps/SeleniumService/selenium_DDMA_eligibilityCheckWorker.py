@@ -1,16 +1,17 @@
 from selenium import webdriver
-from selenium.common.exceptions import WebDriverException, TimeoutException
-from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import time
 import os
-import base64
+import tracing
 
 from ddma_browser_manager import get_browser_manager
+from page_waits import PageWaits
+from job_downloads import JobDownloads
+import api_capture
+import page_parsers
+import pdf_render
 
 class AutomationDeltaDentalMAEligibilityCheck:    
     def __init__(self, data):
@@ -27,10 +28,37 @@ class AutomationDeltaDentalMAEligibilityCheck:
         self.lastName = self.data.get("lastName", "")
         self.massddma_username = self.data.get("massddmaUsername", "")
         self.massddma_password = self.data.get("massddmaPassword", "")
+        # mode=quick: status / member ID / name from the search results only (no detail page, no PDF)
+        self.quick = self.data.get("mode") == "quick"
 
-        # Use browser manager's download dir
-        self.download_dir = get_browser_manager().download_dir
-        os.makedirs(self.download_dir, exist_ok=True)
+        # This job's own folder under the browser manager's download dir (see job_downloads.py)
+        self.downloads = JobDownloads(get_browser_manager().download_dir, "DDMA")
+        self.download_dir = self.downloads.dir
+
+        # Batch runs keep the browser open between patients (see load_patient)
+        self.keep_browser_open = False
+
+        # Condition-driven waits, timed per step (reported with the step2 result)
+        self.waits = PageWaits(lambda: self.driver, "DDMA")
+
+        # JSON responses captured between step1 and step2 (see api_capture.py)
+        self.api_capture = None
+
+    def load_patient(self, patient):
+        """Switch to the next patient of a batch (same browser and login)."""
+        self.data = {**self.data, **(patient or {})}
+        self.memberId = self.data.get("memberId", "")
+        self.dateOfBirth = self.data.get("dateOfBirth", "")
+        self.firstName = self.data.get("firstName", "")
+        self.lastName = self.data.get("lastName", "")
+        self.quick = self.data.get("mode") == "quick"
+        self.waits.reset()
+        self.waits.begin("load_patient")
+        # step2 leaves us on the member's detail page - back to member search
+        self.driver.get("https://providers.deltadentalma.com/members")
+        self.waits.wait(30).until(
+            EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
+        )
 
     def config_driver(self):
         # Use persistent browser from manager (keeps device trust tokens)
@@ -45,7 +73,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
             # First try to click logout button if visible
             try:
                 self.driver.get("https://providers.deltadentalma.com/")
-                time.sleep(2)
+                self.waits.page_ready()
                 
                 logout_selectors = [
                     "//button[contains(text(), 'Log out') or contains(text(), 'Logout') or contains(text(), 'Sign out')]",
@@ -56,12 +84,12 @@ class AutomationDeltaDentalMAEligibilityCheck:
                 
                 for selector in logout_selectors:
                     try:
-                        logout_btn = WebDriverWait(self.driver, 3).until(
+                        logout_btn = self.waits.wait(3).until(
                             EC.element_to_be_clickable((By.XPATH, selector))
                         )
                         logout_btn.click()
                         print("[DDMA login] Clicked logout button")
-                        time.sleep(2)
+                        self.waits.network_idle()
                         break
                     except TimeoutException:
                         continue
@@ -83,7 +111,8 @@ class AutomationDeltaDentalMAEligibilityCheck:
             return False
 
     def login(self, url):
-        wait = WebDriverWait(self.driver, 30)
+        self.waits.begin("login")
+        wait = self.waits.wait(30)
         browser_manager = get_browser_manager()
         
         try:
@@ -91,7 +120,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
             if self.massddma_username and browser_manager.credentials_changed(self.massddma_username):
                 self._force_logout()
                 self.driver.get(url)
-                time.sleep(2)
+                self.waits.page_ready()
             
             # First check if we're already on a logged-in page (from previous run)
             try:
@@ -108,7 +137,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
                     if "member" not in current_url.lower():
                         # Try to find a link to member search or just check for search input
                         try:
-                            member_search = WebDriverWait(self.driver, 5).until(
+                            member_search = self.waits.wait(5).until(
                                 EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
                             )
                             print("[login] Found member search input - returning ALREADY_LOGGED_IN")
@@ -118,11 +147,11 @@ class AutomationDeltaDentalMAEligibilityCheck:
                             members_url = "https://providers.deltadentalma.com/members"
                             print(f"[login] Navigating to members page: {members_url}")
                             self.driver.get(members_url)
-                            time.sleep(2)
+                            self.waits.page_ready()
                     
                     # Verify we have the member search input
                     try:
-                        member_search = WebDriverWait(self.driver, 5).until(
+                        member_search = self.waits.wait(5).until(
                             EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
                         )
                         print("[login] Member search found - ALREADY_LOGGED_IN")
@@ -134,7 +163,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
             
             # Navigate to login URL
             self.driver.get(url)
-            time.sleep(2)  # Wait for page to load and any redirects
+            self.waits.page_ready()  # Wait for page to load and any redirects
             
             # Check if we got redirected to member search (session still valid)
             try:
@@ -142,7 +171,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
                 print(f"[login] URL after navigation: {current_url}")
                 
                 if "onboarding" not in current_url.lower():
-                    member_search = WebDriverWait(self.driver, 3).until(
+                    member_search = self.waits.wait(3).until(
                         EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
                     )
                     if member_search:
@@ -154,15 +183,16 @@ class AutomationDeltaDentalMAEligibilityCheck:
             # Dismiss any "Authentication flow continued in another tab" modal
             modal_dismissed = False
             try:
-                ok_button = WebDriverWait(self.driver, 3).until(
+                ok_button = self.waits.wait(3).until(
                     EC.element_to_be_clickable((By.XPATH, "//button[normalize-space(text())='Ok' or normalize-space(text())='OK']"))
                 )
+                known_windows = len(self.driver.window_handles)
                 ok_button.click()
                 print("[login] Dismissed authentication modal")
                 modal_dismissed = True
-                time.sleep(2)
                 
                 # Check if a popup window opened for authentication
+                self.waits.new_window(known_windows, timeout=2)
                 all_windows = self.driver.window_handles
                 print(f"[login] Windows after modal dismiss: {len(all_windows)}")
                 
@@ -177,7 +207,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
                     
                     # Look for OTP input in the popup
                     try:
-                        otp_candidate = WebDriverWait(self.driver, 10).until(
+                        otp_candidate = self.waits.wait(10).until(
                             EC.presence_of_element_located(
                                 (By.XPATH, "//input[contains(@aria-lable,'Verification code') or contains(@placeholder,'Enter your verification code') or contains(@aria-label,'Verification code')]")
                             )
@@ -194,10 +224,9 @@ class AutomationDeltaDentalMAEligibilityCheck:
             
             # If modal was dismissed but no popup, page might have changed - wait and check
             if modal_dismissed:
-                time.sleep(2)
                 # Check if we're now on member search page (already authenticated)
                 try:
-                    member_search = WebDriverWait(self.driver, 5).until(
+                    member_search = self.waits.wait(7).until(
                         EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
                     )
                     if member_search:
@@ -208,7 +237,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
             
             # Try to fill login form
             try:
-                email_field = WebDriverWait(self.driver, 10).until(
+                email_field = self.waits.wait(10).until(
                     EC.element_to_be_clickable((By.XPATH, "//input[@name='username' and @type='text']"))
                 )
             except TimeoutException:
@@ -241,7 +270,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
 
             # OTP detection - wait up to 30 seconds for OTP input to appear
             try:
-                otp_candidate = WebDriverWait(self.driver, 30).until(
+                otp_candidate = self.waits.wait(30).until(
                     EC.presence_of_element_located(
                         (By.XPATH, "//input[contains(@aria-lable,'Verification code') or contains(@placeholder,'Enter your verification code')]")
                     )
@@ -255,7 +284,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
                 try:
                     current_url = self.driver.current_url.lower()
                     if "member" in current_url or "dashboard" in current_url:
-                        member_search = WebDriverWait(self.driver, 5).until(
+                        member_search = self.waits.wait(5).until(
                             EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
                         )
                         print("[login] Login successful - now on member search page")
@@ -265,7 +294,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
                 
                 # Check for error messages on page
                 try:
-                    error_elem = WebDriverWait(self.driver, 3).until(
+                    error_elem = self.waits.wait(3).until(
                         EC.presence_of_element_located((By.XPATH, "//*[contains(@class,'error') or contains(text(),'invalid') or contains(text(),'failed')]"))
                     )
                     print(f"[login] Login failed - error detected: {error_elem.text}")
@@ -287,7 +316,10 @@ class AutomationDeltaDentalMAEligibilityCheck:
 
     def step1(self):
         """Fill search form with all available fields (flexible search)"""
-        wait = WebDriverWait(self.driver, 30)
+        self.waits.begin("step1")
+        wait = self.waits.wait(30)
+        # Record the search API's JSON responses for step2 (no-op unless API_CAPTURE=1)
+        self.api_capture = api_capture.start_capture(self.driver, "DDMA")
 
         try:
             # Log what fields are available
@@ -318,7 +350,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
                     member_id_input.clear()
                     member_id_input.send_keys(self.memberId)
                     print(f"[DDMA step1] Entered Member ID: {self.memberId}")
-                    time.sleep(0.2)
+                    self.waits.condition(lambda d: member_id_input.get_attribute("value") == self.memberId, timeout=2)
                 except Exception as e:
                     print(f"[DDMA step1] Warning: Could not fill Member ID: {e}")
 
@@ -341,9 +373,9 @@ class AutomationDeltaDentalMAEligibilityCheck:
                     year_elem = dob_container.find_element(By.XPATH, ".//span[@data-type='year' and @contenteditable='true']")
 
                     replace_with_sendkeys(month_elem, month)
-                    time.sleep(0.05)
+                    tracing.sleep(0.05)
                     replace_with_sendkeys(day_elem, day)
-                    time.sleep(0.05)
+                    tracing.sleep(0.05)
                     replace_with_sendkeys(year_elem, year)
                     print(f"[DDMA step1] Filled DOB: {month}/{day}/{year}")
                 except Exception as e:
@@ -358,7 +390,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
                     first_name_input.clear()
                     first_name_input.send_keys(self.firstName)
                     print(f"[DDMA step1] Entered First Name: {self.firstName}")
-                    time.sleep(0.2)
+                    self.waits.condition(lambda d: first_name_input.get_attribute("value") == self.firstName, timeout=2)
                 except Exception as e:
                     print(f"[DDMA step1] Warning: Could not fill First Name: {e}")
 
@@ -371,31 +403,29 @@ class AutomationDeltaDentalMAEligibilityCheck:
                     last_name_input.clear()
                     last_name_input.send_keys(self.lastName)
                     print(f"[DDMA step1] Entered Last Name: {self.lastName}")
-                    time.sleep(0.2)
+                    self.waits.condition(lambda d: last_name_input.get_attribute("value") == self.lastName, timeout=2)
                 except Exception as e:
                     print(f"[DDMA step1] Warning: Could not fill Last Name: {e}")
 
-            time.sleep(0.3)
-
             # Click Search button
             continue_btn = wait.until(EC.element_to_be_clickable(
                 (By.XPATH, '//button[@data-testid="member-search_search-button"]')
             ))
+            previous_rows = self.driver.find_elements(By.XPATH, "//tbody//tr")
             continue_btn.click()
             print("[DDMA step1] Clicked Search button")
-            
-            time.sleep(5)
-            
-            # Check for error message
-            try:
-                error_msg = WebDriverWait(self.driver, 5).until(EC.presence_of_element_located(
-                    (By.XPATH, '//div[@data-testid="member-search-result-no-results"]')
-                ))
-                if error_msg:
-                    print("[DDMA step1] Error: No results found")
-                    return "ERROR: INVALID SEARCH CRITERIA"
-            except TimeoutException:
-                pass
+
+            # Wait for this search's outcome: result rows or the no-results message
+            if previous_rows:
+                self.waits.staleness(previous_rows[0], timeout=5)
+            matched, _ = self.waits.any_of([
+                (By.XPATH, "//tbody//tr"),
+                (By.XPATH, '//div[@data-testid="member-search-result-no-results"]'),
+            ], timeout=15)
+            if matched == 1:
+                print("[DDMA step1] Error: No results found")
+                return "ERROR: INVALID SEARCH CRITERIA"
+            self.waits.network_idle(timeout=5)
 
             print("[DDMA step1] Search completed successfully")
             return "Success"
@@ -406,12 +436,14 @@ class AutomationDeltaDentalMAEligibilityCheck:
 
     
     def step2(self):
-        wait = WebDriverWait(self.driver, 90)
+        self.waits.begin("step2")
+        self.downloads.begin()
+        wait = self.waits.wait(90)
 
         try:
             # Wait for results table to load
             try:
-                WebDriverWait(self.driver, 10).until(
+                self.waits.wait(10).until(
                     EC.presence_of_element_located((By.XPATH, "//tbody//tr"))
                 )
             except TimeoutException:
@@ -421,132 +453,66 @@ class AutomationDeltaDentalMAEligibilityCheck:
             eligibilityText = "unknown"
             foundMemberId = ""
             patientName = ""
-            
-            # Extract data from first row
+
             import re
-            try:
-                first_row = self.driver.find_element(By.XPATH, "(//tbody//tr)[1]")
-                row_text = first_row.text.strip()
-                print(f"[DDMA step2] First row text: {row_text[:150]}...")
-                
-                if row_text:
-                    lines = row_text.split('\n')
-                    
-                    # Extract patient name (first line, before "DOB:")
-                    if lines:
-                        potential_name = lines[0].strip()
-                        # Remove DOB if included in the name
-                        potential_name = re.sub(r'\s*DOB[:\s]*\d{1,2}/\d{1,2}/\d{2,4}\s*', '', potential_name, flags=re.IGNORECASE).strip()
-                        if potential_name and not potential_name.startswith('DOB') and not potential_name.isdigit():
-                            patientName = potential_name
-                            print(f"[DDMA step2] Extracted patient name from row: '{patientName}'")
-                    
-                    # Extract Member ID (usually a numeric/alphanumeric ID on its own line)
-                    for line in lines:
-                        line = line.strip()
-                        if line and re.match(r'^[A-Z0-9]{5,}$', line) and not line.startswith('DOB'):
-                            foundMemberId = line
-                            print(f"[DDMA step2] Extracted Member ID from row: {foundMemberId}")
-                            break
-                    
+            # The whole results page in one round trip; parsed locally (page_parsers)
+            current_url_before = self.driver.current_url
+            results = page_parsers.ddma_search_results(self.driver.page_source, current_url_before)
+
+            # Member data straight from the portal's search API (API_CAPTURE=1)
+            harvested = api_capture.harvest(self.api_capture, self.memberId, self.lastName, "DDMA")
+            self.api_capture = None
+            if harvested:
+                eligibilityText = harvested["eligibility"].strip().lower()
+                foundMemberId = harvested["memberId"]
+                patientName = harvested["patientName"]
+            else:
+                print(f"[DDMA step2] First row text: {results['rowText'][:150]}...")
+                patientName = results["patientName"]
+                if patientName:
+                    print(f"[DDMA step2] Extracted patient name from row: '{patientName}'")
+                foundMemberId = results["memberId"]
+                if foundMemberId:
+                    print(f"[DDMA step2] Extracted Member ID from row: {foundMemberId}")
+                elif self.memberId:
                     # Fallback: use input memberId if not found
-                    if not foundMemberId and self.memberId:
-                        foundMemberId = self.memberId
-                        print(f"[DDMA step2] Using input Member ID: {foundMemberId}")
-                        
-            except Exception as e:
-                print(f"[DDMA step2] Error extracting data from row: {e}")
-                if self.memberId:
                     foundMemberId = self.memberId
-            
-            # Extract eligibility status
-            try:
-                short_wait = WebDriverWait(self.driver, 3)
-                status_link = short_wait.until(EC.presence_of_element_located((
-                    By.XPATH,
-                    "(//tbody//tr)[1]//a[contains(@href, 'member-eligibility-search')]"
-                )))
-                eligibilityText = status_link.text.strip().lower()
-                print(f"[DDMA step2] Found eligibility status: {eligibilityText}")
-            except Exception as e:
-                print(f"[DDMA step2] Eligibility link not found, trying alternative...")
-                try:
-                    alt_status = self.driver.find_element(By.XPATH, "//*[contains(text(),'Active') or contains(text(),'Inactive') or contains(text(),'Eligible')]")
-                    eligibilityText = alt_status.text.strip().lower()
-                    if "active" in eligibilityText or "eligible" in eligibilityText:
-                        eligibilityText = "active"
-                    elif "inactive" in eligibilityText:
-                        eligibilityText = "inactive"
-                    print(f"[DDMA step2] Found eligibility via alternative: {eligibilityText}")
-                except:
-                    pass
+                    print(f"[DDMA step2] Using input Member ID: {foundMemberId}")
+                if results["eligibility"]:
+                    eligibilityText = results["eligibility"]
+                    print(f"[DDMA step2] Found eligibility status: {eligibilityText}")
+                else:
+                    print("[DDMA step2] Eligibility status not found in results")
 
-            # 2) Click on patient name to navigate to detailed patient page
-            print("[DDMA step2] Clicking on patient name to open detailed page...")
+            if self.quick:
+                return self._quick_result(eligibilityText, foundMemberId or self.memberId, patientName)
+
+            # 2) Navigate to the detailed patient page
+            print("[DDMA step2] Opening detailed patient page...")
             patient_name_clicked = False
             # Note: Don't reset patientName here - preserve the name extracted from row above
-            
-            # First, let's print what we see on the page for debugging
-            current_url_before = self.driver.current_url
             print(f"[DDMA step2] Current URL before click: {current_url_before}")
-            
-            # Try to find all links in the first row and print them for debugging
-            try:
-                all_links = self.driver.find_elements(By.XPATH, "(//tbody//tr)[1]//a")
-                print(f"[DDMA step2] Found {len(all_links)} links in first row:")
-                for i, link in enumerate(all_links):
-                    href = link.get_attribute("href") or "no-href"
-                    text = link.text.strip() or "(empty text)"
-                    print(f"  Link {i}: href={href[:80]}..., text={text}")
-            except Exception as e:
-                print(f"[DDMA step2] Error listing links: {e}")
-            
-            # Find the patient detail link and navigate DIRECTLY to it
-            detail_url = None
-            patient_link_selectors = [
-                "(//table//tbody//tr)[1]//td[1]//a",  # First column link
-                "(//tbody//tr)[1]//a[contains(@href, 'member-details')]",  # member-details link
-                "(//tbody//tr)[1]//a[contains(@href, 'member')]",  # Any member link
-            ]
-            
-            for selector in patient_link_selectors:
-                try:
-                    patient_link = WebDriverWait(self.driver, 5).until(
-                        EC.presence_of_element_located((By.XPATH, selector))
-                    )
-                    link_text = patient_link.text.strip()
-                    href = patient_link.get_attribute("href")
-                    print(f"[DDMA step2] Found patient link: text='{link_text}', href={href}")
-                    
-                    # Only update patientName if link has text (preserve previously extracted name)
-                    if link_text and not patientName:
-                        patientName = link_text
-                    
-                    if href and "member-details" in href:
-                        detail_url = href
-                        patient_name_clicked = True
-                        print(f"[DDMA step2] Will navigate directly to: {detail_url}")
-                        break
-                except Exception as e:
-                    print(f"[DDMA step2] Selector '{selector}' failed: {e}")
-                    continue
-            
-            if not detail_url:
-                # Fallback: Try to find ANY link to member-details
-                try:
-                    all_links = self.driver.find_elements(By.XPATH, "//a[contains(@href, 'member-details')]")
-                    if all_links:
-                        detail_url = all_links[0].get_attribute("href")
-                        patient_name_clicked = True
-                        print(f"[DDMA step2] Found member-details link: {detail_url}")
-                except Exception as e:
-                    print(f"[DDMA step2] Could not find member-details link: {e}")
+
+            print(f"[DDMA step2] Found {len(results['links'])} links in first row:")
+            for i, (href, text) in enumerate(results["links"]):
+                print(f"  Link {i}: href={(href or 'no-href')[:80]}..., text={text or '(empty text)'}")
+
+            # Only update patientName if the link has text (preserve previously extracted name)
+            if results["linkName"] and not patientName:
+                patientName = results["linkName"]
+
+            detail_url = results["detailUrl"]
+            if detail_url:
+                patient_name_clicked = True
+                print(f"[DDMA step2] Will navigate directly to: {detail_url}")
+            else:
+                print("[DDMA step2] Could not find member-details link")
             
             # Navigate to detail page DIRECTLY instead of clicking (which may open new tab/fail)
             if patient_name_clicked and detail_url:
                 print(f"[DDMA step2] Navigating directly to detail page: {detail_url}")
                 self.driver.get(detail_url)
-                time.sleep(3)  # Wait for page to load
+                self.waits.page_ready()  # Wait for page to load (and SPA redirects)
                 
                 current_url_after = self.driver.current_url
                 print(f"[DDMA step2] Current URL after navigation: {current_url_after}")
@@ -558,7 +524,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
                 
                 # Wait for page to be ready
                 try:
-                    WebDriverWait(self.driver, 30).until(
+                    self.waits.wait(30).until(
                         lambda d: d.execute_script("return document.readyState") == "complete"
                     )
                 except Exception:
@@ -576,7 +542,7 @@ class AutomationDeltaDentalMAEligibilityCheck:
                 ]
                 for selector in content_selectors:
                     try:
-                        WebDriverWait(self.driver, 10).until(
+                        self.waits.wait(10).until(
                             EC.presence_of_element_located((By.XPATH, selector))
                         )
                         content_loaded = True
@@ -588,8 +554,8 @@ class AutomationDeltaDentalMAEligibilityCheck:
                 if not content_loaded:
                     print("[DDMA step2] Warning: Could not verify content loaded, waiting extra time...")
                 
-                # Additional wait for dynamic content and animations
-                time.sleep(5)  # Increased from 2 to 5 seconds
+                # Wait for dynamic content to finish loading and rendering
+                self.waits.settled()
                 
                 # Print page title for debugging
                 try:
@@ -600,32 +566,14 @@ class AutomationDeltaDentalMAEligibilityCheck:
                 
                 # Try to extract patient name from detailed page if not already found
                 if not patientName:
-                    detail_name_selectors = [
-                        "//h1",
-                        "//h2",
-                        "//*[contains(@class,'patient-name') or contains(@class,'member-name')]",
-                        "//div[contains(@class,'header')]//span",
-                    ]
-                    for selector in detail_name_selectors:
-                        try:
-                            name_elem = self.driver.find_element(By.XPATH, selector)
-                            name_text = name_elem.text.strip()
-                            if name_text and len(name_text) > 1:
-                                if not any(x in name_text.lower() for x in ['active', 'inactive', 'eligible', 'search', 'date', 'print']):
-                                    patientName = name_text
-                                    print(f"[DDMA step2] Found patient name on detail page: {patientName}")
-                                    break
-                        except:
-                            continue
+                    patientName = page_parsers.detail_page_name(self.driver.page_source)
+                    if patientName:
+                        print(f"[DDMA step2] Found patient name on detail page: {patientName}")
             else:
                 print("[DDMA step2] Warning: Could not click on patient, capturing search results page")
                 # Still try to get patient name from search results if not already found
                 if not patientName:
-                    try:
-                        name_elem = self.driver.find_element(By.XPATH, "(//tbody//tr)[1]//td[1]")
-                        patientName = name_elem.text.strip()
-                    except:
-                        pass
+                    patientName = results["firstCell"]
 
             if not patientName:
                 print("[DDMA step2] Could not extract patient name")
@@ -634,48 +582,35 @@ class AutomationDeltaDentalMAEligibilityCheck:
 
             # Wait for page to fully load before generating PDF
             try:
-                WebDriverWait(self.driver, 30).until(
+                self.waits.wait(30).until(
                     lambda d: d.execute_script("return document.readyState") == "complete"
                 )
             except Exception:
                 pass
             
-            time.sleep(1)
+            self.waits.settled(timeout=5)
 
             # Generate PDF of the detailed patient page using Chrome DevTools Protocol
             print("[DDMA step2] Generating PDF of patient detail page...")
             
-            pdf_options = {
-                "landscape": False,
-                "displayHeaderFooter": False,
-                "printBackground": True,
-                "preferCSSPageSize": True,
-                "paperWidth": 8.5,  # Letter size in inches
-                "paperHeight": 11,
-                "marginTop": 0.4,
-                "marginBottom": 0.4,
-                "marginLeft": 0.4,
-                "marginRight": 0.4,
-                "scale": 0.9,  # Slightly scale down to fit content
-            }
-            
-            result = self.driver.execute_cdp_cmd("Page.printToPDF", pdf_options)
-            pdf_data = base64.b64decode(result.get('data', ''))
+            # Letter size, slightly scaled down to fit content (pdf_capture.DEFAULT_PDF_OPTIONS);
+            # snapshotted here, rendered by the background pool (pdf_render.py)
             # Use foundMemberId for filename if available, otherwise fall back to input memberId
             pdf_id = foundMemberId or self.memberId or "unknown"
-            pdf_path = os.path.join(self.download_dir, f"eligibility_{pdf_id}.pdf")
-            with open(pdf_path, "wb") as f:
-                f.write(pdf_data)
+            pdf_path = pdf_render.snapshot_to_pdf(
+                self.driver, os.path.join(self.download_dir, f"eligibility_{pdf_id}.pdf")
+            )
 
             print(f"[DDMA step2] PDF saved at: {pdf_path}")
             
             # Close the browser window after PDF generation (session preserved in profile)
-            try:
-                from ddma_browser_manager import get_browser_manager
-                get_browser_manager().quit_driver()
-                print("[step2] Browser closed - session preserved in profile")
-            except Exception as e:
-                print(f"[step2] Error closing browser: {e}")
+            if not self.keep_browser_open:
+                try:
+                    from ddma_browser_manager import get_browser_manager
+                    get_browser_manager().quit_driver()
+                    print("[step2] Browser closed - session preserved in profile")
+                except Exception as e:
+                    print(f"[step2] Error closing browser: {e}")
             
             # Clean patient name - remove DOB if it was included (already cleaned above but double check)
             if patientName:
@@ -693,37 +628,42 @@ class AutomationDeltaDentalMAEligibilityCheck:
                     "ss_path": pdf_path,  # Keep key as ss_path for backward compatibility
                     "pdf_path": pdf_path,  # Also add explicit pdf_path
                     "patientName": patientName,
-                    "memberId": foundMemberId  # Include extracted Member ID
+                    "memberId": foundMemberId,  # Include extracted Member ID
+                    "waits": self.waits.report(),
                 }
             return output
         except Exception as e:
             print("ERROR in step2:", e)
-            # Empty the download folder (remove files / symlinks only)
-            try:
-                dl = os.path.abspath(self.download_dir)
-                if os.path.isdir(dl):
-                    for name in os.listdir(dl):
-                        item = os.path.join(dl, name)
-                        try:
-                            if os.path.isfile(item) or os.path.islink(item):
-                                os.remove(item)
-                                print(f"[cleanup] removed: {item}")
-                        except Exception as rm_err:
-                            print(f"[cleanup] failed to remove {item}: {rm_err}")
-                    print(f"[cleanup] emptied download dir: {dl}")
-                else:
-                    print(f"[cleanup] download dir does not exist: {dl}")
-            except Exception as cleanup_exc:
-                print(f"[cleanup] unexpected error while cleaning downloads dir: {cleanup_exc}")
+            # Remove this patient's partial files (other jobs' files are untouched)
+            self.downloads.discard()
             return {"status": "error", "message": str(e)}
 
         # NOTE: Do NOT quit driver here - keep browser alive for next patient
 
+    def _quick_result(self, eligibility, member_id, patient_name):
+        """mode=quick: finish with what the search results showed - no detail page, no PDF."""
+        if not self.keep_browser_open:
+            try:
+                get_browser_manager().quit_driver()
+                print("[step2] Browser closed - session preserved in profile")
+            except Exception as e:
+                print(f"[step2] Error closing browser: {e}")
+        # Nothing was written for this patient (the empty job folder goes at job end)
+        self.downloads.discard()
+        print(f"[DDMA step2] Quick check - Eligibility: '{eligibility}', MemberID: '{member_id}'")
+        return {
+            "status": "success",
+            "mode": "quick",
+            "eligibility": eligibility,
+            "patientName": patient_name,
+            "memberId": member_id,
+            "waits": self.waits.report(),
+        }
+
     def main_workflow(self, url):
         try: 
             self.config_driver()
             self.driver.maximize_window()
-            time.sleep(3)
 
             login_result = self.login(url)
             if login_result.startswith("ERROR"):
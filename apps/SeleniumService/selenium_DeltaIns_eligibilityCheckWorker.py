@@ -1,18 +1,19 @@
 from selenium import webdriver
-from selenium.common.exceptions import WebDriverException, TimeoutException
-from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import time
 import os
-import base64
+import time
 import re
-import glob
 
 from deltains_browser_manager import get_browser_manager
+from page_waits import PageWaits
+from job_downloads import JobDownloads
+import portal_http
+import page_parsers
+import pdf_render
+import resource_policy
 
 LOGIN_URL = "https://www.deltadentalins.com/ciam/login?TARGET=%2Fprovider-tools%2Fv2"
 PROVIDER_TOOLS_URL = "https://www.deltadentalins.com/provider-tools/v2"
@@ -31,21 +32,41 @@ class AutomationDeltaInsEligibilityCheck:
         self.lastName = self.data.get("lastName", "")
         self.deltains_username = self.data.get("deltains_username", "")
         self.deltains_password = self.data.get("deltains_password", "")
+        # mode=quick: status / name from the search's patient card only (no benefits page, no PDF)
+        self.quick = self.data.get("mode") == "quick"
+
+        # This job's own folder under the browser manager's download dir (see job_downloads.py)
+        self.downloads = JobDownloads(get_browser_manager().download_dir, "DeltaIns")
+        self.download_dir = self.downloads.dir
 
-        self.download_dir = get_browser_manager().download_dir
-        os.makedirs(self.download_dir, exist_ok=True)
+        # Batch runs keep the browser open between patients (see load_patient)
+        self.keep_browser_open = False
+
+        # Condition-driven waits, timed per step (reported with the step2 result)
+        self.waits = PageWaits(lambda: self.driver, "DeltaIns")
+
+    def load_patient(self, patient):
+        """Switch to the next patient of a batch (same browser and login)."""
+        self.data = {**self.data, **(patient or {})}
+        self.memberId = self.data.get("memberId", "")
+        self.dateOfBirth = self.data.get("dateOfBirth", "")
+        self.firstName = self.data.get("firstName", "")
+        self.lastName = self.data.get("lastName", "")
+        self.quick = self.data.get("mode") == "quick"
+        self.waits.reset()
+        # step1 navigates to the eligibility search itself
 
     def config_driver(self):
         self.driver = get_browser_manager().get_driver(self.headless)
 
     def _dismiss_cookie_banner(self):
         try:
-            accept_btn = WebDriverWait(self.driver, 5).until(
+            accept_btn = self.waits.wait(5).until(
                 EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
             )
             accept_btn.click()
             print("[DeltaIns login] Dismissed cookie consent banner")
-            time.sleep(1)
+            self.waits.condition(EC.invisibility_of_element_located((By.ID, "onetrust-accept-btn-handler")), timeout=3)
         except TimeoutException:
             print("[DeltaIns login] No cookie consent banner found")
         except Exception as e:
@@ -75,14 +96,24 @@ class AutomationDeltaInsEligibilityCheck:
         3. Handle MFA: click 'Send me an email' -> wait for OTP
         Returns: ALREADY_LOGGED_IN, SUCCESS, OTP_REQUIRED, or ERROR:...
         """
-        wait = WebDriverWait(self.driver, 30)
+        self.waits.begin("login")
+        # Login pages load fonts and images (resource_policy search_only)
+        resource_policy.searching(self.driver, False)
+        wait = self.waits.wait(30)
         browser_manager = get_browser_manager()
 
+        def submit_button_present(d):
+            return d.find_elements(By.XPATH, "//input[@type='submit'] | //button[@type='submit']")
+
+        def on_provider_tools(d):
+            url = d.current_url.lower()
+            return "provider-tools" in url and "login" not in url and "ciam" not in url
+
         try:
             if self.deltains_username and browser_manager.credentials_changed(self.deltains_username):
                 self._force_logout()
                 self.driver.get(url)
-                time.sleep(3)
+                self.waits.page_ready()
 
             # First, try navigating to provider-tools directly (not login URL)
             # This avoids triggering Okta password re-verification when session is valid
@@ -98,7 +129,7 @@ class AutomationDeltaInsEligibilityCheck:
             # Navigate to provider-tools URL first to check if session is still valid
             print("[DeltaIns login] Trying provider-tools URL to check session...")
             self.driver.get(PROVIDER_TOOLS_URL)
-            time.sleep(5)
+            self.waits.page_ready(timeout=20)  # let the Okta redirect (if any) settle
 
             current_url = self.driver.current_url
             print(f"[DeltaIns login] After provider-tools nav URL: {current_url}")
@@ -110,7 +141,7 @@ class AutomationDeltaInsEligibilityCheck:
             # Session expired or not logged in - navigate to login URL
             print("[DeltaIns login] Session not valid, navigating to login page...")
             self.driver.get(url)
-            time.sleep(3)
+            self.waits.page_ready(timeout=20)
 
             current_url = self.driver.current_url
             print(f"[DeltaIns login] After login nav URL: {current_url}")
@@ -131,7 +162,7 @@ class AutomationDeltaInsEligibilityCheck:
                 (By.XPATH, "//input[@type='text']"),
             ]:
                 try:
-                    field = WebDriverWait(self.driver, 8).until(EC.presence_of_element_located(sel))
+                    field = self.waits.wait(8).until(EC.presence_of_element_located(sel))
                     if field.is_displayed():
                         field.clear()
                         field.send_keys(self.deltains_username)
@@ -145,7 +176,7 @@ class AutomationDeltaInsEligibilityCheck:
                 return "ERROR: Could not find username field"
 
             # Click Next/Submit
-            time.sleep(1)
+            self.waits.condition(submit_button_present, timeout=5)
             for sel in [
                 (By.XPATH, "//input[@type='submit' and @value='Next']"),
                 (By.XPATH, "//input[@type='submit']"),
@@ -160,7 +191,11 @@ class AutomationDeltaInsEligibilityCheck:
                 except Exception:
                     continue
 
-            time.sleep(4)
+            # Next either shows the password step or (trusted session) lands on provider tools
+            self.waits.condition(
+                lambda d: d.find_elements(By.XPATH, "//input[@type='password']") or on_provider_tools(d),
+                timeout=15,
+            )
 
             current_url = self.driver.current_url
             if "provider-tools" in current_url and "login" not in current_url.lower() and "ciam" not in current_url.lower():
@@ -175,7 +210,7 @@ class AutomationDeltaInsEligibilityCheck:
                 (By.NAME, "password"),
             ]:
                 try:
-                    field = WebDriverWait(self.driver, 10).until(EC.presence_of_element_located(sel))
+                    field = self.waits.wait(10).until(EC.presence_of_element_located(sel))
                     if field.is_displayed():
                         field.clear()
                         field.send_keys(self.deltains_password)
@@ -192,7 +227,7 @@ class AutomationDeltaInsEligibilityCheck:
                 return "ERROR: Password field not found"
 
             # Click Sign In
-            time.sleep(1)
+            self.waits.condition(submit_button_present, timeout=5)
             for sel in [
                 (By.ID, "okta-signin-submit"),
                 (By.XPATH, "//input[@type='submit']"),
@@ -210,7 +245,21 @@ class AutomationDeltaInsEligibilityCheck:
             if self.deltains_username:
                 browser_manager.save_credentials_hash(self.deltains_username)
 
-            time.sleep(6)
+            # Wait for the outcome of the password step: provider tools, an MFA page or an error
+            def login_outcome(d):
+                if on_provider_tools(d):
+                    return True
+                if d.find_elements(By.XPATH,
+                        "//div[@data-se='okta_email'] | "
+                        "//input[@value='Send me an email'] | "
+                        "//button[contains(text(),'Send me an email')] | "
+                        "//input[contains(@name,'passcode')] | "
+                        "//*[contains(@class,'alert-error')]"):
+                    return True
+                return False
+
+            self.waits.condition(login_outcome, timeout=20)
+            self.waits.network_idle(timeout=5)
 
             current_url = self.driver.current_url
             print(f"[DeltaIns login] After password submit URL: {current_url}")
@@ -252,7 +301,7 @@ class AutomationDeltaInsEligibilityCheck:
                     if email_select:
                         email_select.click()
                         print("[DeltaIns login] Clicked 'Select' for Email MFA")
-                        time.sleep(5)
+                        self.waits.page_ready(timeout=10)
                     else:
                         print("[DeltaIns login] Could not find Email Select button")
             except Exception as e:
@@ -260,7 +309,7 @@ class AutomationDeltaInsEligibilityCheck:
 
             # Now look for "Send me an email" button (may appear after method selection or directly)
             try:
-                send_btn = WebDriverWait(self.driver, 8).until(
+                send_btn = self.waits.wait(8).until(
                     EC.element_to_be_clickable((By.XPATH,
                         "//input[@type='submit' and @value='Send me an email'] | "
                         "//input[@value='Send me an email'] | "
@@ -268,13 +317,12 @@ class AutomationDeltaInsEligibilityCheck:
                 )
                 send_btn.click()
                 print("[DeltaIns login] Clicked 'Send me an email'")
-                time.sleep(5)
             except TimeoutException:
                 print("[DeltaIns login] No 'Send me an email' button, checking for OTP input...")
 
             # Step 4: OTP entry page
             try:
-                otp_input = WebDriverWait(self.driver, 10).until(
+                otp_input = self.waits.wait(15).until(
                     EC.presence_of_element_located((By.XPATH,
                         "//input[@name='credentials.passcode' and @type='text'] | "
                         "//input[contains(@name,'passcode')]"))
@@ -304,6 +352,25 @@ class AutomationDeltaInsEligibilityCheck:
             print(f"[DeltaIns login] Exception: {e}")
             return f"ERROR:LOGIN FAILED: {e}"
 
+    def _quick_result(self):
+        """mode=quick: the search's patient card (read in step1) - no benefits page, no PDF."""
+        elig_text = getattr(self, '_eligibility_text', '')
+        eligibility = "Eligible" if "present" in elig_text.lower() else (elig_text or "Unknown")
+        if not self.keep_browser_open:
+            self._close_browser()
+        self.downloads.discard()  # nothing was written; the empty job folder goes at job end
+        result = {
+            "status": "success",
+            "mode": "quick",
+            "patientName": getattr(self, '_patient_name', '') or f"{self.firstName} {self.lastName}".strip(),
+            "eligibility": eligibility,
+            "extractedDob": self._format_dob(self.dateOfBirth),
+            "memberId": self.memberId,
+            "waits": self.waits.report(),
+        }
+        print(f"[DeltaIns step2] Quick check: name={result['patientName']}, eligibility={result['eligibility']}")
+        return result
+
     def _format_dob(self, dob_str):
         """Convert DOB from YYYY-MM-DD to MM/DD/YYYY format."""
         if dob_str and "-" in dob_str:
@@ -325,6 +392,22 @@ class AutomationDeltaInsEligibilityCheck:
         except Exception as e:
             print(f"[DeltaIns] Could not close browser: {e}")
 
+    def _print_page_pdf(self):
+        """Print the current page (11x17, scaled to fit) - used when the summary download fails."""
+        pdf_path = pdf_render.snapshot_to_pdf(
+            self.driver,
+            os.path.join(self.download_dir, f"deltains_eligibility_{self.memberId or 'member'}_{int(time.time())}.pdf"),
+            {
+                "printBackground": True,
+                "preferCSSPageSize": True,
+                "scale": 0.7,
+                "paperWidth": 11,
+                "paperHeight": 17,
+            },
+        )
+        print(f"[DeltaIns step2] CDP fallback PDF: {os.path.basename(pdf_path)}")
+        return pdf_path
+
     def step1(self):
         """
         Navigate to Eligibility search, enter patient info, search, and
@@ -340,6 +423,9 @@ class AutomationDeltaInsEligibilityCheck:
         7. Extract patient info from result card
         8. Click 'Check eligibility and benefits'
         """
+        self.waits.begin("step1")
+        # No fonts or images on the search pages (resource_policy search_only)
+        resource_policy.searching(self.driver, True)
         try:
             formatted_dob = self._format_dob(self.dateOfBirth)
             print(f"[DeltaIns step1] Starting — memberId={self.memberId}, DOB={formatted_dob}")
@@ -347,29 +433,28 @@ class AutomationDeltaInsEligibilityCheck:
             # 1. Click "Eligibility and benefits" link
             print("[DeltaIns step1] Clicking 'Eligibility and benefits'...")
             try:
-                elig_link = WebDriverWait(self.driver, 15).until(
+                elig_link = self.waits.wait(15).until(
                     EC.element_to_be_clickable((By.XPATH,
                         "//a[contains(text(),'Eligibility and benefits')] | "
                         "//a[contains(text(),'Eligibility')]"))
                 )
                 elig_link.click()
-                time.sleep(5)
+                self.waits.page_ready()
                 print("[DeltaIns step1] Clicked Eligibility link")
             except TimeoutException:
                 print("[DeltaIns step1] No Eligibility link found, checking if already on page...")
                 if "patient-search" not in self.driver.current_url and "eligibility" not in self.driver.current_url:
                     self.driver.get("https://www.deltadentalins.com/provider-tools/v2/patient-search")
-                    time.sleep(5)
+                    self.waits.page_ready()
 
             # 2. Click "Search for a new patient" button
             print("[DeltaIns step1] Clicking 'Search for a new patient'...")
             try:
-                new_patient_btn = WebDriverWait(self.driver, 10).until(
+                new_patient_btn = self.waits.wait(10).until(
                     EC.element_to_be_clickable((By.XPATH,
                         "//button[contains(text(),'Search for a new patient')]"))
                 )
                 new_patient_btn.click()
-                time.sleep(3)
                 print("[DeltaIns step1] Clicked 'Search for a new patient'")
             except TimeoutException:
                 print("[DeltaIns step1] 'Search for a new patient' button not found - may already be on search page")
@@ -377,12 +462,11 @@ class AutomationDeltaInsEligibilityCheck:
             # 3. Click "Search by member ID" tab
             print("[DeltaIns step1] Clicking 'Search by member ID' tab...")
             try:
-                member_id_tab = WebDriverWait(self.driver, 10).until(
+                member_id_tab = self.waits.wait(15).until(
                     EC.element_to_be_clickable((By.XPATH,
                         "//button[contains(text(),'Search by member ID')]"))
                 )
                 member_id_tab.click()
-                time.sleep(2)
                 print("[DeltaIns step1] Clicked 'Search by member ID' tab")
             except TimeoutException:
                 print("[DeltaIns step1] 'Search by member ID' tab not found")
@@ -391,15 +475,15 @@ class AutomationDeltaInsEligibilityCheck:
             # 4. Enter Member ID
             print(f"[DeltaIns step1] Entering Member ID: {self.memberId}")
             try:
-                mid_field = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.ID, "memberId"))
+                mid_field = self.waits.wait(10).until(
+                    EC.element_to_be_clickable((By.ID, "memberId"))
                 )
                 mid_field.click()
                 mid_field.send_keys(Keys.CONTROL + "a")
                 mid_field.send_keys(Keys.DELETE)
-                time.sleep(0.3)
+                self.waits.condition(lambda d: not mid_field.get_attribute("value"), timeout=2)
                 mid_field.send_keys(self.memberId)
-                time.sleep(0.5)
+                self.waits.condition(lambda d: mid_field.get_attribute("value") == self.memberId, timeout=2)
                 print(f"[DeltaIns step1] Member ID entered: '{mid_field.get_attribute('value')}'")
             except TimeoutException:
                 return "ERROR: Member ID field not found"
@@ -411,9 +495,9 @@ class AutomationDeltaInsEligibilityCheck:
                 dob_field.click()
                 dob_field.send_keys(Keys.CONTROL + "a")
                 dob_field.send_keys(Keys.DELETE)
-                time.sleep(0.3)
+                self.waits.condition(lambda d: not dob_field.get_attribute("value"), timeout=2)
                 dob_field.send_keys(formatted_dob)
-                time.sleep(0.5)
+                self.waits.condition(lambda d: len(dob_field.get_attribute("value") or "") >= len(formatted_dob), timeout=2)
                 print(f"[DeltaIns step1] DOB entered: '{dob_field.get_attribute('value')}'")
             except Exception as e:
                 return f"ERROR: DOB field not found: {e}"
@@ -425,15 +509,23 @@ class AutomationDeltaInsEligibilityCheck:
                     "//button[@type='submit'][contains(text(),'Search')] | "
                     "//button[@data-testid='searchButton']")
                 search_btn.click()
-                time.sleep(10)
                 print("[DeltaIns step1] Search clicked")
             except Exception as e:
                 return f"ERROR: Search button not found: {e}"
 
             # 7. Check for results - look for patient card
             print("[DeltaIns step1] Checking for results...")
+
+            # Wait for the patient card or a "no results" message, whichever comes first
+            def search_outcome(d):
+                if d.find_elements(By.XPATH, "//div[contains(@class,'patient-card-root')] | //div[starts-with(@data-testid,'patientCard')]"):
+                    return True
+                body_text = d.find_element(By.TAG_NAME, "body").text.lower()
+                return any(t in body_text for t in ("no results", "not found", "no patient"))
+
+            self.waits.condition(search_outcome, timeout=25)
             try:
-                patient_card = WebDriverWait(self.driver, 15).until(
+                self.waits.wait(15).until(
                     EC.presence_of_element_located((By.XPATH,
                         "//div[contains(@class,'patient-card-root')] | "
                         "//div[@data-testid='patientCard'] | "
@@ -441,26 +533,14 @@ class AutomationDeltaInsEligibilityCheck:
                 )
                 print("[DeltaIns step1] Patient card found!")
 
-                # Extract patient name
-                try:
-                    name_el = patient_card.find_element(By.XPATH, ".//h3")
-                    patient_name = name_el.text.strip()
-                    print(f"[DeltaIns step1] Patient name: {patient_name}")
-                except Exception:
-                    patient_name = ""
-
-                # Extract eligibility dates
-                try:
-                    elig_el = patient_card.find_element(By.XPATH,
-                        ".//*[@data-testid='patientCardMemberEligibility']//*[contains(@class,'pt-staticfield-text')]")
-                    elig_text = elig_el.text.strip()
-                    print(f"[DeltaIns step1] Eligibility: {elig_text}")
-                except Exception:
-                    elig_text = ""
+                # Name and eligibility dates, parsed from one page_source (page_parsers)
+                card = page_parsers.deltains_patient_card(self.driver.page_source)
+                print(f"[DeltaIns step1] Patient name: {card['patientName']}")
+                print(f"[DeltaIns step1] Eligibility: {card['eligibility']}")
 
                 # Store for step2
-                self._patient_name = patient_name
-                self._eligibility_text = elig_text
+                self._patient_name = card["patientName"]
+                self._eligibility_text = card["eligibility"]
 
             except TimeoutException:
                 # Check for error messages
@@ -477,16 +557,23 @@ class AutomationDeltaInsEligibilityCheck:
                     pass
                 return "ERROR: No patient results found within timeout"
 
+            if self.quick:
+                # step2 answers from the patient card - the benefits page is not needed
+                return "SUCCESS"
+
             # 8. Click "Check eligibility and benefits"
+            # The benefits page is printed if the summary download fails - load its fonts and images
+            resource_policy.searching(self.driver, False)
             print("[DeltaIns step1] Clicking 'Check eligibility and benefits'...")
             try:
-                check_btn = WebDriverWait(self.driver, 10).until(
+                check_btn = self.waits.wait(10).until(
                     EC.element_to_be_clickable((By.XPATH,
                         "//button[contains(text(),'Check eligibility and benefits')] | "
                         "//button[@data-testid='eligibilityBenefitsButton']"))
                 )
                 check_btn.click()
-                time.sleep(10)
+                self.waits.condition(lambda d: "eligibility-benefits" in d.current_url, timeout=20)
+                self.waits.page_ready()
                 print(f"[DeltaIns step1] Navigated to: {self.driver.current_url}")
             except TimeoutException:
                 return "ERROR: 'Check eligibility and benefits' button not found"
@@ -507,11 +594,19 @@ class AutomationDeltaInsEligibilityCheck:
         Extracts:
         - Patient name from h3 in patient-card-header
         - DOB, Member ID, eligibility from data-testid fields
-        - PDF via Page.printToPDF
+        - PDF (the portal's summary download, else Page.printToPDF), returned by path
         """
+        self.waits.begin("step2")
+        self.downloads.begin()
+        if self.quick:
+            return self._quick_result()
         try:
             print("[DeltaIns step2] Extracting eligibility data...")
-            time.sleep(3)
+            # Wait for the patient card on the benefits page to render
+            self.waits.condition(lambda d: d.find_elements(By.XPATH,
+                "//*[@data-testid='patientCardMemberId'] | //*[@data-testid='patientCardMemberEligibility']"
+            ), timeout=15)
+            self.waits.settled(timeout=5)
 
             current_url = self.driver.current_url
             print(f"[DeltaIns step2] URL: {current_url}")
@@ -519,151 +614,110 @@ class AutomationDeltaInsEligibilityCheck:
             if "eligibility-benefits" not in current_url:
                 print("[DeltaIns step2] Not on eligibility page, checking body text...")
 
-            # Extract patient name
-            patientName = ""
-            try:
-                name_el = self.driver.find_element(By.XPATH,
-                    "//div[contains(@class,'patient-card-header')]//h3 | "
-                    "//div[starts-with(@data-testid,'patientCard')]//h3")
-                patientName = name_el.text.strip()
+            # The card's fields from one page_source, parsed locally (page_parsers)
+            card = page_parsers.deltains_patient_card(self.driver.page_source)
+
+            patientName = card["patientName"]
+            if patientName:
                 print(f"[DeltaIns step2] Patient name: {patientName}")
-            except Exception:
+            else:
                 patientName = getattr(self, '_patient_name', '') or f"{self.firstName} {self.lastName}".strip()
                 print(f"[DeltaIns step2] Using stored/fallback name: {patientName}")
 
-            # Extract DOB from card
-            extractedDob = ""
-            try:
-                dob_el = self.driver.find_element(By.XPATH,
-                    "//*[@data-testid='patientCardDateOfBirth']//*[contains(@class,'pt-staticfield-text')]")
-                extractedDob = dob_el.text.strip()
-                print(f"[DeltaIns step2] DOB: {extractedDob}")
-            except Exception:
-                extractedDob = self._format_dob(self.dateOfBirth)
+            extractedDob = card["dob"] or self._format_dob(self.dateOfBirth)
+            print(f"[DeltaIns step2] DOB: {extractedDob}")
 
-            # Extract Member ID from card
-            foundMemberId = ""
-            try:
-                mid_el = self.driver.find_element(By.XPATH,
-                    "//*[@data-testid='patientCardMemberId']//*[contains(@class,'pt-staticfield-text')]")
-                foundMemberId = mid_el.text.strip()
-                print(f"[DeltaIns step2] Member ID: {foundMemberId}")
-            except Exception:
-                foundMemberId = self.memberId
+            foundMemberId = card["memberId"] or self.memberId
+            print(f"[DeltaIns step2] Member ID: {foundMemberId}")
 
-            # Extract eligibility status
+            # Eligibility status
+            elig_text = card["eligibility"] or getattr(self, '_eligibility_text', '')
+            print(f"[DeltaIns step2] Eligibility text: {elig_text}")
             eligibility = "Unknown"
-            try:
-                elig_el = self.driver.find_element(By.XPATH,
-                    "//*[@data-testid='patientCardMemberEligibility']//*[contains(@class,'pt-staticfield-text')]")
-                elig_text = elig_el.text.strip()
-                print(f"[DeltaIns step2] Eligibility text: {elig_text}")
-
-                if "present" in elig_text.lower():
-                    eligibility = "Eligible"
-                elif elig_text:
-                    eligibility = elig_text
-            except Exception:
-                elig_text = getattr(self, '_eligibility_text', '')
-                if elig_text and "present" in elig_text.lower():
-                    eligibility = "Eligible"
-                elif elig_text:
-                    eligibility = elig_text
+            if "present" in elig_text.lower():
+                eligibility = "Eligible"
+            elif elig_text:
+                eligibility = elig_text
 
-            # Check page body for additional eligibility info
-            try:
-                body_text = self.driver.find_element(By.TAG_NAME, "body").text
-                if "not eligible" in body_text.lower():
-                    eligibility = "Not Eligible"
-                elif "terminated" in body_text.lower():
-                    eligibility = "Terminated"
-            except Exception:
-                pass
+            # Page body for additional eligibility info
+            if card["notEligible"]:
+                eligibility = "Not Eligible"
+            elif card["terminated"]:
+                eligibility = "Terminated"
 
             # Capture PDF via "Download summary" -> "Download PDF" button
-            pdfBase64 = ""
+            # (returned by path - ss_path / pdf_path like the other payers, not inline base64)
+            pdf_path = None
             try:
-                existing_files = set(glob.glob(os.path.join(self.download_dir, "*")))
-
-                dl_link = WebDriverWait(self.driver, 10).until(
+                dl_link = self.waits.wait(10).until(
                     EC.element_to_be_clickable((By.XPATH,
                         "//a[@data-testid='downloadBenefitSummaryLink']"))
                 )
-                dl_link.click()
-                print("[DeltaIns step2] Clicked 'Download summary'")
-                time.sleep(3)
-
-                dl_btn = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH,
-                        "//button[@data-testid='downloadPdfButton']"))
-                )
-                dl_btn.click()
-                print("[DeltaIns step2] Clicked 'Download PDF'")
 
+                # A link that points at the document itself is fetched directly
+                # with the browser's cookies - no modal, no download folder
                 pdf_path = None
-                for i in range(30):
-                    time.sleep(2)
-                    current_files = set(glob.glob(os.path.join(self.download_dir, "*")))
-                    new_files = current_files - existing_files
-                    completed = [f for f in new_files
-                                 if not f.endswith(".crdownload") and not f.endswith(".tmp")]
-                    if completed:
-                        pdf_path = completed[0]
-                        break
+                summary_href = dl_link.get_attribute("href") or ""
+                if portal_http.is_allowed("deltains", summary_href):
+                    try:
+                        pdf_path = portal_http.fetch_artifact(
+                            self.driver, "deltains", summary_href,
+                            os.path.join(self.download_dir, f"deltains_summary_{self.memberId or 'member'}.pdf"),
+                        )
+                    except portal_http.PortalHttpError as e:
+                        print(f"[DeltaIns step2] Direct summary fetch failed, using the download: {e}")
+
+                if not pdf_path:
+                    # Downloads go to this job's folder; completion comes from Chrome's events
+                    self.downloads.watch(self.driver)
+                    dl_link.click()
+                    print("[DeltaIns step2] Clicked 'Download summary'")
+
+                    dl_btn = self.waits.wait(10).until(
+                        EC.element_to_be_clickable((By.XPATH,
+                            "//button[@data-testid='downloadPdfButton']"))
+                    )
+                    dl_btn.click()
+                    print("[DeltaIns step2] Clicked 'Download PDF'")
+
+                    pdf_path = self.downloads.wait(timeout=60)
+                    self.downloads.close()
 
                 if pdf_path and os.path.exists(pdf_path):
-                    with open(pdf_path, "rb") as f:
-                        pdfBase64 = base64.b64encode(f.read()).decode()
                     print(f"[DeltaIns step2] PDF downloaded: {os.path.basename(pdf_path)} "
-                          f"({os.path.getsize(pdf_path)} bytes), b64 len={len(pdfBase64)}")
-                    try:
-                        os.remove(pdf_path)
-                    except Exception:
-                        pass
+                          f"({os.path.getsize(pdf_path)} bytes)")
                 else:
                     print("[DeltaIns step2] Download PDF timed out, falling back to CDP")
-                    cdp_result = self.driver.execute_cdp_cmd("Page.printToPDF", {
-                        "printBackground": True,
-                        "preferCSSPageSize": True,
-                        "scale": 0.7,
-                        "paperWidth": 11,
-                        "paperHeight": 17,
-                    })
-                    pdfBase64 = cdp_result.get("data", "")
-                    print(f"[DeltaIns step2] CDP fallback PDF, b64 len={len(pdfBase64)}")
+                    pdf_path = self._print_page_pdf()
 
                 # Dismiss the download modal
                 try:
                     self.driver.find_element(By.TAG_NAME, "body").send_keys(Keys.ESCAPE)
-                    time.sleep(1)
+                    self.waits.dom_quiet(timeout=3, idle=0.2)
                 except Exception:
                     pass
 
             except Exception as e:
                 print(f"[DeltaIns step2] PDF capture failed: {e}")
+                self.downloads.close()
                 try:
-                    cdp_result = self.driver.execute_cdp_cmd("Page.printToPDF", {
-                        "printBackground": True,
-                        "preferCSSPageSize": True,
-                        "scale": 0.7,
-                        "paperWidth": 11,
-                        "paperHeight": 17,
-                    })
-                    pdfBase64 = cdp_result.get("data", "")
-                    print(f"[DeltaIns step2] CDP fallback PDF, b64 len={len(pdfBase64)}")
+                    pdf_path = self._print_page_pdf()
                 except Exception as e2:
                     print(f"[DeltaIns step2] CDP fallback also failed: {e2}")
 
             # Hide browser after completion
-            self._close_browser()
+            if not self.keep_browser_open:
+                self._close_browser()
 
             result = {
                 "status": "success",
                 "patientName": patientName,
                 "eligibility": eligibility,
-                "pdfBase64": pdfBase64,
+                "ss_path": pdf_path,
+                "pdf_path": pdf_path,
                 "extractedDob": extractedDob,
                 "memberId": foundMemberId,
+                "waits": self.waits.report(),
             }
 
             print(f"[DeltaIns step2] Result: name={result['patientName']}, "
@@ -674,12 +728,14 @@ class AutomationDeltaInsEligibilityCheck:
 
         except Exception as e:
             print(f"[DeltaIns step2] Exception: {e}")
-            self._close_browser()
+            # Remove this patient's partial files (other jobs' files are untouched)
+            self.downloads.discard()
+            if not self.keep_browser_open:
+                self._close_browser()
             return {
                 "status": "error",
                 "patientName": getattr(self, '_patient_name', '') or f"{self.firstName} {self.lastName}".strip(),
                 "eligibility": "Unknown",
-                "pdfBase64": "",
                 "extractedDob": self._format_dob(self.dateOfBirth),
                 "memberId": self.memberId,
                 "error": str(e),
@@ -1,17 +1,19 @@
 from selenium import webdriver
-from selenium.common.exceptions import WebDriverException, TimeoutException
-from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 import time
 import os
-import base64
+import tracing
 
 from dentaquest_browser_manager import get_browser_manager
+from page_waits import PageWaits
+from job_downloads import JobDownloads
+import api_capture
+import page_parsers
+import pdf_render
 
 class AutomationDentaQuestEligibilityCheck:    
     def __init__(self, data):
@@ -27,10 +29,37 @@ class AutomationDentaQuestEligibilityCheck:
         self.lastName = self.data.get("lastName", "")
         self.dentaquest_username = self.data.get("dentaquestUsername", "")
         self.dentaquest_password = self.data.get("dentaquestPassword", "")
+        # mode=quick: status / member ID / name from the search results only (no detail page, no PDF)
+        self.quick = self.data.get("mode") == "quick"
 
-        # Use browser manager's download dir
-        self.download_dir = get_browser_manager().download_dir
-        os.makedirs(self.download_dir, exist_ok=True)
+        # This job's own folder under the browser manager's download dir (see job_downloads.py)
+        self.downloads = JobDownloads(get_browser_manager().download_dir, "DentaQuest")
+        self.download_dir = self.downloads.dir
+
+        # Batch runs keep the browser open between patients (see load_patient)
+        self.keep_browser_open = False
+
+        # Condition-driven waits, timed per step (reported with the step2 result)
+        self.waits = PageWaits(lambda: self.driver, "DentaQuest")
+
+        # JSON responses captured between step1 and step2 (see api_capture.py)
+        self.api_capture = None
+
+    def load_patient(self, patient):
+        """Switch to the next patient of a batch (same browser and login)."""
+        self.data = {**self.data, **(patient or {})}
+        self.memberId = self.data.get("memberId", "")
+        self.dateOfBirth = self.data.get("dateOfBirth", "")
+        self.firstName = self.data.get("firstName", "")
+        self.lastName = self.data.get("lastName", "")
+        self.quick = self.data.get("mode") == "quick"
+        self.waits.reset()
+        self.waits.begin("load_patient")
+        # step2 leaves us on the member's detail page - back to member search
+        self.driver.get("https://providers.dentaquest.com/members")
+        self.waits.wait(30).until(
+            EC.presence_of_element_located((By.XPATH, "//div[@data-testid='member-search_date-of-birth']"))
+        )
 
     def config_driver(self):
         # Use persistent browser from manager (keeps device trust tokens)
@@ -45,7 +74,7 @@ class AutomationDentaQuestEligibilityCheck:
             # First try to click logout button if visible
             try:
                 self.driver.get("https://providers.dentaquest.com/")
-                time.sleep(2)
+                self.waits.page_ready()
                 
                 logout_selectors = [
                     "//button[contains(text(), 'Log out') or contains(text(), 'Logout') or contains(text(), 'Sign out')]",
@@ -56,12 +85,12 @@ class AutomationDentaQuestEligibilityCheck:
                 
                 for selector in logout_selectors:
                     try:
-                        logout_btn = WebDriverWait(self.driver, 3).until(
+                        logout_btn = self.waits.wait(3).until(
                             EC.element_to_be_clickable((By.XPATH, selector))
                         )
                         logout_btn.click()
                         print("[DentaQuest login] Clicked logout button")
-                        time.sleep(2)
+                        self.waits.network_idle()
                         break
                     except TimeoutException:
                         continue
@@ -83,7 +112,8 @@ class AutomationDentaQuestEligibilityCheck:
             return False
 
     def login(self, url):
-        wait = WebDriverWait(self.driver, 30)
+        self.waits.begin("login")
+        wait = self.waits.wait(30)
         browser_manager = get_browser_manager()
         
         try:
@@ -91,7 +121,7 @@ class AutomationDentaQuestEligibilityCheck:
             if self.dentaquest_username and browser_manager.credentials_changed(self.dentaquest_username):
                 self._force_logout()
                 self.driver.get(url)
-                time.sleep(2)
+                self.waits.page_ready()
             
             # First check if we're already on a logged-in page (from previous run)
             try:
@@ -101,7 +131,7 @@ class AutomationDentaQuestEligibilityCheck:
                 # Check if we're already on dashboard with member search
                 if "dashboard" in current_url.lower() or "member" in current_url.lower():
                     try:
-                        member_search = WebDriverWait(self.driver, 3).until(
+                        member_search = self.waits.wait(3).until(
                             EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
                         )
                         print("[DentaQuest login] Already on dashboard with member search")
@@ -113,7 +143,7 @@ class AutomationDentaQuestEligibilityCheck:
             
             # Navigate to login URL
             self.driver.get(url)
-            time.sleep(3)
+            self.waits.page_ready()
             
             current_url = self.driver.current_url
             print(f"[DentaQuest login] After navigation URL: {current_url}")
@@ -125,12 +155,12 @@ class AutomationDentaQuestEligibilityCheck:
             
             # Try to dismiss the modal by clicking OK
             try:
-                ok_button = WebDriverWait(self.driver, 5).until(
+                ok_button = self.waits.wait(5).until(
                     EC.element_to_be_clickable((By.XPATH, "//button[normalize-space(text())='Ok' or normalize-space(text())='OK' or normalize-space(text())='Continue']"))
                 )
                 ok_button.click()
                 print("[DentaQuest login] Clicked OK modal button")
-                time.sleep(3)
+                self.waits.page_ready(timeout=10)
             except TimeoutException:
                 print("[DentaQuest login] No OK modal button found")
             
@@ -141,7 +171,7 @@ class AutomationDentaQuestEligibilityCheck:
             if "dashboard" in current_url.lower():
                 # Check for member search input to confirm logged in
                 try:
-                    member_search = WebDriverWait(self.driver, 5).until(
+                    member_search = self.waits.wait(5).until(
                         EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
                     )
                     print("[DentaQuest login] Session valid - on dashboard with member search")
@@ -159,7 +189,7 @@ class AutomationDentaQuestEligibilityCheck:
                         break
                 
                 try:
-                    otp_input = WebDriverWait(self.driver, 5).until(
+                    otp_input = self.waits.wait(5).until(
                         EC.presence_of_element_located((By.XPATH, "//input[@type='tel' or contains(@placeholder,'code') or contains(@aria-label,'Verification')]"))
                     )
                     print("[DentaQuest login] OTP input found in popup")
@@ -169,7 +199,7 @@ class AutomationDentaQuestEligibilityCheck:
             
             # Check for OTP input on main page
             try:
-                otp_input = WebDriverWait(self.driver, 3).until(
+                otp_input = self.waits.wait(3).until(
                     EC.presence_of_element_located((By.XPATH, "//input[@type='tel' or contains(@placeholder,'code') or contains(@aria-label,'Verification')]"))
                 )
                 print("[DentaQuest login] OTP input found")
@@ -182,7 +212,7 @@ class AutomationDentaQuestEligibilityCheck:
                 print("[DentaQuest login] Need to fill login credentials")
                 
                 try:
-                    email_field = WebDriverWait(self.driver, 10).until(
+                    email_field = self.waits.wait(10).until(
                         EC.element_to_be_clickable((By.XPATH, "//input[@name='username' or @type='text']"))
                     )
                     email_field.clear()
@@ -204,7 +234,7 @@ class AutomationDentaQuestEligibilityCheck:
                     # OTP detection - wait up to 30 seconds for OTP input to appear (like Delta MA)
                     # Use comprehensive XPath to detect various OTP input patterns
                     try:
-                        otp_input = WebDriverWait(self.driver, 30).until(
+                        otp_input = self.waits.wait(30).until(
                             EC.presence_of_element_located((By.XPATH, 
                                 "//input[@type='tel' or contains(@placeholder,'code') or contains(@placeholder,'Code') or "
                                 "contains(@aria-label,'Verification') or contains(@aria-label,'verification') or "
@@ -225,7 +255,7 @@ class AutomationDentaQuestEligibilityCheck:
                     if "dashboard" in current_url_after_login or "member" in current_url_after_login:
                         # Verify by checking for member search input
                         try:
-                            member_search = WebDriverWait(self.driver, 5).until(
+                            member_search = self.waits.wait(5).until(
                                 EC.presence_of_element_located((By.XPATH, '//input[@placeholder="Search by member ID"]'))
                             )
                             print("[DentaQuest login] Login successful - now on member search page")
@@ -251,7 +281,10 @@ class AutomationDentaQuestEligibilityCheck:
 
     def step1(self):
         """Navigate to member search - fills all available fields (Member ID, First Name, Last Name, DOB)"""
-        wait = WebDriverWait(self.driver, 30)
+        self.waits.begin("step1")
+        wait = self.waits.wait(30)
+        # Record the search API's JSON responses for step2 (no-op unless API_CAPTURE=1)
+        self.api_capture = api_capture.start_capture(self.driver, "DentaQuest")
 
         try:
             # Log what fields are available for search
@@ -265,8 +298,11 @@ class AutomationDentaQuestEligibilityCheck:
             fields.append(f"DOB: {self.dateOfBirth}")
             print(f"[DentaQuest step1] Starting member search with: {', '.join(fields)}")
             
-            # Wait for page to be ready
-            time.sleep(2)
+            # Wait for the search form to render
+            try:
+                wait.until(EC.presence_of_element_located((By.XPATH, "//div[@data-testid='member-search_date-of-birth']")))
+            except TimeoutException:
+                print("[DentaQuest step1] Warning: Member search form not found within timeout")
             
             # Parse DOB - format: YYYY-MM-DD
             try:
@@ -289,15 +325,15 @@ class AutomationDentaQuestEligibilityCheck:
                     
                     def replace_with_sendkeys(el, value):
                         el.click()
-                        time.sleep(0.05)
+                        tracing.sleep(0.05)
                         el.send_keys(Keys.CONTROL, "a")
                         el.send_keys(Keys.BACKSPACE)
                         el.send_keys(value)
 
                     replace_with_sendkeys(month_elem, month_val)
-                    time.sleep(0.1)
+                    tracing.sleep(0.1)
                     replace_with_sendkeys(day_elem, day_val)
-                    time.sleep(0.1)
+                    tracing.sleep(0.1)
                     replace_with_sendkeys(year_elem, year_val)
                     print(f"[DentaQuest step1] Filled {field_name}: {month_val}/{day_val}/{year_val}")
                     return True
@@ -321,12 +357,14 @@ class AutomationDentaQuestEligibilityCheck:
                 provider_clicked = False
                 for selector in provider_selectors:
                     try:
-                        provider_dropdown = WebDriverWait(self.driver, 3).until(
+                        provider_dropdown = self.waits.wait(3).until(
                             EC.element_to_be_clickable((By.XPATH, selector))
                         )
                         provider_dropdown.click()
                         print(f"[DentaQuest step1] Clicked provider dropdown with selector: {selector}")
-                        time.sleep(0.5)
+                        self.waits.condition(lambda d: d.find_elements(
+                            By.XPATH, "//*[@role='option'] | //div[contains(@class,'option')] | //li[contains(@class,'option')] | //option"
+                        ), timeout=2)
                         provider_clicked = True
                         break
                     except TimeoutException:
@@ -358,18 +396,16 @@ class AutomationDentaQuestEligibilityCheck:
                     
                     # Close dropdown if still open
                     ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
-                    time.sleep(0.3)
+                    self.waits.dom_quiet(timeout=2, idle=0.2)
                 else:
                     print("[DentaQuest step1] Warning: Could not find Provider dropdown")
                     
             except Exception as e:
                 print(f"[DentaQuest step1] Error selecting provider: {e}")
-            
-            time.sleep(0.3)
 
             # 2. Fill Date of Birth with patient's DOB using specific data-testid
             fill_date_by_testid("member-search_date-of-birth", dob_month, dob_day, dob_year, "Date of Birth")
-            time.sleep(0.3)
+            self.waits.dom_quiet(timeout=2, idle=0.2)
 
             # 3. Fill ALL available search fields (flexible search)
             # Fill Member ID if provided
@@ -381,7 +417,7 @@ class AutomationDentaQuestEligibilityCheck:
                     member_id_input.clear()
                     member_id_input.send_keys(self.memberId)
                     print(f"[DentaQuest step1] Entered member ID: {self.memberId}")
-                    time.sleep(0.2)
+                    self.waits.condition(lambda d: member_id_input.get_attribute("value") == self.memberId, timeout=2)
                 except Exception as e:
                     print(f"[DentaQuest step1] Warning: Could not fill member ID: {e}")
             
@@ -394,7 +430,7 @@ class AutomationDentaQuestEligibilityCheck:
                     first_name_input.clear()
                     first_name_input.send_keys(self.firstName)
                     print(f"[DentaQuest step1] Entered first name: {self.firstName}")
-                    time.sleep(0.2)
+                    self.waits.condition(lambda d: first_name_input.get_attribute("value") == self.firstName, timeout=2)
                 except Exception as e:
                     print(f"[DentaQuest step1] Warning: Could not fill first name: {e}")
             
@@ -407,13 +443,12 @@ class AutomationDentaQuestEligibilityCheck:
                     last_name_input.clear()
                     last_name_input.send_keys(self.lastName)
                     print(f"[DentaQuest step1] Entered last name: {self.lastName}")
-                    time.sleep(0.2)
+                    self.waits.condition(lambda d: last_name_input.get_attribute("value") == self.lastName, timeout=2)
                 except Exception as e:
                     print(f"[DentaQuest step1] Warning: Could not fill last name: {e}")
 
-            time.sleep(0.3)
-
             # 4. Click Search button
+            previous_rows = self.driver.find_elements(By.XPATH, "//tbody//tr")
             try:
                 search_btn = wait.until(EC.element_to_be_clickable(
                     (By.XPATH, '//button[@data-testid="member-search_search-button"]')
@@ -431,18 +466,17 @@ class AutomationDentaQuestEligibilityCheck:
                     ActionChains(self.driver).send_keys(Keys.RETURN).perform()
                     print("[DentaQuest step1] Pressed Enter to search")
             
-            time.sleep(5)
-            
-            # Check for "no results" error
-            try:
-                error_msg = WebDriverWait(self.driver, 3).until(EC.presence_of_element_located(
-                    (By.XPATH, '//*[contains(@data-testid,"no-results") or contains(@class,"no-results") or contains(text(),"No results") or contains(text(),"not found") or contains(text(),"No member found") or contains(text(),"Nothing was found")]')
-                ))
-                if error_msg and error_msg.is_displayed():
-                    print("[DentaQuest step1] No results found")
-                    return "ERROR: INVALID SEARCH CRITERIA"
-            except TimeoutException:
-                pass
+            # Wait for this search's outcome: result rows or a "no results" message
+            if previous_rows:
+                self.waits.staleness(previous_rows[0], timeout=5)
+            matched, error_msg = self.waits.any_of([
+                (By.XPATH, "//tbody//tr"),
+                (By.XPATH, '//*[contains(@data-testid,"no-results") or contains(@class,"no-results") or contains(text(),"No results") or contains(text(),"not found") or contains(text(),"No member found") or contains(text(),"Nothing was found")]'),
+            ], timeout=15)
+            if matched == 1 and error_msg.is_displayed():
+                print("[DentaQuest step1] No results found")
+                return "ERROR: INVALID SEARCH CRITERIA"
+            self.waits.network_idle(timeout=5)
 
             print("[DentaQuest step1] Search completed successfully")
             return "Success"
@@ -454,14 +488,16 @@ class AutomationDentaQuestEligibilityCheck:
     
     def step2(self):
         """Get eligibility status, navigate to detail page, and capture PDF"""
-        wait = WebDriverWait(self.driver, 90)
+        self.waits.begin("step2")
+        self.downloads.begin()
+        wait = self.waits.wait(90)
 
         try:
             print("[DentaQuest step2] Starting eligibility capture")
             
             # Wait for results table to load (use explicit wait instead of fixed sleep)
             try:
-                WebDriverWait(self.driver, 10).until(
+                self.waits.wait(10).until(
                     EC.presence_of_element_located((By.XPATH, "//tbody//tr"))
                 )
             except TimeoutException:
@@ -470,146 +506,65 @@ class AutomationDentaQuestEligibilityCheck:
             # 1) Find and extract eligibility status and Member ID from search results
             eligibilityText = "unknown"
             foundMemberId = ""
-            
-            # Try to extract Member ID from the first row of search results
-            # Row format: "NAME\nDOB: MM/DD/YYYY\nMEMBER_ID\n..."
-            import re
-            try:
-                first_row = self.driver.find_element(By.XPATH, "(//tbody//tr)[1]")
-                row_text = first_row.text.strip()
-                
-                if row_text:
-                    lines = row_text.split('\n')
-                    # Member ID is typically the 3rd line (index 2) - a pure number
-                    for line in lines:
-                        line = line.strip()
-                        # Member ID is usually a number, could be alphanumeric
-                        # It should be after DOB line and be mostly digits
-                        if line and re.match(r'^[A-Z0-9]{5,}$', line) and not line.startswith('DOB'):
-                            foundMemberId = line
-                            print(f"[DentaQuest step2] Extracted Member ID from row: {foundMemberId}")
-                            break
-                
-                # Fallback: if we have self.memberId from input, use that
-                if not foundMemberId and self.memberId:
+
+            # The whole results page in one round trip; parsed locally (page_parsers)
+            current_url_before = self.driver.current_url
+            results = page_parsers.dentaquest_search_results(self.driver.page_source, current_url_before)
+
+            # Member data straight from the portal's search API (API_CAPTURE=1)
+            harvested = api_capture.harvest(self.api_capture, self.memberId, self.lastName, "DentaQuest")
+            self.api_capture = None
+            if harvested:
+                eligibilityText = page_parsers.eligibility_status(harvested["eligibility"]) or eligibilityText
+                foundMemberId = harvested["memberId"]
+            else:
+                # Row format: "NAME\nDOB: MM/DD/YYYY\nMEMBER_ID\n..."
+                foundMemberId = results["memberId"]
+                if foundMemberId:
+                    print(f"[DentaQuest step2] Extracted Member ID from row: {foundMemberId}")
+                elif self.memberId:
+                    # Fallback: if we have self.memberId from input, use that
                     foundMemberId = self.memberId
                     print(f"[DentaQuest step2] Using input Member ID: {foundMemberId}")
-                    
-            except Exception as e:
-                print(f"[DentaQuest step2] Error extracting Member ID: {e}")
-                # Fallback to input memberId
-                if self.memberId:
-                    foundMemberId = self.memberId
-            
-            # Extract eligibility status
-            status_selectors = [
-                "(//tbody//tr)[1]//a[contains(@href, 'eligibility')]",
-                "//a[contains(@href,'eligibility')]",
-                "//*[contains(@class,'status')]",
-                "//*[contains(text(),'Active') or contains(text(),'Inactive') or contains(text(),'Eligible')]"
-            ]
-            
-            for selector in status_selectors:
-                try:
-                    status_elem = self.driver.find_element(By.XPATH, selector)
-                    status_text = status_elem.text.strip().lower()
-                    if status_text:
-                        print(f"[DentaQuest step2] Found status with selector '{selector}': {status_text}")
-                        if "active" in status_text or "eligible" in status_text:
-                            eligibilityText = "active"
-                            break
-                        elif "inactive" in status_text or "ineligible" in status_text:
-                            eligibilityText = "inactive"
-                            break
-                except:
-                    continue
-            
+                eligibilityText = results["eligibility"] or eligibilityText
+
             print(f"[DentaQuest step2] Final eligibility status: {eligibilityText}")
 
             # 2) Find the patient detail link and navigate DIRECTLY to it
             print("[DentaQuest step2] Looking for patient detail link...")
             patient_name_clicked = False
-            patientName = ""
-            detail_url = None
-            current_url_before = self.driver.current_url
+            patientName = harvested["patientName"] if harvested else ""
             print(f"[DentaQuest step2] Current URL before: {current_url_before}")
-            
-            # Find all links in first row and log them
-            try:
-                all_links = self.driver.find_elements(By.XPATH, "(//tbody//tr)[1]//a")
-                print(f"[DentaQuest step2] Found {len(all_links)} links in first row:")
-                for i, link in enumerate(all_links):
-                    href = link.get_attribute("href") or "no-href"
-                    text = link.text.strip() or "(empty text)"
-                    print(f"  Link {i}: href={href[:80]}..., text={text}")
-            except Exception as e:
-                print(f"[DentaQuest step2] Error listing links: {e}")
-            
-            # Find the patient detail link and extract patient name from row
-            patient_link_selectors = [
-                "(//table//tbody//tr)[1]//td[1]//a",  # First column link
-                "(//tbody//tr)[1]//a[contains(@href, 'member-details')]",  # member-details link
-                "(//tbody//tr)[1]//a[contains(@href, 'member')]",  # Any member link
-            ]
-            
-            # First, try to extract patient name from the row text (not the link)
-            try:
-                first_row = self.driver.find_element(By.XPATH, "(//tbody//tr)[1]")
-                row_text = first_row.text.strip()
-                print(f"[DentaQuest step2] First row text: {row_text[:100]}...")
-                
+
+            if not harvested:
+                print(f"[DentaQuest step2] Found {len(results['links'])} links in first row:")
+                for i, (href, text) in enumerate(results["links"]):
+                    print(f"  Link {i}: href={(href or 'no-href')[:80]}..., text={text or '(empty text)'}")
+                print(f"[DentaQuest step2] First row text: {results['rowText'][:100]}...")
                 # The name is typically the first line, before "DOB:"
-                if row_text:
-                    lines = row_text.split('\n')
-                    if lines:
-                        # First line is usually the patient name
-                        potential_name = lines[0].strip()
-                        # Make sure it's not a date or ID
-                        if potential_name and not potential_name.startswith('DOB') and not potential_name.isdigit():
-                            patientName = potential_name
-                            print(f"[DentaQuest step2] Extracted patient name from row: '{patientName}'")
-            except Exception as e:
-                print(f"[DentaQuest step2] Error extracting name from row: {e}")
-            
-            # Now find the detail link
-            for selector in patient_link_selectors:
-                try:
-                    patient_link = WebDriverWait(self.driver, 5).until(
-                        EC.presence_of_element_located((By.XPATH, selector))
-                    )
-                    link_text = patient_link.text.strip()
-                    href = patient_link.get_attribute("href")
-                    print(f"[DentaQuest step2] Found patient link: text='{link_text}', href={href}")
-                    
-                    # If link has text and we don't have patientName yet, use it
-                    if link_text and not patientName:
-                        patientName = link_text
-                    
-                    if href and ("member-details" in href or "member" in href):
-                        detail_url = href
-                        patient_name_clicked = True
-                        print(f"[DentaQuest step2] Will navigate directly to: {detail_url}")
-                        break
-                except Exception as e:
-                    print(f"[DentaQuest step2] Selector '{selector}' failed: {e}")
-                    continue
-            
-            if not detail_url:
-                # Fallback: Try to find ANY link to member-details
-                try:
-                    all_links = self.driver.find_elements(By.XPATH, "//a[contains(@href, 'member')]")
-                    if all_links:
-                        detail_url = all_links[0].get_attribute("href")
-                        patient_name_clicked = True
-                        print(f"[DentaQuest step2] Found member link: {detail_url}")
-                except Exception as e:
-                    print(f"[DentaQuest step2] Could not find member link: {e}")
+                patientName = results["patientName"]
+                if patientName:
+                    print(f"[DentaQuest step2] Extracted patient name from row: '{patientName}'")
+
+            if self.quick:
+                return self._quick_result(eligibilityText, foundMemberId or self.memberId, patientName)
+
+            # If the link has text and we don't have patientName yet, use it
+            if results["linkName"] and not patientName:
+                patientName = results["linkName"]
+
+            detail_url = results["detailUrl"]
+            if detail_url:
+                patient_name_clicked = True
+                print(f"[DentaQuest step2] Will navigate directly to: {detail_url}")
+            else:
+                print("[DentaQuest step2] Could not find member link")
             
             # Navigate to detail page DIRECTLY
             if patient_name_clicked and detail_url:
                 print(f"[DentaQuest step2] Navigating directly to detail page: {detail_url}")
                 self.driver.get(detail_url)
-                time.sleep(3)  # Wait for page to load
+                self.waits.page_ready()  # Wait for page to load (and SPA redirects)
                 
                 current_url_after = self.driver.current_url
                 print(f"[DentaQuest step2] Current URL after navigation: {current_url_after}")
@@ -621,7 +576,7 @@ class AutomationDentaQuestEligibilityCheck:
                 
                 # Wait for page to be ready
                 try:
-                    WebDriverWait(self.driver, 30).until(
+                    self.waits.wait(30).until(
                         lambda d: d.execute_script("return document.readyState") == "complete"
                     )
                 except Exception:
@@ -639,7 +594,7 @@ class AutomationDentaQuestEligibilityCheck:
                 ]
                 for selector in content_selectors:
                     try:
-                        WebDriverWait(self.driver, 10).until(
+                        self.waits.wait(10).until(
                             EC.presence_of_element_located((By.XPATH, selector))
                         )
                         content_loaded = True
@@ -651,36 +606,18 @@ class AutomationDentaQuestEligibilityCheck:
                 if not content_loaded:
                     print("[DentaQuest step2] Warning: Could not verify content loaded, waiting extra time...")
                 
-                # Additional wait for dynamic content
-                time.sleep(5)
+                # Wait for dynamic content to finish loading and rendering
+                self.waits.settled()
                 
                 # Try to extract patient name from detailed page if not already found
                 if not patientName:
-                    detail_name_selectors = [
-                        "//h1",
-                        "//h2",
-                        "//*[contains(@class,'patient-name') or contains(@class,'member-name')]",
-                        "//div[contains(@class,'header')]//span",
-                    ]
-                    for selector in detail_name_selectors:
-                        try:
-                            name_elem = self.driver.find_element(By.XPATH, selector)
-                            name_text = name_elem.text.strip()
-                            if name_text and len(name_text) > 1:
-                                if not any(x in name_text.lower() for x in ['active', 'inactive', 'eligible', 'search', 'date', 'print', 'member id']):
-                                    patientName = name_text
-                                    print(f"[DentaQuest step2] Found patient name on detail page: {patientName}")
-                                    break
-                        except:
-                            continue
+                    patientName = page_parsers.detail_page_name(self.driver.page_source)
+                    if patientName:
+                        print(f"[DentaQuest step2] Found patient name on detail page: {patientName}")
             else:
                 print("[DentaQuest step2] Warning: Could not find detail URL, capturing search results page")
                 # Still try to get patient name from search results
-                try:
-                    name_elem = self.driver.find_element(By.XPATH, "(//tbody//tr)[1]//td[1]")
-                    patientName = name_elem.text.strip()
-                except:
-                    pass
+                patientName = results["firstCell"] or patientName
 
             if not patientName:
                 print("[DentaQuest step2] Could not extract patient name")
@@ -689,45 +626,33 @@ class AutomationDentaQuestEligibilityCheck:
 
             # Wait for page to fully load before generating PDF
             try:
-                WebDriverWait(self.driver, 30).until(
+                self.waits.wait(30).until(
                     lambda d: d.execute_script("return document.readyState") == "complete"
                 )
             except Exception:
                 pass
 
-            time.sleep(1)
+            self.waits.settled(timeout=5)
 
             # Generate PDF of the detailed patient page using Chrome DevTools Protocol
             print("[DentaQuest step2] Generating PDF of patient detail page...")
             
-            pdf_options = {
-                "landscape": False,
-                "displayHeaderFooter": False,
-                "printBackground": True,
-                "preferCSSPageSize": True,
-                "paperWidth": 8.5,  # Letter size in inches
-                "paperHeight": 11,
-                "marginTop": 0.4,
-                "marginBottom": 0.4,
-                "marginLeft": 0.4,
-                "marginRight": 0.4,
-                "scale": 0.9,  # Slightly scale down to fit content
-            }
-            
-            result = self.driver.execute_cdp_cmd("Page.printToPDF", pdf_options)
-            pdf_data = base64.b64decode(result.get('data', ''))
-            pdf_path = os.path.join(self.download_dir, f"dentaquest_eligibility_{self.memberId}_{int(time.time())}.pdf")
-            with open(pdf_path, "wb") as f:
-                f.write(pdf_data)
+            # Letter size, slightly scaled down to fit content (pdf_capture.DEFAULT_PDF_OPTIONS);
+            # snapshotted here, rendered by the background pool (pdf_render.py)
+            pdf_path = pdf_render.snapshot_to_pdf(
+                self.driver,
+                os.path.join(self.download_dir, f"dentaquest_eligibility_{self.memberId}_{int(time.time())}.pdf"),
+            )
             print(f"[DentaQuest step2] PDF saved: {pdf_path}")
 
             # Close the browser window after PDF generation
-            try:
-                from dentaquest_browser_manager import get_browser_manager
-                get_browser_manager().quit_driver()
-                print("[DentaQuest step2] Browser closed")
-            except Exception as e:
-                print(f"[DentaQuest step2] Error closing browser: {e}")
+            if not self.keep_browser_open:
+                try:
+                    from dentaquest_browser_manager import get_browser_manager
+                    get_browser_manager().quit_driver()
+                    print("[DentaQuest step2] Browser closed")
+                except Exception as e:
+                    print(f"[DentaQuest step2] Error closing browser: {e}")
             
             output = {
                 "status": "success",
@@ -735,33 +660,43 @@ class AutomationDentaQuestEligibilityCheck:
                 "ss_path": pdf_path,  # Keep key as ss_path for backward compatibility
                 "pdf_path": pdf_path,  # Also add explicit pdf_path
                 "patientName": patientName,
-                "memberId": foundMemberId  # Member ID extracted from the page
+                "memberId": foundMemberId,  # Member ID extracted from the page
+                "waits": self.waits.report(),
             }
             print(f"[DentaQuest step2] Success: {output}")
             return output
             
         except Exception as e:
             print(f"[DentaQuest step2] Exception: {e}")
-            # Cleanup download folder on error
-            try:
-                dl = os.path.abspath(self.download_dir)
-                if os.path.isdir(dl):
-                    for name in os.listdir(dl):
-                        item = os.path.join(dl, name)
-                        try:
-                            if os.path.isfile(item) or os.path.islink(item):
-                                os.remove(item)
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+            # Remove this patient's partial files (other jobs' files are untouched)
+            self.downloads.discard()
             return {"status": "error", "message": str(e)}
 
+    def _quick_result(self, eligibility, member_id, patient_name):
+        """mode=quick: finish with what the search results showed - no detail page, no PDF."""
+        if not self.keep_browser_open:
+            try:
+                get_browser_manager().quit_driver()
+                print("[DentaQuest step2] Browser closed")
+            except Exception as e:
+                print(f"[DentaQuest step2] Error closing browser: {e}")
+        # Nothing was written for this patient (the empty job folder goes at job end)
+        self.downloads.discard()
+        output = {
+            "status": "success",
+            "mode": "quick",
+            "eligibility": eligibility,
+            "patientName": patient_name,
+            "memberId": member_id,
+            "waits": self.waits.report(),
+        }
+        print(f"[DentaQuest step2] Quick check: {output}")
+        return output
+
     def main_workflow(self, url):
         try: 
             self.config_driver()
             self.driver.maximize_window()
-            time.sleep(3)
 
             login_result = self.login(url)
             if login_result.startswith("ERROR"):
@@ -1,16 +1,16 @@
 from selenium import webdriver
-from selenium.common.exceptions import WebDriverException, TimeoutException
-from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 import time
 import os
-import base64
 
 from unitedsco_browser_manager import get_browser_manager
+from page_waits import PageWaits
+from job_downloads import JobDownloads
+import page_parsers
+import pdf_render
 
 class AutomationUnitedSCOEligibilityCheck:    
     def __init__(self, data):
@@ -26,10 +26,29 @@ class AutomationUnitedSCOEligibilityCheck:
         self.lastName = self.data.get("lastName", "")
         self.unitedsco_username = self.data.get("unitedscoUsername", "")
         self.unitedsco_password = self.data.get("unitedscoPassword", "")
+        # mode=quick: status / member ID / name from the Selected Patient page only (no Eligibility tab, no PDF)
+        self.quick = self.data.get("mode") == "quick"
 
-        # Use browser manager's download dir
-        self.download_dir = get_browser_manager().download_dir
-        os.makedirs(self.download_dir, exist_ok=True)
+        # This job's own folder under the browser manager's download dir (see job_downloads.py)
+        self.downloads = JobDownloads(get_browser_manager().download_dir, "UnitedSCO")
+        self.download_dir = self.downloads.dir
+
+        # Batch runs keep the browser open between patients (see load_patient)
+        self.keep_browser_open = False
+
+        # Condition-driven waits, timed per step (reported with the step2 result)
+        self.waits = PageWaits(lambda: self.driver, "UnitedSCO")
+
+    def load_patient(self, patient):
+        """Switch to the next patient of a batch (same browser and login)."""
+        self.data = {**self.data, **(patient or {})}
+        self.memberId = self.data.get("memberId", "")
+        self.dateOfBirth = self.data.get("dateOfBirth", "")
+        self.firstName = self.data.get("firstName", "")
+        self.lastName = self.data.get("lastName", "")
+        self.quick = self.data.get("mode") == "quick"
+        self.waits.reset()
+        # step1 navigates to the eligibility search itself
 
     def config_driver(self):
         # Use persistent browser from manager (keeps device trust tokens)
@@ -44,7 +63,7 @@ class AutomationUnitedSCOEligibilityCheck:
             # First try to click logout button if visible
             try:
                 self.driver.get("https://app.dentalhub.com/app/dashboard")
-                time.sleep(2)
+                self.waits.page_ready()
                 
                 logout_selectors = [
                     "//button[contains(text(), 'Log out') or contains(text(), 'Logout') or contains(text(), 'Sign out')]",
@@ -55,12 +74,12 @@ class AutomationUnitedSCOEligibilityCheck:
                 
                 for selector in logout_selectors:
                     try:
-                        logout_btn = WebDriverWait(self.driver, 3).until(
+                        logout_btn = self.waits.wait(3).until(
                             EC.element_to_be_clickable((By.XPATH, selector))
                         )
                         logout_btn.click()
                         print("[UnitedSCO login] Clicked logout button")
-                        time.sleep(2)
+                        self.waits.network_idle()
                         break
                     except TimeoutException:
                         continue
@@ -82,7 +101,8 @@ class AutomationUnitedSCOEligibilityCheck:
             return False
 
     def login(self, url):
-        wait = WebDriverWait(self.driver, 30)
+        self.waits.begin("login")
+        wait = self.waits.wait(30)
         browser_manager = get_browser_manager()
         
         try:
@@ -90,7 +110,7 @@ class AutomationUnitedSCOEligibilityCheck:
             if self.unitedsco_username and browser_manager.credentials_changed(self.unitedsco_username):
                 self._force_logout()
                 self.driver.get(url)
-                time.sleep(2)
+                self.waits.page_ready()
             
             # First check if we're already on a logged-in page (from previous run)
             try:
@@ -101,7 +121,7 @@ class AutomationUnitedSCOEligibilityCheck:
                 if "app.dentalhub.com" in current_url and "login" not in current_url.lower():
                     try:
                         # Look for dashboard element or member search
-                        dashboard_elem = WebDriverWait(self.driver, 3).until(
+                        dashboard_elem = self.waits.wait(3).until(
                             EC.presence_of_element_located((By.XPATH, 
                                 '//input[contains(@placeholder,"Search")] | //*[contains(@class,"dashboard")] | '
                                 '//a[contains(@href,"member")] | //nav'))
@@ -115,7 +135,7 @@ class AutomationUnitedSCOEligibilityCheck:
             
             # Navigate to login URL
             self.driver.get(url)
-            time.sleep(3)
+            self.waits.page_ready(timeout=20)
             
             current_url = self.driver.current_url
             print(f"[UnitedSCO login] After navigation URL: {current_url}")
@@ -127,7 +147,7 @@ class AutomationUnitedSCOEligibilityCheck:
             
             # Check for OTP input first (in case we're on B2C OTP page)
             try:
-                otp_input = WebDriverWait(self.driver, 3).until(
+                otp_input = self.waits.wait(3).until(
                     EC.presence_of_element_located((By.XPATH, 
                         "//input[@type='tel' or contains(@placeholder,'code') or contains(@aria-label,'Verification')]"))
                 )
@@ -140,13 +160,14 @@ class AutomationUnitedSCOEligibilityCheck:
             # This redirects to Azure B2C login
             if "app.dentalhub.com" in current_url:
                 try:
-                    login_btn = WebDriverWait(self.driver, 5).until(
+                    login_btn = self.waits.wait(5).until(
                         EC.element_to_be_clickable((By.XPATH, 
                             "//button[contains(text(),'LOGIN') or contains(text(),'Log In') or contains(text(),'Login')]"))
                     )
                     login_btn.click()
                     print("[UnitedSCO login] Clicked LOGIN button on dentalhub.com")
-                    time.sleep(5)  # Wait for redirect to B2C login page
+                    # Wait for redirect to B2C login page
+                    self.waits.condition(lambda d: "b2clogin.com" in d.current_url, timeout=15)
                 except TimeoutException:
                     print("[UnitedSCO login] No LOGIN button found on dentalhub page, proceeding...")
             
@@ -160,7 +181,7 @@ class AutomationUnitedSCOEligibilityCheck:
                 
                 try:
                     # Find email field by id="signInName" (Azure B2C specific)
-                    email_field = WebDriverWait(self.driver, 10).until(
+                    email_field = self.waits.wait(10).until(
                         EC.element_to_be_clickable((By.XPATH, 
                             "//input[@id='signInName' or @name='signInName' or @name='Email address' or @type='email']"))
                     )
@@ -169,7 +190,7 @@ class AutomationUnitedSCOEligibilityCheck:
                     print(f"[UnitedSCO login] Entered username: {self.unitedsco_username}")
                     
                     # Find password field by id="password"
-                    password_field = WebDriverWait(self.driver, 10).until(
+                    password_field = self.waits.wait(10).until(
                         EC.presence_of_element_located((By.XPATH, 
                             "//input[@id='password' or @type='password']"))
                     )
@@ -178,7 +199,7 @@ class AutomationUnitedSCOEligibilityCheck:
                     print("[UnitedSCO login] Entered password")
                     
                     # Click "Sign in" button (id="next" on B2C page)
-                    signin_button = WebDriverWait(self.driver, 10).until(
+                    signin_button = self.waits.wait(10).until(
                         EC.element_to_be_clickable((By.XPATH, 
                             "//button[@id='next'] | //button[@type='submit' and contains(text(),'Sign')]"))
                     )
@@ -189,7 +210,18 @@ class AutomationUnitedSCOEligibilityCheck:
                     if self.unitedsco_username:
                         browser_manager.save_credentials_hash(self.unitedsco_username)
                     
-                    time.sleep(5)  # Wait for login to process
+                    # Wait for login to process: dashboard, MFA selection, OTP input or an error
+                    def login_outcome(d):
+                        current = d.current_url.lower()
+                        if "app.dentalhub.com" in current and "login" not in current:
+                            return True
+                        candidates = d.find_elements(By.XPATH,
+                            "//button[contains(text(),'Continue')] | //input[@type='tel'] | "
+                            "//input[contains(@id,'code') or contains(@name,'code') or contains(@id,'otp')] | "
+                            "//*[contains(@class,'error') or contains(@class,'alert')]")
+                        return any(c.is_displayed() and (c.tag_name == "input" or c.text.strip()) for c in candidates)
+
+                    self.waits.condition(login_outcome, timeout=20)
                     
                     # Check for MFA method selection page
                     # DentalHub shows: "Phone" / "Authenticator App" radio buttons + "Continue" button
@@ -227,11 +259,11 @@ class AutomationUnitedSCOEligibilityCheck:
                                 except Exception:
                                     pass
                             
-                            time.sleep(1)
+                            self.waits.condition(EC.element_to_be_clickable(continue_btn), timeout=2)
                             # Click Continue
                             continue_btn.click()
                             print("[UnitedSCO login] Clicked 'Continue' on MFA selection page")
-                            time.sleep(5)  # Wait for OTP to be sent
+                            self.waits.page_ready(timeout=10)  # Wait for OTP to be sent
                     except Exception:
                         pass  # No MFA selection page - proceed normally
                     
@@ -245,7 +277,7 @@ class AutomationUnitedSCOEligibilityCheck:
                     
                     # Check for OTP input after login / after MFA selection
                     try:
-                        otp_input = WebDriverWait(self.driver, 15).until(
+                        otp_input = self.waits.wait(15).until(
                             EC.presence_of_element_located((By.XPATH, 
                                 "//input[@type='tel' or contains(@placeholder,'code') or contains(@placeholder,'Code') or "
                                 "contains(@aria-label,'Verification') or contains(@aria-label,'verification') or "
@@ -281,7 +313,7 @@ class AutomationUnitedSCOEligibilityCheck:
                         print("[UnitedSCO login] Still on B2C page - checking for OTP or error")
                         # Give it more time for OTP
                         try:
-                            otp_input = WebDriverWait(self.driver, 10).until(
+                            otp_input = self.waits.wait(10).until(
                                 EC.presence_of_element_located((By.XPATH, 
                                     "//input[@type='tel' or contains(@id,'code') or contains(@name,'code')]"))
                             )
@@ -337,7 +369,7 @@ class AutomationUnitedSCOEligibilityCheck:
                         )
                         dismiss_btn.click()
                         print("[UnitedSCO step1] Dismissed error dialog")
-                        time.sleep(1)
+                        self.waits.condition(EC.invisibility_of_element_located((By.XPATH, "//modal-container")), timeout=3)
                     except Exception:
                         # Try clicking the X button
                         try:
@@ -376,13 +408,13 @@ class AutomationUnitedSCOEligibilityCheck:
         """
         from selenium.webdriver.common.action_chains import ActionChains
         
+        self.waits.begin("step1")
         try:
             print(f"[UnitedSCO step1] Starting eligibility search for: {self.firstName} {self.lastName}, DOB: {self.dateOfBirth}")
             
             # Navigate directly to eligibility page
             print("[UnitedSCO step1] Navigating to eligibility page...")
             self.driver.get("https://app.dentalhub.com/app/patient/eligibility")
-            time.sleep(3)
             
             current_url = self.driver.current_url
             print(f"[UnitedSCO step1] Current URL: {current_url}")
@@ -392,7 +424,7 @@ class AutomationUnitedSCOEligibilityCheck:
             
             # Wait for form to load - look for First Name field (id='firstName_Back')
             try:
-                WebDriverWait(self.driver, 10).until(
+                self.waits.wait(15).until(
                     EC.presence_of_element_located((By.ID, "firstName_Back"))
                 )
                 print("[UnitedSCO step1] Patient Information form loaded")
@@ -487,7 +519,7 @@ class AutomationUnitedSCOEligibilityCheck:
                 print(f"[UnitedSCO step1] Error entering DOB: {e}")
                 return "ERROR: Could not enter Date of Birth"
             
-            time.sleep(1)
+            self.waits.dom_quiet(timeout=2, idle=0.2)
             
             # Step 1.2: Select Payer - UnitedHealthcare Massachusetts
             print("[UnitedSCO step1] Selecting Payer...")
@@ -503,6 +535,12 @@ class AutomationUnitedSCOEligibilityCheck:
                 pass
             
             payer_selected = False
+
+            def dropdown_open(d):
+                return d.find_elements(By.XPATH, "//ng-dropdown-panel")
+
+            def united_option_listed(d):
+                return d.find_elements(By.XPATH, "//ng-dropdown-panel//div[contains(@class,'ng-option') and contains(.,'United')]")
             
             # Strategy 1: Click the ng-select, type to search, and select the option
             try:
@@ -525,9 +563,9 @@ class AutomationUnitedSCOEligibilityCheck:
                 if payer_ng_select:
                     # Scroll to it and click to open
                     self.driver.execute_script("arguments[0].scrollIntoView({block:'center'});", payer_ng_select)
-                    time.sleep(0.5)
+                    self.waits.condition(EC.element_to_be_clickable(payer_ng_select), timeout=2)
                     payer_ng_select.click()
-                    time.sleep(1)
+                    self.waits.condition(dropdown_open, timeout=3)
                     
                     # Type into the search input inside ng-select to filter options
                     try:
@@ -535,13 +573,13 @@ class AutomationUnitedSCOEligibilityCheck:
                         search_input.clear()
                         search_input.send_keys("UnitedHealthcare Massachusetts")
                         print("[UnitedSCO step1] Typed payer search text")
-                        time.sleep(2)
+                        self.waits.condition(united_option_listed, timeout=5)
                     except Exception:
                         # If no search input, try sending keys directly to ng-select
                         try:
                             ActionChains(self.driver).send_keys("UnitedHealthcare Mass").perform()
                             print("[UnitedSCO step1] Typed payer search via ActionChains")
-                            time.sleep(2)
+                            self.waits.condition(united_option_listed, timeout=5)
                         except Exception:
                             pass
                     
@@ -569,7 +607,7 @@ class AutomationUnitedSCOEligibilityCheck:
                     
                     # Close dropdown
                     ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
-                    time.sleep(0.5)
+                    self.waits.condition(lambda d: not dropdown_open(d), timeout=2)
                 else:
                     print("[UnitedSCO step1] Could not find Payer ng-select element")
                     
@@ -600,9 +638,9 @@ class AutomationUnitedSCOEligibilityCheck:
                         return false;
                     """)
                     if clicked:
-                        time.sleep(1)
+                        self.waits.condition(dropdown_open, timeout=3)
                         ActionChains(self.driver).send_keys("UnitedHealthcare Mass").perform()
-                        time.sleep(2)
+                        self.waits.condition(united_option_listed, timeout=5)
                         payer_options = self.driver.find_elements(By.XPATH, 
                             "//ng-dropdown-panel//div[contains(@class,'ng-option')]"
                         )
@@ -619,16 +657,18 @@ class AutomationUnitedSCOEligibilityCheck:
             if not payer_selected:
                 print("[UnitedSCO step1] WARNING: Could not select Payer - form may fail")
             
-            time.sleep(1)
-            
             # Step 1.3: Click Continue button (Step 1 - Patient Info)
             try:
-                continue_btn = WebDriverWait(self.driver, 10).until(
+                continue_btn = self.waits.wait(10).until(
                     EC.element_to_be_clickable((By.XPATH, "//button[contains(text(),'Continue')]"))
                 )
                 continue_btn.click()
                 print("[UnitedSCO step1] Clicked Continue button (Patient Info)")
-                time.sleep(4)
+                # Wait for the Practitioner page, the results page or an error dialog
+                self.waits.condition(lambda d: any(e.is_displayed() for e in d.find_elements(By.XPATH,
+                    "//*[@id='paymentGroupId' or @id='treatmentLocation'] | //modal-container | "
+                    "//div[contains(@class,'modal-dialog')] | //*[contains(text(),'Selected Patient')]"
+                )), timeout=10)
                 
                 # Check for error dialogs (modal) after clicking Continue
                 error_result = self._check_for_error_dialog()
@@ -647,7 +687,7 @@ class AutomationUnitedSCOEligibilityCheck:
             on_practitioner_page = False
             try:
                 # Check for Practitioner page elements (paymentGroupId or treatment location)
-                WebDriverWait(self.driver, 8).until(
+                self.waits.wait(8).until(
                     lambda d: d.find_element(By.ID, "paymentGroupId").is_displayed() or 
                               d.find_element(By.ID, "treatmentLocation").is_displayed()
                 )
@@ -679,11 +719,10 @@ class AutomationUnitedSCOEligibilityCheck:
                     if taxonomy_input.is_displayed():
                         taxonomy_input.click()
                         print("[UnitedSCO step1] Clicked Practitioner Taxonomy dropdown")
-                        time.sleep(1)
                         
                         # Select "Summit Dental Care" option
                         try:
-                            summit_option = WebDriverWait(self.driver, 5).until(
+                            summit_option = self.waits.wait(5).until(
                                 EC.element_to_be_clickable((By.XPATH, 
                                     "//ng-dropdown-panel//div[contains(@class,'ng-option') and contains(.,'Summit Dental Care')]"
                                 ))
@@ -704,18 +743,24 @@ class AutomationUnitedSCOEligibilityCheck:
                         
                         # Press Escape to close dropdown
                         ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
-                        time.sleep(1)
+                        self.waits.condition(
+                            lambda d: not d.find_elements(By.XPATH, "//ng-dropdown-panel"), timeout=2
+                        )
                 except Exception as e:
                     print(f"[UnitedSCO step1] Practitioner Taxonomy handling: {e}")
             
             # Step 1.5: Click Continue button (Step 2 - Practitioner)
             try:
-                continue_btn2 = WebDriverWait(self.driver, 10).until(
+                continue_btn2 = self.waits.wait(10).until(
                     EC.element_to_be_clickable((By.XPATH, "//button[contains(text(),'Continue')]"))
                 )
                 continue_btn2.click()
                 print("[UnitedSCO step1] Clicked Continue button (Practitioner)")
-                time.sleep(5)
+                # Wait for the eligibility results (or an error dialog)
+                self.waits.condition(lambda d: any(e.is_displayed() for e in d.find_elements(By.XPATH,
+                    "//*[@id='eligibility-link'] | //*[contains(text(),'Selected Patient')] | "
+                    "//modal-container | //div[contains(@class,'modal-dialog')]"
+                )), timeout=15)
             except Exception as e:
                 print(f"[UnitedSCO step1] Error clicking Continue on Practitioner page: {e}")
                 # Check for error dialog intercepting the click
@@ -736,25 +781,6 @@ class AutomationUnitedSCOEligibilityCheck:
             return f"ERROR:STEP1 - {e}"
 
     
-    def _get_existing_downloads(self):
-        """Get set of existing PDF files in download dir before clicking."""
-        import glob
-        return set(glob.glob(os.path.join(self.download_dir, "*.pdf")))
-
-    def _wait_for_new_download(self, existing_files, timeout=15):
-        """Wait for a new PDF file to appear in the download dir."""
-        import glob
-        for _ in range(timeout * 2):  # check every 0.5s
-            time.sleep(0.5)
-            current = set(glob.glob(os.path.join(self.download_dir, "*.pdf")))
-            new_files = current - existing_files
-            if new_files:
-                # Also wait for download to finish (no .crdownload files)
-                crdownloads = glob.glob(os.path.join(self.download_dir, "*.crdownload"))
-                if not crdownloads:
-                    return list(new_files)[0]
-        return None
-
     def step2(self):
         """
         Extract data from Selected Patient page, click the "Eligibility" tab
@@ -767,14 +793,15 @@ class AutomationUnitedSCOEligibilityCheck:
           c) Load content dynamically on the same page
         We handle all three cases.
         """
-        import glob
         import re
         
+        self.waits.begin("step2")
+        self.downloads.begin()
         try:
             print("[UnitedSCO step2] Starting eligibility capture")
             
             # Wait for page to load
-            time.sleep(3)
+            self.waits.network_idle(timeout=10)
             
             current_url = self.driver.current_url
             print(f"[UnitedSCO step2] Current URL: {current_url}")
@@ -784,162 +811,101 @@ class AutomationUnitedSCOEligibilityCheck:
             patientName = f"{self.firstName} {self.lastName}".strip()
             foundMemberId = self.memberId  # Use provided memberId as default
             
-            # Extract eligibility status
+            # Wait for the eligibility badge (the patient details have rendered)
             try:
-                status_elem = WebDriverWait(self.driver, 10).until(
+                self.waits.wait(10).until(
                     EC.presence_of_element_located((By.XPATH,
                         "//*[contains(text(),'Member Eligible') or contains(text(),'member eligible')]"
                     ))
                 )
-                status_text = status_elem.text.strip().lower()
-                print(f"[UnitedSCO step2] Found status: {status_text}")
-                
-                if "eligible" in status_text:
-                    eligibilityText = "active"
-                elif "ineligible" in status_text or "not eligible" in status_text:
-                    eligibilityText = "inactive"
-                    
             except TimeoutException:
                 print("[UnitedSCO step2] Eligibility status badge not found")
             except Exception as e:
-                print(f"[UnitedSCO step2] Error extracting status: {e}")
-            
+                print(f"[UnitedSCO step2] Error waiting for status: {e}")
+
+            # The whole page in one round trip; parsed locally (page_parsers)
+            patient = page_parsers.unitedsco_selected_patient(self.driver.page_source)
+            if patient["statusText"]:
+                print(f"[UnitedSCO step2] Found status: {patient['statusText']}")
+            eligibilityText = patient["eligibility"] or eligibilityText
             print(f"[UnitedSCO step2] Eligibility status: {eligibilityText}")
-            
-            # Extract patient name from the page
-            page_text = ""
-            try:
-                page_text = self.driver.find_element(By.TAG_NAME, "body").text
-            except Exception:
-                pass
-            
+
             # Log a snippet of page text around "Selected Patient" for debugging
-            try:
-                sp_idx = page_text.find("Selected Patient")
-                if sp_idx >= 0:
-                    snippet = page_text[sp_idx:sp_idx+300]
-                    print(f"[UnitedSCO step2] Page text near 'Selected Patient': {repr(snippet[:200])}")
-            except Exception:
-                pass
-            
-            # Strategy 1: Try DOM element id="patient-name"
-            name_extracted = False
-            try:
-                name_elem = self.driver.find_element(By.ID, "patient-name")
-                extracted_name = name_elem.text.strip()
-                if extracted_name:
-                    patientName = extracted_name
-                    name_extracted = True
-                    print(f"[UnitedSCO step2] Extracted patient name from DOM (id=patient-name): {patientName}")
-            except Exception:
-                pass
-            
-            # Strategy 2: Try various DOM patterns for patient name
-            if not name_extracted:
-                name_selectors = [
-                    "//*[contains(@class,'patient-name') or contains(@class,'patientName')]",
-                    "//*[contains(@class,'selected-patient')]//h3 | //*[contains(@class,'selected-patient')]//h4 | //*[contains(@class,'selected-patient')]//strong",
-                    "//div[contains(@class,'patient')]//h3 | //div[contains(@class,'patient')]//h4",
-                    "//*[contains(@class,'eligibility__banner')]//h3 | //*[contains(@class,'eligibility__banner')]//h4",
-                    "//*[contains(@class,'banner__patient')]",
-                ]
-                for sel in name_selectors:
-                    try:
-                        elems = self.driver.find_elements(By.XPATH, sel)
-                        for elem in elems:
-                            txt = elem.text.strip()
-                            # Filter: must look like a name (2+ words, starts with uppercase)
-                            if txt and len(txt.split()) >= 2 and txt[0].isupper() and len(txt) < 60:
-                                patientName = txt
-                                name_extracted = True
-                                print(f"[UnitedSCO step2] Extracted patient name from DOM: {patientName}")
-                                break
-                        if name_extracted:
-                            break
-                    except Exception:
-                        continue
-            
-            # Strategy 3: Regex from page text - multiple patterns
-            # IMPORTANT: Use [^\n] to avoid matching across newlines (e.g. picking up "Member Eligible")
-            if not name_extracted:
-                name_patterns = [
-                    # Name on the line right after "Selected Patient"
-                    r'Selected Patient\s*\n\s*([A-Z][A-Za-z\-\']+(?: [A-Z][A-Za-z\-\']+)+)',
-                    r'Patient Name\s*[\n:]\s*([A-Z][A-Za-z\-\']+(?: [A-Z][A-Za-z\-\']+)+)',
-                    # "LASTNAME, FIRSTNAME" format
-                    r'Selected Patient\s*\n\s*([A-Z][A-Za-z\-\']+,\s*[A-Z][A-Za-z\-\']+)',
-                    # Name on the line right before "Member Eligible" or "Member ID"
-                    r'\n([A-Z][A-Za-z\-\']+(?: [A-Z]\.?)? [A-Z][A-Za-z\-\']+)\n(?:Member|Date Of Birth|DOB)',
-                ]
-                for pattern in name_patterns:
-                    try:
-                        name_match = re.search(pattern, page_text)
-                        if name_match:
-                            candidate = name_match.group(1).strip()
-                            # Validate: not too long, not a header/label, and doesn't contain "Eligible"/"Member"/"Patient"
-                            skip_words = ("Selected Patient", "Patient Name", "Patient Information", 
-                                         "Member Eligible", "Member ID", "Date Of Birth")
-                            if (len(candidate) < 50 and candidate not in skip_words 
-                                    and "Eligible" not in candidate and "Member" not in candidate):
-                                patientName = candidate
-                                name_extracted = True
-                                print(f"[UnitedSCO step2] Extracted patient name from text: {patientName}")
-                                break
-                    except Exception:
-                        continue
-            
-            if not name_extracted:
+            page_text = patient["pageText"]
+            sp_idx = page_text.find("Selected Patient")
+            if sp_idx >= 0:
+                print(f"[UnitedSCO step2] Page text near 'Selected Patient': {repr(page_text[sp_idx:sp_idx+200])}")
+
+            if patient["patientName"]:
+                patientName = patient["patientName"]
+                print(f"[UnitedSCO step2] Extracted patient name: {patientName}")
+            else:
                 print(f"[UnitedSCO step2] WARNING: Could not extract patient name from page")
-            
-            # Extract Member ID from the page (for database storage)
-            try:
-                member_id_match = re.search(r'Member ID\s*[\n:]\s*(\d+)', page_text)
-                if member_id_match:
-                    foundMemberId = member_id_match.group(1)
-                    print(f"[UnitedSCO step2] Extracted Member ID from page: {foundMemberId}")
-            except Exception as e:
-                print(f"[UnitedSCO step2] Could not extract Member ID: {e}")
-            
-            # Extract Date of Birth from page if available (for patient creation)
-            extractedDob = ""
-            try:
-                dob_match = re.search(r'Date Of Birth\s*[\n:]\s*(\d{2}/\d{2}/\d{4})', page_text)
-                if dob_match:
-                    extractedDob = dob_match.group(1)
-                    print(f"[UnitedSCO step2] Extracted DOB from page: {extractedDob}")
-            except Exception:
-                pass
-            
+
+            # Member ID from the page (for database storage)
+            if patient["memberId"]:
+                foundMemberId = patient["memberId"]
+                print(f"[UnitedSCO step2] Extracted Member ID from page: {foundMemberId}")
+
+            # Date of Birth from the page if available (for patient creation)
+            extractedDob = patient["dob"]
+            if extractedDob:
+                print(f"[UnitedSCO step2] Extracted DOB from page: {extractedDob}")
+            
+            if self.quick:
+                # Status-only check: no Eligibility tab, no PDF
+                if not self.keep_browser_open:
+                    self._hide_browser()
+                self.downloads.discard()  # nothing was written; the empty job folder goes at job end
+                return {
+                    "status": "success",
+                    "mode": "quick",
+                    "eligibility": eligibilityText,
+                    "patientName": patientName,
+                    "memberId": foundMemberId,
+                    "waits": self.waits.report(),
+                }
+
             # 2) Click the "Eligibility" button to navigate to eligibility details
             # The DOM has: <button id="eligibility-link" class="btn btn-link">Eligibility</button>
             # This is near "Benefit Summary" and "Service History" buttons.
             print("[UnitedSCO step2] Looking for 'Eligibility' button (id='eligibility-link')...")
             
-            # Record existing downloads BEFORE clicking (to detect new downloads)
-            existing_downloads = self._get_existing_downloads()
+            # Send downloads to this job's folder and listen for Chrome's download events
+            self.downloads.watch(self.driver)
             
             # Record current window handles BEFORE clicking (to detect new tabs)
             original_window = self.driver.current_window_handle
             original_windows = set(self.driver.window_handles)
             
             eligibility_clicked = False
+
+            def wait_for_click_outcome():
+                # New tab, a download starting, or (otherwise) same-page content settling
+                opened = self.waits.condition(
+                    lambda d: len(d.window_handles) > len(original_windows)
+                    or self.downloads.started(),
+                    timeout=5,
+                )
+                if not opened:
+                    self.waits.network_idle(timeout=5)
             
             # Strategy 1 (PRIMARY): Use the known button id="eligibility-link"
             try:
                 # First check if the button exists and is visible
-                elig_btn = WebDriverWait(self.driver, 15).until(
+                elig_btn = self.waits.wait(15).until(
                     EC.presence_of_element_located((By.ID, "eligibility-link"))
                 )
                 # Wait for it to become visible (it's hidden when no results)
-                WebDriverWait(self.driver, 10).until(
+                self.waits.wait(10).until(
                     EC.visibility_of(elig_btn)
                 )
                 self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", elig_btn)
-                time.sleep(0.5)
+                self.waits.condition(EC.element_to_be_clickable(elig_btn), timeout=2)
                 elig_btn.click()
                 eligibility_clicked = True
                 print("[UnitedSCO step2] Clicked 'Eligibility' button (id='eligibility-link')")
-                time.sleep(5)
+                wait_for_click_outcome()
             except Exception as e:
                 print(f"[UnitedSCO step2] Could not click by ID: {e}")
             
@@ -952,11 +918,11 @@ class AutomationUnitedSCOEligibilityCheck:
                             text = btn.text.strip()
                             if re.match(r'^Eligibility\s*$', text, re.IGNORECASE) and btn.is_displayed():
                                 self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", btn)
-                                time.sleep(0.5)
+                                self.waits.condition(EC.element_to_be_clickable(btn), timeout=2)
                                 btn.click()
                                 eligibility_clicked = True
                                 print(f"[UnitedSCO step2] Clicked button with text 'Eligibility'")
-                                time.sleep(5)
+                                wait_for_click_outcome()
                                 break
                         except Exception:
                             continue
@@ -983,7 +949,7 @@ class AutomationUnitedSCOEligibilityCheck:
                     if clicked:
                         eligibility_clicked = True
                         print("[UnitedSCO step2] Clicked via JavaScript")
-                        time.sleep(5)
+                        wait_for_click_outcome()
                 except Exception as e:
                     print(f"[UnitedSCO step2] JS click error: {e}")
             
@@ -999,16 +965,15 @@ class AutomationUnitedSCOEligibilityCheck:
                 new_tab = list(new_windows)[0]
                 print(f"[UnitedSCO step2] New tab opened! Switching to it...")
                 self.driver.switch_to.window(new_tab)
-                time.sleep(5)
                 
                 # Wait for the new page to load
                 try:
-                    WebDriverWait(self.driver, 30).until(
+                    self.waits.wait(30).until(
                         lambda d: d.execute_script("return document.readyState") == "complete"
                     )
                 except Exception:
                     pass
-                time.sleep(2)
+                self.waits.settled(timeout=10)
                 
                 print(f"[UnitedSCO step2] New tab URL: {self.driver.current_url}")
                 
@@ -1022,7 +987,7 @@ class AutomationUnitedSCOEligibilityCheck:
             
             # Check for downloaded file
             if not pdf_path:
-                downloaded_file = self._wait_for_new_download(existing_downloads, timeout=10)
+                downloaded_file = self.downloads.wait(timeout=10)
                 if downloaded_file:
                     print(f"[UnitedSCO step2] File downloaded: {downloaded_file}")
                     pdf_path = downloaded_file
@@ -1033,23 +998,27 @@ class AutomationUnitedSCOEligibilityCheck:
                 
                 # Wait for any dynamic content
                 try:
-                    WebDriverWait(self.driver, 15).until(
+                    self.waits.wait(15).until(
                         lambda d: d.execute_script("return document.readyState") == "complete"
                     )
                 except Exception:
                     pass
-                time.sleep(3)
+                self.waits.settled(timeout=10)
                 
                 print(f"[UnitedSCO step2] Capturing PDF from URL: {self.driver.current_url}")
                 pdf_path = self._capture_pdf(foundMemberId)
 
+            self.downloads.close()
+
             if not pdf_path:
+                self.downloads.discard()
                 return {"status": "error", "message": "STEP2 FAILED: Could not generate PDF"}
 
             print(f"[UnitedSCO step2] PDF saved: {pdf_path}")
 
             # Hide browser window after completion
-            self._hide_browser()
+            if not self.keep_browser_open:
+                self._hide_browser()
 
             print("[UnitedSCO step2] Eligibility capture complete")
 
@@ -1059,11 +1028,14 @@ class AutomationUnitedSCOEligibilityCheck:
                 "ss_path": pdf_path,
                 "pdf_path": pdf_path,
                 "patientName": patientName,
-                "memberId": foundMemberId
+                "memberId": foundMemberId,
+                "waits": self.waits.report(),
             }
             
         except Exception as e:
             print(f"[UnitedSCO step2] Exception: {e}")
+            # Remove this patient's partial files (other jobs' files are untouched)
+            self.downloads.discard()
             return {"status": "error", "message": f"STEP2 FAILED: {str(e)}"}
 
     def _hide_browser(self):
@@ -1072,7 +1044,6 @@ class AutomationUnitedSCOEligibilityCheck:
             # Strategy 1: Navigate to blank page first (clears sensitive data from view)
             try:
                 self.driver.get("about:blank")
-                time.sleep(0.5)
             except Exception:
                 pass
             
@@ -1107,28 +1078,11 @@ class AutomationUnitedSCOEligibilityCheck:
     def _capture_pdf(self, member_id):
         """Capture the current page as PDF using Chrome DevTools Protocol."""
         try:
-            pdf_options = {
-                "landscape": False,
-                "displayHeaderFooter": False,
-                "printBackground": True,
-                "preferCSSPageSize": True,
-                "paperWidth": 8.5,
-                "paperHeight": 11,
-                "marginTop": 0.4,
-                "marginBottom": 0.4,
-                "marginLeft": 0.4,
-                "marginRight": 0.4,
-                "scale": 0.9,
-            }
-            
             file_identifier = member_id if member_id else f"{self.firstName}_{self.lastName}"
-            
-            result = self.driver.execute_cdp_cmd("Page.printToPDF", pdf_options)
-            pdf_data = base64.b64decode(result.get('data', ''))
-            pdf_path = os.path.join(self.download_dir, f"unitedsco_eligibility_{file_identifier}_{int(time.time())}.pdf")
-            with open(pdf_path, "wb") as f:
-                f.write(pdf_data)
-            return pdf_path
+            return pdf_render.snapshot_to_pdf(
+                self.driver,
+                os.path.join(self.download_dir, f"unitedsco_eligibility_{file_identifier}_{int(time.time())}.pdf"),
+            )
         except Exception as e:
             print(f"[UnitedSCO _capture_pdf] Error: {e}")
             return None
@@ -1,18 +1,19 @@
-from selenium import webdriver
 from selenium.common import TimeoutException
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import time
 import os
 import base64
+import tracing
+
+from massdhp_browser_manager import get_browser_manager
+from job_downloads import JobDownloads
 
 class AutomationMassHealthClaimStatusCheck:    
     def __init__(self, data):
         self.headless = False
         self.driver = None
+        self.session = None
 
         self.data = data.get("data")
 
@@ -22,28 +23,18 @@ class AutomationMassHealthClaimStatusCheck:
         self.massdhp_username = self.data.get("massdhpUsername", "")
         self.massdhp_password = self.data.get("massdhpPassword", "")
 
-        self.download_dir = os.path.abspath("seleniumDownloads")
-        os.makedirs(self.download_dir, exist_ok=True)
+        # This job's own folder under seleniumDownloads (see job_downloads.py)
+        self.downloads = JobDownloads(get_browser_manager().download_dir, "MassHealth")
+        self.download_dir = self.downloads.dir
     
 
+    @tracing.traced()
     def config_driver(self):
-        options = webdriver.ChromeOptions()
-        if self.headless:
-            options.add_argument("--headless")
-
-        # Add PDF download preferences
-        prefs = {
-            "download.default_directory": self.download_dir,
-            "plugins.always_open_pdf_externally": True,
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True
-        }
-        options.add_experimental_option("prefs", prefs)
-
-        s = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=s, options=options)
-        self.driver = driver
+        # Borrow a warm (possibly already logged-in) browser from the MassHealth pool
+        self.session = get_browser_manager().acquire(self.massdhp_username, self.headless)
+        self.driver = self.session.driver
 
+    @tracing.traced()
     def login(self):
         wait = WebDriverWait(self.driver, 30)
 
@@ -68,6 +59,7 @@ class AutomationMassHealthClaimStatusCheck:
             print(f"Error while logging in: {e}")
             return "ERROR:LOGIN FAILED"
 
+    @tracing.traced()
     def step1(self):
         wait = WebDriverWait(self.driver, 30)
 
@@ -77,7 +69,7 @@ class AutomationMassHealthClaimStatusCheck:
             )
             eligibility_link.click()
 
-            time.sleep(3)
+            tracing.sleep(3)
 
             # Fill Member ID
             member_id_input = wait.until(EC.presence_of_element_located((By.XPATH, '//input[@name="MAMedicaidID"]')))
@@ -88,7 +80,7 @@ class AutomationMassHealthClaimStatusCheck:
             search_btn = wait.until(EC.element_to_be_clickable((By.XPATH, '//input[@id="Submit1"]')))
             search_btn.click()
 
-            time.sleep(2)
+            tracing.sleep(2)
 
              # Check for error message
             try:
@@ -116,6 +108,7 @@ class AutomationMassHealthClaimStatusCheck:
             print(f"Error while step1 i.e Cheking the MemberId and DOB in: {e}")
             return "ERROR:STEP1"
 
+    @tracing.traced()
     def step2(self):
         try:
             try:
@@ -126,7 +119,7 @@ class AutomationMassHealthClaimStatusCheck:
                 print("Warning: document.readyState did not become 'complete' within timeout")
 
             # Give some time for lazy content to finish rendering (adjust if needed)
-            time.sleep(0.6)
+            tracing.sleep(0.6)
 
             # Get total page size and DPR
             total_width = int(self.driver.execute_script(
@@ -148,7 +141,7 @@ class AutomationMassHealthClaimStatusCheck:
             })
 
             # Small pause for layout to settle after emulation change
-            time.sleep(0.15)
+            tracing.sleep(0.15)
 
             # Capture screenshot (base64 PNG)
             result = self.driver.execute_cdp_cmd("Page.captureScreenshot", {"format": "png", "fromSurface": True})
@@ -169,43 +162,19 @@ class AutomationMassHealthClaimStatusCheck:
 
         except Exception as e:
             print("ERROR in step2:", e)
-            # Empty the download folder (remove files / symlinks only)
-            try:
-                dl = os.path.abspath(self.download_dir)
-                if os.path.isdir(dl):
-                    for name in os.listdir(dl):
-                        item = os.path.join(dl, name)
-                        try:
-                            if os.path.isfile(item) or os.path.islink(item):
-                                os.remove(item)
-                                print(f"[cleanup] removed: {item}")
-                        except Exception as rm_err:
-                            print(f"[cleanup] failed to remove {item}: {rm_err}")
-                    print(f"[cleanup] emptied download dir: {dl}")
-                else:
-                    print(f"[cleanup] download dir does not exist: {dl}")
-            except Exception as cleanup_exc:
-                print(f"[cleanup] unexpected error while cleaning downloads dir: {cleanup_exc}")
+            # Remove this job's partial files (other jobs' files are untouched)
+            self.downloads.discard()
             return {"status": "error", "message": str(e)}
-
-        finally:
-            # Keep your existing quit behavior; if you want the driver to remain open for further
-            # actions, remove or change this.
-            if self.driver:
-                try:
-                    self.driver.quit()
-                except Exception:
-                    pass
     
 
     def main_workflow(self, url):
+        # Only a run that got all the way through gives a reusable browser back
+        healthy = False
         try: 
             self.config_driver()
-            self.driver.maximize_window()
-            self.driver.get(url)
-            time.sleep(3)
 
-            login_result = self.login()
+            # Reuses the pooled login while it is still valid, logs in again otherwise
+            login_result = get_browser_manager().ensure_logged_in(self.session, url, self.login)
             if login_result.startswith("ERROR"):
                 return {"status": "error", "message": login_result}
 
@@ -217,12 +186,15 @@ class AutomationMassHealthClaimStatusCheck:
             if step2_result.get("status") == "error":
                 return {"status": "error", "message": step2_result.get("message")}
 
+            healthy = True
             return step2_result
         except Exception as e: 
             return {
                 "status": "error",
                 "message": e
             }
-        
+
         finally:
-            self.driver.quit()
+            # Hand the (still logged-in) browser back to the pool instead of quitting;
+            # one a run failed on is closed (it may be stuck on an error page or dead)
+            get_browser_manager().release(self.session, healthy=healthy)
@@ -1,21 +1,23 @@
-from selenium import webdriver
 from selenium.common import TimeoutException
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import Select
-import time
 from datetime import datetime
 import tempfile
 import base64
 import os
+import tracing
+import portal_http
+
+from massdhp_browser_manager import get_browser_manager
 
 class AutomationMassHealth:    
     def __init__(self, data):
         self.headless = False
         self.driver = None
+        self.session = None
+        self.pdf_path = None
 
         self.data = data
         self.claim = data.get("claim", {})
@@ -32,14 +34,13 @@ class AutomationMassHealth:
         self.missingTeeth = self.claim.get("missingTeeth", {})
     
 
+    @tracing.traced()
     def config_driver(self):
-        options = webdriver.ChromeOptions()
-        if self.headless:
-            options.add_argument("--headless")
-        s = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=s, options=options)
-        self.driver = driver
+        # Borrow a warm (possibly already logged-in) browser from the MassHealth pool
+        self.session = get_browser_manager().acquire(self.massdhp_username, self.headless)
+        self.driver = self.session.driver
 
+    @tracing.traced()
     def login(self):
         wait = WebDriverWait(self.driver, 30)
 
@@ -64,6 +65,7 @@ class AutomationMassHealth:
             print(f"Error while logging in: {e}")
             return "ERROR:LOGIN FAILED"
 
+    @tracing.traced()
     def step1(self):
         wait = WebDriverWait(self.driver, 30)
 
@@ -73,7 +75,7 @@ class AutomationMassHealth:
             )
             claim_upload_link.click()
 
-            time.sleep(3)
+            tracing.sleep(3)
 
             # Fill Member ID
             member_id_input = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@id="Text1"]')))
@@ -127,6 +129,7 @@ class AutomationMassHealth:
             print(f"Error while step1 i.e Cheking the MemberId and DOB in: {e}")
             return "ERROR:STEP1"
 
+    @tracing.traced()
     def step2(self):
 
         wait = WebDriverWait(self.driver, 30)
@@ -189,7 +192,7 @@ class AutomationMassHealth:
                 add_proc_xpath = "//input[@type='submit' and @value='Add Procedure']"
                 wait.until(EC.element_to_be_clickable((By.XPATH, add_proc_xpath))).click()
 
-                time.sleep(1)
+                tracing.sleep(1)
 
         except Exception as e: 
             print(f"Error while filling Procedure Codes: {e}")
@@ -220,7 +223,7 @@ class AutomationMassHealth:
                     upload_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and @value='Upload File']")))
                     upload_button.click()
 
-                    time.sleep(3)
+                    tracing.sleep(3)
         except Exception as e: 
             print(f"Error while uploading PDFs: {e}")
             return "ERROR:PDF FAILED"
@@ -253,7 +256,7 @@ class AutomationMassHealth:
             update_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and @value='Update Missing Teeth']")))
             update_button.click()
             
-            time.sleep(3)
+            tracing.sleep(3)
         except Exception as e: 
             print(f"Error while filling missing teeth: {e}")
             return "ERROR:MISSING TEETH FAILED"
@@ -270,7 +273,7 @@ class AutomationMassHealth:
                 update_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and @value='Update Remarks']")))
                 update_button.click()
                 
-                time.sleep(3)
+                tracing.sleep(3)
             
         except Exception as e: 
             print(f"Error while filling remarks: {e}")
@@ -281,7 +284,7 @@ class AutomationMassHealth:
             close_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and @value='Submit Request']")))
             close_button.click()
             
-            time.sleep(1)
+            tracing.sleep(1)
 
             # Switch to alert and accept it
             try:
@@ -292,7 +295,7 @@ class AutomationMassHealth:
             except TimeoutException:
                 print("No alert appeared after clicking the button.")
                 
-            time.sleep(1)
+            tracing.sleep(1)
 
         except Exception as e: 
             print(f"Error while Closing: {e}")
@@ -301,13 +304,14 @@ class AutomationMassHealth:
         return "Success"
     
 
+    @tracing.traced()
     def reach_to_pdf(self):
         wait = WebDriverWait(self.driver, 90)
         try:
             pdf_link_element = wait.until(
                 EC.element_to_be_clickable((By.XPATH, "//a[contains(@href, '.pdf')]"))
             )
-            time.sleep(5)
+            tracing.sleep(5)
             pdf_relative_url = pdf_link_element.get_attribute("href")
 
             if not pdf_relative_url.startswith("http"):
@@ -316,6 +320,17 @@ class AutomationMassHealth:
                 full_pdf_url = pdf_relative_url
             
             print("FULL PDF LINK: ",full_pdf_url)
+
+            # Fetch the PDF now with this browser's login cookies (the link needs the session)
+            try:
+                safe_name = "".join(c for c in os.path.basename(full_pdf_url.split("?")[0]) if c.isalnum() or c in "-_.")
+                self.pdf_path = portal_http.fetch_artifact(
+                    self.driver, "massdhp", full_pdf_url,
+                    os.path.join(get_browser_manager().download_dir, f"claim_{self.memberId}_{safe_name}")
+                )
+            except portal_http.PortalHttpError as e:
+                print(f"[portal_http] PDF not fetched directly, only its link is returned: {e}")
+
             return full_pdf_url
 
         except Exception as e:
@@ -325,18 +340,14 @@ class AutomationMassHealth:
                 "message": str(e),
             }
 
-        finally:
-            if self.driver:
-                self.driver.quit()
-
     def main_workflow(self, url):
+        # Only a run that got all the way through gives a reusable browser back
+        healthy = False
         try: 
             self.config_driver()
-            self.driver.maximize_window()
-            self.driver.get(url)
-            time.sleep(3)
 
-            login_result = self.login()
+            # Reuses the pooled login while it is still valid, logs in again otherwise
+            login_result = get_browser_manager().ensure_logged_in(self.session, url, self.login)
             if login_result.startswith("ERROR"):
                 return {"status": "error", "message": login_result}
 
@@ -352,12 +363,21 @@ class AutomationMassHealth:
             if reachToPdf_result.startswith("ERROR"):
                 return {"status": "error", "message": reachToPdf_result}
 
-            return {
+            result = {
                     "status": "success",
                     "pdf_url": reachToPdf_result
                 }
+            if self.pdf_path:
+                result["pdf_path"] = self.pdf_path
+            healthy = True
+            return result
         except Exception as e: 
             return {
                 "status": "error",
                 "message": e
             }
+
+        finally:
+            # Hand the (still logged-in) browser back to the pool instead of quitting;
+            # one a run failed on is closed (it may be stuck on an error page or dead)
+            get_browser_manager().release(self.session, healthy=healthy)
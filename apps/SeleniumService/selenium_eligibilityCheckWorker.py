@@ -1,19 +1,19 @@
-from selenium import webdriver
 from selenium.common import TimeoutException
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import time
 import os
-import shutil
 import stat
+import tracing
+
+from massdhp_browser_manager import get_browser_manager
+from job_downloads import JobDownloads
 
 class AutomationMassHealthEligibilityCheck:    
     def __init__(self, data):
         self.headless = False
         self.driver = None
+        self.session = None
 
         self.data = data.get("data")
 
@@ -22,29 +22,21 @@ class AutomationMassHealthEligibilityCheck:
         self.dateOfBirth = self.data.get("dateOfBirth", "")
         self.massdhp_username = self.data.get("massdhpUsername", "")
         self.massdhp_password = self.data.get("massdhpPassword", "")
+        # mode=quick: status from the search results only (no Tx Report download)
+        self.quick = self.data.get("mode") == "quick"
 
-        self.download_dir = os.path.abspath("seleniumDownloads")
-        os.makedirs(self.download_dir, exist_ok=True)
+        # This job's own folder under seleniumDownloads (see job_downloads.py)
+        self.downloads = JobDownloads(get_browser_manager().download_dir, "MassHealth")
+        self.download_dir = self.downloads.dir
     
 
+    @tracing.traced()
     def config_driver(self):
-        options = webdriver.ChromeOptions()
-        if self.headless:
-            options.add_argument("--headless")
-
-        # Add PDF download preferences
-        prefs = {
-            "download.default_directory": self.download_dir,
-            "plugins.always_open_pdf_externally": True,
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True
-        }
-        options.add_experimental_option("prefs", prefs)
-
-        s = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=s, options=options)
-        self.driver = driver
+        # Borrow a warm (possibly already logged-in) browser from the MassHealth pool
+        self.session = get_browser_manager().acquire(self.massdhp_username, self.headless)
+        self.driver = self.session.driver
 
+    @tracing.traced()
     def login(self):
         wait = WebDriverWait(self.driver, 30)
 
@@ -69,6 +61,7 @@ class AutomationMassHealthEligibilityCheck:
             print(f"Error while logging in: {e}")
             return "ERROR:LOGIN FAILED"
 
+    @tracing.traced()
     def step1(self):
         wait = WebDriverWait(self.driver, 30)
 
@@ -78,7 +71,7 @@ class AutomationMassHealthEligibilityCheck:
             )
             eligibility_link.click()
 
-            time.sleep(3)
+            tracing.sleep(3)
 
             # Fill Member ID
             member_id_input = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@id="Text1"]')))
@@ -121,14 +114,14 @@ class AutomationMassHealthEligibilityCheck:
             return "ERROR:STEP1"
 
     
+    @tracing.traced()
     def step2(self):
         def wait_for_pdf_download(timeout=60):
-            for _ in range(timeout):
-                files = [f for f in os.listdir(self.download_dir) if f.endswith(".pdf")]
-                if files:
-                    return os.path.join(self.download_dir, files[0])
-                time.sleep(1)
-            raise TimeoutError("PDF did not download in time")
+            # Completion comes from Chrome's download events for this job's folder
+            path = self.downloads.wait(timeout)
+            if not path:
+                raise TimeoutError("PDF did not download in time")
+            return path
 
         def _unique_target_path():
             """
@@ -147,22 +140,33 @@ class AutomationMassHealthEligibilityCheck:
             f"//table[@id='Table3']//tr[td[contains(text(), '{self.memberId}')]]/td[3]")))
             eligibilityText = eligibilityElement.text
 
+            if self.quick:
+                self.downloads.discard()  # nothing was written; the empty job folder goes at job end
+                return {
+                    "status": "success",
+                    "mode": "quick",
+                    "eligibility": eligibilityText,
+                    "memberId": self.memberId,
+                }
+
             txReportElement = wait.until(EC.element_to_be_clickable((By.XPATH,
             f"//table[@id='Table3']//tr[td[contains(text(), '{self.memberId}')]]//input[@value='Tx Report']"
             )))
 
+            self.downloads.watch(self.driver)
             txReportElement.click()
 
             # wait for the PDF to fully appear
             downloaded_path = wait_for_pdf_download()
             # generate unique target path (include memberId)
             target_path = _unique_target_path()
-            # It's possible Chrome writes a file with a fixed name: copy/rename it to our target name.
-            shutil.copyfile(downloaded_path, target_path)
+            # Chrome keeps the portal's fixed file name: move it to our target name.
+            os.replace(downloaded_path, target_path)
             # ensure the copied file is writable / stable
             os.chmod(target_path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
 
 
+            self.downloads.close()
             print("PDF downloaded at:", target_path)
 
             return {
@@ -173,42 +177,22 @@ class AutomationMassHealthEligibilityCheck:
         except Exception as e:
             print(f"ERROR: {str(e)}")
 
-            # Empty the download folder (remove files / symlinks only)
-            try:
-                dl = os.path.abspath(self.download_dir)
-                if os.path.isdir(dl):
-                    for name in os.listdir(dl):
-                        item = os.path.join(dl, name)
-                        try:
-                            if os.path.isfile(item) or os.path.islink(item):
-                                os.remove(item)
-                                print(f"[cleanup] removed: {item}")
-                        except Exception as rm_err:
-                            print(f"[cleanup] failed to remove {item}: {rm_err}")
-                    print(f"[cleanup] emptied download dir: {dl}")
-                else:
-                    print(f"[cleanup] download dir does not exist: {dl}")
-            except Exception as cleanup_exc:
-                print(f"[cleanup] unexpected error while cleaning downloads dir: {cleanup_exc}")
-
+            # Remove this job's partial downloads (other jobs' files are untouched)
+            self.downloads.discard()
 
             return {
                 "status": "error",
                 "message": str(e),
             }
 
-        finally:
-            if self.driver:
-                self.driver.quit()
-
     def main_workflow(self, url):
+        # Only a run that got all the way through gives a reusable browser back
+        healthy = False
         try: 
             self.config_driver()
-            self.driver.maximize_window()
-            self.driver.get(url)
-            time.sleep(3)
 
-            login_result = self.login()
+            # Reuses the pooled login while it is still valid, logs in again otherwise
+            login_result = get_browser_manager().ensure_logged_in(self.session, url, self.login)
             if login_result.startswith("ERROR"):
                 return {"status": "error", "message": login_result}
 
@@ -220,12 +204,15 @@ class AutomationMassHealthEligibilityCheck:
             if step2_result.get("status") == "error":
                 return {"status": "error", "message": step2_result.get("message")}
 
+            healthy = True
             return step2_result
         except Exception as e: 
             return {
                 "status": "error",
                 "message": e
             }
-        
+
         finally:
-            self.driver.quit()
+            # Hand the (still logged-in) browser back to the pool instead of quitting;
+            # one a run failed on is closed (it may be stuck on an error page or dead)
+            get_browser_manager().release(self.session, healthy=healthy)
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+PAGES_DIR = Path(__file__).resolve().parent / "pages"
+
+# Stores and browser profiles go to a scratch directory, never the service's own
+_SCRATCH = tempfile.mkdtemp(prefix="selenium-service-tests-")
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(_SCRATCH, "jobs.sqlite3"))
+os.environ.setdefault("ARTIFACT_STORE_DIR", os.path.join(_SCRATCH, "artifacts"))
+os.environ.setdefault("ELIGIBILITY_CACHE_PATH", os.path.join(_SCRATCH, "eligibility_cache.sqlite3"))
+os.environ.setdefault("PDF_RENDER_DEFERRED", "0")  # render inline, no background pool
+os.environ.setdefault("WAIT_IDLE_SECONDS", "0.05")
+os.chdir(_SCRATCH)  # browser managers put seleniumDownloads / chrome profiles in the cwd
+
+sys.path.insert(0, str(SERVICE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def read_page(name: str) -> str:
+    return (PAGES_DIR / name).read_text(encoding="utf-8")
+
+
+@pytest.fixture
+def page():
+    """Saved portal page by file name (tests/pages/)."""
+    return read_page
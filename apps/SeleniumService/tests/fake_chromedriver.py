@@ -0,0 +1,206 @@
+"""
+Stand-in for chromedriver: answers WebDriver commands from saved HTML pages.
+
+An InstrumentedChrome wired to it (instrumented_driver()) runs worker code
+without a browser, and its command_count is the number of WebDriver round
+trips that code would make against the portal. Pages are looked up by URL;
+a click on an element with data-navigate="<url>" opens that page, and one
+with data-download="<name>" writes that file into the directory last set
+with Browser.setDownloadBehavior, like a portal download. URLs matching the
+Network.setBlockedURLs patterns are blocked as Chrome blocks them, and
+`loads` records the patterns in force when each page was opened.
+"""
+import os
+import re
+import base64
+from collections import Counter
+from typing import Dict, Any, Optional, List, Tuple
+from urllib.parse import urljoin
+
+from selenium import webdriver
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+import page_parsers
+from chromedriver_service import InstrumentedChrome
+
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+PDF_BYTES = b"%PDF-1.4\n% stand-in\n%%EOF\n"
+
+
+def _no_such_element(selector: str) -> Dict[str, Any]:
+    # "status" is what selenium's ErrorHandler looks at to raise NoSuchElementException
+    message = f"Unable to locate element: {selector}"
+    return {"status": "no such element", "message": message, "value": {"error": "no such element", "message": message}}
+
+
+def _css_to_xpath(css: str) -> str:
+    """The CSS selectors Selenium's By.ID / NAME / TAG_NAME / CLASS_NAME produce."""
+    if css.startswith("[") and css.endswith("]") and "=" in css:
+        name, value = css[1:-1].split("=", 1)
+        return f"//*[@{name}={value}]"
+    if css.startswith("."):
+        return f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {css[1:]} ')]"
+    return f"//{css}"
+
+
+class FakeChromedriver:
+    """Command executor over `pages` (URL -> HTML), starting at `url`."""
+
+    def __init__(self, pages: Dict[str, str], url: str):
+        self.pages = pages
+        self.commands: Counter = Counter()
+        self.download_dir: Optional[str] = None
+        self.blocked_urls: List[str] = []
+        self.loads: List[Tuple[str, List[str]]] = []
+        self.load(url)
+
+    def blocks(self, url: str) -> bool:
+        """Would Chrome block `url` (setBlockedURLs: '*' is the only wildcard)?"""
+        return any(
+            re.fullmatch(".*".join(re.escape(part) for part in pattern.split("*")), url)
+            for pattern in self.blocked_urls
+        )
+
+    def load(self, url: str):
+        self.loads.append((url, list(self.blocked_urls)))
+        if self.blocks(url):
+            url, self.html = "chrome-error://chromewebdata/", "<html><body>ERR_BLOCKED_BY_CLIENT</body></html>"
+        else:
+            self.html = self.pages.get(url, "<html><body></body></html>")
+        self.url = url
+        self.tree = page_parsers.parse(self.html)
+        self.elements = {}
+
+    # ── Protocol ────────────────────────────────────────────────────
+
+    def execute(self, command: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.commands[command] += 1
+        handler = getattr(self, f"_cmd_{command}", None)
+        return handler(params) if handler else {"value": None}
+
+    def _ref(self, el) -> Dict[str, str]:
+        key = str(id(el))
+        self.elements[key] = el
+        return {ELEMENT_KEY: key}
+
+    def _element(self, params: Dict[str, Any]):
+        return self.elements[params["id"]]
+
+    def _find(self, root, params: Dict[str, Any]):
+        using, value = params["using"], params["value"]
+        xpath = value if using == "xpath" else _css_to_xpath(value)
+        if root is not self.tree and xpath.startswith("//"):
+            xpath = "." + xpath
+        return [el for el in root.xpath(xpath) if not isinstance(el, str)]
+
+    # ── Commands ────────────────────────────────────────────────────
+
+    def _cmd_newSession(self, params):
+        return {"value": {"sessionId": "stand-in", "capabilities": {"browserName": "chrome"}}}
+
+    def _cmd_get(self, params):
+        self.load(params["url"])
+        return {"value": None}
+
+    def _cmd_getCurrentUrl(self, params):
+        return {"value": self.url}
+
+    def _cmd_getPageSource(self, params):
+        return {"value": self.html}
+
+    def _cmd_getTitle(self, params):
+        return {"value": page_parsers.first_text(self.tree, "//title")}
+
+    def _cmd_w3cGetWindowHandles(self, params):
+        return {"value": ["main"]}
+
+    def _cmd_w3cGetCurrentWindowHandle(self, params):
+        return {"value": "main"}
+
+    def _cmd_getLog(self, params):
+        return {"value": []}
+
+    def _cmd_findElement(self, params):
+        found = self._find(self.tree, params)
+        return {"value": self._ref(found[0])} if found else _no_such_element(params["value"])
+
+    def _cmd_findElements(self, params):
+        return {"value": [self._ref(el) for el in self._find(self.tree, params)]}
+
+    def _cmd_findChildElement(self, params):
+        found = self._find(self._element(params), params)
+        return {"value": self._ref(found[0])} if found else _no_such_element(params["value"])
+
+    def _cmd_findChildElements(self, params):
+        return {"value": [self._ref(el) for el in self._find(self._element(params), params)]}
+
+    def _cmd_getElementText(self, params):
+        return {"value": page_parsers.text_of(self._element(params))}
+
+    def _cmd_getElementTagName(self, params):
+        return {"value": self._element(params).tag}
+
+    def _cmd_isElementEnabled(self, params):
+        return {"value": self._element(params).get("disabled") is None}
+
+    def _cmd_clickElement(self, params):
+        el = self._element(params)
+        name = el.get("data-download")
+        if name and self.download_dir:
+            with open(os.path.join(self.download_dir, name), "wb") as f:
+                f.write(PDF_BYTES)
+        if el.get("data-navigate"):
+            self.load(urljoin(self.url, el.get("data-navigate")))
+        return {"value": None}
+
+    def _cmd_sendKeysToElement(self, params):
+        el = self._element(params)
+        value = el.get("value") or ""
+        for char in params.get("text", ""):
+            if char == Keys.DELETE:
+                value = ""  # after Ctrl+A
+            elif not "\ue000" <= char <= "\uf8ff":  # other keys type nothing
+                value += char
+        el.set("value", value)
+        return {"value": None}
+
+    def _cmd_w3cExecuteScript(self, params):
+        script, args = params["script"], params.get("args") or []
+        if "getAttribute" in script and len(args) == 2:
+            el, name = self.elements[args[0][ELEMENT_KEY]], args[1]
+            value = el.get(name)
+            if name == "href" and value is not None:
+                value = urljoin(self.url, value)  # the property, as Chrome returns it
+            return {"value": value}
+        if "isDisplayed" in script or "is_displayed" in script:
+            return {"value": True}
+        if "__pageWaitsDom" in script:
+            return {"value": ["complete", 60000]}  # loaded, no DOM mutations
+        if "document.readyState" in script:
+            return {"value": "complete"}
+        return {"value": None}
+
+    def _cmd_executeCdpCommand(self, params):
+        cmd, args = params["cmd"], params.get("params") or {}
+        if cmd == "Network.setBlockedURLs":
+            self.blocked_urls = list(args.get("urls", []))
+        elif cmd == "Browser.setDownloadBehavior":
+            self.download_dir = args.get("downloadPath")
+        elif cmd == "Page.printToPDF":
+            return {"value": {"data": base64.b64encode(PDF_BYTES).decode()}}
+        elif cmd == "Page.captureSnapshot":
+            return {"value": {"data": self.html}}
+        return {"value": {}}
+
+
+def instrumented_driver(fake: FakeChromedriver, label: str = "test") -> InstrumentedChrome:
+    """An InstrumentedChrome whose commands go to `fake` instead of chromedriver."""
+    driver = InstrumentedChrome.__new__(InstrumentedChrome)
+    driver.metrics_label = label
+    driver.command_count = 0
+    # Remote session setup only - webdriver.Chrome.__init__ would start chromedriver
+    RemoteWebDriver.__init__(driver, command_executor=fake, options=webdriver.ChromeOptions())
+    driver.command_count = 0  # not the session setup
+    fake.commands.clear()
+    return driver
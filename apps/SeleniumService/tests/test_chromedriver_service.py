@@ -0,0 +1,40 @@
+"""
+chromedriver_status(), as read by /status on the event loop: it must not wait
+on a driver download or chromedriver start (both run under _lock).
+"""
+import threading
+
+import chromedriver_service
+
+
+def test_status_while_the_driver_is_being_resolved():
+    resolving, done = threading.Event(), threading.Event()
+
+    def slow_resolve():
+        with chromedriver_service._lock:  # as resolve_chromedriver() holds it across install()
+            resolving.set()
+            done.wait(5)
+
+    resolver = threading.Thread(target=slow_resolve)
+    resolver.start()
+    assert resolving.wait(5)
+    try:
+        seen = []
+        reader = threading.Thread(target=lambda: seen.append(chromedriver_service.chromedriver_status()))
+        reader.start()
+        reader.join(2)
+        assert seen and "launches" in seen[0]
+    finally:
+        done.set()
+        resolver.join(5)
+
+
+def test_status_is_a_copy():
+    chromedriver_service._record_launch("test-status", 812.4)
+    status = chromedriver_service.chromedriver_status()
+    assert status["by_browser"]["test-status"]["last_ms"] == 812.4
+
+    status["by_browser"]["test-status"]["launches"] = 99
+    chromedriver_service._record_launch("test-status", 100.0)
+    per = chromedriver_service.chromedriver_status()["by_browser"]["test-status"]
+    assert per == {"launches": 2, "last_ms": 100.0}
@@ -0,0 +1,104 @@
+"""
+eligibility_cache: which lookups share a key, what gets stored, and which
+requests a stored result answers (quick vs full, bypass).
+"""
+import uuid
+
+import pytest
+
+import eligibility_cache
+from eligibility_cache import cache_key
+
+FULL = {"status": "success", "eligibility": "Active", "patientName": "DOE, JANE", "pdfBase64": "JVBERi0=",
+        "waits": {"step2": 1.2}}
+QUICK = {"status": "success", "eligibility": "Active", "memberId": "A12345678", "mode": "quick"}
+
+
+@pytest.fixture
+def patient():
+    """Lookup data for a member no other test uses (the cache DB is shared)."""
+    return {"memberId": f"M{uuid.uuid4().hex[:10]}", "dateOfBirth": "1990-05-06", "serviceDate": "2026-10-17"}
+
+
+def test_key_ignores_case_and_punctuation():
+    assert cache_key("ddma", {"memberId": "a-123 45", "dateOfBirth": "1990-05-06", "lastName": "O'Neil"}) == \
+        cache_key("ddma", {"memberId": "A12345", "dateOfBirth": "1990.05.06", "lastName": "oneil"})
+    assert cache_key("ddma", {"memberId": "A12345", "dateOfBirth": "1990-05-06"}) != \
+        cache_key("ddma", {"memberId": "A12345", "dateOfBirth": "1990-06-05"})
+
+
+def test_key_separates_lanes_modes_and_service_dates(patient):
+    keys = {
+        cache_key("ddma", patient),
+        cache_key("dentaquest", patient),
+        cache_key("ddma", {**patient, "mode": "quick"}),
+        cache_key("ddma", {**patient, "serviceDate": "2026-10-18"}),
+    }
+    assert len(keys) == 4
+
+
+def test_no_key_without_a_member():
+    assert cache_key("ddma", {"firstName": "Jane"}) is None
+    assert cache_key("ddma", {"lastName": "Doe", "dateOfBirth": "1990-05-06"}) is not None
+
+
+def test_full_result_is_stored_and_returned(patient):
+    assert eligibility_cache.get("ddma", patient) is None
+    eligibility_cache.put("ddma", patient, FULL, "job-1")
+
+    hit = eligibility_cache.get("ddma", patient)
+    assert hit["eligibility"] == "Active" and hit["pdfBase64"] == FULL["pdfBase64"]
+    assert hit["cached"] is True and hit["cached_job_id"] == "job-1"
+    assert "waits" not in hit  # per-run diagnostics are not kept
+    assert eligibility_cache.get("unitedsco", patient) is None
+
+
+@pytest.mark.parametrize("result", [
+    {"status": "error", "message": "member not found"},
+    {"status": "success", "eligibility": "Active"},  # full result without its PDF
+    {**FULL, "pdf_error": "render timed out"},
+    {"status": "success", "eligibility": "Active", "pdf_artifact_id": "no-such-artifact"},
+    "ERROR:LOGIN FAILED",
+])
+def test_results_that_are_not_cached(patient, result):
+    eligibility_cache.put("ddma", patient, result, "job-1")
+    assert eligibility_cache.get("ddma", patient) is None
+
+
+def test_quick_request_is_answered_by_a_full_result(patient):
+    eligibility_cache.put("ddma", patient, FULL, "job-full")
+    hit = eligibility_cache.get("ddma", {**patient, "mode": "quick"})
+    assert hit is not None and hit["cached_job_id"] == "job-full"
+
+
+def test_full_request_is_not_answered_by_a_quick_result(patient):
+    quick = {**patient, "mode": "quick"}
+    eligibility_cache.put("ddma", quick, QUICK, "job-quick")
+    assert eligibility_cache.get("ddma", quick)["cached_job_id"] == "job-quick"
+    assert eligibility_cache.get("ddma", patient) is None
+
+
+def test_bypass_skips_the_cache_and_the_run_refreshes_it(patient):
+    eligibility_cache.put("ddma", patient, FULL, "job-old")
+    assert eligibility_cache.get("ddma", patient, bypass=True) is None
+
+    eligibility_cache.put("ddma", patient, {**FULL, "eligibility": "Inactive"}, "job-new")
+    hit = eligibility_cache.get("ddma", patient)
+    assert (hit["eligibility"], hit["cached_job_id"]) == ("Inactive", "job-new")
+
+
+@pytest.mark.parametrize("body, headers, bypass", [
+    ({"bypassCache": True}, {}, True),
+    ({"data": {"bypassCache": True}}, {}, True),
+    ({}, {"Cache-Control": "No-Cache"}, True),
+    ({}, {"Cache-Control": "max-age=0"}, False),
+    ({"data": {}}, {}, False),
+])
+def test_wants_bypass(body, headers, bypass):
+    assert eligibility_cache.wants_bypass(body, headers) is bypass
+
+
+def test_disabled_with_zero_ttl(patient, monkeypatch):
+    monkeypatch.setattr(eligibility_cache, "ELIGIBILITY_CACHE_TTL_SECONDS", 0)
+    eligibility_cache.put("ddma", patient, FULL, "job-1")
+    assert eligibility_cache.get("ddma", patient) is None
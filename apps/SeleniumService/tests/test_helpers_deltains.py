@@ -0,0 +1,91 @@
+"""
+DeltaIns helper with a deferred PDF: once the job released its slot the
+singleton browser belongs to the next job, so a late failure must not close it.
+"""
+import asyncio
+
+import pytest
+
+import pdf_render
+import artifact_store
+import helpers_deltains_eligibility as deltains
+
+RESULT = {"status": "success", "eligibility": "Active", "pdf_path": "/tmp/deltains_summary.pdf"}
+
+
+class StandInBot:
+    def __init__(self, data):
+        self.driver = StandInDriver()
+
+    def config_driver(self):
+        pass
+
+    def login(self, url):
+        return "SUCCESS"
+
+    def step1(self):
+        return "SUCCESS"
+
+    def step2(self):
+        return dict(RESULT)
+
+
+class StandInDriver:
+    def maximize_window(self):
+        pass
+
+
+class StandInSlot:
+    released = False
+
+    def release(self):
+        self.released = True
+
+
+class StandInBrowserManager:
+    def save_cookies(self):
+        pass
+
+
+@pytest.fixture
+def closed(monkeypatch):
+    """Browsers the helper closed."""
+    calls = []
+    monkeypatch.setattr(deltains, "AutomationDeltaInsEligibilityCheck", StandInBot)
+    monkeypatch.setattr(deltains, "get_browser_manager", StandInBrowserManager)
+    monkeypatch.setattr(deltains, "_close_browser", calls.append)
+    monkeypatch.setattr(pdf_render, "pending", lambda result: True)
+
+    async def rendered(result):
+        return result
+
+    monkeypatch.setattr(pdf_render, "wait", rendered)
+    return calls
+
+
+def run(sid):
+    return asyncio.run(deltains.start_deltains_run(sid, {"memberId": "11223344"}, "https://www.deltadentalins.com/"))
+
+
+def test_failure_after_the_slot_is_released_keeps_the_browser(closed, monkeypatch):
+    async def disk_full(job_id, result):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(artifact_store, "ingest", disk_full)
+    sid = deltains.make_session_entry()
+    slot = deltains.sessions[sid]["slot"] = StandInSlot()
+
+    result = run(sid)
+    assert result == {"status": "error", "message": "worker exception: No space left on device"}
+    assert slot.released
+    assert closed == []
+
+
+def test_failure_before_the_slot_is_released_closes_the_browser(closed, monkeypatch):
+    monkeypatch.setattr(StandInBot, "step1", lambda self: "ERROR:PATIENT NOT FOUND")
+    sid = deltains.make_session_entry()
+    slot = deltains.sessions[sid]["slot"] = StandInSlot()
+
+    assert run(sid)["status"] == "error"
+    assert not slot.released
+    assert len(closed) == 1
@@ -0,0 +1,107 @@
+"""
+job_events: what subscribers and the webhook see while a helper runs a job.
+The DDMA helper is driven with a stand-in bot (no browser), so every event
+comes from its own session writes.
+"""
+import asyncio
+
+import pytest
+
+import job_events
+import job_store
+import helpers_ddma_eligibility as ddma
+
+RESULT = {"status": "success", "eligibility": "Active", "pdf_path": None}
+
+
+class StandInBot:
+    """The calls start_ddma_run makes on the DDMA worker."""
+
+    def __init__(self, data):
+        self.driver = None
+
+    def config_driver(self):
+        self.driver = StandInDriver()
+
+    def login(self, url):
+        return "SUCCESS"
+
+    def step1(self):
+        return "SUCCESS"
+
+    def step2(self):
+        return dict(RESULT)
+
+
+class StandInDriver:
+    def maximize_window(self):
+        pass
+
+    def get(self, url):
+        pass
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    """Webhook calls in the order they were submitted: [(event, snapshot)]."""
+    sent = []
+    monkeypatch.setattr(job_events._webhook_pool, "submit",
+                        lambda fn, url, event, snapshot: sent.append((event, snapshot)))
+    return sent
+
+
+def run_job(monkeypatch, webhook):
+    monkeypatch.setattr(ddma, "AutomationDeltaDentalMAEligibilityCheck", StandInBot)
+    sid = ddma.make_session_entry()
+    job_events.register_callback(sid, "https://backend.example/hooks/jobs")
+
+    async def main():
+        events = []
+
+        async def listen():
+            async for event, snapshot in job_events.subscribe(sid):
+                events.append((event, snapshot))
+
+        listener = asyncio.create_task(listen())
+        await asyncio.sleep(0)
+        returned = await ddma.start_ddma_run(sid, {"memberId": "A12345678"}, "https://providers.deltadentalma.com/")
+        job_events.close(sid)
+        await asyncio.wait_for(listener, 5)
+        return returned, events
+
+    return asyncio.run(main())
+
+
+def test_completed_event_carries_the_result(monkeypatch, webhook):
+    returned, events = run_job(monkeypatch, webhook)
+    assert returned["status"] == "success"
+
+    statuses = [snapshot["status"] for event, snapshot in events if event == "status"]
+    assert statuses[0] in ("created", "queued")
+    assert statuses[-1] == "completed"
+    assert statuses.index("running") < statuses.index("completed")
+    # The first completed frame is the one the backend stops at
+    completed = next(snapshot for event, snapshot in events if snapshot["status"] == "completed")
+    assert completed["result"]["eligibility"] == "Active"
+    assert completed["message"] == "completed"
+    assert events[-1][0] == "done"
+
+
+def test_webhook_fires_once_per_transition_with_the_result(monkeypatch, webhook):
+    run_job(monkeypatch, webhook)
+    assert [(event, snapshot["status"]) for event, snapshot in webhook] == [
+        ("status", "running"), ("status", "completed"), ("done", "completed"),
+    ]
+    assert webhook[1][1]["result"]["eligibility"] == "Active"
+
+
+def test_session_update_is_one_job_write(monkeypatch):
+    sid = ddma.make_session_entry()
+    writes = []
+    monkeypatch.setattr(job_store, "_listeners", [lambda job_id, fields: writes.append(fields)])
+
+    s = ddma.sessions[sid]
+    s.update(status="error", message="boom", result={"status": "error", "message": "boom"}, last_activity=1.0)
+    assert writes == [{"status": "error", "message": "boom", "result": {"status": "error", "message": "boom"}}]
+    assert s["last_activity"] == 1.0
+    assert job_store.get_job(sid)["result"] == {"status": "error", "message": "boom"}
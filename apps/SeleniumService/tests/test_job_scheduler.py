@@ -0,0 +1,140 @@
+"""
+job_scheduler: SlotPool serves waiters by priority class with aging, and a
+JobSlot's park / resume / release keep the lane and execution counters right.
+"""
+import asyncio
+
+import pytest
+
+import job_scheduler
+from job_scheduler import SlotPool, Lane
+
+
+async def served_order(pool, priorities, age=None):
+    """Queue one waiter per priority behind a held slot; return the order they get it."""
+    await pool.acquire()
+    order = []
+
+    async def wait(name, priority):
+        await pool.acquire(priority)
+        order.append(name)
+
+    tasks = []
+    for name, priority in priorities:
+        tasks.append(asyncio.create_task(wait(name, priority)))
+        await asyncio.sleep(0)
+    if age:
+        for waiter in pool._waiters:
+            waiter.since -= age.get(waiter.label, 0)
+
+    for _ in range(len(priorities) + 1):
+        pool.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_priority_classes_then_fifo(monkeypatch):
+    monkeypatch.setattr(job_scheduler, "PRIORITY_AGING_SECONDS", 0)
+    order = asyncio.run(served_order(SlotPool(1), [
+        ("bulk", "bulk"), ("normal", "normal"), ("interactive 1", "interactive"),
+        ("interactive 2", "interactive"), ("unknown", "whenever"),
+    ]))
+    assert order == ["interactive 1", "interactive 2", "normal", "unknown", "bulk"]
+
+
+def test_resumed_otp_session_goes_first(monkeypatch):
+    monkeypatch.setattr(job_scheduler, "PRIORITY_AGING_SECONDS", 0)
+    order = asyncio.run(served_order(SlotPool(1), [
+        ("interactive", "interactive"), ("resumed", job_scheduler.PRIORITY_RESUME),
+    ]))
+    assert order == ["resumed", "interactive"]
+
+
+def test_aged_bulk_job_overtakes_newer_interactive_ones(monkeypatch):
+    monkeypatch.setattr(job_scheduler, "PRIORITY_AGING_SECONDS", 10)
+    priorities = [("bulk", "bulk"), ("interactive", "interactive"), ("normal", "normal")]
+
+    # Waited 5s: bulk counts as 2.5, still behind interactive and normal
+    assert asyncio.run(served_order(SlotPool(1), priorities, age={"bulk": 5})) == ["interactive", "normal", "bulk"]
+    # Waited 25s: aged up to interactive, and queued first
+    assert asyncio.run(served_order(SlotPool(1), priorities, age={"bulk": 25})) == ["bulk", "interactive", "normal"]
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def main():
+        pool = SlotPool(1)
+        await pool.acquire()
+        waiter = asyncio.create_task(pool.acquire("interactive"))
+        await asyncio.sleep(0)
+        assert pool.waiting == 1
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert pool.waiting == 0
+        pool.release()
+        assert pool.in_use == 0
+
+    asyncio.run(main())
+
+
+@pytest.fixture
+def lane(monkeypatch):
+    monkeypatch.setattr(job_scheduler, "execution_slots", SlotPool(1))
+    return Lane("test", 1)
+
+
+def counters(lane):
+    return {
+        "active": lane.active,
+        "parked": lane.parked,
+        "lane_slots": lane._slots.in_use,
+        "execution_slots": job_scheduler.execution_slots.in_use,
+    }
+
+
+def test_release_hands_both_slots_to_the_next_job(lane):
+    async def main():
+        next_started = asyncio.Event()
+
+        async def next_job():
+            async with lane.slot():
+                next_started.set()
+
+        async with lane.slot() as job:
+            assert counters(lane) == {"active": 1, "parked": 0, "lane_slots": 1, "execution_slots": 1}
+            waiting = asyncio.create_task(next_job())
+            await asyncio.sleep(0)
+            assert lane.queued == 1
+
+            job.release()  # e.g. waiting for a deferred PDF
+            await asyncio.wait_for(next_started.wait(), 1)
+            job.release()  # no-op the second time
+        await waiting
+        assert counters(lane) == {"active": 0, "parked": 0, "lane_slots": 0, "execution_slots": 0}
+
+    asyncio.run(main())
+
+
+def test_release_while_parked(lane):
+    async def main():
+        async with lane.slot() as job:
+            job.park()
+            assert counters(lane) == {"active": 0, "parked": 1, "lane_slots": 1, "execution_slots": 0}
+            job.release()
+            assert counters(lane) == {"active": 0, "parked": 0, "lane_slots": 0, "execution_slots": 0}
+        assert counters(lane) == {"active": 0, "parked": 0, "lane_slots": 0, "execution_slots": 0}
+
+    asyncio.run(main())
+
+
+def test_park_and_resume(lane):
+    async def main():
+        async with lane.slot() as job:
+            job.park()
+            job.park()
+            assert counters(lane) == {"active": 0, "parked": 1, "lane_slots": 1, "execution_slots": 0}
+            await job.resume()
+            assert counters(lane) == {"active": 1, "parked": 0, "lane_slots": 1, "execution_slots": 1}
+        assert counters(lane) == {"active": 0, "parked": 0, "lane_slots": 0, "execution_slots": 0}
+
+    asyncio.run(main())
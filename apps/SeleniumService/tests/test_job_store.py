@@ -0,0 +1,69 @@
+"""
+job_store: Idempotency-Key reuse (in the store and through a submit
+endpoint) and dropping the payload once a job is done.
+"""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import job_store
+
+CLAIM = {"claim": {"memberId": "100200300"}, "massdhpUsername": "provider1", "massdhpPassword": "s3cret"}
+
+
+def test_same_idempotency_key_returns_the_first_job():
+    key = str(uuid.uuid4())
+    job, created = job_store.create_job("claimsubmit", "massdhp", CLAIM, idempotency_key=key)
+    again, created_again = job_store.create_job("claimsubmit", "massdhp", {"other": 1}, idempotency_key=key)
+    assert created and not created_again
+    assert again["id"] == job["id"]
+    assert again["payload"] == CLAIM
+
+
+def test_jobs_without_a_key_are_never_merged():
+    first, _ = job_store.create_job("claimsubmit", "massdhp", CLAIM)
+    second, created = job_store.create_job("claimsubmit", "massdhp", CLAIM)
+    assert created and second["id"] != first["id"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import agent
+
+    started = []
+
+    async def worker(job_id, kind, data, priority="normal"):
+        started.append(job_id)
+
+    monkeypatch.setattr(agent, "_massdhp_worker_wrapper", worker)
+    # No `with`: the startup hooks (chromedriver warm-up, job recovery) don't run
+    return TestClient(agent.app), started
+
+
+def test_retried_submit_joins_the_first_job(client):
+    client, started = client
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    first = client.post("/claimsubmit", json=CLAIM, headers=headers).json()
+    retry = client.post("/claimsubmit", json=CLAIM, headers=headers).json()
+    assert retry["job_id"] == first["job_id"]
+    assert started == [first["job_id"]]
+
+    other = client.post("/claimsubmit", json=CLAIM, headers={"Idempotency-Key": str(uuid.uuid4())}).json()
+    assert other["job_id"] != first["job_id"]
+    assert started == [first["job_id"], other["job_id"]]
+
+
+@pytest.mark.parametrize("final", job_store.FINAL_STATUSES)
+def test_payload_is_dropped_once_the_job_is_done(final):
+    job, _ = job_store.create_job("claimsubmit", "massdhp", CLAIM)
+    job_store.mark_started(job["id"])
+    job_store.update_job(job["id"], status="running", message="Logging in")
+    assert job_store.get_job(job["id"])["payload"] == CLAIM
+
+    job_store.update_job(job["id"], status=final, message="done", result={"status": "success"})
+    done = job_store.get_job(job["id"])
+    assert done["payload"] is None
+    assert done["finished_at"] is not None
+    assert done["result"] == {"status": "success"}
+    assert "payload" not in job_store.job_public_view(done)
@@ -0,0 +1,164 @@
+"""
+MassDHP browser pool: /status (snapshot) and other workers are not held up
+while one worker's browser is launching or being checked; logins are reused
+until the portal shows its login form again; a browser a run failed on is
+closed rather than handed to the next job.
+"""
+import threading
+
+import pytest
+
+import massdhp_browser_manager
+from massdhp_browser_manager import MassDHPBrowserManager, PooledSession
+from fake_chromedriver import FakeChromedriver, instrumented_driver
+
+
+class StandInDriver:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.quit_called = False
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        return "https://providers.massdhp.com/home.asp"
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    manager = MassDHPBrowserManager()
+    monkeypatch.setattr(manager, "_sessions", [])
+    monkeypatch.setattr(massdhp_browser_manager, "MASSDHP_POOL_SIZE", 2)
+    return manager
+
+
+def test_snapshot_during_a_browser_launch(pool, monkeypatch):
+    launching, launched = threading.Event(), threading.Event()
+
+    def slow_launch(headless=False):
+        launching.set()
+        assert launched.wait(5)
+        return StandInDriver()
+
+    monkeypatch.setattr(pool, "_create_driver", slow_launch)
+    acquired = []
+    worker = threading.Thread(target=lambda: acquired.append(pool.acquire("provider1")))
+    worker.start()
+    assert launching.wait(5)
+
+    # Both would block on the pool lock if acquire() held it across the launch
+    seen = []
+    status = threading.Thread(target=lambda: (pool.release(PooledSession(StandInDriver(), "other")),
+                                              seen.append(pool.snapshot())))
+    status.start()
+    status.join(2)
+    assert seen == [{"size": 2, "sessions": 1, "in_use": 1, "logged_in": 0}]
+
+    launched.set()
+    worker.join(5)
+    assert acquired and isinstance(acquired[0].driver, StandInDriver)
+
+
+def test_dead_session_is_replaced(pool, monkeypatch):
+    monkeypatch.setattr(pool, "_create_driver", lambda headless=False: StandInDriver())
+    first = pool.acquire("provider1")
+    pool.release(first)
+    assert pool.acquire("provider1") is first
+    pool.release(first)
+
+    first.driver.alive = False
+    dead_driver = first.driver
+    second = pool.acquire("provider1")
+    assert second is not first
+    assert dead_driver.quit_called
+    assert pool.snapshot()["sessions"] == 1
+
+
+def test_unhealthy_release_closes_the_browser(pool, monkeypatch):
+    monkeypatch.setattr(pool, "_create_driver", lambda headless=False: StandInDriver())
+    session = pool.acquire("provider1")
+    pool.release(session, healthy=False)
+    assert session.driver.quit_called
+    assert pool.snapshot()["sessions"] == 0
+
+
+def test_failed_launch_frees_its_slot(pool, monkeypatch):
+    def no_chrome(headless=False):
+        raise RuntimeError("chrome failed to start")
+
+    monkeypatch.setattr(pool, "_create_driver", no_chrome)
+    with pytest.raises(RuntimeError, match="failed to start"):
+        pool.acquire("provider1")
+    assert pool.snapshot()["sessions"] == 0
+
+
+LOGIN_URL = "https://providers.massdhp.com/providers_login.asp"
+HOME_URL = "https://providers.massdhp.com/home.asp"
+LOGIN_PAGE = """<html><body><form>
+<input name="Email" type="text"/><input name="Pass" type="password"/>
+<input type="submit" value="Login" data-navigate="/home.asp"/>
+</form></body></html>"""
+HOME_PAGE = "<html><body><a href='/eligibility.asp'>Eligibility</a></body></html>"
+
+
+def portal_browser(pool, monkeypatch, home_page=HOME_PAGE):
+    fake = FakeChromedriver({LOGIN_URL: LOGIN_PAGE, HOME_URL: home_page}, "about:blank")
+    monkeypatch.setattr(pool, "_create_driver", lambda headless=False: instrumented_driver(fake, "massdhp"))
+    return fake
+
+
+def submit_login(driver):
+    driver.find_element("xpath", "//input[@type='submit']").click()
+    return "Success"
+
+
+def test_warm_login_is_reused(pool, monkeypatch):
+    portal_browser(pool, monkeypatch)
+    session = pool.acquire("provider1")
+    logins = []
+
+    def login():
+        logins.append(session.driver.current_url)
+        return submit_login(session.driver)
+
+    assert pool.ensure_logged_in(session, LOGIN_URL, login) == "Success"
+    assert session.home_url == HOME_URL
+    assert pool.ensure_logged_in(session, LOGIN_URL, login) == "ALREADY_LOGGED_IN"
+    assert logins == [LOGIN_URL]
+
+
+def test_expired_login_logs_in_again(pool, monkeypatch):
+    fake = portal_browser(pool, monkeypatch, home_page=LOGIN_PAGE)  # the portal answers with its login form
+    session = pool.acquire("provider1")
+    session.home_url = HOME_URL
+    assert pool.ensure_logged_in(session, LOGIN_URL, lambda: "ERROR:LOGIN FAILED") == "ERROR:LOGIN FAILED"
+    assert session.home_url is None
+    assert fake.url == LOGIN_URL
+
+
+def test_login_page_that_never_loads(pool, monkeypatch):
+    fake = portal_browser(pool, monkeypatch)
+    del fake.pages[LOGIN_URL]
+    wait = massdhp_browser_manager.WebDriverWait
+    monkeypatch.setattr(massdhp_browser_manager, "WebDriverWait", lambda driver, timeout: wait(driver, 0.2))
+    session = pool.acquire("provider1")
+    assert pool.ensure_logged_in(session, LOGIN_URL, lambda: pytest.fail("no login form to fill")).startswith("ERROR")
+
+
+@pytest.mark.parametrize("step1, closed", [("SUCCESS", False), ("ERROR:MEMBER NOT FOUND", True)])
+def test_worker_closes_a_browser_its_run_failed_on(pool, monkeypatch, step1, closed):
+    from selenium_eligibilityCheckWorker import AutomationMassHealthEligibilityCheck
+
+    portal_browser(pool, monkeypatch)
+    bot = AutomationMassHealthEligibilityCheck({"data": {"memberId": "100200300", "massdhpUsername": "provider1"}})
+    monkeypatch.setattr(bot, "login", lambda: submit_login(bot.driver))
+    monkeypatch.setattr(bot, "step1", lambda: step1)
+    monkeypatch.setattr(bot, "step2", lambda: {"status": "success", "eligibility": "Active"})
+
+    result = bot.main_workflow(LOGIN_URL)
+    assert result["status"] == ("error" if closed else "success")
+    assert pool.snapshot()["sessions"] == (0 if closed else 1)
@@ -0,0 +1,112 @@
+import pytest
+
+import page_parsers
+
+DDMA_URL = "https://providers.deltadentalma.com/members"
+DENTAQUEST_URL = "https://provider.dentaquest.com/members/search"
+
+
+@pytest.mark.parametrize("label, expected", [
+    ("Active", "active"),
+    ("Member Eligible", "active"),
+    ("Inactive", "inactive"),
+    ("INACTIVE - termed 12/31/2023", "inactive"),
+    ("Not eligible", "inactive"),
+    ("Ineligible", "inactive"),
+    ("Pending", ""),
+    ("", ""),
+])
+def test_eligibility_status(label, expected):
+    assert page_parsers.eligibility_status(label) == expected
+
+
+def test_text_of_matches_element_text():
+    tree = page_parsers.parse(
+        "<table><tbody><tr><td><a>JANE DOE</a><div>DOB: 01/02/1980</div></td>"
+        "<td><span>A1</span> <span>B2</span></td></tr></tbody></table>"
+        "<script>var x = 1;</script><p style='display: none'>hidden</p>"
+    )
+    assert page_parsers.text_of(page_parsers.first(tree, "//tr")) == "JANE DOE\nDOB: 01/02/1980\nA1 B2"
+    assert page_parsers.first_text(tree, "//body") == "JANE DOE\nDOB: 01/02/1980\nA1 B2"
+    assert page_parsers.text_of(None) == ""
+
+
+def test_parse_empty_page():
+    assert page_parsers.first(page_parsers.parse(""), "//tr") is None
+
+
+def test_ddma_search_results(page):
+    results = page_parsers.ddma_search_results(page("ddma_search.html"), DDMA_URL)
+    assert results["patientName"] == "JANE DOE"
+    assert results["memberId"] == "A12345678"
+    assert results["eligibility"] == "active"
+    assert results["detailUrl"] == "https://providers.deltadentalma.com/members/member-details/8f2c1e"
+    assert results["linkName"] == "JANE DOE"
+    assert [text for _, text in results["links"]] == ["JANE DOE", "Active"]
+
+
+def test_ddma_search_results_status_without_link():
+    html = "<table><tbody><tr><td>JANE DOE</td><td><span>Inactive</span></td></tr></tbody></table>"
+    results = page_parsers.ddma_search_results(html, DDMA_URL)
+    # "Inactive" contains "active": it has to be tested first
+    assert results["eligibility"] == "inactive"
+    assert results["detailUrl"] is None
+
+
+def test_dentaquest_search_results(page):
+    results = page_parsers.dentaquest_search_results(page("dentaquest_search.html"), DENTAQUEST_URL)
+    assert results["patientName"] == "JOHN SMITH"
+    assert results["memberId"] == "987654321"
+    assert results["eligibility"] == "active"
+    assert results["detailUrl"] == "https://provider.dentaquest.com/members/member/5521"
+
+
+def test_dentaquest_inactive_member(page):
+    results = page_parsers.dentaquest_search_results(page("dentaquest_search_inactive.html"), DENTAQUEST_URL)
+    assert results["eligibility"] == "inactive"
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("ddma_member_details.html", "Jane Doe"),
+    ("dentaquest_member_details.html", "John Smith"),
+])
+def test_detail_page_name(page, name, expected):
+    assert page_parsers.detail_page_name(page(name)) == expected
+
+
+def test_detail_page_name_skips_status_headings():
+    assert page_parsers.detail_page_name("<h1>Member Eligibility Search</h1><h2>Jane Doe</h2>") == "Jane Doe"
+    assert page_parsers.detail_page_name("<h1>Active</h1>") == ""
+
+
+def test_unitedsco_selected_patient(page):
+    patient = page_parsers.unitedsco_selected_patient(page("unitedsco_selected_patient.html"))
+    assert patient["statusText"] == "member eligible"
+    assert patient["eligibility"] == "active"
+    assert patient["patientName"] == "Mary Jones"
+    assert patient["memberId"] == "123456789"
+    assert patient["dob"] == "03/04/1975"
+
+
+def test_unitedsco_name_from_page_text():
+    html = ("<body><div><h5>Selected Patient</h5><p>Mary Jones</p>"
+            "<p>Member ID<br>123456789</p></div></body>")
+    assert page_parsers.unitedsco_selected_patient(html)["patientName"] == "Mary Jones"
+
+
+def test_deltains_patient_card(page):
+    card = page_parsers.deltains_patient_card(page("deltains_benefits.html"))
+    assert card == {
+        "patientName": "ROBERT BROWN",
+        "dob": "05/06/1990",
+        "memberId": "11223344",
+        "eligibility": "Coverage present",
+        "notEligible": False,
+        "terminated": False,
+    }
+
+
+def test_deltains_terminated_card():
+    card = page_parsers.deltains_patient_card("<body><p>Coverage terminated 01/31/2024</p></body>")
+    assert card["terminated"] and not card["notEligible"]
+    assert card["patientName"] == card["memberId"] == ""
@@ -0,0 +1,175 @@
+"""
+portal_http against a local stand-in portal: an HTTPS server on localhost
+(self-signed, trusted through REQUESTS_CA_BUNDLE) registered as the
+"standin" lane. 127.0.0.1 is the same server but off the allowlist, like an
+SSO login page.
+"""
+import json
+import shutil
+import ssl
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import portal_http
+
+SESSION_COOKIE = "session=s3cret"
+USER_AGENT = "Mozilla/5.0 (stand-in) Chrome/126.0"
+PDF_BODY = b"%PDF-1.7\n" + b"0" * (3 * portal_http.CHUNK_SIZE) + b"\n%%EOF\n"
+
+
+class StandInPortal(BaseHTTPRequestHandler):
+    seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, content_type, body, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        StandInPortal.seen.append({"path": self.path, "cookie": self.headers.get("Cookie"),
+                                   "ua": self.headers.get("User-Agent")})
+        port = self.server.server_address[1]
+        if self.path == "/sso/login":
+            return self._send(200, "text/html", b"<html><body>SSO</body></html>")
+        if SESSION_COOKIE not in (self.headers.get("Cookie") or ""):
+            # Not logged in: off to the SSO page (not a portal host)
+            return self._send(302, "text/html", b"", [("Location", f"https://127.0.0.1:{port}/sso/login")])
+        if self.path == "/docs/summary.pdf":
+            return self._send(200, "application/pdf", PDF_BODY)
+        if self.path == "/docs/expired.pdf":
+            return self._send(200, "text/html", b"<html><body>Please sign in</body></html>")
+        if self.path.startswith("/api/members/"):
+            member_id = self.path.rsplit("/", 1)[1]
+            return self._send(200, "application/json", json.dumps({"memberId": member_id}).encode())
+        return self._send(404, "text/html", b"not found")
+
+
+class Browser:
+    """The two things portal_http reads from a logged-in driver."""
+
+    def __init__(self, cookies):
+        self.cookies = cookies
+
+    def get_cookies(self):
+        return self.cookies
+
+    def execute_script(self, script):
+        return USER_AGENT
+
+
+@pytest.fixture(scope="module")
+def portal(tmp_path_factory):
+    if not shutil.which("openssl"):
+        pytest.skip("openssl is needed for the stand-in portal's certificate")
+    certs = tmp_path_factory.mktemp("certs")
+    cert, key = certs / "cert.pem", certs / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", str(key), "-out", str(cert), "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInPortal)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(str(cert), str(key))
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield {"base": f"https://localhost:{server.server_address[1]}", "cert": str(cert)}
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def lane(portal, monkeypatch):
+    monkeypatch.setenv("REQUESTS_CA_BUNDLE", portal["cert"])
+    monkeypatch.setitem(portal_http.HOSTS, "standin", ("localhost",))
+    monkeypatch.setitem(portal_http.BASE_URLS, "standin", portal["base"])
+    monkeypatch.setitem(portal_http.ENDPOINTS, "standin", {"member": "/api/members/{member_id}"})
+    StandInPortal.seen.clear()
+    return portal["base"]
+
+
+def logged_in():
+    # http.cookiejar files a dotless host as "<host>.local" (portal hosts all have dots)
+    return Browser([{"name": "session", "value": "s3cret", "domain": "localhost.local", "path": "/"}])
+
+
+@pytest.mark.parametrize("lane_name, url, allowed", [
+    ("deltains", "https://www.deltadentalins.com/provider-tools/summary.pdf", True),
+    ("deltains", "https://deltadentalins.com/summary.pdf", True),
+    ("deltains", "https://files.deltadentalins.com/summary.pdf", True),
+    ("deltains", "http://www.deltadentalins.com/summary.pdf", False),
+    ("deltains", "https://deltadentalins.com.evil.example/summary.pdf", False),
+    ("deltains", "https://providers.deltadentalma.com/summary.pdf", False),
+    ("ddma", "https://providers.deltadentalma.com/members", True),
+    ("nosuchlane", "https://providers.deltadentalma.com/members", False),
+    ("deltains", "", False),
+])
+def test_is_allowed(lane_name, url, allowed):
+    assert portal_http.is_allowed(lane_name, url) is allowed
+
+
+def test_fetch_artifact_with_browser_cookies(lane, tmp_path):
+    dest = tmp_path / "summary.pdf"
+    driver = logged_in()
+    assert portal_http.fetch_artifact(driver, "standin", f"{lane}/docs/summary.pdf", str(dest)) == str(dest)
+    assert dest.read_bytes() == PDF_BODY
+    assert not (tmp_path / "summary.pdf.part").exists()
+    assert StandInPortal.seen[-1] == {"path": "/docs/summary.pdf", "cookie": SESSION_COOKIE, "ua": USER_AGENT}
+    # One pooled client per browser
+    assert portal_http.get_client(driver, "standin") is driver._portal_http
+
+
+def test_fetch_artifact_rejects_a_login_page(lane, tmp_path):
+    with pytest.raises(portal_http.PortalHttpError, match="text/html"):
+        portal_http.fetch_artifact(logged_in(), "standin", f"{lane}/docs/expired.pdf", str(tmp_path / "x.pdf"))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_redirect_off_the_portal_is_an_error(lane, tmp_path):
+    logged_out = Browser([])
+    with pytest.raises(portal_http.PortalHttpError, match="sso/login"):
+        portal_http.fetch_artifact(logged_out, "standin", f"{lane}/docs/summary.pdf", str(tmp_path / "x.pdf"))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_missing_document_is_an_error(lane, tmp_path):
+    with pytest.raises(portal_http.PortalHttpError, match="404"):
+        portal_http.fetch_artifact(logged_in(), "standin", f"{lane}/docs/gone.pdf", str(tmp_path / "x.pdf"))
+
+
+def test_url_off_the_allowlist_is_never_requested(lane, tmp_path):
+    with pytest.raises(portal_http.PortalHttpError, match="allowlist"):
+        portal_http.fetch_artifact(logged_in(), "deltains", f"{lane}/docs/summary.pdf", str(tmp_path / "x.pdf"))
+    assert StandInPortal.seen == []
+
+
+def test_disabled(lane, tmp_path, monkeypatch):
+    monkeypatch.setattr(portal_http, "PORTAL_HTTP", False)
+    with pytest.raises(portal_http.PortalHttpError, match="PORTAL_HTTP=0"):
+        portal_http.fetch_artifact(logged_in(), "standin", f"{lane}/docs/summary.pdf", str(tmp_path / "x.pdf"))
+    assert StandInPortal.seen == []
+
+
+def test_get_json_registered_endpoint(lane):
+    assert portal_http.get_json(logged_in(), "standin", "member", member_id="A 1/2") == {"memberId": "A%201%2F2"}
+    assert StandInPortal.seen[-1]["path"] == "/api/members/A%201%2F2"
+
+
+def test_get_json_unregistered_endpoint(lane):
+    with pytest.raises(portal_http.PortalHttpError, match="not a registered"):
+        portal_http.get_json(logged_in(), "standin", "claims")
+    with pytest.raises(portal_http.PortalHttpError, match="needs parameter"):
+        portal_http.get_json(logged_in(), "standin", "member")
+    assert StandInPortal.seen == []
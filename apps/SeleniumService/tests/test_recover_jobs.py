@@ -0,0 +1,74 @@
+"""
+agent.recover_jobs(): which jobs a restarted agent runs again and which it
+marks as failed.
+"""
+import asyncio
+
+import pytest
+
+import agent
+import job_store
+
+PAYLOAD = {"data": {"memberId": "A12345678"}, "url": "https://providers.deltadentalma.com/"}
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    """Job IDs recover_jobs() handed back to a worker."""
+    started = []
+
+    async def massdhp_worker(job_id, kind, data, priority="normal"):
+        started.append(job_id)
+
+    monkeypatch.setattr(agent, "_massdhp_worker_wrapper", massdhp_worker)
+    monkeypatch.setattr(agent, "_dispatch_otp_job", lambda job: started.append(job["id"]))
+    return started
+
+
+def left_by_last_run(kind, status="queued", attempts=0, payload=PAYLOAD):
+    job, _ = job_store.create_job(kind, agent.JOB_KINDS.get(kind, {}).get("lane", "ddma"), payload)
+    if status != "queued":
+        job_store.update_job(job["id"], status=status, attempts=attempts)
+    return job["id"]
+
+
+async def recover():
+    await agent.recover_jobs()
+    await asyncio.sleep(0)  # let the re-queued worker tasks start
+
+
+def test_recover_jobs(dispatched):
+    requeued = {
+        "queued claim": left_by_last_run("claimsubmit"),
+        "queued eligibility": left_by_last_run("ddma_eligibility"),
+        "interrupted lookup": left_by_last_run("eligibility_check", "running", attempts=1),
+        "interrupted otp lookup": left_by_last_run("deltains_eligibility", "waiting_for_otp", attempts=1),
+    }
+    failed = {
+        "interrupted claim": left_by_last_run("claimsubmit", "running", attempts=1),
+        "interrupted pre-auth": left_by_last_run("claim_pre_auth", "running", attempts=1),
+        "out of attempts": left_by_last_run("eligibility_check", "running", attempts=job_store.JOB_MAX_ATTEMPTS),
+        "no payload": left_by_last_run("ddma_eligibility", payload=None),
+        "unknown kind": left_by_last_run("retired_kind"),
+    }
+
+    asyncio.run(recover())
+
+    for name, job_id in requeued.items():
+        job = job_store.get_job(job_id)
+        assert job_id in dispatched, name
+        assert (job["status"], job["message"]) == ("queued", "Re-queued after agent restart"), name
+    for name, job_id in failed.items():
+        job = job_store.get_job(job_id)
+        assert job_id not in dispatched, name
+        assert (job["status"], job["message"]) == ("error", "Interrupted by agent restart"), name
+        assert job["payload"] is None, name
+
+
+def test_finished_jobs_are_left_alone(dispatched):
+    job_id = left_by_last_run("ddma_eligibility")
+    job_store.update_job(job_id, status="completed", message="completed", result={"status": "success"})
+
+    asyncio.run(recover())
+    assert job_id not in dispatched
+    assert job_store.get_job(job_id)["message"] == "completed"
@@ -0,0 +1,141 @@
+"""
+resource_policy: what each lane's browser is told to block
+(Network.setBlockedURLs, as recorded by fake_chromedriver) against the URLs
+its login and search go through.
+"""
+import pytest
+
+import resource_policy
+from fake_chromedriver import FakeChromedriver, instrumented_driver
+
+CAPTCHA = [
+    "https://www.google.com/recaptcha/api.js?render=explicit",
+    "https://www.google.com/recaptcha/api2/anchor?ar=1&k=6Lc&co=aHR0cHM",
+    "https://www.gstatic.com/recaptcha/releases/v1/recaptcha__en.js",
+    "https://js.hcaptcha.com/1/api.js",
+    "https://challenges.cloudflare.com/turnstile/v0/api.js",
+]
+
+# Pages the workers open (agent.py *_LOGIN_URL, worker driver.get) and what they load
+LOGIN = {
+    "ddma": [
+        "https://providers.deltadentalma.com/onboarding/start/",
+        "https://providers.deltadentalma.com/static/js/main.8c1f.js",
+        "https://providers.deltadentalma.com/api/auth/login",
+    ],
+    "dentaquest": [
+        "https://providers.dentaquest.com/onboarding/start/",
+        "https://providers.dentaquest.com/static/css/main.css",
+        "https://providers.dentaquest.com/api/auth/login",
+    ],
+    "unitedsco": [
+        "https://app.dentalhub.com/app/login",
+        "https://app.dentalhub.com/app/main.js",
+        "https://app.dentalhub.com/app/dashboard",
+    ],
+    "massdhp": [
+        "https://providers.massdhp.com/providers_login.asp",
+        "https://providers.massdhp.com/scripts/login.js",
+    ],
+    "deltains": [
+        "https://www.deltadentalins.com/favicon.ico",  # cookie restore opens it
+        "https://www.deltadentalins.com/ciam/login?TARGET=%2Fprovider-tools%2Fv2",
+        "https://www.deltadentalins.com/ciam/static/js/app.js",
+        "https://www.deltadentalins.com/ciam/static/media/logo.svg",
+        "https://www.deltadentalins.com/ciam/static/fonts/opensans.woff2",
+        "https://www.deltadentalins.com/ciam/static/images/header.png",
+        "https://deltadentalins.okta.com/api/v1/authn",
+        "https://ok12static.oktacdn.com/assets/js/sdk/okta-signin-widget/7.14.0/js/okta-sign-in.min.js",
+        "https://www.deltadentalins.com/provider-tools/v2",
+    ],
+}
+SEARCH = {
+    "ddma": [
+        "https://providers.deltadentalma.com/members",
+        "https://providers.deltadentalma.com/api/members/search?memberId=A12345678",
+        "https://providers.deltadentalma.com/members/member-details/8f2c1e",
+    ],
+    "dentaquest": [
+        "https://providers.dentaquest.com/members",
+        "https://providers.dentaquest.com/api/members/search?memberId=987654321",
+    ],
+    "unitedsco": [
+        "https://app.dentalhub.com/app/patient/eligibility",
+        "https://app.dentalhub.com/api/patients/search?memberId=123456789",
+    ],
+    "massdhp": [
+        "https://providers.massdhp.com/eligibility.asp",
+    ],
+    "deltains": [
+        "https://www.deltadentalins.com/provider-tools/v2/patient-search",
+        "https://www.deltadentalins.com/provider-tools/v2/static/js/main.js",
+        "https://www.deltadentalins.com/provider-tools/v2/api/patients/search",
+        "https://www.deltadentalins.com/provider-tools/v2/eligibility-benefits",
+    ],
+}
+TRACKERS = [
+    "https://www.google-analytics.com/g/collect?v=2&tid=G-X",
+    "https://www.googletagmanager.com/gtm.js?id=GTM-X",
+    "https://connect.facebook.net/en_US/fbevents.js",
+]
+
+
+def browser(lane):
+    fake = FakeChromedriver({}, "about:blank")
+    driver = instrumented_driver(fake, lane)
+    resource_policy.apply_policy(driver, lane)
+    return driver, fake
+
+
+@pytest.mark.parametrize("lane", sorted(resource_policy.POLICIES))
+def test_login_and_search_are_not_blocked(lane):
+    driver, fake = browser(lane)
+    assert fake.blocked_urls
+    for url in LOGIN[lane] + CAPTCHA:
+        assert not fake.blocks(url), f"{lane} login: {url}"
+    resource_policy.searching(driver, True)
+    for url in SEARCH[lane] + CAPTCHA:
+        assert not fake.blocks(url), f"{lane} search: {url}"
+    for url in TRACKERS:
+        assert fake.blocks(url), f"{lane}: {url}"
+
+
+@pytest.mark.parametrize("lane", ["ddma", "dentaquest", "unitedsco", "massdhp"])
+def test_printed_pages_keep_fonts_and_images(lane):
+    driver, fake = browser(lane)
+    resource_policy.searching(driver, True)
+    assert not fake.blocks("https://fonts.gstatic.com/s/roboto/v30/roboto.woff2")
+    assert not fake.blocks("https://cdn.example.com/logo.png")
+
+
+def test_deltains_blocks_fonts_and_images_only_while_searching():
+    driver, fake = browser("deltains")
+    image, font = "https://cdn.deltadentalins.com/img/banner.png?v=2", "https://use.typekit.net/af/x.woff2"
+    assert not fake.blocks(image) and not fake.blocks(font)
+    resource_policy.searching(driver, True)
+    assert fake.blocks(image) and fake.blocks(font)
+    resource_policy.searching(driver, False)
+    assert not fake.blocks(image) and not fake.blocks(font)
+
+
+def test_deltains_benefits_page_loads_fonts_and_images(page):
+    """step1 blocks them on the search and lifts them before the (possibly printed) benefits page."""
+    from selenium_DeltaIns_eligibilityCheckWorker import AutomationDeltaInsEligibilityCheck, PROVIDER_TOOLS_URL
+
+    search_url = "https://www.deltadentalins.com/provider-tools/v2/patient-search"
+    benefits_url = "https://www.deltadentalins.com/provider-tools/v2/eligibility-benefits"
+    fake = FakeChromedriver({
+        PROVIDER_TOOLS_URL: page("deltains_provider_tools.html"),
+        search_url: page("deltains_patient_search.html"),
+        benefits_url: page("deltains_benefits.html"),
+    }, PROVIDER_TOOLS_URL)
+    bot = AutomationDeltaInsEligibilityCheck({"data": {"memberId": "11223344", "dateOfBirth": "1990-05-06"}})
+    bot.driver = instrumented_driver(fake, "deltains")
+    resource_policy.apply_policy(bot.driver, "deltains")
+
+    assert bot.step1() == "SUCCESS"
+    blocked_at_load = dict(fake.loads)
+    assert "*.png" in blocked_at_load[search_url]
+    assert "*.png" not in blocked_at_load[benefits_url]
+    assert "*.woff2" not in blocked_at_load[benefits_url]
+    assert fake.url == benefits_url
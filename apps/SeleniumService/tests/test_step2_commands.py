@@ -0,0 +1,87 @@
+"""
+step2 of each eligibility worker against saved result pages (fake_chromedriver).
+
+The result pages are read from one page_source; element-by-element reads
+(getElementText per field, one findElement per selector) must not come back.
+Measured with these pages before / after the page_source parsers: DDMA
+33 / 22 commands (quick 5 / 3), DentaQuest 34 / 21 (quick 8 / 3), United
+SCO quick 9 / 5, DeltaIns 30 / 21.
+"""
+import importlib
+
+import pytest
+
+from fake_chromedriver import FakeChromedriver, instrumented_driver
+
+DDMA_SEARCH = "https://providers.deltadentalma.com/members"
+DENTAQUEST_SEARCH = "https://provider.dentaquest.com/members/search"
+UNITEDSCO_PATIENT = "https://app.unitedconcordia.com/tuctpi/eligibility"
+DELTAINS_BENEFITS = "https://www.deltadentalins.com/provider-tools/v2/eligibility-benefits"
+
+CASES = {
+    "DDMA": (
+        "selenium_DDMA_eligibilityCheckWorker", "AutomationDeltaDentalMAEligibilityCheck",
+        {DDMA_SEARCH: "ddma_search.html",
+         "https://providers.deltadentalma.com/members/member-details/8f2c1e": "ddma_member_details.html"},
+        DDMA_SEARCH, {"memberId": "A12345678"},
+        {"eligibility": "active", "patientName": "JANE DOE", "memberId": "A12345678"},
+    ),
+    "DentaQuest": (
+        "selenium_DentaQuest_eligibilityCheckWorker", "AutomationDentaQuestEligibilityCheck",
+        {DENTAQUEST_SEARCH: "dentaquest_search.html",
+         "https://provider.dentaquest.com/members/member/5521": "dentaquest_member_details.html"},
+        DENTAQUEST_SEARCH, {"memberId": "987654321"},
+        {"eligibility": "active", "patientName": "JOHN SMITH", "memberId": "987654321"},
+    ),
+    "UnitedSCO": (
+        "selenium_UnitedSCO_eligibilityCheckWorker", "AutomationUnitedSCOEligibilityCheck",
+        {UNITEDSCO_PATIENT: "unitedsco_selected_patient.html"},
+        UNITEDSCO_PATIENT, {"memberId": "123456789"},
+        {"eligibility": "active", "patientName": "Mary Jones", "memberId": "123456789"},
+    ),
+    "DeltaIns": (
+        "selenium_DeltaIns_eligibilityCheckWorker", "AutomationDeltaInsEligibilityCheck",
+        {DELTAINS_BENEFITS: "deltains_benefits.html"},
+        DELTAINS_BENEFITS, {"memberId": "11223344"},
+        {"eligibility": "Eligible", "patientName": "ROBERT BROWN", "memberId": "11223344"},
+    ),
+}
+
+
+def run_step2(page, payer, pages=None, **data):
+    """step2 of `payer` on its saved pages (`pages` replaces some: URL -> file)."""
+    module, cls, saved, url, defaults, _ = CASES[payer]
+    bot = getattr(importlib.import_module(module), cls)({"data": {**defaults, **data}})
+    saved = {**saved, **(pages or {})}
+    fake = FakeChromedriver({u: page(name) for u, name in saved.items()}, url)
+    bot.driver = instrumented_driver(fake, payer)
+    bot.keep_browser_open = True
+    return bot.step2(), bot.driver, fake
+
+
+@pytest.mark.parametrize("payer, mode", [
+    ("DDMA", "full"), ("DDMA", "quick"),
+    ("DentaQuest", "full"), ("DentaQuest", "quick"),
+    ("UnitedSCO", "quick"),
+    ("DeltaIns", "full"),
+])
+def test_step2_reads_results_from_page_source(page, payer, mode):
+    result, driver, fake = run_step2(page, payer, mode=mode)
+
+    assert result["status"] == "success"
+    for key, value in CASES[payer][-1].items():
+        assert result[key] == value
+    if mode == "full":
+        assert result["pdf_path"]
+    # No element-by-element reads of the result page
+    assert fake.commands["getElementText"] == 0
+    assert fake.commands["findElement"] <= 3
+    assert driver.command_count == sum(fake.commands.values())
+    assert result["waits"]["commands"] == driver.command_count
+
+
+def test_dentaquest_inactive_member_is_inactive(page):
+    result, _, _ = run_step2(
+        page, "DentaQuest", pages={DENTAQUEST_SEARCH: "dentaquest_search_inactive.html"}, mode="quick"
+    )
+    assert result["eligibility"] == "inactive"
@@ -0,0 +1,231 @@
+"""
+Step-level tracing for agent jobs: timed spans exported as OTLP JSON.
+
+Every job runs under a root span whose trace id is the job id (a uuid4 is
+exactly an OTLP trace id), and everything it does becomes a child span:
+
+    job
+    ├── queue                          lane + execution slot wait
+    ├── login / step1 / step2 / ...    each run_blocking call (job_scheduler)
+    │   ├── webdriver <command>        each WebDriver command (InstrumentedChrome)
+    │   ├── cdp Page.printToPDF        CDP commands, named by method
+    │   ├── wait <kind>                PageWaits waits
+    │   └── sleep                      tracing.sleep() (remaining fixed sleeps)
+    └── otp_wait
+
+Spans are only recorded inside a job trace, so warm-ups and status calls cost
+nothing. The parent span travels in a contextvar, which run_blocking copies
+into the lane thread.
+
+Export:
+- in-process collector (always): the last TRACE_MAX_JOBS traces, served by
+  GET /jobs/{job_id}/trace (?format=otlp for the raw OTLP JSON);
+- TRACE_EXPORT_FILE (optional): one OTLP/JSON TracesData object per line,
+  written when the job's root span ends (the OpenTelemetry Collector file
+  exporter / otlpjsonfile receiver format).
+"""
+import os
+import json
+import time
+import secrets
+import threading
+import functools
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")
+TRACE_MAX_JOBS = int(os.getenv("TRACE_MAX_JOBS", "200"))
+# WebDriver-heavy steps produce thousands of spans; past this, spans are only counted
+TRACE_MAX_SPANS_PER_JOB = int(os.getenv("TRACE_MAX_SPANS_PER_JOB", "5000"))
+
+SERVICE_NAME = "selenium-agent"
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+_lock = threading.Lock()
+# trace_id -> {"spans": [otlp span dict], "dropped": int, "job_id": str}
+_traces: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _traces_data(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": spans}],
+        }]
+    }
+
+
+def _write_file(spans: List[Dict[str, Any]]):
+    try:
+        with open(TRACE_EXPORT_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(_traces_data(spans)) + "\n")
+    except OSError as e:
+        print(f"[tracing] Could not write {TRACE_EXPORT_FILE}: {e}")
+
+
+def _finish(span: Span):
+    span.end_ns = time.time_ns()
+    with _lock:
+        trace = _traces.get(span.trace_id)
+        if trace is None:
+            return
+        if len(trace["spans"]) < TRACE_MAX_SPANS_PER_JOB or span.parent_id is None:
+            trace["spans"].append(span.to_otlp())
+        else:
+            trace["dropped"] += 1
+        if span.parent_id is None and TRACE_EXPORT_FILE:
+            _write_file(trace["spans"])
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def job_span(job_id: str, **attributes):
+    """Root span for one job; its trace id is the job id."""
+    trace_id = job_id.replace("-", "")
+    if len(trace_id) != 32:
+        trace_id = secrets.token_hex(16)
+    with _lock:
+        _traces[trace_id] = {"job_id": job_id, "spans": [], "dropped": 0}
+        _traces.move_to_end(trace_id)
+        while len(_traces) > TRACE_MAX_JOBS:
+            _traces.popitem(last=False)
+
+    span = Span(trace_id, None, "job", {"job.id": job_id, "session.id": job_id, **attributes})
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        _finish(span)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the current one; a no-op outside a job trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace_id, parent.span_id, name, {"job.id": parent.attributes.get("job.id"), **attributes})
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        _finish(child)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator: run the function inside a span (named after it by default)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def sleep(seconds: float):
+    """time.sleep() that shows up in the job's trace."""
+    with span("sleep", seconds=seconds):
+        time.sleep(seconds)
+
+
+def get_trace(job_id: str, otlp: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Collected trace of a job. Default shape is a flat, start-ordered list with
+    depth and ms offsets (easy to eyeball); otlp=True returns OTLP TracesData.
+    """
+    trace_id = job_id.replace("-", "")
+    with _lock:
+        trace = _traces.get(trace_id)
+        if trace is None:
+            return None
+        spans = list(trace["spans"])
+        dropped = trace["dropped"]
+    if otlp:
+        return _traces_data(spans)
+    if not spans:
+        return {"job_id": job_id, "trace_id": trace_id, "spans": [], "dropped_spans": dropped}
+
+    by_id = {s["spanId"]: s for s in spans}
+
+    def depth(s):
+        d = 0
+        while s.get("parentSpanId") in by_id:
+            s = by_id[s["parentSpanId"]]
+            d += 1
+        return d
+
+    t0 = min(int(s["startTimeUnixNano"]) for s in spans)
+    rows = []
+    for s in sorted(spans, key=lambda s: int(s["startTimeUnixNano"])):
+        start, end = int(s["startTimeUnixNano"]), int(s["endTimeUnixNano"])
+        rows.append({
+            "name": s["name"],
+            "depth": depth(s),
+            "start_ms": round((start - t0) / 1e6, 1),
+            "duration_ms": round((end - start) / 1e6, 1),
+            "error": s["status"].get("message"),
+            "attributes": {
+                a["key"]: next(iter(a["value"].values())) for a in s["attributes"] if a["key"] != "job.id"
+            },
+        })
+    return {"job_id": job_id, "trace_id": trace_id, "spans": rows, "dropped_spans": dropped}
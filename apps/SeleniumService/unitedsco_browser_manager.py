@@ -8,10 +8,9 @@ import shutil
 import hashlib
 import threading
 import subprocess
-import time
+import tracing
 from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from chromedriver_service import create_chrome_driver
 
 # Ensure DISPLAY is set for Chrome to work (needed when running from SSH/background)
 if not os.environ.get("DISPLAY"):
@@ -197,7 +196,7 @@ class UnitedSCOBrowserManager:
                         subprocess.run(["kill", "-9", pid], check=False)
                     except:
                         pass
-                time.sleep(1)
+                tracing.sleep(1)
         except Exception as e:
             pass
         
@@ -242,7 +241,7 @@ class UnitedSCOBrowserManager:
             except:
                 pass
             self._driver = None
-            time.sleep(1)
+            tracing.sleep(1)
 
         options = webdriver.ChromeOptions()
         if headless:
@@ -271,8 +270,7 @@ class UnitedSCOBrowserManager:
         }
         options.add_experimental_option("prefs", prefs)
 
-        service = Service(ChromeDriverManager().install())
-        self._driver = webdriver.Chrome(service=service, options=options)
+        self._driver = create_chrome_driver(options, label="unitedsco")
         self._driver.maximize_window()
         
         # Remove webdriver property to avoid detection